@@ -32,6 +32,11 @@ class SimCli(threading.Thread):
                               'switch a mote on',
                               '<moterank>',
                               self._handleBoot)
+        self._registerCommand('checkpoint',
+                              'cp',
+                              'save a checkpoint of the simulation to a file, or compare the simulation with one',
+                              '<save|verify> <filename>',
+                              self._handleCheckpoint)
         self._registerCommand('debugpins',
                               'dp',
                               'print the current state of the debug pins',
@@ -72,6 +77,16 @@ class SimCli(threading.Thread):
                               'resume the execution',
                               '',
                               self._handleResume)
+        self._registerCommand('speed',
+                              'sp',
+                              'run as fast as possible, in real time, or at a ratio of simulated to wall-clock time',
+                              '<fast|realtime|N>',
+                              self._handleSpeed)
+        self._registerCommand('stats',
+                              'st',
+                              'print the number of events executed, and the rate of events and CPU handoffs',
+                              '',
+                              self._handleStats)
         self._registerCommand('step',
                               's',
                               'execute a number of steps, then pause',
@@ -226,6 +241,29 @@ class SimCli(threading.Thread):
         
         print 'OK'
             
+    def _handleCheckpoint(self,params):
+        # usage
+        if len(params)!=2 or params[0] not in ['save','verify']:
+            self._printUsageFromName('checkpoint')
+            return
+        
+        from openvisualizer.SimEngine import SimCheckpoint
+        
+        (action,filename) = params
+        
+        try:
+            if action=='save':
+                checkpoint = SimCheckpoint.save(self.engine,filename)
+                print 'saved after {0} events, seed {1}'.format(checkpoint['numEvents'],checkpoint['seed'])
+            else:
+                differences = SimCheckpoint.verify(self.engine,SimCheckpoint.load(filename))
+                if differences:
+                    print 'differs: {0}'.format(', '.join(differences))
+                else:
+                    print 'OK'
+        except (IOError,ValueError) as err:
+            print 'checkpoint failed: {0}'.format(err)
+    
     def _handleDebugpins(self,params):
         # usage
         if len(params)!=1:
@@ -350,6 +388,44 @@ class SimCli(threading.Thread):
         # pause the engine
         self.engine.resume()
     
+    def _handleSpeed(self,params):
+        # usage
+        if len(params)>1:
+            self._printUsageFromName('speed')
+            return
+        
+        # print the current speed
+        if len(params)==0:
+            print self.engine.getClock().getDescription()
+            return
+        
+        # apply speed
+        try:
+            self.engine.setSpeed(params[0])
+        except ValueError:
+            print 'invalid speed'
+            return
+        
+        print 'OK'
+    
+    def _handleStats(self,params):
+        # usage
+        if len(params)!=0:
+            self._printUsageFromName('stats')
+            return
+        
+        numEvents       = self.engine.timeline.getStats().getNumEvents()
+        durationRunning = self.engine.getStats().getDurationRunning()
+        
+        output  = ''
+        output += '- events:       '+str(numEvents)+'\n'
+        output += '- running for:  {0:.3f}s'.format(durationRunning)+'\n'
+        if durationRunning:
+            output += '- events/s:     {0:.0f}'.format(numEvents/durationRunning)+'\n'
+        output += '- handoffs/s:   {0:.0f}'.format(self.engine.getHandoffsPerSecond())+'\n'
+        output += '- corrupted:    {0} frames'.format(self.engine.propagation.medium.getNumCorrupted())+'\n'
+        print output
+    
     def _handleStep(self,params):
         # usage
         if len(params)>1:
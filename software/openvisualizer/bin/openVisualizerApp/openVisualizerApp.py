@@ -18,9 +18,14 @@ from openvisualizer.OVtracer import OVtracer
 log = logging.getLogger('openVisualizerApp')
 
 from openvisualizer.eventBus        import eventBusMonitor
+from openvisualizer.eventBus        import eventBusExecutor
 from openvisualizer.moteProbe       import moteProbe
+from openvisualizer.moteProbe       import moteProbeReactor
+from openvisualizer.moteProbe       import moteProbeCapture
+from openvisualizer.moteProbe       import moteProbeReplay
 from openvisualizer.moteConnector   import moteConnector
 from openvisualizer.moteState       import moteState
+from openvisualizer.moteState       import moteHistory
 from openvisualizer.RPL             import RPL
 from openvisualizer.openLbr         import openLbr
 from openvisualizer.openTun         import openTun
@@ -37,7 +42,7 @@ class OpenVisualizerApp(object):
     top-level functionality for several UI clients.
     '''
     
-    def __init__(self,confdir,datadir,logdir,simulatorMode,numMotes,trace,debug,simTopology,iotlabmotes, pathTopo, roverMode):
+    def __init__(self,confdir,datadir,logdir,simulatorMode,numMotes,trace,debug,simTopology,simSpeed,simCpu,shardProcesses,simSeed,simCheckpoint,iotlabmotes, pathTopo, roverMode, probeReactor=False, captureFile=None, replayFile=None, replaySpeed=None, historyDir=None):
         
         # store params
         self.confdir              = confdir
@@ -50,9 +55,15 @@ class OpenVisualizerApp(object):
         self.iotlabmotes          = iotlabmotes
         self.pathTopo             = pathTopo
         self.roverMode            = roverMode
+        self.probeReactor         = None
+        self.capture              = None
+        self.replay               = None
 
         # local variables
         self.eventBusMonitor      = eventBusMonitor.eventBusMonitor()
+        # the moteStates are updated by a thread of their own, not the moteProbes'
+        self.moteStateExecutor    = eventBusExecutor.eventBusExecutor('moteStateExecutor')
+        self.moteHistory          = moteHistory.moteHistory(directory=historyDir)
         self.openLbr              = openLbr.OpenLbr()
         self.rpl                  = RPL.RPL()
         self.topology             = topology.topology()
@@ -63,8 +74,20 @@ class OpenVisualizerApp(object):
         if self.simulatorMode:
             from openvisualizer.SimEngine import SimEngine, MoteHandler
             
-            self.simengine        = SimEngine.SimEngine(simTopology)
-            self.simengine.start()
+            self.simengine        = SimEngine.SimEngine(simTopology,cpuModel=simCpu,seed=simSeed)
+            self.simengine.setSpeed(simSpeed)
+            self.simCheckpoint    = simCheckpoint
+            if shardProcesses:
+                # motes run in other processes, handed their motes once all are created
+                from openvisualizer.SimEngine import ShardCoordinator
+                self.shardCoordinator = ShardCoordinator.ShardCoordinator(
+                    shards        = shardProcesses,
+                    simFilesPath  = os.path.join(self.datadir, 'sim_files'),
+                    headerPath    = os.path.join(self.datadir, 'sim_files', 'openwsnmodule_obj.h'),
+                )
+            else:
+                self.shardCoordinator = None
+                self.simengine.start()
         
         # import the number of motes from json file given by user (if the pathTopo option is enabled)
         if self.pathTopo and self.simulatorMode:
@@ -78,8 +101,21 @@ class OpenVisualizerApp(object):
                 os.kill(os.getpid(), signal.SIGTERM)
 
         
+        # record the frames received by the moteProbes, if asked to
+        if captureFile:
+            self.capture          = moteProbeCapture.moteProbeCapture(captureFile)
+        
         # create a moteProbe for each mote
-        if self.simulatorMode:
+        if replayFile:
+            # in "replay" mode, frames are played from a capture, no mote is connected
+            self.replay           = moteProbeReplay.moteProbeReplay(replayFile,speed=replaySpeed)
+            self.moteProbes       = []
+        elif self.simulatorMode and self.shardCoordinator:
+            # in sharded "simulator" mode, motes are emulated by other processes
+            self.moteProbes       = [
+                moteProbe.moteProbe(emulatedMote=self.shardCoordinator.createMote(),capture=self.capture) for _ in range(self.numMotes)
+            ]
+        elif self.simulatorMode:
             # in "simulator" mode, motes are emulated
             sys.path.append(os.path.join(self.datadir, 'sim_files'))
             import oos_openwsn
@@ -89,47 +125,66 @@ class OpenVisualizerApp(object):
             for _ in range(self.numMotes):
                 moteHandler       = MoteHandler.MoteHandler(oos_openwsn.OpenMote())
                 self.simengine.indicateNewMote(moteHandler)
-                self.moteProbes  += [moteProbe.moteProbe(emulatedMote=moteHandler)]
+                self.moteProbes  += [moteProbe.moteProbe(emulatedMote=moteHandler,capture=self.capture)]
         elif self.iotlabmotes:
             # in "IoT-LAB" mode, motes are connected to TCP ports
             
+            if probeReactor:
+                self.probeReactor = moteProbeReactor.moteProbeReactor()
             self.moteProbes       = [
-                moteProbe.moteProbe(iotlabmote=p) for p in self.iotlabmotes.split(',')
+                moteProbe.moteProbe(iotlabmote=p,reactor=self.probeReactor,capture=self.capture) for p in self.iotlabmotes.split(',')
             ]
             
         else:
             # in "hardware" mode, motes are connected to the serial port
 
+            if probeReactor:
+                self.probeReactor = moteProbeReactor.moteProbeReactor()
             self.moteProbes       = [
-                moteProbe.moteProbe(serialport=p) for p in moteProbe.findSerialPorts()
+                moteProbe.moteProbe(serialport=p,reactor=self.probeReactor,capture=self.capture) for p in moteProbe.findSerialPorts()
             ]
         
-        # create a moteConnector for each moteProbe
+        # create a moteConnector for each moteProbe, or each port of the capture replayed
+        if self.replay:
+            portNames             = self.replay.getPortNames()
+        else:
+            portNames             = [mp.getPortName() for mp in self.moteProbes]
         self.moteConnectors       = [
-            moteConnector.moteConnector(mp.getPortName()) for mp in self.moteProbes
+            moteConnector.moteConnector(p) for p in portNames
         ]
         
         # create a moteState for each moteConnector
         self.moteStates           = [
-            moteState.moteState(mc) for mc in self.moteConnectors
+            moteState.moteState(mc,executor=self.moteStateExecutor,history=self.moteHistory) for mc in self.moteConnectors
         ]
 
         if self.roverMode :
             self.remoteConnectorServer = remoteConnectorServer.remoteConnectorServer()
 
 
+        # play the capture, now that all its listeners are connected
+        if self.replay:
+            self.replay.start()
+        
         # boot all emulated motes, if applicable
-        if self.simulatorMode:
+        if self.simulatorMode and self.shardCoordinator:
+            self.shardCoordinator.start()
+        elif self.simulatorMode:
             self.simengine.pause()
-            now = self.simengine.timeline.getCurrentTime()
-            for rank in range(self.simengine.getNumMotes()):
-                moteHandler = self.simengine.getMoteHandler(rank)
-                self.simengine.timeline.scheduleEvent(
-                    now,
-                    moteHandler.getId(),
-                    moteHandler.hwSupply.switchOn,
-                    moteHandler.hwSupply.INTR_SWITCHON
-                )
+            if self.simCheckpoint:
+                # start from the checkpoint, which schedules the boot of the motes
+                from openvisualizer.SimEngine import SimCheckpoint
+                SimCheckpoint.restore(self.simengine,self.simCheckpoint)
+            else:
+                now = self.simengine.timeline.getCurrentTime()
+                for rank in range(self.simengine.getNumMotes()):
+                    moteHandler = self.simengine.getMoteHandler(rank)
+                    self.simengine.timeline.scheduleEvent(
+                        now,
+                        moteHandler.getId(),
+                        moteHandler.hwSupply.switchOn,
+                        moteHandler.hwSupply.INTR_SWITCHON
+                    )
             self.simengine.resume()
 
        
@@ -188,6 +243,16 @@ class OpenVisualizerApp(object):
         self.rpl.close()
         for probe in self.moteProbes:
             probe.close()
+        if self.probeReactor:
+            self.probeReactor.close()
+        if self.replay:
+            self.replay.close()
+        if self.capture:
+            self.capture.close()
+        self.moteStateExecutor.close()
+        self.moteHistory.close()
+        if self.simulatorMode and self.shardCoordinator:
+            self.shardCoordinator.close()
                 
     def getMoteState(self, moteid):
         '''
@@ -222,7 +287,7 @@ class OpenVisualizerApp(object):
                         if not exist :
                             moc = moteConnector.moteConnector(rm)
                             self.moteConnectors       += [moc]
-                            self.moteStates += [moteState.moteState(moc)]
+                            self.moteStates += [moteState.moteState(moc,executor=self.moteStateExecutor,history=self.moteHistory)]
         self.remoteConnectorServer.initRoverConn(roverMotes)
 
     def removeRoverMotes(self, roverIP, moteList):
@@ -298,11 +363,59 @@ def main(parser=None, roverMode=False):
     elif argspace.simulatorMode:
         # default count when --simCount not provided
         argspace.numMotes = DEFAULT_MOTE_COUNT
+    
+    simCheckpoint = None
+    if argspace.simRestore:
+        # the checkpoint determines the simulation to restore
+        if argspace.simShards>1:
+            parser.error('--simRestore cannot be used with --simShards, checkpoints require a single process')
+        from openvisualizer.SimEngine import SimCheckpoint
+        try:
+            simCheckpoint = SimCheckpoint.load(argspace.simRestore)
+        except (IOError,ValueError) as err:
+            parser.error('invalid --simRestore {0}: {1}'.format(argspace.simRestore,err))
+        argspace.simulatorMode = True
+        argspace.numMotes      = simCheckpoint['numMotes']
+        argspace.simTopology   = simCheckpoint['simTopology']
+        argspace.simCpu        = simCheckpoint['cpuModel']
+        argspace.simSeed       = simCheckpoint['seed']
+    
+    replaySpeed = None
+    if argspace.replay:
+        if argspace.simulatorMode or argspace.iotlabmotes:
+            parser.error('--replay cannot be used with simulated or IoT-LAB motes')
+        if   argspace.replaySpeed=='fast':
+            replaySpeed = None
+        elif argspace.replaySpeed=='realtime':
+            replaySpeed = 1.0
+        else:
+            try:
+                replaySpeed = float(argspace.replaySpeed)
+                assert replaySpeed>0
+            except (ValueError,AssertionError):
+                parser.error('invalid --replaySpeed {0}'.format(argspace.replaySpeed))
+    
+    if argspace.simulatorMode:
+        from openvisualizer.SimEngine import SimClock
+        try:
+            SimClock.create(argspace.simSpeed)
+        except ValueError as err:
+            parser.error('invalid --simSpeed {0}: {1}'.format(argspace.simSpeed,err))
 
     log.info('Initializing OpenVisualizerApp with options:\n\t{0}'.format(
             '\n    '.join(['appdir   = {0}'.format(argspace.appdir),
                            'sim      = {0}'.format(argspace.simulatorMode),
                            'simCount = {0}'.format(argspace.numMotes),
+                           'simSpeed = {0}'.format(argspace.simSpeed),
+                           'simCpu   = {0}'.format(argspace.simCpu),
+                           'simShards= {0}'.format(argspace.simShards),
+                           'simSeed  = {0}'.format(argspace.simSeed),
+                           'simRestore = {0}'.format(argspace.simRestore),
+                           'probeReactor = {0}'.format(argspace.probeReactor),
+                           'capture  = {0}'.format(argspace.capture),
+                           'replay   = {0}'.format(argspace.replay),
+                           'replaySpeed = {0}'.format(argspace.replaySpeed),
+                           'history  = {0}'.format(argspace.history),
                            'trace    = {0}'.format(argspace.trace),
                            'debug    = {0}'.format(argspace.debug)],
             )))
@@ -312,6 +425,12 @@ def main(parser=None, roverMode=False):
                            'log      = {0}'.format(logdir)],
             )))
     log.info('sys.path:\n\t{0}'.format('\n\t'.join(str(p) for p in sys.path)))
+    
+    shardProcesses = None
+    if argspace.simulatorMode and argspace.simShards>1:
+        # fork the shards now, before any other thread is started
+        from openvisualizer.SimEngine import ShardCoordinator
+        shardProcesses = ShardCoordinator.forkShards(argspace.simShards)
         
     return OpenVisualizerApp(
         confdir         = confdir,
@@ -322,9 +441,19 @@ def main(parser=None, roverMode=False):
         trace           = argspace.trace,
         debug           = argspace.debug,
         simTopology     = argspace.simTopology,
+        simSpeed        = argspace.simSpeed,
+        simCpu          = argspace.simCpu,
+        shardProcesses  = shardProcesses,
+        simSeed         = argspace.simSeed,
+        simCheckpoint   = simCheckpoint,
         iotlabmotes     = argspace.iotlabmotes,
         pathTopo        = argspace.pathTopo,
-        roverMode       = roverMode
+        roverMode       = roverMode,
+        probeReactor    = argspace.probeReactor,
+        captureFile     = argspace.capture,
+        replayFile      = argspace.replay,
+        replaySpeed     = replaySpeed,
+        historyDir      = argspace.history,
     )
 
 def _addParserArgs(parser):
@@ -358,6 +487,36 @@ def _addParserArgs(parser):
         action     = 'store',
         help       = 'force a certain toplogy (simulation mode only)'
     )
+    parser.add_argument('-ss', '--simSpeed',
+        dest       = 'simSpeed',
+        default    = 'fast',
+        action     = 'store',
+        help       = 'simulation speed: "fast", "realtime", or the number of simulated seconds per second (simulation mode only)'
+    )
+    parser.add_argument('-sc', '--simCpu',
+        dest       = 'simCpu',
+        default    = 'thread',
+        choices    = ['thread','greenlet'],
+        help       = 'run each emulated mote in its own thread, or as a greenlet in the timeline thread (simulation mode only)'
+    )
+    parser.add_argument('-sh', '--simShards',
+        dest       = 'simShards',
+        type       = int,
+        default    = 1,
+        help       = 'number of processes to spread the emulated motes over (simulation mode only)'
+    )
+    parser.add_argument('-sd', '--simSeed',
+        dest       = 'simSeed',
+        type       = int,
+        default    = None,
+        help       = 'seed of the random number generators, random by default (simulation mode only)'
+    )
+    parser.add_argument('-sr', '--simRestore',
+        dest       = 'simRestore',
+        default    = None,
+        action     = 'store',
+        help       = 'start the simulation from a checkpoint file, rebooting the motes which had booted'
+    )
     parser.add_argument('-d', '--debug',
         dest       = 'debug',
         default    = False,
@@ -370,6 +529,36 @@ def _addParserArgs(parser):
         action     = 'store',
         help       = 'comma-separated list of IoT-LAB motes (e.g. "wsn430-9,wsn430-34,wsn430-3")'
     )
+    parser.add_argument('--probeReactor',
+        dest       = 'probeReactor',
+        default    = False,
+        action     = 'store_true',
+        help       = 'read from all serial ports, or IoT-LAB motes, in a single thread'
+    )
+    parser.add_argument('--capture',
+        dest       = 'capture',
+        default    = None,
+        action     = 'store',
+        help       = 'record the frames received from the motes to a capture file'
+    )
+    parser.add_argument('--replay',
+        dest       = 'replay',
+        default    = None,
+        action     = 'store',
+        help       = 'play the frames of a capture file instead of connecting to motes'
+    )
+    parser.add_argument('--replaySpeed',
+        dest       = 'replaySpeed',
+        default    = 'realtime',
+        action     = 'store',
+        help       = 'replay speed: "fast", "realtime", or the number of captured seconds per second (replay mode only)'
+    )
+    parser.add_argument('--history',
+        dest       = 'history',
+        default    = None,
+        action     = 'store',
+        help       = 'directory where to also write the history of the motes\' state, in rotating segment files'
+    )
     parser.add_argument('-i', '--pathTopo', 
         dest       = 'pathTopo',
         default    = '',
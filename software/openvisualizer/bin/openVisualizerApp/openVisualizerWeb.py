@@ -110,6 +110,9 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
         self.websrv.route(path='/moteview',                               callback=self._showMoteview)
         self.websrv.route(path='/moteview/:moteid',                       callback=self._showMoteview)
         self.websrv.route(path='/motedata/:moteid',                       callback=self._getMoteData)
+        self.websrv.route(path='/motedata/:moteid/:version',              callback=self._getMoteDataDelta)
+        self.websrv.route(path='/history/:moteid',                        callback=self._getHistoryFields)
+        self.websrv.route(path='/history/:moteid/:field',                 callback=self._getHistory)
         self.websrv.route(path='/toggleDAGroot/:moteid',                  callback=self._toggleDAGroot)
         self.websrv.route(path='/eventBus',                               callback=self._showEventBus)
         self.websrv.route(path='/routing',                                callback=self._showRouting)
@@ -117,6 +120,7 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
         self.websrv.route(path='/eventdata',                              callback=self._getEventData)
         self.websrv.route(path='/wiresharkDebug/:enabled',                callback=self._setWiresharkDebug)
         self.websrv.route(path='/gologicDebug/:enabled',                  callback=self._setGologicDebug)
+        self.websrv.route(path='/callbackTiming/:enabled',                callback=self._setCallbackTiming)
         self.websrv.route(path='/topology',                               callback=self._topologyPage)
         self.websrv.route(path='/topology/data',                          callback=self._topologyData)
         self.websrv.route(path='/topology/download',                      callback=self._topologyDownload)
@@ -278,6 +282,72 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
             states = {}
         return states
 
+    def _getMoteDataDelta(self, moteid, version):
+        '''
+        Collects the data of the provided mote which changed since a version.
+
+        :param moteid:  16-bit ID of mote
+        :param version: 'version' returned by the previous request, 0 for
+                        all the data
+        :returns: 'version' to pass to the next request, and the JSON data of
+                  the state elements which changed, as 'states'
+        '''
+        log.debug('Get JSON data for moteid {0} since version {1}'.format(moteid, version))
+        try:
+            version = int(version)
+        except ValueError:
+            return '{"result" : "fail"}'
+        ms = self.app.getMoteState(moteid)
+        if ms:
+            return ms.getStateDelta(version)
+        else:
+            log.debug('Mote {0} not found in moteStates'.format(moteid))
+            return '{"result" : "fail"}'
+
+    def _getHistoryFields(self, moteid):
+        '''
+        Lists the fields of the provided mote which have a history.
+
+        :param moteid: 16-bit ID of mote
+        '''
+        ms = self.app.getMoteState(moteid)
+        if ms:
+            return {'fields': self.app.moteHistory.getFields(ms.moteConnector.serialport)}
+        else:
+            log.debug('Mote {0} not found in moteStates'.format(moteid))
+            return '{"result" : "fail"}'
+
+    def _getHistory(self, moteid, field):
+        '''
+        Collects the history of a field of the provided mote. The optional
+        'start' and 'end' query parameters bound the range, in seconds since
+        the epoch, and 'tier' selects its resolution, see moteHistory.getRange().
+
+        :param moteid: 16-bit ID of mote
+        :param field:  field, as listed by _getHistoryFields()
+        '''
+        log.debug('Get history of {0} for moteid {1}'.format(field, moteid))
+        query = bottle.request.query
+        try:
+            start = float(query.start) if query.start else None
+            end   = float(query.end)   if query.end   else None
+        except ValueError:
+            return '{"result" : "fail"}'
+        ms = self.app.getMoteState(moteid)
+        if not ms:
+            log.debug('Mote {0} not found in moteStates'.format(moteid))
+            return '{"result" : "fail"}'
+        try:
+            return self.app.moteHistory.getRange(
+                ms.moteConnector.serialport,
+                field,
+                start = start,
+                end   = end,
+                tier  = query.tier or None,
+            )
+        except ValueError:
+            return '{"result" : "fail"}'
+
     def _setWiresharkDebug(self, enabled):
         '''
         Selects whether eventBus must export debug packets.
@@ -293,6 +363,16 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
         VcdLogger.VcdLogger().setEnabled(enabled == 'true')
         return '{"result" : "success"}'
 
+    def _setCallbackTiming(self, enabled):
+        '''
+        Selects whether the callbacks of the eventBus clients are timed.
+
+        :param enabled: 'true' if enabled; any other value considered false
+        '''
+        log.info('Enable callback timing : {0}'.format(enabled))
+        self.app.eventBusMonitor.setCallbackTiming(enabled == 'true')
+        return '{"result" : "success"}'
+
     @view('eventBus.tmpl')
     def _showEventBus(self):
         '''
@@ -375,7 +455,10 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
 
         for (_,v) in motesTemp.items():
             mh = self.engine.getMoteHandlerById(v['id'])
-            mh.setLocation(v['lat'],v['lon'])
+            if mh.getLocation()!=(v['lat'],v['lon']):
+                # a moved mote gets the links of its new location
+                mh.setLocation(v['lat'],v['lon'])
+                self.engine.propagation.recomputeConnections(v['id'])
 
     def _topologyConnectionsCreate(self):
 
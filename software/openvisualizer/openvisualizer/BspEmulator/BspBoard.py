@@ -50,10 +50,8 @@ class BspBoard(BspModule.BspModule):
             if self.log.isEnabledFor(logging.DEBUG):
                 self.log.debug('cmd_sleep')
             
-            self.motehandler.cpuDone.release()
-            
             # block the mote until CPU is released by ISR
-            self.motehandler.cpuRunning.acquire()
+            self.motehandler.cpu.sleep()
             
         except Exception as err:
             self.log.critical(err)
@@ -37,6 +37,7 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
     INTR_ENDOFFRAME_MOTE          = 'radio.endofframe_fromMote'
     INTR_STARTOFFRAME_PROPAGATION = 'radio.startofframe_fromPropagation'
     INTR_ENDOFFRAME_PROPAGATION   = 'radio.endofframe_fromPropagation'
+    DELAY_TX                      = 0.000214 # s, from txNow to start of frame
     
     def __init__(self,motehandler):
         
@@ -54,7 +55,7 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
         self.isRfOn      = False  # radio is off
         self.txBuf       = []
         self.rxBuf       = []
-        self.delayTx     = 0.000214
+        self.delayTx     = self.DELAY_TX
         
         # initialize the parents
         BspModule.BspModule.__init__(self,'BspRadio')
@@ -254,6 +255,16 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
                                     self.motehandler.getId(),
                                     self.intr_startOfFrame_fromMote,
                                     self.INTR_STARTOFFRAME_MOTE)
+        
+        # announce the frame to the other shards, if the simulation is sharded
+        if self.engine.shard:
+            self.engine.shard.indicateTxScheduled(
+                self.motehandler.getId(),
+                startOfFrameTime,
+                startOfFrameTime+self._packetLengthToDuration(len(self.txBuf)),
+                self.txBuf,
+                self.frequency,
+            )
     
     def cmd_rxEnable(self):
         '''emulates
@@ -381,6 +392,9 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
     #======================== indication from Propagation =====================
     
     def indicateTxStart(self,moteId,packet,channel):
+        '''
+        :returns: True if the radio starts receiving the frame.
+        '''
         
         if self.log.isEnabledFor(logging.DEBUG):
             self.log.debug('_indicateTxStart from moteId={0} channel={1} len={2}'.format(moteId,channel,len(packet)))
@@ -405,15 +419,23 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
                 self.intr_startOfFrame_fromPropagation,
                 self.INTR_STARTOFFRAME_PROPAGATION,
             )
+            
+            return True
+        
+        return False
     
-    def indicateTxEnd(self,moteId):
+    def indicateTxEnd(self,moteId,crcPasses=True):
+        '''
+        :param crcPasses: False if the frame was corrupted by interference.
+        '''
         
         if self.log.isEnabledFor(logging.DEBUG):
-            self.log.debug('_indicateTxEnd from moteId={0}'.format(moteId))
+            self.log.debug('_indicateTxEnd from moteId={0} crcPasses={1}'.format(moteId,crcPasses))
         
         if (self.isInitialized==True and
             self.state==RadioState.RECEIVING):
             self._changeState(RadioState.LISTENING)
+            self.crcPasses   = crcPasses
             
             # schedule end of frame
             self.timeline.scheduleEvent(
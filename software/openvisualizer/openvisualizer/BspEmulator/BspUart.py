@@ -9,6 +9,7 @@ import threading
 
 from openvisualizer.SimEngine     import SimEngine
 import BspModule
+import UartRingBuffer
 
 class BspUart(BspModule.BspModule):
     '''
@@ -19,6 +20,10 @@ class BspUart(BspModule.BspModule):
     INTR_RX   = 'uart.rx'
     BAUDRATE  = 115200
     
+    HDLC_FLAG         = 0x7e
+    RX_BUFFER_SIZE    = 4096    # bytes written by the mote, not read yet by the moteProbe
+    RX_FLUSH_QUANTUM  = 0.010   # wall-clock seconds the moteProbe waits for a frame to be complete
+    
     def __init__(self,motehandler):
         
         # store params
@@ -30,15 +35,14 @@ class BspUart(BspModule.BspModule):
         self.interruptsEnabled    = False
         self.txInterruptFlag      = False
         self.rxInterruptFlag      = False
-        self.uartRxBuffer         = []
-        self.uartRxBufferSem      = threading.Semaphore()
-        self.uartRxBufferSem.acquire()
-        self.uartRxBufferLock     = threading.Lock()
+        self.uartRxBuffer         = UartRingBuffer.UartRingBuffer(
+            self.RX_BUFFER_SIZE,
+            self.RX_FLUSH_QUANTUM,
+        )
+        self.inFrame              = False             # whether the last HDLC flag written opened a frame
         self.uartTxBuffer         = []                # the bytes to be sent over UART
         self.uartTxNext           = None              # the byte that was just signaled to mote
         self.uartTxBufferLock     = threading.Lock()
-        self.waitForDoneReading   = threading.Lock()
-        self.waitForDoneReading.acquire()
         
         # initialize the parent
         BspModule.BspModule.__init__(self,'BspUart')
@@ -49,20 +53,14 @@ class BspUart(BspModule.BspModule):
     
     def read(self):
         '''
-        Read a byte from the mote.
-        '''
-        
-        # wait for something to appear in the RX buffer
-        self.uartRxBufferSem.acquire()
+        Read the bytes written by the mote.
         
-        # copy uartRxBuffer
-        with self.uartRxBufferLock:
-            assert len(self.uartRxBuffer)>0
-            returnVal             = [chr(b) for b in self.uartRxBuffer]
-            self.uartRxBuffer     = []
+        Blocks until the mote has written a complete HDLC frame, or until
+        RX_FLUSH_QUANTUM seconds after it started writing.
         
-        # return that element
-        return returnVal
+        :returns: A string of bytes, possibly holding several frames.
+        '''
+        return self.uartRxBuffer.read()
     
     def write(self,bytesToWrite):
         '''
@@ -78,8 +76,12 @@ class BspUart(BspModule.BspModule):
         self._scheduleNextTx()
         self.engine.resume()
     
-    def doneReading(self):
-        self.waitForDoneReading.release()
+    def close(self):
+        '''
+        Stop reading from the mote: read() returns the bytes left, then an
+        empty string.
+        '''
+        self.uartRxBuffer.close()
     
     #=== commands
     
@@ -160,15 +162,8 @@ class BspUart(BspModule.BspModule):
             self.INTR_TX
         )
         
-        # add to receive buffer
-        with self.uartRxBufferLock:
-            self.uartRxBuffer    += [byteToWrite]
-        
-        # release the semaphore indicating there is something in RX buffer
-        self.uartRxBufferSem.release()
-        
-        # wait for the moteProbe to be done reading
-        self.waitForDoneReading.acquire()
+        # add to receive buffer, the moteProbe reads it once the frame is complete
+        self.uartRxBuffer.write([byteToWrite],flush=self._isEndOfFrame([byteToWrite]))
     
     def cmd_writeCircularBuffer_FASTSIM(self,buffer):
         '''emulates
@@ -205,15 +200,8 @@ class BspUart(BspModule.BspModule):
             self.INTR_TX
         )
         
-        # add to receive buffer
-        with self.uartRxBufferLock:
-            self.uartRxBuffer    += buffer
-        
-        # release the semaphore indicating there is something in RX buffer
-        self.uartRxBufferSem.release()
-        
-        # wait for the moteProbe to be done reading
-        self.waitForDoneReading.acquire()
+        # add to receive buffer, the moteProbe reads it once a frame is complete
+        self.uartRxBuffer.write(buffer,flush=self._isEndOfFrame(buffer))
     
     def cmd_readByte(self):
         '''emulates
@@ -286,4 +274,16 @@ class BspUart(BspModule.BspModule):
             self.INTR_RX
         )
     
-    
\ No newline at end of file
+    def _isEndOfFrame(self,bytesWritten):
+        '''
+        :returns: True if the bytes close an HDLC frame, i.e. hold an HDLC
+            flag following the one which opened it.
+        '''
+        
+        returnVal = False
+        for b in bytesWritten:
+            if b==self.HDLC_FLAG:
+                if self.inFrame:
+                    returnVal    = True
+                self.inFrame     = not self.inFrame
+        return returnVal
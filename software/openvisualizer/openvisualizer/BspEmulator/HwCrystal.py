@@ -6,7 +6,6 @@
 # https://openwsn.atlassian.net/wiki/display/OW/License
 
 import logging
-import random
 import math
 
 from openvisualizer.SimEngine     import SimEngine
@@ -33,7 +32,7 @@ class HwCrystal(HwModule.HwModule):
         
         # local variables
         self.drift           =  float(
-                                    random.uniform(
+                                    self.engine.getRandom('HwCrystal').uniform(
                                         -self.maxDrift,
                                         +self.maxDrift
                                     )
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+import threading
+
+class UartRingBuffer(object):
+    '''
+    The bytes an emulated mote writes to its UART, until its moteProbe reads
+    them.
+    
+    A bounded ring of bytes, written by the mote and read by the moteProbe.
+    The mote only blocks when the ring is full. The moteProbe is woken up
+    when the mote flushes, typically at the end of an HDLC frame, and
+    otherwise reads what was written after waiting for flushQuantum seconds.
+    '''
+    
+    def __init__(self,capacity,flushQuantum):
+        
+        assert capacity>0
+        
+        # store params
+        self.capacity             = capacity
+        self.flushQuantum         = flushQuantum
+        
+        # local variables
+        self.ring                 = bytearray(capacity)
+        self.head                 = 0    # index of the oldest byte
+        self.size                 = 0    # number of bytes in the ring
+        self.numFlushed           = 0    # number of bytes the reader is woken up for
+        self.numBlocked           = 0    # number of times the writer found the ring full
+        self.closed               = False
+        self.dataLock             = threading.Lock()
+        self.dataReady            = threading.Condition(self.dataLock)
+        self.spaceReady           = threading.Condition(self.dataLock)
+    
+    #======================== public ==========================================
+    
+    def write(self,bytesToWrite,flush=False):
+        '''
+        Append bytes to the ring, blocking only while it is full.
+        
+        :param bytesToWrite: The bytes to write, a bytearray, a str or a list
+            of ints.
+        :param flush:        Whether to wake up the reader once written.
+        '''
+        
+        bytesToWrite = bytearray(bytesToWrite)
+        
+        with self.dataLock:
+            
+            written = 0
+            while written<len(bytesToWrite):
+                
+                # wait for the reader to make room
+                while self.size==self.capacity:
+                    self.numBlocked += 1
+                    self.numFlushed  = self.size
+                    self.dataReady.notify()
+                    self.spaceReady.wait()
+                
+                # copy as much as fits, in at most two slices
+                tail     = (self.head+self.size)%self.capacity
+                numBytes = min(
+                    len(bytesToWrite)-written,
+                    self.capacity-self.size,
+                    self.capacity-tail,
+                )
+                self.ring[tail:tail+numBytes] = bytesToWrite[written:written+numBytes]
+                self.size += numBytes
+                written   += numBytes
+            
+            if flush:
+                self.numFlushed = self.size
+                self.dataReady.notify()
+    
+    def read(self):
+        '''
+        Read bytes from the ring, blocking until some are available.
+        
+        :returns: A str with the bytes flushed, or with all bytes written if
+            none was flushed within flushQuantum. Once the ring is closed,
+            all bytes left, then an empty str.
+        '''
+        
+        with self.dataLock:
+            
+            # wait for bytes, then for the writer to flush them
+            while not self.size:
+                if self.closed:
+                    return ''
+                self.dataReady.wait()
+            if not (self.numFlushed or self.closed):
+                self.dataReady.wait(self.flushQuantum)
+            numBytes = self.numFlushed or self.size
+            
+            # copy them out, in at most two slices
+            end = self.head+numBytes
+            if end<=self.capacity:
+                returnVal = str(self.ring[self.head:end])
+            else:
+                returnVal = str(self.ring[self.head:])+str(self.ring[:end-self.capacity])
+            self.head            = end%self.capacity
+            self.size           -= numBytes
+            self.numFlushed      = max(0,self.numFlushed-numBytes)
+            
+            # let the writer go on, if it was waiting
+            self.spaceReady.notify()
+        
+        return returnVal
+    
+    def close(self):
+        '''
+        Have the reader return the bytes left without waiting for a flush,
+        then stop blocking.
+        '''
+        with self.dataLock:
+            self.closed = True
+            self.dataReady.notify()
+    
+    def getNumBlocked(self):
+        return self.numBlocked
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # BspEmulator/
+
+import logging
+import logging.handlers
+import json
+import threading
+import time
+
+import pytest
+
+import UartRingBuffer
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_UartRingBuffer.log'
+
+import logging
+log = logging.getLogger('test_UartRingBuffer')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_UartRingBuffer',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT       = 10   # s
+FLUSH_QUANTUM = 0.05 # s
+
+#============================ fixtures ========================================
+
+CAPACITIES = [
+    json.dumps(1),
+    json.dumps(3),
+    json.dumps(7),
+    json.dumps(64),
+]
+
+@pytest.fixture(params=CAPACITIES)
+def capacity(request):
+    return json.loads(request.param)
+
+#============================ helpers =========================================
+
+def _readAll(ringBuffer,numBytes):
+    returnVal = ''
+    while len(returnVal)<numBytes:
+        returnVal += ringBuffer.read()
+    return returnVal
+
+#============================ tests ===========================================
+
+def test_flush():
+    
+    ringBuffer = UartRingBuffer.UartRingBuffer(16,TIMEOUT)
+    
+    ringBuffer.write('\x7eab')
+    ringBuffer.write([0x63,0x7e],flush=True)
+    ringBuffer.write('\x7ed')
+    
+    # only the flushed bytes are read, without waiting for the quantum
+    startTime = time.time()
+    assert ringBuffer.read()=='\x7eabc\x7e'
+    assert time.time()-startTime<TIMEOUT/2
+
+def test_quantum():
+    
+    ringBuffer = UartRingBuffer.UartRingBuffer(16,FLUSH_QUANTUM)
+    
+    ringBuffer.write('\x7eab')
+    
+    # unflushed bytes are read once the quantum elapsed
+    startTime = time.time()
+    assert ringBuffer.read()=='\x7eab'
+    assert time.time()-startTime>=FLUSH_QUANTUM*0.9
+
+def test_blockWhenFull(capacity):
+    '''
+    The writer blocks only when the ring is full, and no byte is lost or
+    reordered when wrapping around.
+    '''
+    
+    ringBuffer = UartRingBuffer.UartRingBuffer(capacity,FLUSH_QUANTUM)
+    data       = ''.join([chr(i%256) for i in range(10*capacity+5)])
+    
+    writer = threading.Thread(target=ringBuffer.write,args=(data,True))
+    writer.setDaemon(True)
+    writer.start()
+    
+    assert _readAll(ringBuffer,len(data))==data
+    writer.join(TIMEOUT)
+    assert not writer.isAlive()
+    assert ringBuffer.getNumBlocked()>0
+
+def test_noBlockWhenRoom():
+    
+    ringBuffer = UartRingBuffer.UartRingBuffer(16,FLUSH_QUANTUM)
+    
+    # the writer returns without any reader
+    for _ in range(4):
+        ringBuffer.write('\x7ea\x7e',flush=True)
+    assert ringBuffer.getNumBlocked()==0
+    assert ringBuffer.read()=='\x7ea\x7e'*4
+
+def test_close():
+    
+    ringBuffer = UartRingBuffer.UartRingBuffer(16,TIMEOUT)
+    
+    ringBuffer.write('\x7eab')
+    ringBuffer.close()
+    
+    # the bytes left are read without waiting for the quantum, then nothing
+    startTime = time.time()
+    assert ringBuffer.read()=='\x7eab'
+    assert ringBuffer.read()==''
+    assert time.time()-startTime<TIMEOUT/2
@@ -23,7 +23,6 @@ from datetime import datetime
 from pydispatch import dispatcher
 
 from openvisualizer.eventBus import eventBusClient
-import SourceRoute
 import openvisualizer.openvisualizer_utils as u
 
 class RPL(eventBusClient.eventBusClient):
@@ -72,11 +71,6 @@ class RPL(eventBusClient.eventBusClient):
                     'signal'      : 'infoDagRoot',
                     'callback'    : self._infoDagRoot_notif,
                 },
-                {
-                    'sender'      : self.WILDCARD,
-                    'signal'      : 'getSourceRoute',
-                    'callback'    : self._getSourceRoute_notif,
-                },
             ]
         )
         
@@ -85,7 +79,6 @@ class RPL(eventBusClient.eventBusClient):
         self.state                = {}
         self.networkPrefix        = None
         self.dagRootEui64         = None
-        self.sourceRoute          = SourceRoute.SourceRoute()
         self.latencyStats         = {}
     
     #======================== public ==========================================
@@ -171,10 +164,6 @@ class RPL(eventBusClient.eventBusClient):
         self._indicateDAO(data)
         return True
     
-    def _getSourceRoute_notif(self,sender,signal,data):
-        destination = data
-        return self.sourceRoute.getSourceRoute(destination)
-    
     #===== receive DAO
     
     def _indicateDAO(self,tup):
@@ -0,0 +1,101 @@
+'''
+This is a performance test which measures how many source routes per second
+the topology answers, and how many DAOs per second it processes, in a DODAG
+of a given number of motes, each DAO moving a mote to a random parent. The
+source routes are also computed walking the parents of the DAOs, checking
+for loops along the way, for comparison.
+
+Run this test with 'python bench_topology.py [numMotes] [rounds]'. By
+default, a DODAG of 100 motes is built, and 10000 source routes and DAOs are
+measured.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # RPL/
+
+import random
+import time
+
+import topology
+
+#============================ defines =========================================
+
+NUM_MOTES      = 100
+ROUNDS         = 10000
+NUM_CANDIDATES = 12           # parents each mote picks from, when building the DODAG
+
+#============================ helpers =========================================
+
+def _mote(i):
+    return [0x14,0x15,0x92,0xcc,0x00,0x00,i>>8,i & 0xFF]
+
+def _build(numMotes,rand):
+    '''
+    :returns: The topology of a DODAG rooted at mote 1, each mote attached
+        to one of the motes attached last, and the motes.
+    '''
+    topo    = topology.topology()
+    motes   = [_mote(1)]
+    for i in range(2,numMotes+1):
+        parent = rand.choice(motes[-NUM_CANDIDATES:])
+        motes += [_mote(i)]
+        topo.updateParents(None,'updateParents',(tuple(motes[-1]),[parent]))
+    return (topo,motes)
+
+def _walkParents(parents,destAddr):
+    route = []
+    hop   = destAddr
+    while parents.get(tuple(hop)):
+        if hop not in route:
+            route += [hop]
+        parent = parents[tuple(hop)][0]
+        if parent in route:
+            break
+        hop    = parent
+    else:
+        route += [hop]
+    return route
+
+def _lookups(topo,motes,rounds,rand):
+    destinations = [rand.choice(motes) for _ in xrange(rounds)]
+    start        = time.time()
+    for destination in destinations:
+        topo.getSourceRoute(destination)
+    return rounds/(time.time()-start)
+
+def _walks(topo,motes,rounds,rand):
+    destinations = [rand.choice(motes) for _ in xrange(rounds)]
+    start        = time.time()
+    for destination in destinations:
+        _walkParents(topo.parents,destination)
+    return rounds/(time.time()-start)
+
+def _daos(topo,motes,rounds,rand):
+    daos         = [(tuple(rand.choice(motes[1:])),[rand.choice(motes)]) for _ in xrange(rounds)]
+    start        = time.time()
+    for dao in daos:
+        topo.updateParents(None,'updateParents',dao)
+    return rounds/(time.time()-start)
+
+#============================ main ============================================
+
+def main(numMotes=NUM_MOTES,rounds=ROUNDS):
+    
+    rand          = random.Random(0)
+    (topo,motes)  = _build(numMotes,rand)
+    depth         = max([len(topo.getSourceRoute(m)) for m in motes])
+    
+    output  = []
+    output += ['{0} motes, routes up to {1} hops, {2} rounds'.format(numMotes,depth,rounds)]
+    output += ['getSourceRoute:    {0:9.0f} routes/s'.format(_lookups(topo,motes,rounds,rand))]
+    output += ['walking parents:   {0:9.0f} routes/s'.format(_walks(topo,motes,rounds,rand))]
+    output += ['updateParents:     {0:9.0f} DAOs/s'.format(_daos(topo,motes,rounds,rand))]
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -22,12 +22,28 @@ import openvisualizer.openvisualizer_utils as u
 from openvisualizer.eventBus import eventBusClient
 
 class topology(eventBusClient.eventBusClient):
+    '''
+    The DODAG of the mesh, as the DAOs report it, and the source routes
+    through it.
+    
+    Each mote is indexed on its preferred parent, the first of its DAO, and
+    each parent on its children, and the route of each mote to the DAG root is
+    kept. When a DAO changes the preferred parent of a mote, the routes of it
+    and of its subtree only are updated. A DAO which would make a mote the
+    descendant of itself is ignored, so there is no loop in the DODAG.
+    
+    The routes are replaced, never modified, so they are read without the
+    lock.
+    '''
     
     def __init__(self):
         
         # local variables
-        self.dataLock        = threading.Lock()
-        self.parents         = {}
+        self.dataLock         = threading.Lock()
+        self.parents          = {}
+        self.preferredParents = {}   # mote -> its preferred parent
+        self.children         = {}   # mote -> the motes it is the preferred parent of
+        self.routes           = {}   # mote -> its route, from it to the DAG root
         
         eventBusClient.eventBusClient.__init__(
             self,
@@ -43,6 +59,11 @@ class topology(eventBusClient.eventBusClient):
                     'signal'      : 'getParents',
                     'callback'    : self.getParents,
                 },
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'getSourceRoute',
+                    'callback'    : self._getSourceRoute_notif,
+                },
             ]
         )
     
@@ -51,6 +72,21 @@ class topology(eventBusClient.eventBusClient):
     def getParents(self,sender,signal,data):
         return self.parents
     
+    def getSourceRoute(self,destAddr):
+        '''
+        Retrieve the source route to a given mote.
+        
+        :param destAddr: [in] The EUI64 address of the final destination.
+        
+        :returns: The source route, a list of EUI64 address, ordered from
+            destination to source, empty if the destination is not in the
+            DODAG.
+        '''
+        route = self.routes.get(tuple(destAddr))
+        if route is None:
+            return []
+        return route[:]
+    
     def getDAG(self):
         states = []
         edges = []
@@ -70,13 +106,70 @@ class topology(eventBusClient.eventBusClient):
                 states.append(d)
         
         return states, edges
-        
+    
     def updateParents(self,sender,signal,data):
         ''' inserts parent information into the parents dictionary '''
+        
+        #data[0] == source address, data[1] == list of parents
+        (source,parents) = data
+        source           = tuple(source)
+        newParent        = tuple(parents[0]) if parents else None
+        
         with self.dataLock:
-            #data[0] == source address, data[1] == list of parents
-            self.parents.update({data[0]:data[1]})
+            oldParent    = self.preferredParents.get(source)
+            
+            if newParent!=oldParent and newParent is not None and self._isAncestor(source,newParent):
+                log.warning('ignoring DAO from {0}, its parent {1} is its descendant'.format(
+                    u.formatAddr(source),
+                    u.formatAddr(newParent),
+                ))
+                return
+            
+            self.parents.update({source:parents})
+            
+            if newParent==oldParent:
+                return
+            
+            # move the mote, with its subtree
+            if oldParent is not None:
+                siblings = self.children[oldParent]
+                siblings.discard(source)
+                if not siblings:
+                    del self.children[oldParent]
+            if newParent is None:
+                del self.preferredParents[source]
+            else:
+                self.preferredParents[source] = newParent
+                self.children.setdefault(newParent,set()).add(source)
+            
+            self._updateRoutes(source)
     
     #======================== private =========================================
     
+    def _getSourceRoute_notif(self,sender,signal,data):
+        return self.getSourceRoute(data)
+    
     #======================== helpers =========================================
+    
+    def _isAncestor(self,mote,descendant):
+        hop = descendant
+        while hop is not None:
+            if hop==mote:
+                return True
+            hop = self.preferredParents.get(hop)
+        return False
+    
+    def _updateRoutes(self,mote):
+        '''
+        Update the routes of a mote and of its subtree, parents first.
+        '''
+        toUpdate = [mote]
+        while toUpdate:
+            mote   = toUpdate.pop()
+            parent = self.preferredParents.get(mote)
+            if parent is None:
+                # the DAG root, or detached
+                self.routes.pop(mote,None)
+            else:
+                self.routes[mote] = [list(mote)]+self.routes.get(parent,[list(parent)])
+            toUpdate += self.children.get(mote,[])
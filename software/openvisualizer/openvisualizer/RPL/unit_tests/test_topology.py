@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # RPL/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import json
+import random
+
+import pytest
+
+import topology
+import openvisualizer.openvisualizer_utils as u
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_topology.log'
+
+import logging
+log = logging.getLogger('test_topology')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_topology',
+                   'topology',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE_A = [0xaa]*8
+MOTE_B = [0xbb]*8
+MOTE_C = [0xcc]*8
+MOTE_D = [0xdd]*8
+MOTE_E = [0xee]*8
+
+#============================ fixtures ========================================
+
+EXPECTEDSOURCEROUTE = [
+    json.dumps((MOTE_B, [MOTE_B,MOTE_A])),
+    json.dumps((MOTE_C, [MOTE_C,MOTE_B,MOTE_A])),
+    json.dumps((MOTE_D, [MOTE_D,MOTE_C,MOTE_B,MOTE_A])),
+]
+
+@pytest.fixture(params=EXPECTEDSOURCEROUTE)
+def expectedSourceRoute(request):
+    return request.param
+
+#============================ helpers =========================================
+
+def _updateParents(topo,mote,parents):
+    topo.updateParents(None,'updateParents',(tuple(mote),parents))
+
+def _walkParents(parents,mote):
+    '''
+    The route to a mote, walking the first parents of the DAOs.
+    '''
+    if not parents.get(tuple(mote)):
+        return []
+    route = [mote]
+    while parents.get(tuple(route[-1])):
+        route += [list(parents[tuple(route[-1])][0])]
+    return route
+
+#============================ tests ===========================================
+
+def test_sourceRoute(expectedSourceRoute):
+    '''
+    This tests the following topology
+    
+    MOTE_A <- MOTE_B <- MOTE_C <- MOTE_D
+    '''
+    
+    topo        = topology.topology()
+    
+    topo.dispatch(          
+        signal          = 'updateParents',
+        data            =  (tuple(MOTE_B),[MOTE_A]),
+    )
+    topo.dispatch(          
+        signal          = 'updateParents',
+        data            =  (tuple(MOTE_C),[MOTE_B]),
+    )
+    topo.dispatch(          
+        signal          = 'updateParents',
+        data            =  (tuple(MOTE_D),[MOTE_C]),
+    )
+    
+    expectedDestination = json.loads(expectedSourceRoute)[0]
+    expectedRoute       = json.loads(expectedSourceRoute)[1]
+    calculatedRoute     = topo.getSourceRoute(expectedDestination)
+    
+    # log
+    if log.isEnabledFor(logging.DEBUG):
+        output          = []
+        output         += ['\n']
+        output         += ['expectedDestination: {0}'.format(u.formatAddr(expectedDestination))]
+        output         += ['expectedRoute:']
+        for m in expectedRoute:
+            output     += ['- {0}'.format(u.formatAddr(m))]
+        output         += ['calculatedRoute:']
+        for m in calculatedRoute:
+            output     += ['- {0}'.format(u.formatAddr(m))]
+        output          = '\n'.join(output)
+        log.debug(output)
+    
+    assert calculatedRoute==expectedRoute
+
+def test_reparent():
+    '''
+    A mote changing its preferred parent moves its subtree.
+    
+    MOTE_A <- MOTE_B <- MOTE_C <- MOTE_D
+           <- MOTE_E
+    '''
+    
+    topo = topology.topology()
+    _updateParents(topo,MOTE_B,[MOTE_A])
+    _updateParents(topo,MOTE_C,[MOTE_B])
+    _updateParents(topo,MOTE_D,[MOTE_C])
+    _updateParents(topo,MOTE_E,[MOTE_A])
+    
+    # the other parents don't matter
+    _updateParents(topo,MOTE_C,[MOTE_E,MOTE_B])
+    assert topo.getSourceRoute(MOTE_D)==[MOTE_D,MOTE_C,MOTE_E,MOTE_A]
+    assert topo.getSourceRoute(MOTE_C)==[MOTE_C,MOTE_E,MOTE_A]
+    assert topo.getSourceRoute(MOTE_B)==[MOTE_B,MOTE_A]
+    assert topo.getSourceRoute(MOTE_A)==[]
+    
+    # a mote without parents ends the routes through it
+    _updateParents(topo,MOTE_C,[])
+    assert topo.getSourceRoute(MOTE_C)==[]
+    assert topo.getSourceRoute(MOTE_D)==[MOTE_D,MOTE_C]
+    
+    _updateParents(topo,MOTE_C,[MOTE_B])
+    assert topo.getSourceRoute(MOTE_D)==[MOTE_D,MOTE_C,MOTE_B,MOTE_A]
+
+def test_loop():
+    '''
+    A DAO which would close a loop is ignored.
+    '''
+    
+    topo = topology.topology()
+    _updateParents(topo,MOTE_B,[MOTE_A])
+    _updateParents(topo,MOTE_C,[MOTE_B])
+    _updateParents(topo,MOTE_D,[MOTE_C])
+    
+    _updateParents(topo,MOTE_B,[MOTE_D])
+    _updateParents(topo,MOTE_C,[MOTE_C])
+    assert topo.parents[tuple(MOTE_B)]==[MOTE_A]
+    assert topo.parents[tuple(MOTE_C)]==[MOTE_B]
+    assert topo.getSourceRoute(MOTE_D)==[MOTE_D,MOTE_C,MOTE_B,MOTE_A]
+    
+    # once MOTE_D moved, it is not a descendant of MOTE_B anymore
+    _updateParents(topo,MOTE_D,[MOTE_A])
+    _updateParents(topo,MOTE_B,[MOTE_D])
+    assert topo.getSourceRoute(MOTE_C)==[MOTE_C,MOTE_B,MOTE_D,MOTE_A]
+
+def test_random():
+    '''
+    After each DAO of random ones, the routes are those found walking the
+    parents, without loops.
+    '''
+    
+    rand  = random.Random(0)
+    motes = [[0x14,0x15,0x92,0xcc,0x00,0x00,0x00,i] for i in range(1,31)]
+    topo  = topology.topology()
+    
+    for _ in range(1000):
+        mote    = rand.choice(motes[1:])
+        parents = rand.sample(motes,rand.randint(0,3))
+        _updateParents(topo,mote,parents)
+        for m in motes:
+            route = topo.getSourceRoute(m)
+            assert route==_walkParents(topo.parents,m)
+            assert len(set([tuple(hop) for hop in route]))==len(route)
@@ -5,7 +5,6 @@
 # Released under the BSD 3-Clause license as published at the link below.
 # https://openwsn.atlassian.net/wiki/display/OW/License
 
-import random
 import logging
 
 import SimEngine
@@ -21,6 +20,7 @@ class LocationManager(object):
         self.engine               = SimEngine.SimEngine()
         
         # local variables
+        self.random               = self.engine.getRandom('LocationManager')
         
         # logging
         self.log                  = logging.getLogger('LocationManager')
@@ -32,8 +32,8 @@ class LocationManager(object):
     def getLocation(self):
         
         # get random location around Cory Hall, UC Berkeley
-        lat =   37.875095-0.0005+random.random()*0.0010
-        lon = -122.257473-0.0005+random.random()*0.0010
+        lat =   37.875095-0.0005+self.random.random()*0.0010
+        lon = -122.257473-0.0005+self.random.random()*0.0010
         
         # debug
         if self.log.isEnabledFor(logging.DEBUG):
@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+import logging
+from math import log10
+
+class Reception(object):
+    '''
+    A frame being received by a mote.
+    '''
+    
+    def __init__(self,fromMote,signal_mW):
+        
+        # store params
+        self.fromMote             = fromMote
+        self.signal_mW            = signal_mW
+        
+        # local variables
+        self.minSinr_dB           = None
+    
+    def indicateInterference(self,sinr_dB):
+        if self.minSinr_dB is None or sinr_dB<self.minSinr_dB:
+            self.minSinr_dB       = sinr_dB
+
+class Medium(object):
+    '''
+    Tracks the transmissions overlapping in time on each channel, and the
+    signal-to-interference-plus-noise ratio (SINR) of the frames being
+    received.
+    
+    Only the transmissions and receptions currently in progress are kept, per
+    channel, so the cost of a transmission grows with the number of motes
+    active on its channel, not with the size of the network. A frame is
+    received correctly if its SINR stayed above SINR_THRESHOLD_dB for its
+    whole duration. The SINR can only drop when another transmission starts,
+    so it is only re-evaluated then.
+    '''
+    
+    NOISE_FLOOR_dBm               = -105.0
+    SINR_THRESHOLD_dB             =    3.0
+    
+    def __init__(self,getRxPower):
+        '''
+        :param getRxPower: A function returning the power, in mW, at which a
+            mote receives another one, 0 if it does not hear it at all.
+        '''
+        
+        # store params
+        self.getRxPower           = getRxPower
+        
+        # local variables
+        self.noise_mW             = 10**(self.NOISE_FLOOR_dBm/10)
+        self.transmissions        = {}   # channel -> set of transmitting moteIds
+        self.receptions           = {}   # channel -> {toMote: Reception}
+        self.channelOfTx          = {}   # transmitting moteId -> channel
+        self.numCorrupted         = 0
+        
+        # logging
+        self.log                  = logging.getLogger('Medium')
+        self.log.setLevel(logging.DEBUG)
+        self.log.addHandler(logging.NullHandler())
+    
+    #======================== public ==========================================
+    
+    def isReceiving(self,toMote,channel):
+        '''
+        :returns: True if the mote is already receiving a frame on this
+            channel, in which case any other frame only interferes with it.
+        '''
+        return toMote in self.receptions.get(channel,())
+    
+    def indicateTxStart(self,fromMote,channel,receivers):
+        '''
+        A mote starts transmitting.
+        
+        :param fromMote:  The transmitting mote.
+        :param channel:   The channel it transmits on.
+        :param receivers: The motes which start receiving its frame.
+        '''
+        
+        transmissions = self.transmissions.setdefault(channel,set())
+        receptions    = self.receptions.setdefault(channel,{})
+        
+        # the new transmission interferes with the frames being received
+        for (toMote,reception) in receptions.items():
+            if self.getRxPower(fromMote,toMote):
+                reception.indicateInterference(self._getSinr(toMote,reception,transmissions|set([fromMote])))
+        
+        transmissions.add(fromMote)
+        self.channelOfTx[fromMote] = channel
+        
+        # the frames now being received suffer from the ongoing transmissions
+        for toMote in receivers:
+            reception = Reception(fromMote,self.getRxPower(fromMote,toMote))
+            reception.indicateInterference(self._getSinr(toMote,reception,transmissions))
+            receptions[toMote] = reception
+    
+    def indicateTxEnd(self,fromMote):
+        '''
+        A mote stops transmitting.
+        
+        :returns: A list of (toMote,crcPasses) tuples, one per mote which was
+            receiving the frame, indicating whether it received it correctly.
+        '''
+        
+        channel = self.channelOfTx.pop(fromMote,None)
+        if channel is None:
+            return []
+        
+        self.transmissions[channel].discard(fromMote)
+        
+        returnVal  = []
+        receptions = self.receptions[channel]
+        for (toMote,reception) in receptions.items():
+            if reception.fromMote==fromMote:
+                del receptions[toMote]
+                crcPasses = reception.minSinr_dB>=self.SINR_THRESHOLD_dB
+                if not crcPasses:
+                    self.numCorrupted += 1
+                    if self.log.isEnabledFor(logging.DEBUG):
+                        self.log.debug('frame from {0} to {1} corrupted, SINR {2:.1f}dB'.format(
+                            fromMote,toMote,reception.minSinr_dB,
+                        ))
+                returnVal += [(toMote,crcPasses)]
+        return returnVal
+    
+    def getNumCorrupted(self):
+        return self.numCorrupted
+    
+    #======================== private =========================================
+    
+    def _getSinr(self,toMote,reception,transmissions):
+        
+        interference_mW = sum(
+            self.getRxPower(m,toMote) for m in transmissions if m!=reception.fromMote
+        )
+        return 10*log10(reception.signal_mW/(self.noise_mW+interference_mW))
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+import threading
+
+CPU_THREAD   = 'thread'
+CPU_GREENLET = 'greenlet'
+CPU_ALL      = [
+    CPU_THREAD,
+    CPU_GREENLET,
+]
+
+def create(cpuModel,motehandler):
+    '''
+    Module-based Factory method to create the CPU of an emulated mote.
+    
+    :param cpuModel:    One of CPU_ALL.
+    :param motehandler: The MoteHandler of the mote.
+    '''
+    
+    if cpuModel==CPU_THREAD:
+        return ThreadCpu(motehandler)
+    elif cpuModel==CPU_GREENLET:
+        return GreenletCpu(motehandler)
+    else:
+        raise NotImplementedError('unsupported cpuModel={0}'.format(cpuModel))
+
+class MoteCpu(object):
+    '''
+    Hands control back and forth between the timeline and the task-mode code
+    of an emulated mote.
+    
+    The timeline calls boot() once, then kick() each time an interrupt asks
+    for the mote's scheduler to run. Both return once the mote calls sleep()
+    from its board_sleep() callback.
+    
+    This class is abstract, with concrete subclasses implementing the
+    different execution models.
+    '''
+    
+    def __init__(self,motehandler):
+        
+        # store params
+        self.motehandler          = motehandler
+        
+        # local variables
+        self.numHandoffs          = 0
+    
+    #======================== public ==========================================
+    
+    def boot(self):
+        raise NotImplementedError()
+    
+    def kick(self):
+        raise NotImplementedError()
+    
+    def sleep(self):
+        raise NotImplementedError()
+    
+    def getNumHandoffs(self):
+        return self.numHandoffs
+
+class ThreadCpu(MoteCpu):
+    '''
+    Runs the mote in its own OS thread, synchronized with the timeline
+    through a pair of locks.
+    '''
+    
+    def __init__(self,motehandler):
+        
+        # initialize the parent
+        MoteCpu.__init__(self,motehandler)
+        
+        # local variables
+        self.cpuRunning           = threading.Lock()
+        self.cpuRunning.acquire()
+        self.cpuDone              = threading.Lock()
+        self.cpuDone.acquire()
+    
+    #======================== public ==========================================
+    
+    def boot(self):
+        
+        # start the thread's execution
+        self.motehandler.start()
+        
+        # wait for CPU to be done
+        self.cpuDone.acquire()
+    
+    def kick(self):
+        
+        self.numHandoffs += 1
+        
+        # release the mote's CPU (mote runs in task mode)
+        self.cpuRunning.release()
+        
+        # wait for CPU to be done
+        self.cpuDone.acquire()
+    
+    def sleep(self):
+        
+        self.cpuDone.release()
+        
+        # block the mote until CPU is released by ISR
+        self.cpuRunning.acquire()
+
+class GreenletCpu(MoteCpu):
+    '''
+    Runs the mote as a greenlet in the timeline thread.
+    
+    Handing control to and from the mote is a stack switch within the same
+    OS thread, so no per-mote thread is created and no lock is involved.
+    Requires the greenlet module.
+    '''
+    
+    def __init__(self,motehandler):
+        
+        # import here since only needed by this execution model
+        import greenlet
+        
+        # initialize the parent
+        MoteCpu.__init__(self,motehandler)
+        
+        # local variables
+        self.greenletClass        = greenlet.greenlet
+        self.greenlet             = None
+    
+    #======================== public ==========================================
+    
+    def boot(self):
+        
+        # create the greenlet here, since it can only be switched to from
+        # the thread it was created in, i.e. the timeline
+        self.greenlet             = self.greenletClass(self.motehandler.run)
+        
+        # run the mote until it first goes to sleep
+        self.greenlet.switch()
+    
+    def kick(self):
+        
+        self.numHandoffs += 1
+        
+        # run the mote until it goes back to sleep
+        self.greenlet.switch()
+    
+    def sleep(self):
+        
+        # hand control back to the timeline
+        self.greenlet.parent.switch()
@@ -13,6 +13,7 @@ import time
 import binascii
 
 from openvisualizer.SimEngine   import SimEngine
+from openvisualizer.SimEngine   import MoteCpu
 from openvisualizer.BspEmulator import BspBoard
 from openvisualizer.BspEmulator import BspBsp_timer
 from openvisualizer.BspEmulator import BspDebugpins
@@ -57,7 +58,7 @@ def notifId(s):
 
 class MoteHandler(threading.Thread):
     
-    def __init__(self,mote):
+    def __init__(self,mote,moteId=None):
         
         # store params
         self.engine          = SimEngine.SimEngine()
@@ -65,8 +66,12 @@ class MoteHandler(threading.Thread):
         
         #=== local variables
         self.loghandler      = self.engine.loghandler
-        # unique identifier of the mote
-        self.id              = self.engine.idmanager.getId()
+        # unique identifier of the mote, assigned by the process owning the
+        # simulation when this mote runs in a shard
+        if moteId is None:
+            self.id          = self.engine.idmanager.getId()
+        else:
+            self.id          = moteId
         # position of the mote
         self.location        = self.engine.locationmanager.getLocation()
         # stats
@@ -86,10 +91,7 @@ class MoteHandler(threading.Thread):
         self.bspUart         = BspUart.BspUart(self)
         # status
         self.booted          = False
-        self.cpuRunning      = threading.Lock()
-        self.cpuRunning.acquire()
-        self.cpuDone         = threading.Lock()
-        self.cpuDone.acquire()
+        self.cpu             = MoteCpu.create(self.engine.cpuModel,self)
         
         #=== install callbacks
         # board
@@ -246,7 +248,15 @@ class MoteHandler(threading.Thread):
         return self.location
     
     def setLocation(self,lat,lon):
+        '''
+        Move the mote. Its connections are left as they are, call
+        Propagation.recomputeConnections() to derive them from the new location.
+        '''
         self.location = (lat,lon)
+        self.engine.propagation.setLocation(self.id,lat,lon)
+    
+    def getNumHandoffs(self):
+        return self.cpu.getNumHandoffs()
     
     def handleEvent(self,functionToCall):
         
@@ -257,11 +267,8 @@ class MoteHandler(threading.Thread):
             # I'm not booted
             self.booted = True
             
-            # start the thread's execution
-            self.start()
-            
-            # wait for CPU to be done
-            self.cpuDone.acquire()
+            # start the mote's CPU, returns when the mote first sleeps
+            self.cpu.boot()
         
         else:
             # call the funcion (mote runs in ISR)
@@ -270,11 +277,8 @@ class MoteHandler(threading.Thread):
             assert kickScheduler in [True,False]
             
             if kickScheduler:
-                # release the mote's CPU (mote runs in task mode)
-                self.cpuRunning.release()
-                
-                # wait for CPU to be done
-                self.cpuDone.acquire()
+                # let the mote run in task mode, returns when it sleeps
+                self.cpu.kick()
     
     #======================== private =========================================
     
\ No newline at end of file
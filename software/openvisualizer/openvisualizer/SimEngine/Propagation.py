@@ -8,21 +8,52 @@
 import logging
 import threading
 import copy
-import random
 from math import radians, cos, sin, asin, sqrt, log10
 
+try:
+    import numpy
+except ImportError:
+    # fall back to computing one pair at a time
+    numpy = None
+
 from openvisualizer.eventBus      import eventBusClient
 
 import SimEngine
+import SpatialGrid
+import Medium
 
 class Propagation(eventBusClient.eventBusClient):
     '''
     The propagation model of the engine.
+    
+    When NumPy is available, the PDRs between a mote and all others are
+    computed in a single vectorized pass, and the reception of a frame by all
+    the transmitter's neighbors is drawn in a single batch. The locations are
+    then kept in NumPy arrays, which double in size when full.
+    
+    With the Pister-hack model, a mote farther away than MAX_RANGE_km can
+    never be reached, so only the motes a SpatialGrid finds within that range
+    are considered.
+    
+    Frames transmitted at the same time on the same channel interfere, as
+    modeled by the Medium. The power at which a mote hears another is the one
+    the Pister-hack model computed for their connection. For connections set
+    otherwise, it is derived from their PDR, mapping the grey area linearly
+    onto [SENSITIVITY_dBm,SENSITIVITY_dBm+GREY_AREA_dB].
     '''
     
     SIGNAL_WIRELESSTXSTART        = 'wirelessTxStart'
     SIGNAL_WIRELESSTXEND          = 'wirelessTxEnd'
     
+    FREQUENCY_GHz                 =    2.4
+    TX_POWER_dBm                  =    0.0
+    PISTER_HACK_LOSS              =   40.0
+    SENSITIVITY_dBm               = -101.0
+    GREY_AREA_dB                  =   15.0
+    EARTH_RADIUS_km               = 6367.0
+    MAX_RANGE_km                  = 10**((TX_POWER_dBm-SENSITIVITY_dBm-20*log10(FREQUENCY_GHz)-92.45)/20)
+    INITIAL_CAPACITY              =   64   # motes the location arrays hold initially
+    
     def __init__(self,simTopology):
         
         # store params
@@ -32,7 +63,22 @@ class Propagation(eventBusClient.eventBusClient):
         # local variables
         self.dataLock             = threading.Lock()
         self.connections          = {}
-        self.pendingTxEnd         = []
+        self.rxPowers             = {}   # rxPowers[fromMote][toMote], in dBm, when computed
+        self.connectionsVersion   = 0    # incremented each time connections change
+        self.neighbors            = {}   # per transmitter, (toMotes,pdrs) built from connections
+        self.medium               = Medium.Medium(self._getRxPower)
+        self.moteIds              = []
+        self.moteIndex            = {}   # moteId -> index in moteIds, lats and lons
+        if numpy is None:
+            self.lats             = []   # radians
+            self.lons             = []   # radians
+        else:
+            self.lats             = numpy.empty(self.INITIAL_CAPACITY)
+            self.lons             = numpy.empty(self.INITIAL_CAPACITY)
+        self.grid                 = SpatialGrid.SpatialGrid(self.MAX_RANGE_km,self.EARTH_RADIUS_km)
+        self.random               = self.engine.getRandom('Propagation')
+        if numpy is not None:
+            self.numpyRandom      = numpy.random.RandomState(self.random.getrandbits(32))
         
         # logging
         self.log                  = logging.getLogger('Propagation')
@@ -56,82 +102,94 @@ class Propagation(eventBusClient.eventBusClient):
                 },
             ]
         )
-        
+    
     #======================== public ==========================================
     
+    def setLocation(self,moteId,lat,lon):
+        '''
+        Record the location of a mote, used to compute its connections.
+        
+        :param moteId: The id of the mote.
+        :param lat:    Its latitude, in degrees.
+        :param lon:    Its longitude, in degrees.
+        '''
+        
+        with self.dataLock:
+            if moteId not in self.moteIndex:
+                i                       = len(self.moteIds)
+                self.moteIndex[moteId]  = i
+                self.moteIds           += [moteId]
+                if numpy is None:
+                    self.lats          += [None]
+                    self.lons          += [None]
+                elif i==len(self.lats):
+                    # grow geometrically, so adding a mote is amortized O(1)
+                    self.lats           = numpy.concatenate((self.lats,numpy.empty(len(self.lats))))
+                    self.lons           = numpy.concatenate((self.lons,numpy.empty(len(self.lons))))
+            else:
+                i                       = self.moteIndex[moteId]
+            self.lats[i]                = radians(lat)
+            self.lons[i]                = radians(lon)
+            self.grid.setLocation(moteId,radians(lat),radians(lon))
+    
     def createConnection(self,fromMote,toMote):
-  
         
-        FREQUENCY_GHz        =    2.4
-        TX_POWER_dBm         =    0.0
-        PISTER_HACK_LOSS     =   40.0
-        SENSITIVITY_dBm      = -101.0
-        GREY_AREA_dB         =   15.0
+        self.createConnections(fromMote,[toMote])
+    
+    def createConnections(self,fromMote,toMotes=None):
+        '''
+        Create, update or delete the connections between a mote and a number
+        of other motes, computing all the PDRs in one pass.
+        
+        :param fromMote: The id of the mote.
+        :param toMotes:  The ids of the other motes. If None, all other motes
+            with a known location.
+        '''
         
         with self.dataLock:
             
+            if toMotes is None and not self.simTopology:
+                # only motes in range, and those to update the connection of
+                toMotes = set(self.grid.getCandidates(fromMote))
+                toMotes.update(self.connections.get(fromMote,()))
+                toMotes = list(toMotes)
+            elif toMotes is None:
+                toMotes = [m for m in self.moteIds if m!=fromMote]
+            if not toMotes:
+                return
+            
+            rxPowers = [None]*len(toMotes)
             if not self.simTopology:
-                
-                #===== Pister-hack model
-                
-                # retrieve position
-                mhFrom            = self.engine.getMoteHandlerById(fromMote)
-                (latFrom,lonFrom) = mhFrom.getLocation()
-                mhTo              = self.engine.getMoteHandlerById(toMote)
-                (latTo,lonTo)     = mhTo.getLocation()
-    
-                # compute distance
-                lonFrom, latFrom, lonTo, latTo = map(radians, [lonFrom, latFrom, lonTo, latTo])
-                dlon             = lonTo - lonFrom 
-                dlat             = latTo - latFrom 
-                a                = sin(dlat/2)**2 + cos(latFrom) * cos(latTo) * sin(dlon/2)**2
-                c                = 2 * asin(sqrt(a)) 
-                d_km                = 6367 * c
-                
-                # compute reception power (first Friis, then apply Pister-hack)
-                Prx              = TX_POWER_dBm - (20*log10(d_km) + 20*log10(FREQUENCY_GHz) + 92.45)
-                Prx             -= PISTER_HACK_LOSS*random.random()
-               
-                #turn into PDR
-                if   Prx<SENSITIVITY_dBm:
-                    pdr          = 0.0
-                elif Prx>SENSITIVITY_dBm+GREY_AREA_dB:
-                    pdr          = 1.0
-                else:
-                    pdr          = (Prx-SENSITIVITY_dBm)/GREY_AREA_dB
-
+                (pdrs,rxPowers) = self._computePisterHackLinks(fromMote,toMotes)
             elif self.simTopology=='linear':
-                
                 # linear network
-                if fromMote==toMote+1:
-                    pdr          = 1.0
-                else:
-                    pdr          = 0.0
-            
+                pdrs = [1.0 if fromMote==toMote+1 else 0.0 for toMote in toMotes]
             elif self.simTopology=='fully-meshed':
-                
-                pdr          = 1.0
-            
+                pdrs = [1.0]*len(toMotes)
             else:
-                
                 raise NotImplementedError('unsupported simTopology={0}'.format(self.simTopology))
             
-            #==== create, update or delete connection
+            #==== create, update or delete connections
             
-            if pdr:
-                if fromMote not in self.connections:
-                    self.connections[fromMote] = {}
-                self.connections[fromMote][toMote] = pdr
-                
-                if toMote not in self.connections:
-                    self.connections[toMote] = {}
-                self.connections[toMote][fromMote] = pdr
-            else:
-                self.deleteConnection(toMote,fromMote)
+            for (toMote,pdr,rxPower) in zip(toMotes,pdrs,rxPowers):
+                if pdr:
+                    self._setConnection(fromMote,toMote,float(pdr),None if rxPower is None else float(rxPower))
+                else:
+                    self._deleteConnection(fromMote,toMote)
+            
+            self._indicateConnectionsChanged()
+    
+    def recomputeConnections(self,moteId):
+        '''
+        Recompute the connections of a mote with all others, e.g. after it
+        was moved.
+        '''
+        
+        self.createConnections(moteId)
     
     def retrieveConnections(self):
         
-        retrievedConnections = []
+        retrievedConnections = set()
         returnVal            = []
         with self.dataLock:
             
@@ -145,30 +203,72 @@ class Propagation(eventBusClient.eventBusClient):
                                 'pdr':      self.connections[fromMote][toMote],
                             }
                         ]
-                        retrievedConnections += [(fromMote,toMote)]
+                        retrievedConnections.add((fromMote,toMote))
         
         return returnVal
     
     def updateConnection(self,fromMote,toMote,pdr):
         
         with self.dataLock:
-            self.connections[fromMote][toMote] = pdr
-            self.connections[toMote][fromMote] = pdr
+            self._setConnection(fromMote,toMote,pdr)
+            self._indicateConnectionsChanged()
     
     def deleteConnection(self,fromMote,toMote):
         
         with self.dataLock:
+            self._deleteConnection(fromMote,toMote)
+            self._indicateConnectionsChanged()
+    
+    def getConnections(self):
+        '''
+        :returns: A tuple (version,connections,rxPowers) with a copy of the
+            connections and of the reception powers computed for them, and
+            the version they correspond to.
+        '''
+        with self.dataLock:
+            return (
+                self.connectionsVersion,
+                dict([(k,v.copy()) for (k,v) in self.connections.items()]),
+                dict([(k,v.copy()) for (k,v) in self.rxPowers.items()]),
+            )
+    
+    def setConnections(self,connections,rxPowers=None):
+        '''
+        Replace all connections, e.g. by the ones computed by another process.
+        
+        :param connections: A dict of dicts, connections[fromMote][toMote]
+            being the PDR from fromMote to toMote.
+        :param rxPowers:    A dict of dicts, rxPowers[fromMote][toMote] being
+            the power in dBm at which toMote hears fromMote, for the
+            connections it is known of.
+        '''
+        with self.dataLock:
+            self.connections = connections
+            self.rxPowers    = rxPowers or {}
+            self._indicateConnectionsChanged()
+    
+    def indicateTxStart(self,fromMote,packet,channel):
+        
+        receivers = []
+        for toMote in self._drawReceivers(fromMote):
             
-            try:
-                del self.connections[fromMote][toMote]
-                if not self.connections[fromMote]:
-                    del self.connections[fromMote]
-                
-                del self.connections[toMote][fromMote]
-                if not self.connections[toMote]:
-                    del self.connections[toMote]
-            except KeyError:
-                pass # did not exist
+            # a mote already receiving on this channel only sees interference
+            if self.medium.isReceiving(toMote,channel):
+                continue
+            
+            # indicate start of transmission
+            mh = self.engine.getMoteHandlerById(toMote)
+            if mh.bspRadio.indicateTxStart(fromMote,packet,channel):
+                receivers += [toMote]
+        
+        # remember to signal end of transmission
+        self.medium.indicateTxStart(fromMote,channel,receivers)
+    
+    def indicateTxEnd(self,fromMote):
+        
+        for (toMote,crcPasses) in self.medium.indicateTxEnd(fromMote):
+            mh = self.engine.getMoteHandlerById(toMote)
+            mh.bspRadio.indicateTxEnd(fromMote,crcPasses)
     
     #======================== indication from eventBus ========================
     
@@ -176,32 +276,175 @@ class Propagation(eventBusClient.eventBusClient):
         
         (fromMote,packet,channel) = data
         
-        if fromMote in self.connections:
-            for (toMote,pdr) in self.connections[fromMote].items():
-                if random.random()<=pdr:
-                    
-                    # indicate start of transmission
-                    mh = self.engine.getMoteHandlerById(toMote)
-                    mh.bspRadio.indicateTxStart(fromMote,packet,channel)
-                    
-                    # remember to signal end of transmission
-                    self.pendingTxEnd += [(fromMote,toMote)]
+        self.indicateTxStart(fromMote,packet,channel)
     
     def _indicateTxEnd(self,sender,signal,data):
         
         fromMote = data
         
-        if fromMote in self.connections:
-            for (toMote,pdr) in self.connections[fromMote].items():
-                try:
-                    self.pendingTxEnd.remove((fromMote,toMote))
-                except ValueError:
-                    pass
-                else:
-                    mh = self.engine.getMoteHandlerById(toMote)
-                    mh.bspRadio.indicateTxEnd(fromMote)
+        self.indicateTxEnd(fromMote)
     
     #======================== private =========================================
     
-    #======================== helpers =========================================
+    def _setConnection(self,fromMote,toMote,pdr,rxPower=None):
+        
+        if fromMote not in self.connections:
+            self.connections[fromMote] = {}
+        self.connections[fromMote][toMote] = pdr
+        
+        if toMote not in self.connections:
+            self.connections[toMote] = {}
+        self.connections[toMote][fromMote] = pdr
+        
+        # a PDR set by hand no longer matches the computed reception power
+        if rxPower is None:
+            self._deleteRxPower(fromMote,toMote)
+        else:
+            self.rxPowers.setdefault(fromMote,{})[toMote] = rxPower
+            self.rxPowers.setdefault(toMote,{})[fromMote] = rxPower
+    
+    def _deleteConnection(self,fromMote,toMote):
+        
+        try:
+            del self.connections[fromMote][toMote]
+            if not self.connections[fromMote]:
+                del self.connections[fromMote]
+            
+            del self.connections[toMote][fromMote]
+            if not self.connections[toMote]:
+                del self.connections[toMote]
+        except KeyError:
+            pass # did not exist
+        
+        self._deleteRxPower(fromMote,toMote)
+    
+    def _deleteRxPower(self,fromMote,toMote):
+        
+        for (a,b) in [(fromMote,toMote),(toMote,fromMote)]:
+            if b in self.rxPowers.get(a,()):
+                del self.rxPowers[a][b]
+                if not self.rxPowers[a]:
+                    del self.rxPowers[a]
+    
+    def _indicateConnectionsChanged(self):
+        self.connectionsVersion  += 1
+        self.neighbors            = {}
+    
+    def _getRxPower(self,fromMote,toMote):
+        '''
+        :returns: The power, in mW, at which toMote hears fromMote, 0 if it
+            does not hear it at all.
+        '''
+        
+        pdr = self.connections.get(fromMote,{}).get(toMote)
+        if pdr is None:
+            return 0.0
+        rxPower = self.rxPowers.get(fromMote,{}).get(toMote)
+        if rxPower is None:
+            # connection not computed by the propagation model
+            rxPower = self.SENSITIVITY_dBm+pdr*self.GREY_AREA_dB
+        return 10**(rxPower/10)
+    
+    def _computePisterHackLinks(self,fromMote,toMotes):
+        '''
+        Compute the links from a mote to other motes, using the Pister-hack
+        model: Friis' free-space loss over the great-circle distance, plus a
+        random loss of up to PISTER_HACK_LOSS dB. The reception power never
+        exceeds TX_POWER_dBm, e.g. for motes at the same location.
+        
+        :returns: A tuple (pdrs,rxPowers) of sequences with the PDR to each
+            mote in toMotes, and the power in dBm at which it hears fromMote.
+        '''
+        
+        i = self.moteIndex[fromMote]
+        
+        if numpy is None:
+            links = [
+                self._pisterHackLink(
+                    self.lats[i],self.lons[i],
+                    self.lats[self.moteIndex[toMote]],self.lons[self.moteIndex[toMote]],
+                ) for toMote in toMotes
+            ]
+            return ([pdr for (pdr,_) in links],[Prx for (_,Prx) in links])
+        
+        # retrieve positions
+        idx      = numpy.fromiter((self.moteIndex[m] for m in toMotes),numpy.intp,len(toMotes))
+        latsTo   = self.lats[idx]
+        lonsTo   = self.lons[idx]
+        
+        # compute distances
+        a        = numpy.sin((latsTo-self.lats[i])/2)**2 + cos(self.lats[i])*numpy.cos(latsTo)*numpy.sin((lonsTo-self.lons[i])/2)**2
+        d_km     = self.EARTH_RADIUS_km*2*numpy.arcsin(numpy.sqrt(a))
+        
+        # compute reception power (first Friis, then apply Pister-hack)
+        with numpy.errstate(divide='ignore'):
+            Prx  = self.TX_POWER_dBm - (20*numpy.log10(d_km) + 20*log10(self.FREQUENCY_GHz) + 92.45)
+        Prx      = numpy.minimum(Prx,self.TX_POWER_dBm)
+        Prx     -= self.PISTER_HACK_LOSS*self.numpyRandom.random_sample(len(toMotes))
+        
+        # turn into PDR
+        return (numpy.clip((Prx-self.SENSITIVITY_dBm)/self.GREY_AREA_dB,0.0,1.0),Prx)
+    
+    def _pisterHackLink(self,latFrom,lonFrom,latTo,lonTo):
+        '''
+        :returns: A tuple (pdr,rxPower) for a single link, see
+            _computePisterHackLinks().
+        '''
+        
+        # compute distance
+        dlon             = lonTo - lonFrom
+        dlat             = latTo - latFrom
+        a                = sin(dlat/2)**2 + cos(latFrom) * cos(latTo) * sin(dlon/2)**2
+        c                = 2 * asin(sqrt(a))
+        d_km             = self.EARTH_RADIUS_km * c
+        
+        # compute reception power (first Friis, then apply Pister-hack)
+        if d_km:
+            Prx          = self.TX_POWER_dBm - (20*log10(d_km) + 20*log10(self.FREQUENCY_GHz) + 92.45)
+            Prx          = min(Prx,self.TX_POWER_dBm)
+        else:
+            Prx          = self.TX_POWER_dBm
+        Prx             -= self.PISTER_HACK_LOSS*self.random.random()
+        
+        # turn into PDR
+        if   Prx<self.SENSITIVITY_dBm:
+            return (0.0,Prx)
+        elif Prx>self.SENSITIVITY_dBm+self.GREY_AREA_dB:
+            return (1.0,Prx)
+        else:
+            return ((Prx-self.SENSITIVITY_dBm)/self.GREY_AREA_dB,Prx)
     
+    def _drawReceivers(self,fromMote):
+        '''
+        Draw which neighbors of a transmitter receive its frame.
+        
+        :returns: The list of the ids of the receiving motes.
+        '''
+        
+        # dataLock is not held: the connections may change, and the cache be
+        # replaced, meanwhile; the cache is read first, so that an entry built
+        # from connections changed since only goes to a cache replaced since
+        neighbors   = self.neighbors
+        connections = self.connections.get(fromMote)
+        if not connections:
+            return []
+        links       = connections.items()
+        
+        if numpy is None:
+            return [
+                toMote for (toMote,pdr) in links
+                if self.random.random()<=pdr
+            ]
+        
+        entry = neighbors.get(fromMote)
+        if entry is None:
+            toMotes             = [toMote for (toMote,_) in links]
+            pdrs                = numpy.array([pdr for (_,pdr) in links])
+            entry               = (toMotes,pdrs)
+            neighbors[fromMote] = entry
+        (toMotes,pdrs) = entry
+        
+        return [toMotes[j] for j in numpy.flatnonzero(self.numpyRandom.random_sample(len(toMotes))<=pdrs)]
+    
+    #======================== helpers =========================================
+
@@ -0,0 +1,252 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+import sys
+import threading
+import logging
+
+from pydispatch import dispatcher
+
+from openvisualizer.eventBus  import eventBusClient
+from openvisualizer.SimEngine import SimEngine
+from openvisualizer.SimEngine import MoteHandler
+
+#============================ defines =========================================
+
+# commands from the ShardCoordinator
+CMD_START     = 'start'
+CMD_ADVANCE   = 'advance'
+CMD_STOP      = 'stop'
+
+# responses to the ShardCoordinator
+RSP_DONE      = 'done'
+
+#============================ entry point =====================================
+
+def runShard(shardId,conn,uartQueue):
+    '''
+    Entry point of the process running one shard of a sharded simulation.
+    
+    The process is forked early, before the motes exist, and waits for the
+    ShardCoordinator to send it its configuration.
+    
+    :param shardId:   The index of this shard.
+    :param conn:      The end of the pipe connected to the ShardCoordinator.
+    :param uartQueue: The queue to forward the motes' UART output on.
+    '''
+    
+    # wait for the configuration, a dict with the parameters of the shard,
+    # see ShardCoordinator._getShardConfig()
+    msg = conn.recv()
+    if msg[0]==CMD_STOP:
+        return
+    assert msg[0]==CMD_START
+    config = msg[1]
+    
+    # a forked process inherits the eventBus receivers and the SimEngine of
+    # its parent, if any, forget them
+    dispatcher.connections.clear()
+    dispatcher.senders.clear()
+    dispatcher.sendersBack.clear()
+    eventBusClient.resetRoutingTable()
+    SimEngine.SimEngine._instance = None
+    
+    # create this process' engine
+    SimEngine.SimEngine(
+        simTopology  = config['simTopology'],
+        cpuModel     = config['cpuModel'],
+        seed         = config['seed'],
+    )
+    
+    Shard(shardId,conn,uartQueue,config).run()
+
+#============================ classes =========================================
+
+class UartPump(threading.Thread):
+    '''
+    Forwards the UART output of a mote to the ShardCoordinator.
+    
+    Plays the role of the mote's moteProbe, which runs in the main process.
+    '''
+    
+    def __init__(self,motehandler,uartQueue):
+        
+        # store params
+        self.motehandler          = motehandler
+        self.uartQueue            = uartQueue
+        
+        # initialize parent class
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.setName('UartPump_'+str(self.motehandler.getId()))
+        
+        # thread daemon mode
+        self.setDaemon(True)
+    
+    def run(self):
+        
+        while True:
+            rxBytes = self.motehandler.bspUart.read()
+            if not rxBytes:
+                # the UART was closed, and all its output forwarded
+                break
+            self.uartQueue.put((self.motehandler.getId(),rxBytes))
+
+class Shard(object):
+    '''
+    Runs a subset of the motes of a sharded simulation, in its own process.
+    
+    The shard executes its timeline one window at a time, as instructed by
+    the ShardCoordinator. Whenever one of its motes starts transmitting, it
+    announces the frame to the other shards through the coordinator. Frames
+    announced by the other shards are delivered to the local motes by the
+    local Propagation, at the time they were announced for.
+    '''
+    
+    def __init__(self,shardId,conn,uartQueue,config):
+        
+        # store params
+        self.engine               = SimEngine.SimEngine()
+        self.shardId              = shardId
+        self.conn                 = conn
+        self.uartQueue            = uartQueue
+        
+        # local variables
+        self.timeline             = self.engine.timeline
+        self.propagation          = self.engine.propagation
+        self.localMoteIds         = set(config['moteIds'])
+        self.outbox               = [] # frames to announce to the other shards
+        
+        # logging
+        self.log                  = logging.getLogger('Shard')
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(logging.NullHandler())
+        
+        # have the radios of the local motes announce their frames to me
+        self.engine.shard         = self
+        
+        # create the local motes, running the firmware unless told otherwise
+        if config.get('moteFactory'):
+            createMote = config['moteFactory']
+        else:
+            sys.path.append(config['simFilesPath'])
+            import oos_openwsn
+            MoteHandler.readNotifIds(config['headerPath'])
+            createMote = lambda moteId: MoteHandler.MoteHandler(oos_openwsn.OpenMote(),moteId=moteId)
+        for moteId in config['moteIds']:
+            self.engine.indicateNewMote(
+                createMote(moteId),
+                createConnections = False,
+            )
+    
+    #======================== public ==========================================
+    
+    def run(self):
+        
+        # log
+        self.log.info('shard {0} starting with motes {1}'.format(self.shardId,sorted(self.localMoteIds)))
+        
+        # forward the UART output and boot all motes
+        uartPumps = []
+        for mh in self.engine.moteHandlers:
+            uartPumps += [UartPump(mh,self.uartQueue)]
+            uartPumps[-1].start()
+            self.timeline.scheduleEvent(
+                0,
+                mh.getId(),
+                mh.hwSupply.switchOn,
+                mh.hwSupply.INTR_SWITCHON,
+            )
+        
+        while True:
+            
+            msg = self.conn.recv()
+            
+            if msg[0]==CMD_STOP:
+                # forward what the motes wrote last before the process exits
+                for uartPump in uartPumps:
+                    uartPump.motehandler.bspUart.close()
+                for uartPump in uartPumps:
+                    uartPump.join()
+                break
+            
+            assert msg[0]==CMD_ADVANCE
+            (_,windowStart,windowEnd,connections,remoteTxs,uartWrites) = msg
+            
+            # anything received from the coordinator happens at the start of
+            # the window, so nothing it causes can reach another shard before
+            # the end of the window
+            self.timeline.setCurrentTime(max(self.timeline.getCurrentTime(),windowStart))
+            
+            if connections is not None:
+                self._setConnections(*connections)
+            for (fromMote,startTime,endTime,packet,channel) in remoteTxs:
+                self._scheduleRemoteTx(fromMote,startTime,endTime,packet,channel)
+            for (moteId,bytesToWrite) in uartWrites:
+                self.engine.getMoteHandlerById(moteId).bspUart.write(bytesToWrite)
+            
+            # run all events in the window
+            numEvents = self.timeline.runUntil(windowEnd)
+            
+            # report
+            self.conn.send((
+                RSP_DONE,
+                self.timeline.getNextEventTime(),
+                self.outbox,
+                numEvents,
+                [(mh.getId(),mh.getNumHandoffs()) for mh in self.engine.moteHandlers],
+            ))
+            self.outbox = []
+    
+    #=== called by the local radios
+    
+    def indicateTxScheduled(self,fromMote,startTime,endTime,packet,channel):
+        '''
+        A local mote will transmit a frame.
+        
+        Called when the transmission is scheduled, i.e. at least the
+        coordinator's lookahead before it starts.
+        '''
+        self.outbox += [(fromMote,startTime,endTime,packet,channel)]
+    
+    #======================== private =========================================
+    
+    def _setConnections(self,connections,rxPowers):
+        '''
+        Keep only the connections towards local motes, since frames to remote
+        motes are delivered by their own shard.
+        '''
+        self.propagation.setConnections(
+            self._keepLocal(connections),
+            self._keepLocal(rxPowers),
+        )
+    
+    def _keepLocal(self,links):
+        returnVal = {}
+        for (fromMote,neighbors) in links.items():
+            localNeighbors = dict(
+                [(toMote,v) for (toMote,v) in neighbors.items() if toMote in self.localMoteIds]
+            )
+            if localNeighbors:
+                returnVal[fromMote] = localNeighbors
+        return returnVal
+    
+    def _scheduleRemoteTx(self,fromMote,startTime,endTime,packet,channel):
+        
+        self.timeline.scheduleEvent(
+            startTime,
+            None,
+            lambda: self.propagation.indicateTxStart(fromMote,packet,channel),
+            'propagation.txStart_{0}'.format(fromMote),
+        )
+        self.timeline.scheduleEvent(
+            endTime,
+            None,
+            lambda: self.propagation.indicateTxEnd(fromMote),
+            'propagation.txEnd_{0}'.format(fromMote),
+        )
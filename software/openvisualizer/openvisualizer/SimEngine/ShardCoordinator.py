@@ -0,0 +1,338 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+import threading
+import logging
+import multiprocessing
+
+from openvisualizer.SimEngine   import SimEngine
+from openvisualizer.SimEngine   import Shard
+from openvisualizer.BspEmulator import BspRadio
+
+#============================ public ==========================================
+
+def forkShards(numShards):
+    '''
+    Start the processes of the shards of a sharded simulation.
+    
+    Must be called from the main thread, before any other thread is started:
+    a process forked while another thread holds a lock, e.g. one of the
+    logging module, inherits that lock held forever. The shards then wait for
+    the ShardCoordinator to send them their motes.
+    
+    :param numShards: The number of shards.
+    
+    :returns: A list of ShardProcess instances, one per shard.
+    '''
+    
+    returnVal = []
+    for shardId in range(numShards):
+        returnVal += [ShardProcess(shardId)]
+    return returnVal
+
+#============================ classes =========================================
+
+class ShardProcess(object):
+    '''
+    The process running a shard, and the means to communicate with it.
+    '''
+    
+    def __init__(self,shardId):
+        
+        # store params
+        self.shardId              = shardId
+        
+        # local variables
+        (self.conn,shardConn)     = multiprocessing.Pipe()
+        self.uartQueue            = multiprocessing.Queue()
+        self.process              = multiprocessing.Process(
+            target                = Shard.runShard,
+            args                  = (shardId,shardConn,self.uartQueue),
+            name                  = 'Shard_{0}'.format(shardId),
+        )
+        self.process.daemon       = True
+        self.process.start()
+
+class ShardedUart(object):
+    '''
+    Stands in for the BspUart of a mote running in a shard, for the mote's
+    moteProbe in the main process.
+    '''
+    
+    def __init__(self,coordinator,moteId):
+        
+        # store params
+        self.coordinator          = coordinator
+        self.moteId               = moteId
+        
+        # local variables
+        self.rxBuffer             = []
+        self.rxBufferSem          = threading.Semaphore(0)
+        self.rxBufferLock         = threading.Lock()
+    
+    #======================== public ==========================================
+    
+    def read(self):
+        '''
+        Read the bytes received from the mote, blocking until there are some.
+        '''
+        while True:
+            self.rxBufferSem.acquire()
+            with self.rxBufferLock:
+                if self.rxBuffer:
+                    returnVal     = ''.join(self.rxBuffer)
+                    self.rxBuffer = []
+                    return returnVal
+    
+    def write(self,bytesToWrite):
+        '''
+        Write a string of bytes to the mote.
+        '''
+        self.coordinator.indicateUartWrite(self.moteId,bytesToWrite)
+    
+    def indicateRx(self,rxBytes):
+        with self.rxBufferLock:
+            self.rxBuffer        += list(rxBytes)
+        self.rxBufferSem.release()
+
+class ShardedMote(object):
+    '''
+    Stands in for the MoteHandler of a mote running in a shard.
+    '''
+    
+    def __init__(self,coordinator,moteId,location):
+        
+        # store params
+        self.coordinator          = coordinator
+        self.id                   = moteId
+        self.location             = location
+        
+        # local variables
+        self.bspUart              = ShardedUart(coordinator,moteId)
+        self.numHandoffs          = 0
+    
+    #======================== public ==========================================
+    
+    def getId(self):
+        return self.id
+    
+    def getLocation(self):
+        return self.location
+    
+    def setLocation(self,lat,lon):
+        # as MoteHandler.setLocation(), connections are left as they are
+        self.location = (lat,lon)
+        self.coordinator.engine.propagation.setLocation(self.id,lat,lon)
+    
+    def getNumHandoffs(self):
+        return self.numHandoffs
+
+class ShardCoordinator(threading.Thread):
+    '''
+    Runs the motes of the simulation in several processes, the shards.
+    
+    Motes and their connections are created in the main process, as in a
+    non-sharded simulation, then assigned to the shards round-robin.
+    
+    The shards are synchronized conservatively: they all execute the events
+    in the same window of simulated time, then wait for the others. The
+    window lasts the lookahead, the time between a radio being told to
+    transmit and the frame actually starting. The frames a shard announces
+    during a window therefore all start after the window, and are delivered
+    to the other shards before they get there.
+    '''
+    
+    def __init__(self,shards,simFilesPath,headerPath,lookahead=BspRadio.BspRadio.DELAY_TX,moteFactory=None):
+        '''
+        :param shards:       The ShardProcess instances, see forkShards().
+        :param simFilesPath: The directory holding the firmware's extension.
+        :param headerPath:   The path to openwsnmodule_obj.h.
+        :param lookahead:    The duration of a window.
+        :param moteFactory:  A function creating the mote with a given id in
+            a shard, instead of a MoteHandler running the firmware.
+        '''
+        
+        assert shards
+        assert lookahead>0
+        
+        # store params
+        self.engine               = SimEngine.SimEngine()
+        self.shards               = shards
+        self.numShards            = len(shards)
+        self.simFilesPath         = simFilesPath
+        self.headerPath           = headerPath
+        self.lookahead            = lookahead
+        self.moteFactory          = moteFactory
+        
+        # local variables
+        self.motes                = []
+        self.motesById            = {}
+        self.moteIdsPerShard      = [[] for _ in range(self.numShards)]
+        self.shardOfMote          = {}
+        self.uartWrites           = [[] for _ in range(self.numShards)]
+        self.uartWritesLock       = threading.Lock()
+        self.conns                = [shard.conn for shard in shards]
+        self.numWindows           = 0
+        self.goOn                 = True
+        
+        # logging
+        self.log                  = logging.getLogger('ShardCoordinator')
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(logging.NullHandler())
+        
+        # initialize parent class
+        threading.Thread.__init__(self)
+        
+        # set thread name
+        self.setName('ShardCoordinator')
+        
+        # thread daemon mode
+        self.setDaemon(True)
+    
+    #======================== public ==========================================
+    
+    def createMote(self):
+        '''
+        Create a mote, to be run by one of the shards once started.
+        
+        :returns: The ShardedMote standing in for the mote.
+        '''
+        
+        assert not self.isAlive()
+        
+        moteId = self.engine.idmanager.getId()
+        mote   = ShardedMote(self,moteId,self.engine.locationmanager.getLocation())
+        
+        shardId                        = len(self.motes)%self.numShards
+        self.moteIdsPerShard[shardId] += [moteId]
+        self.shardOfMote[moteId]       = shardId
+        self.motes                    += [mote]
+        self.motesById[moteId]         = mote
+        
+        # create the connections of the new mote
+        self.engine.indicateNewMote(mote)
+        
+        return mote
+    
+    def indicateUartWrite(self,moteId,bytesToWrite):
+        with self.uartWritesLock:
+            self.uartWrites[self.shardOfMote[moteId]] += [(moteId,bytesToWrite)]
+    
+    def getNumWindows(self):
+        return self.numWindows
+    
+    def close(self):
+        self.goOn = False
+    
+    #======================== thread ==========================================
+    
+    def run(self):
+        
+        # log
+        self.log.info('starting {0} shards, lookahead {1}s'.format(self.numShards,self.lookahead))
+        
+        # hand the shards their motes
+        for shardId in range(self.numShards):
+            self.conns[shardId].send((Shard.CMD_START,self._getShardConfig(shardId)))
+            
+            uartRouter            = threading.Thread(
+                target            = self._routeUart,
+                args              = (self.shards[shardId].uartQueue,),
+                name              = 'UartRouter_{0}'.format(shardId),
+            )
+            uartRouter.daemon     = True
+            uartRouter.start()
+        
+        self.engine.indicateFirstEventPassed()
+        
+        connectionsVersion        = None
+        inboxes                   = [[] for _ in range(self.numShards)]
+        windowStart               = 0.0
+        
+        while self.goOn:
+            
+            windowEnd             = windowStart+self.lookahead
+            
+            # send the connections and their reception powers, if they changed
+            if self.engine.propagation.connectionsVersion!=connectionsVersion:
+                (connectionsVersion,connections,rxPowers) = self.engine.propagation.getConnections()
+                connections       = (connections,rxPowers)
+            else:
+                connections       = None
+            
+            with self.uartWritesLock:
+                uartWrites        = self.uartWrites
+                self.uartWrites   = [[] for _ in range(self.numShards)]
+            
+            # have all shards execute the window
+            for shardId in range(self.numShards):
+                self.conns[shardId].send((
+                    Shard.CMD_ADVANCE,
+                    windowStart,
+                    windowEnd,
+                    connections,
+                    inboxes[shardId],
+                    uartWrites[shardId],
+                ))
+            
+            # collect the frames they announced, and the time of their next event
+            inboxes               = [[] for _ in range(self.numShards)]
+            nextEventTimes        = []
+            numEvents             = 0
+            for shardId in range(self.numShards):
+                (rsp,nextEventTime,outbox,shardNumEvents,numHandoffs) = self.conns[shardId].recv()
+                assert rsp==Shard.RSP_DONE
+                
+                numEvents        += shardNumEvents
+                for (moteId,moteNumHandoffs) in numHandoffs:
+                    self.motesById[moteId].numHandoffs = moteNumHandoffs
+                if nextEventTime is not None:
+                    nextEventTimes += [nextEventTime]
+                for tx in outbox:
+                    nextEventTimes += [tx[1]]
+                    for otherShardId in range(self.numShards):
+                        if otherShardId!=shardId:
+                            inboxes[otherShardId] += [tx]
+            
+            self.numWindows      += 1
+            self.engine.timeline.getStats().incrementEvents(numEvents)
+            self.engine.timeline.setCurrentTime(windowEnd)
+            
+            # detect the end of the simulation
+            if not nextEventTimes:
+                output  = ''
+                output += 'end of simulation reached\n'
+                output += ' - currentTime='+str(windowEnd)+'\n'
+                self.log.warning(output)
+                break
+            
+            # apply the delay, or pause
+            self.engine.pauseOrDelay()
+            
+            # skip the windows in which nothing happens
+            windowStart           = max(windowEnd,min(nextEventTimes))
+        
+        for conn in self.conns:
+            conn.send((Shard.CMD_STOP,))
+    
+    #======================== private =========================================
+    
+    def _getShardConfig(self,shardId):
+        return {
+            'moteIds':       self.moteIdsPerShard[shardId],
+            'simTopology':   self.engine.propagation.simTopology,
+            'cpuModel':      self.engine.cpuModel,
+            'seed':          self.engine.getRandom('Shard_{0}'.format(shardId)).getrandbits(32),
+            'simFilesPath':  self.simFilesPath,
+            'headerPath':    self.headerPath,
+            'moteFactory':   self.moteFactory,
+        }
+    
+    def _routeUart(self,uartQueue):
+        while True:
+            (moteId,rxBytes) = uartQueue.get()
+            self.motesById[moteId].bspUart.indicateRx(rxBytes)
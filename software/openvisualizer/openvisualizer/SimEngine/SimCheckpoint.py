@@ -0,0 +1,323 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+'''
+Checkpoints of a simulation.
+
+A checkpoint records the state of the engine between two timeline events:
+the seed, the current time, the pending events, the locations and
+connections, the state of the random number generators, and the state of
+each mote's emulated hardware and BSP modules.
+
+restore() puts a freshly created engine, with the same motes, in the state of
+a checkpoint, without re-running the simulation. The memory of the emulated
+motes however lives in the C extension running the firmware, which offers no
+way to read or write it. A mote which had booted when the checkpoint was
+taken is therefore rebooted at the checkpoint's time, with the drift of its
+crystal and its connections restored; its firmware, and the events it had
+scheduled, start afresh. The events of the motes which had not booted yet
+are restored as they were.
+'''
+
+import logging
+import json
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+log = logging.getLogger('SimCheckpoint')
+log.setLevel(logging.INFO)
+log.addHandler(logging.NullHandler())
+
+FORMAT_VERSION = 3
+
+# attributes of the motes' modules which are saved, when of a simple type
+SIMPLE_TYPES   = (type(None),bool,int,long,float,str,unicode)
+
+# modules whose state is restored; the others are re-initialized by the
+# firmware when the mote boots
+RESTORED_MODULES = ['hwCrystal']
+
+#============================ public ==========================================
+
+def save(engine,filename):
+    '''
+    Write a checkpoint of the engine to a file.
+    
+    If the engine is running, the state is captured by the timeline thread
+    once it is done with the event it is executing.
+    
+    :param engine:   The SimEngine.
+    :param filename: The file to write the checkpoint to.
+    
+    :returns: The checkpoint written, as a dict.
+    
+    :raises: ValueError if the engine cannot be checkpointed, see capture().
+    '''
+    
+    if engine.timeline.isAlive() and engine.isRunning():
+        checkpointDone = threading.Event()
+        result         = {}
+        def _capture():
+            try:
+                result['checkpoint'] = capture(engine)
+            except ValueError as err:
+                result['error']      = err
+            checkpointDone.set()
+        engine.callBetweenEvents(_capture)
+        checkpointDone.wait()
+        if 'error' in result:
+            raise result['error']
+        checkpoint = result['checkpoint']
+    else:
+        checkpoint = capture(engine)
+    
+    with open(filename,'w') as f:
+        json.dump(checkpoint,f,indent=1,sort_keys=True)
+    
+    log.info('saved checkpoint after {0} events to {1}'.format(checkpoint['numEvents'],filename))
+    
+    return checkpoint
+
+def load(filename):
+    '''
+    Read a checkpoint from a file.
+    
+    :raises: ValueError if the file is not a checkpoint of a supported version.
+    '''
+    
+    with open(filename,'r') as f:
+        checkpoint = json.load(f)
+    
+    if checkpoint.get('version')!=FORMAT_VERSION:
+        raise ValueError('unsupported checkpoint version {0}'.format(checkpoint.get('version')))
+    
+    return checkpoint
+
+def capture(engine):
+    '''
+    Capture the state of the engine. Must be called while the timeline is
+    not executing an event.
+    
+    :returns: The checkpoint, as a dict.
+    
+    :raises: ValueError if some motes are not emulated by this engine, i.e.
+        in a sharded simulation.
+    '''
+    
+    motes = {}
+    for mh in engine.moteHandlers:
+        if not hasattr(mh,'hwSupply'):
+            raise ValueError(
+                'mote {0} is emulated by a shard, checkpoints require a single process'.format(mh.getId())
+            )
+        motes[str(mh.getId())] = {
+            'location':   list(mh.getLocation()),
+            'booted':     mh.booted,
+            'modules':    dict(
+                [(name,_getModuleState(getattr(mh,name))) for name in _getModuleNames(mh)]
+            ),
+        }
+    
+    (_,_,rxPowers) = engine.propagation.getConnections()
+    
+    if getattr(engine.propagation,'numpyRandom',None) is not None:
+        numpyRandom = _jsonify(engine.propagation.numpyRandom.get_state())
+    else:
+        numpyRandom = None
+    
+    return {
+        'version':        FORMAT_VERSION,
+        'seed':           engine.getSeed(),
+        'simTopology':    engine.propagation.simTopology,
+        'cpuModel':       engine.cpuModel,
+        'numMotes':       engine.getNumMotes(),
+        'numEvents':      engine.timeline.getStats().getNumEvents(),
+        'currentTime':    engine.timeline.getCurrentTime(),
+        'events':         [_getEventState(engine,e) for e in engine.timeline.getPendingEvents()],
+        'connections':    sorted(
+            [
+                [c['fromMote'],c['toMote'],c['pdr'],rxPowers.get(c['fromMote'],{}).get(c['toMote'])]
+                for c in engine.propagation.retrieveConnections()
+            ]
+        ),
+        'randoms':        dict(
+            [(name,_jsonify(r.getstate())) for (name,r) in engine.randoms.items()]
+        ),
+        'numpyRandom':    numpyRandom,
+        'motes':          motes,
+    }
+
+def restore(engine,checkpoint):
+    '''
+    Put an engine in the state of a checkpoint.
+    
+    The engine must have been created with the checkpoint's simTopology and
+    motes, and its timeline must not have run nor have any event scheduled.
+    Booted motes are rebooted at the checkpoint's time, see the module's
+    documentation.
+    
+    :raises: ValueError if the engine cannot be put in the checkpoint's
+        state.
+    '''
+    
+    #=== check the engine can be restored
+    
+    moteIds = sorted([str(mh.getId()) for mh in engine.moteHandlers])
+    for (name,value,expected) in [
+            ('simTopology', engine.propagation.simTopology,               checkpoint['simTopology']),
+            ('motes',       moteIds,                                      sorted(checkpoint['motes'].keys())),
+            ('numEvents',   engine.timeline.getStats().getNumEvents(),    0),
+            ('events',      engine.timeline.getEvents(),                  []),
+        ]:
+        if value!=expected:
+            raise ValueError('cannot restore checkpoint, engine has {0}={1}, expected {2}'.format(name,value,expected))
+    for mh in engine.moteHandlers:
+        if not hasattr(mh,'hwSupply'):
+            raise ValueError(
+                'mote {0} is emulated by a shard, checkpoints require a single process'.format(mh.getId())
+            )
+    
+    #=== time
+    
+    currentTime = checkpoint['currentTime']
+    engine.timeline.setCurrentTime(currentTime)
+    engine.timeline.getStats().incrementEvents(checkpoint['numEvents'])
+    
+    #=== random number generators
+    
+    for (name,state) in checkpoint['randoms'].items():
+        engine.getRandom(name).setstate((state[0],tuple(state[1]),state[2]))
+    if checkpoint['numpyRandom'] is not None:
+        if getattr(engine.propagation,'numpyRandom',None) is not None:
+            state = checkpoint['numpyRandom']
+            engine.propagation.numpyRandom.set_state(
+                (str(state[0]),numpy.array(state[1],dtype=numpy.uint32),state[2],state[3],state[4])
+            )
+        else:
+            log.warning('checkpoint drew random numbers with NumPy, which is not installed')
+    
+    #=== locations and connections
+    
+    for mh in engine.moteHandlers:
+        (lat,lon) = checkpoint['motes'][str(mh.getId())]['location']
+        mh.setLocation(lat,lon)
+    
+    connections = {}
+    rxPowers    = {}
+    for (fromMote,toMote,pdr,rxPower) in checkpoint['connections']:
+        connections.setdefault(fromMote,{})[toMote] = pdr
+        connections.setdefault(toMote,{})[fromMote] = pdr
+        if rxPower is not None:
+            rxPowers.setdefault(fromMote,{})[toMote] = rxPower
+            rxPowers.setdefault(toMote,{})[fromMote] = rxPower
+    engine.propagation.setConnections(connections,rxPowers)
+    
+    #=== motes
+    
+    for mh in engine.moteHandlers:
+        moteState = checkpoint['motes'][str(mh.getId())]
+        for name in RESTORED_MODULES:
+            _setModuleState(getattr(mh,name),moteState['modules'][name])
+    
+    # the events of motes which had not booted, in reverse order so events at
+    # the same time keep their order
+    for (atTime,moteId,desc,moduleName,methodName) in reversed(checkpoint['events']):
+        if moteId is None or checkpoint['motes'][str(moteId)]['booted']:
+            continue
+        if moduleName is None:
+            log.warning('cannot restore event {0}@{1}'.format(desc,moteId))
+            continue
+        mh = engine.getMoteHandlerById(moteId)
+        engine.timeline.scheduleEvent(
+            atTime,
+            moteId,
+            getattr(getattr(mh,moduleName),methodName),
+            desc,
+        )
+    
+    # reboot the motes which had
+    numRebooted = 0
+    for mh in engine.moteHandlers:
+        if checkpoint['motes'][str(mh.getId())]['booted']:
+            engine.timeline.scheduleEvent(
+                currentTime,
+                mh.getId(),
+                mh.hwSupply.switchOn,
+                mh.hwSupply.INTR_SWITCHON
+            )
+            numRebooted += 1
+    
+    log.info('restored checkpoint at {0}s, {1} motes rebooted'.format(currentTime,numRebooted))
+
+def verify(engine,checkpoint):
+    '''
+    Compare the state of the engine with a checkpoint.
+    
+    :returns: A list of the names of the parts of the state which differ,
+        empty if the engine is in the state of the checkpoint.
+    '''
+    
+    # round-trip through JSON to compare like with like
+    current   = json.loads(json.dumps(capture(engine)))
+    
+    returnVal = []
+    for key in sorted(checkpoint.keys()):
+        if key=='motes':
+            for moteId in sorted(checkpoint['motes'].keys()):
+                if checkpoint['motes'][moteId]!=current['motes'].get(moteId):
+                    returnVal += ['motes.{0}'.format(moteId)]
+        elif checkpoint[key]!=current.get(key):
+            returnVal += [key]
+    return returnVal
+
+#============================ helpers =========================================
+
+def _getModuleNames(mh):
+    return sorted(
+        [name for name in vars(mh) if name.startswith('hw') or name.startswith('bsp')]
+    )
+
+def _getEventState(engine,event):
+    '''
+    :returns: [atTime,moteId,desc,moduleName,methodName], the module being the
+        attribute of the mote whose method the event calls, None if it is not
+        a method of one of the mote's modules.
+    '''
+    (moduleName,methodName) = (None,None)
+    if event.moteId is not None:
+        mh = engine.getMoteHandlerById(event.moteId)
+        for name in _getModuleNames(mh):
+            if getattr(event.cb,'__self__',None) is getattr(mh,name):
+                (moduleName,methodName) = (name,event.cb.__name__)
+                break
+    return [event.atTime,event.moteId,event.desc,moduleName,methodName]
+
+def _getModuleState(module):
+    returnVal = {}
+    for (name,value) in vars(module).items():
+        if isinstance(value,SIMPLE_TYPES):
+            returnVal[name] = value
+        elif isinstance(value,(list,tuple)) and all(isinstance(v,SIMPLE_TYPES) for v in value):
+            returnVal[name] = list(value)
+    return returnVal
+
+def _setModuleState(module,state):
+    for (name,value) in state.items():
+        if isinstance(value,unicode):
+            value = str(value)
+        setattr(module,str(name),value)
+
+def _jsonify(state):
+    if isinstance(state,tuple):
+        return [_jsonify(s) for s in state]
+    if numpy is not None and isinstance(state,numpy.ndarray):
+        return state.tolist()
+    return state
@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+import logging
+import time
+
+SPEED_FAST     = 'fast'
+SPEED_REALTIME = 'realtime'
+
+def create(speed):
+    '''
+    Module-based Factory method to create a clock from a speed setting.
+    
+    :param speed: SPEED_FAST to run as fast as possible, SPEED_REALTIME to
+                  run in real time, or a number (or its string
+                  representation) of simulated seconds per wall-clock second.
+    
+    :raises: ValueError if speed is not a valid setting.
+    '''
+    
+    if speed==SPEED_FAST:
+        return FreeRunningClock()
+    elif speed==SPEED_REALTIME:
+        return RatioClock(1.0)
+    else:
+        return RatioClock(float(speed))
+
+class SimClock(object):
+    '''
+    Paces the execution of the timeline against the wall clock.
+    
+    The timeline calls pace() after each event it executes. This class is
+    abstract, with concrete subclasses implementing the different pacing
+    policies.
+    '''
+    
+    def __init__(self):
+        
+        # logging
+        self.log                  = logging.getLogger('SimClock')
+        self.log.setLevel(logging.DEBUG)
+        self.log.addHandler(logging.NullHandler())
+    
+    #======================== public ==========================================
+    
+    def rebase(self,simTime):
+        '''
+        Realign the clock on the wall clock, e.g. after the engine resumes.
+        
+        :param simTime: The current simulated time.
+        '''
+        pass
+    
+    def pace(self,simTime):
+        '''
+        Called after each timeline event, possibly blocking the caller.
+        
+        :param simTime: The current simulated time.
+        '''
+        raise NotImplementedError()
+    
+    def getDescription(self):
+        raise NotImplementedError()
+
+class FreeRunningClock(SimClock):
+    '''
+    Runs the simulation as fast as possible.
+    '''
+    
+    def pace(self,simTime):
+        pass
+    
+    def getDescription(self):
+        return SPEED_FAST
+
+class DelayClock(SimClock):
+    '''
+    Sleeps a fixed wall-clock delay after each event.
+    '''
+    
+    def __init__(self,delay):
+        
+        # store params
+        self.delay                = delay
+        
+        # initialize the parent
+        SimClock.__init__(self)
+    
+    def pace(self,simTime):
+        time.sleep(self.delay)
+    
+    def getDescription(self):
+        return 'delay {0}s per event'.format(self.delay)
+
+class RatioClock(SimClock):
+    '''
+    Runs the simulation at a fixed ratio of simulated to wall-clock time.
+    
+    Rather than sleeping after each event, the clock only compares simulated
+    and wall-clock time once every SLEEP_QUANTUM wall-clock seconds' worth
+    of simulated time, and sleeps once for the whole batch of events.
+    '''
+    
+    SLEEP_QUANTUM = 0.010 # s
+    
+    def __init__(self,ratio):
+        
+        # filter error
+        if ratio<=0:
+            raise ValueError('ratio must be positive, got {0}'.format(ratio))
+        
+        # store params
+        self.ratio                = float(ratio)
+        
+        # local variables
+        self.simTimeStart         = None
+        self.wallTimeStart        = None
+        self.simTimeNextCheck     = None
+        self.numSleeps            = 0
+        
+        # initialize the parent
+        SimClock.__init__(self)
+    
+    #======================== public ==========================================
+    
+    def rebase(self,simTime):
+        self.simTimeStart         = simTime
+        self.wallTimeStart        = time.time()
+        self.simTimeNextCheck     = simTime+self.SLEEP_QUANTUM*self.ratio
+    
+    def pace(self,simTime):
+        
+        # start counting at the first event
+        if self.simTimeStart is None:
+            self.rebase(simTime)
+            return
+        
+        # only check the wall clock once per quantum of simulated time
+        if simTime<self.simTimeNextCheck:
+            return
+        self.simTimeNextCheck     = simTime+self.SLEEP_QUANTUM*self.ratio
+        
+        # sleep if the simulation is ahead of the wall clock
+        ahead = self.wallTimeStart+(simTime-self.simTimeStart)/self.ratio-time.time()
+        if ahead>0:
+            self.numSleeps       += 1
+            time.sleep(ahead)
+    
+    def getRatio(self):
+        return self.ratio
+    
+    def getNumSleeps(self):
+        return self.numSleeps
+    
+    def getDescription(self):
+        if self.ratio==1.0:
+            return SPEED_REALTIME
+        else:
+            return '{0}x'.format(self.ratio)
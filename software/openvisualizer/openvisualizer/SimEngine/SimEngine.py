@@ -8,8 +8,12 @@
 import threading
 import logging
 import time
+import random
+import hashlib
 
 import TimeLine
+import SimClock
+import MoteCpu
 import Propagation
 import IdManager
 import LocationManager
@@ -52,7 +56,7 @@ class SimEngine(object):
     
     #======================== main ============================================
     
-    def __init__(self,simTopology='',loghandler=logging.NullHandler()):
+    def __init__(self,simTopology='',loghandler=logging.NullHandler(),cpuModel=MoteCpu.CPU_THREAD,seed=None):
         
         # don't re-initialize an instance (singleton pattern)
         if self._init:
@@ -61,9 +65,16 @@ class SimEngine(object):
         
         # store params
         self.loghandler           = loghandler
+        self.cpuModel             = cpuModel
+        if seed is None:
+            seed                  = random.SystemRandom().randint(0,2**32-1)
+        self.seed                 = seed
         
         # local variables
+        self.randoms              = {}   # name -> random.Random, see getRandom()
         self.moteHandlers         = []
+        self.moteHandlersById     = {}
+        self.shard                = None # set when running as a shard of a sharded simulation
         self.timeline             = TimeLine.TimeLine()
         self.propagation          = Propagation.Propagation(simTopology)
         self.idmanager            = IdManager.IdManager()
@@ -71,7 +82,9 @@ class SimEngine(object):
         self.pauseSem             = threading.Lock()
         self.isPaused             = False
         self.stopAfterSteps       = None
-        self.delay                = 0
+        self.clock                = SimClock.FreeRunningClock()
+        self.betweenEvents        = []   # callbacks to call from the timeline, between two events
+        self.betweenEventsLock    = threading.Lock()
         self.stats                = SimEngineStats()
         
         # logging this module
@@ -83,7 +96,10 @@ class SimEngine(object):
         for loggerName in [
                 'SimEngine',
                 'Timeline',
+                'SimClock',
                 'Propagation',
+                'Medium',
+                'SimCheckpoint',
                 'IdManager',
                 'LocationManager',
                 'SimCli',
@@ -95,7 +111,7 @@ class SimEngine(object):
     def start(self):
         
         # log
-        self.log.info('starting')
+        self.log.info('starting, seed {0}'.format(self.seed))
         
         # start timeline
         self.timeline.start()
@@ -105,7 +121,24 @@ class SimEngine(object):
     #=== controlling execution speed
     
     def setDelay(self,delay):
-        self.delay = delay
+        if delay:
+            self.setClock(SimClock.DelayClock(delay))
+        else:
+            self.setClock(SimClock.FreeRunningClock())
+    
+    def setSpeed(self,speed):
+        '''
+        Set the execution speed, see SimClock.create() for valid values.
+        '''
+        self.setClock(SimClock.create(speed))
+    
+    def setClock(self,clock):
+        clock.rebase(self.timeline.getCurrentTime())
+        self.clock = clock
+        self.log.info('clock set to {0}'.format(clock.getDescription()))
+    
+    def getClock(self):
+        return self.clock
     
     def pause(self):
         if self.log.isEnabledFor(logging.DEBUG):
@@ -130,16 +163,29 @@ class SimEngine(object):
             self.isPaused = False
             self.stats.indicateStart()
     
+    def callBetweenEvents(self,cb):
+        '''
+        Have the timeline thread call a function after the event it is
+        executing, while no event is running.
+        '''
+        with self.betweenEventsLock:
+            self.betweenEvents += [cb]
+    
     def pauseOrDelay(self):
+        if self.betweenEvents:
+            with self.betweenEventsLock:
+                (cbs,self.betweenEvents) = (self.betweenEvents,[])
+            for cb in cbs:
+                cb()
         if self.isPaused:
             if self.log.isEnabledFor(logging.DEBUG):
                 self.log.debug('pauseOrDelay: pause')
             self.pauseSem.acquire()
             self.pauseSem.release()
+            # don't try to catch up with the time spent paused
+            self.clock.rebase(self.timeline.getCurrentTime())
         else:
-            if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('pauseOrDelay: delay {0}'.format(self.delay))
-            time.sleep(self.delay)
+            self.clock.pace(self.timeline.getCurrentTime())
             
         if self.stopAfterSteps is not None:
             if self.stopAfterSteps>0:
@@ -152,19 +198,45 @@ class SimEngine(object):
     def isRunning(self):
         return not self.isPaused
     
+    #=== random numbers
+    
+    def getSeed(self):
+        return self.seed
+    
+    def getRandom(self,name):
+        '''
+        Get the random number generator of a subsystem.
+        
+        Each subsystem draws from its own stream, seeded from the engine's
+        seed and the subsystem's name, so that a change in how often one
+        subsystem draws does not change the numbers another one gets.
+        
+        :param name: The name of the subsystem.
+        
+        :returns: A random.Random instance.
+        '''
+        if name not in self.randoms:
+            self.randoms[name] = random.Random(
+                int(hashlib.md5('{0}:{1}'.format(self.seed,name)).hexdigest(),16)
+            )
+        return self.randoms[name]
+    
     #=== called from the main script
     
-    def indicateNewMote(self,newMoteHandler):
+    def indicateNewMote(self,newMoteHandler,createConnections=True):
         
         # add this mote to my list of motes
         self.moteHandlers.append(newMoteHandler)
+        self.moteHandlersById[newMoteHandler.getId()] = newMoteHandler
+        
+        # connections are set by the caller, e.g. for a shard
+        if not createConnections:
+            return
         
         # create connections to already existing motes
-        for mh in self.moteHandlers[:-1]:
-            self.propagation.createConnection(
-                fromMote     = newMoteHandler.getId(),
-                toMote       = mh.getId(),
-            )
+        (lat,lon) = newMoteHandler.getLocation()
+        self.propagation.setLocation(newMoteHandler.getId(),lat,lon)
+        self.propagation.createConnections(newMoteHandler.getId())
     
     #=== called from timeline
     
@@ -180,17 +252,24 @@ class SimEngine(object):
         return self.moteHandlers[rank]
     
     def getMoteHandlerById(self,moteId):
-        returnVal = None
-        for h in self.moteHandlers:
-            if h.getId()==moteId:
-                returnVal = h
-                break
+        returnVal = self.moteHandlersById.get(moteId)
         assert returnVal
         return returnVal
     
     def getStats(self):
         return self.stats
     
+    def getHandoffsPerSecond(self):
+        '''
+        Returns the rate at which the timeline hands the CPU over to the
+        motes' task-mode code, over the time the engine has been running.
+        '''
+        durationRunning = self.stats.getDurationRunning()
+        if not durationRunning:
+            return 0.0
+        numHandoffs     = sum([mh.getNumHandoffs() for mh in self.moteHandlers])
+        return numHandoffs/durationRunning
+    
     #======================== private =========================================
     
     #======================== helpers =========================================
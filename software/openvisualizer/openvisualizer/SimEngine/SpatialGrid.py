@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+
+from math import cos, sin, floor
+
+class SpatialGrid(object):
+    '''
+    Finds the motes within a given range of a mote, without looking at all
+    the others.
+    
+    Locations are mapped onto a sphere of radius earthRadius, in cartesian
+    coordinates, which are divided in cubic cells of the size of the range.
+    The straight-line distance between two points on the sphere being no
+    larger than their great-circle distance, the motes within range of a
+    mote are all in its cell or in one of the 26 adjacent ones.
+    '''
+    
+    def __init__(self,cellSize,earthRadius):
+        
+        assert cellSize>0
+        
+        # store params
+        self.cellSize             = float(cellSize)
+        self.earthRadius          = earthRadius
+        
+        # local variables
+        self.cells                = {}   # cell -> set of moteIds
+        self.cellOfMote           = {}   # moteId -> cell
+    
+    #======================== public ==========================================
+    
+    def setLocation(self,moteId,lat,lon):
+        '''
+        Add a mote, or move it.
+        
+        :param moteId: The id of the mote.
+        :param lat:    Its latitude, in radians.
+        :param lon:    Its longitude, in radians.
+        '''
+        
+        cell    = self._getCell(lat,lon)
+        oldCell = self.cellOfMote.get(moteId)
+        if cell==oldCell:
+            return
+        
+        if oldCell is not None:
+            self.cells[oldCell].discard(moteId)
+            if not self.cells[oldCell]:
+                del self.cells[oldCell]
+        
+        self.cells.setdefault(cell,set()).add(moteId)
+        self.cellOfMote[moteId] = cell
+    
+    def getCandidates(self,moteId):
+        '''
+        :returns: The ids of the motes which might be within range of the
+            given mote, excluding itself.
+        '''
+        
+        (x,y,z)   = self.cellOfMote[moteId]
+        returnVal = []
+        for dx in (-1,0,1):
+            for dy in (-1,0,1):
+                for dz in (-1,0,1):
+                    returnVal += self.cells.get((x+dx,y+dy,z+dz),())
+        returnVal.remove(moteId)
+        return returnVal
+    
+    #======================== private =========================================
+    
+    def _getCell(self,lat,lon):
+        return (
+            int(floor(self.earthRadius*cos(lat)*cos(lon)/self.cellSize)),
+            int(floor(self.earthRadius*cos(lat)*sin(lon)/self.cellSize)),
+            int(floor(self.earthRadius*sin(lat)/self.cellSize)),
+        )
@@ -7,6 +7,8 @@
 
 import logging
 import threading
+import heapq
+import itertools
 
 import SimEngine
 
@@ -15,8 +17,8 @@ class TimeLineStats(object):
     def __init__(self):
         self.numEvents  = 0
         
-    def incrementEvents(self):
-        self.numEvents += 1
+    def incrementEvents(self,numEvents=1):
+        self.numEvents += numEvents
     
     def getNumEvents(self):
         return self.numEvents
@@ -35,6 +37,19 @@ class TimeLineEvent(object):
 class TimeLine(threading.Thread):
     '''
     The timeline of the engine.
+    
+    Upcoming events are stored in a binary heap of [atTime,-seqNum,event]
+    entries. Events scheduled for the same time are executed in reverse
+    scheduling order, i.e. the most recently scheduled one first.
+    
+    Each pending event is also indexed by its (moteId,desc) key. Replacing
+    or canceling an event only marks its heap entry as removed; removed
+    entries are skipped when popped, and purged when they outnumber the
+    pending events.
+    
+    Events are scheduled from other threads than the timeline's, e.g. by
+    the BspUart of a mote when its moteProbe writes to it, so the heap and
+    the index are only accessed with dataLock held.
     '''
     
     def __init__(self):
@@ -44,7 +59,11 @@ class TimeLine(threading.Thread):
         
         # local variables
         self.currentTime          = 0   # current time
-        self.timeline             = []  # list of upcoming events
+        self.timeline             = []  # heap of upcoming event entries
+        self.eventIndex           = {}  # (moteId,desc) -> entry in the heap
+        self.numRemoved           = 0   # number of removed entries in the heap
+        self.seqNum               = itertools.count()
+        self.dataLock             = threading.Lock()
         self.firstEventPassed     = False
         self.firstEvent           = threading.Lock()
         self.firstEvent.acquire()
@@ -87,34 +106,19 @@ class TimeLine(threading.Thread):
         
         while True:
             
+            # pop the event at the head of the timeline
+            event = self._popEvent()
+            
             # detect the end of the simulation
-            if len(self.timeline)==0:
+            if event is None:
                 output  = ''
                 output += 'end of simulation reached\n'
                 output += ' - currentTime='+str(self.getCurrentTime())+'\n'
                 self.log.warning(output)
                 raise StopIteration(output)
             
-            # pop the event at the head of the timeline
-            event = self.timeline.pop(0)
-            
-            # make sure that this event is later in time than the previous
-            assert(self.currentTime<=event.atTime)
-            
-            # record the current time
-            self.currentTime = event.atTime
-            
-            # log
-            if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('\n\nnow {0:.6f}, executing {1}@{2}'.format(event.atTime,
-                                                                       event.desc,
-                                                                       event.moteId,))
-            
-            # call the event's callback
-            self.engine.getMoteHandlerById(event.moteId).handleEvent(event.cb)
-            
-            # update statistics
-            self.stats.incrementEvents()
+            # execute the event
+            self._executeEvent(event)
             
             # apply the delay
             self.engine.pauseOrDelay()
@@ -124,6 +128,51 @@ class TimeLine(threading.Thread):
     def getCurrentTime(self):
         return self.currentTime
     
+    def setCurrentTime(self,currentTime):
+        '''
+        Move the current time forward without executing any event.
+        
+        Used when the events are executed elsewhere, e.g. by the shards of a
+        sharded simulation.
+        '''
+        assert self.currentTime<=currentTime
+        self.currentTime = currentTime
+    
+    def getNextEventTime(self):
+        '''
+        :returns: The time of the earliest pending event, or None if the
+            timeline is empty.
+        '''
+        with self.dataLock:
+            while self.timeline and self.timeline[0][2] is None:
+                heapq.heappop(self.timeline)
+                self.numRemoved -= 1
+            if self.timeline:
+                return self.timeline[0][0]
+            return None
+    
+    def runUntil(self,endTime):
+        '''
+        Execute, in the calling thread, all events scheduled strictly before
+        endTime, including those they schedule themselves.
+        
+        This is an alternative to running the timeline as a thread, used by
+        the shards of a sharded simulation.
+        
+        :param endTime: The time at which to stop.
+        
+        :returns:       The number of events executed.
+        '''
+        
+        numEvents = 0
+        while True:
+            nextEventTime = self.getNextEventTime()
+            if nextEventTime is None or nextEventTime>=endTime:
+                break
+            self._executeEvent(self._popEvent())
+            numEvents += 1
+        return numEvents
+    
     def scheduleEvent(self,atTime,moteId,cb,desc):
         '''
         Add an event into the timeline
@@ -151,23 +200,15 @@ class TimeLine(threading.Thread):
         # create a new event
         newEvent = TimeLineEvent(moteId,atTime,cb,desc)
         
-        # remove any event already in the queue with same description
-        for i in range(len(self.timeline)):
-            if (self.timeline[i].moteId==moteId and
-                self.timeline[i].desc==desc):
-                self.timeline.pop(i)
-                break
-        
-        # look for where to put this event
-        i = 0
-        while i<len(self.timeline):
-            if newEvent.atTime>self.timeline[i].atTime:
-               i += 1
-            else:
-               break
-        
-        # insert the new event
-        self.timeline.insert(i,newEvent)
+        with self.dataLock:
+            
+            # remove any event already in the queue with same description
+            self._removeEntry((moteId,desc))
+            
+            # insert the new event
+            entry    = [atTime,-next(self.seqNum),newEvent]
+            self.eventIndex[(moteId,desc)] = entry
+            heapq.heappush(self.timeline,entry)
         
         # start the timeline, if applicable
         with self.firstEventLock:
@@ -188,35 +229,105 @@ class TimeLine(threading.Thread):
         if self.log.isEnabledFor(logging.DEBUG):
             self.log.debug('cancelEvent {0}@{1}'.format(desc,moteId))
         
-        # initialize return variable
-        numEventsCanceled = 0
-        
-        # remove any event already the queue with same description
-        i = 0
-        while i<len(self.timeline):
-            if (
-                  self.timeline[i].moteId==moteId and
-                  self.timeline[i].desc==desc
-               ):
-                self.timeline.pop(i)
-                numEventsCanceled += 1
-            else:
-                i += 1
+        # remove the event already in the queue with same description, if any
+        with self.dataLock:
+            removed = self._removeEntry((moteId,desc))
+        if removed:
+            numEventsCanceled = 1
+        else:
+            numEventsCanceled = 0
         
         # return the number of events canceled
         return numEventsCanceled
         
     def getEvents(self):
-        return [[ev.atTime,ev.moteId,ev.desc] for ev in self.timeline]
+        return [[ev.atTime,ev.moteId,ev.desc] for ev in self._getPendingEvents()]
+    
+    def getPendingEvents(self):
+        '''
+        :returns: The pending TimeLineEvent instances, in execution order.
+        '''
+        return self._getPendingEvents()
     
     def getStats(self):
         return self.stats
     
     #======================== private =========================================
     
+    def _executeEvent(self,event):
+        
+        # make sure that this event is later in time than the previous
+        assert(self.currentTime<=event.atTime)
+        
+        # record the current time
+        self.currentTime = event.atTime
+        
+        # log
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('\n\nnow {0:.6f}, executing {1}@{2}'.format(event.atTime,
+                                                                   event.desc,
+                                                                   event.moteId,))
+        
+        # call the event's callback
+        if event.moteId is None:
+            # event of the engine itself, not run on a mote
+            event.cb()
+        else:
+            self.engine.getMoteHandlerById(event.moteId).handleEvent(event.cb)
+        
+        # update statistics
+        self.stats.incrementEvents()
+    
+    def _popEvent(self):
+        '''
+        Pop the next pending event off the heap.
+        
+        :returns: The earliest pending event, or None if the timeline is empty.
+        '''
+        
+        with self.dataLock:
+            while self.timeline:
+                (atTime,negSeqNum,event) = heapq.heappop(self.timeline)
+                if event is None:
+                    # entry was removed while in the heap
+                    self.numRemoved -= 1
+                    continue
+                del self.eventIndex[(event.moteId,event.desc)]
+                return event
+            return None
+    
+    def _removeEntry(self,key):
+        '''
+        Mark the heap entry of the event identified by key as removed. Must
+        be called with dataLock held.
+        
+        :param key: The (moteId,desc) tuple identifying the event.
+        
+        :returns:   True if an event was removed, False otherwise.
+        '''
+        
+        entry = self.eventIndex.pop(key,None)
+        if entry is None:
+            return False
+        
+        entry[2]         = None
+        self.numRemoved += 1
+        
+        # purge removed entries when they make up most of the heap
+        if self.numRemoved>len(self.eventIndex):
+            self.timeline   = self.eventIndex.values()
+            heapq.heapify(self.timeline)
+            self.numRemoved = 0
+        
+        return True
+    
+    def _getPendingEvents(self):
+        with self.dataLock:
+            return [entry[2] for entry in sorted(self.eventIndex.values())]
+    
     def _printTimeline(self):
         output  = ''
-        for event in self.timeline:
+        for event in self._getPendingEvents():
             output += '\n'+str(event)
         return output
     
@@ -0,0 +1,73 @@
+'''
+This is a performance test which measures the rate at which the timeline can
+hand the CPU over to the task-mode code of emulated motes, for each execution
+model in MoteCpu.
+
+The emulated motes are replaced by a dummy mote which goes back to sleep
+immediately each time it is kicked.
+
+Run this test with 'python bench_MoteCpu.py [numMotes] [numHandoffs]'. By
+default, it hands the CPU over 100000 times, spread over 200 motes.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # SimEngine/
+
+import threading
+import time
+
+import MoteCpu
+
+#============================ defines =========================================
+
+NUM_MOTES     = 200
+NUM_HANDOFFS  = 100000
+
+#============================ helpers =========================================
+
+class DummyMoteHandler(threading.Thread):
+    '''
+    Stands in for a MoteHandler whose mote sleeps as soon as it is kicked.
+    '''
+    
+    def __init__(self,cpuModel):
+        self.cpu = MoteCpu.create(cpuModel,self)
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+    
+    def run(self):
+        while True:
+            self.cpu.sleep()
+
+#============================ main ============================================
+
+def main(numMotes=NUM_MOTES,numHandoffs=NUM_HANDOFFS):
+    
+    for cpuModel in MoteCpu.CPU_ALL:
+        
+        try:
+            motehandlers = [DummyMoteHandler(cpuModel) for _ in range(numMotes)]
+        except ImportError as err:
+            print '{0:<10} skipped ({1})'.format(cpuModel,err)
+            continue
+        
+        for mh in motehandlers:
+            mh.cpu.boot()
+        
+        start = time.time()
+        for i in range(numHandoffs):
+            motehandlers[i%numMotes].cpu.kick()
+        duration = time.time()-start
+        
+        assert sum([mh.cpu.getNumHandoffs() for mh in motehandlers])==numHandoffs
+        
+        print '{0:<10} {1} handoffs over {2} motes in {3:.3f}s ({4:.0f} handoffs/s)'.format(
+            cpuModel,numHandoffs,numMotes,duration,numHandoffs/duration,
+        )
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
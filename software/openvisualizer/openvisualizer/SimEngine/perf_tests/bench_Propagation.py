@@ -0,0 +1,70 @@
+'''
+This is a performance test which measures the cost of the propagation model:
+creating the connections of a large number of randomly placed motes, as done
+when they are added to the engine, then drawing which neighbors receive each
+transmitted frame.
+
+Run this test with 'python bench_Propagation.py [numMotes] [numFrames] [spreadM]'.
+By default, it places 1000 motes in a 100m square, as the LocationManager
+does, then draws the receivers of 100000 frames. With a larger spread, most
+pairs of motes are out of range of each other.
+The vectorized code paths are only used if NumPy is installed.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # SimEngine/
+
+import random
+import time
+
+import SimEngine
+
+#============================ defines =========================================
+
+NUM_MOTES     = 1000
+NUM_FRAMES    = 100000
+SPREAD_M      = 100
+M_PER_DEGREE  = 111000.0
+
+#============================ main ============================================
+
+def main(numMotes=NUM_MOTES,numFrames=NUM_FRAMES,spreadM=SPREAD_M):
+    
+    engine      = SimEngine.SimEngine()
+    propagation = engine.propagation
+    
+    random.seed(0)
+    
+    # place the motes and create their connections
+    start = time.time()
+    for moteId in range(1,numMotes+1):
+        lat = 37.875095+random.random()*spreadM/M_PER_DEGREE
+        lon = -122.257473+random.random()*spreadM/M_PER_DEGREE
+        propagation.setLocation(moteId,lat,lon)
+        propagation.createConnections(moteId)
+    durationCreate   = time.time()-start
+    numConnections   = len(propagation.retrieveConnections())
+    
+    # draw the receivers of frames sent by random motes
+    start = time.time()
+    numReceptions = 0
+    for _ in range(numFrames):
+        numReceptions += len(propagation._drawReceivers(random.randint(1,numMotes)))
+    durationDraw     = time.time()-start
+    
+    output  = []
+    output += ['numpy     {0}'.format('yes' if SimEngine.Propagation.numpy else 'no')]
+    output += ['created   {0} connections between {1} motes over {2}m in {3:.3f}s'.format(
+        numConnections,numMotes,spreadM,durationCreate,
+    )]
+    output += ['drew      {0} receptions of {1} frames in {2:.3f}s ({3:.0f} frames/s)'.format(
+        numReceptions,numFrames,durationDraw,numFrames/durationDraw,
+    )]
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,159 @@
+'''
+This is a performance test which compares running emulated motes in a single
+process with spreading them over shards.
+
+The emulated motes are replaced by a busy mote which wakes up once per slot
+and spins for a fixed CPU time, standing in for the firmware. The test
+reports, for one process and for the shards, the wall-clock time needed to
+simulate the same duration, and the synchronization cost of the shards: each
+window of the lookahead (214us of simulated time) costs one pipe round-trip
+per shard, whether or not the shards have events to run in it.
+
+Run this test with
+'python bench_Shard.py [numMotes] [numShards] [eventCostUs] [durationMs]'. By
+default, it simulates 2s of 500 motes spinning 50us per slot, over 4 shards.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # SimEngine/
+
+import threading
+import multiprocessing
+import random
+import time
+
+from openvisualizer.SimEngine import SimEngine
+from openvisualizer.SimEngine import ShardCoordinator
+
+#============================ defines =========================================
+
+NUM_MOTES     = 500
+NUM_SHARDS    = 4
+EVENT_COST_US = 50
+DURATION_MS   = 2000
+SLOT_DURATION = 0.015 # s
+
+#============================ helpers =========================================
+
+class BusyUart(object):
+    
+    def read(self):
+        # the busy mote never writes to its UART
+        threading.Event().wait()
+
+class BusySupply(object):
+    
+    INTR_SWITCHON = 'hw_supply.switchOn'
+    
+    def __init__(self,mote):
+        self.mote = mote
+    
+    def switchOn(self):
+        self.mote.scheduleTick(random.Random(self.mote.getId()).random()*SLOT_DURATION)
+
+class BusyMote(object):
+    '''
+    Stands in for a MoteHandler whose firmware wakes up once per slot, and
+    spins for eventCost seconds each time, until endTime.
+    '''
+    
+    def __init__(self,moteId,eventCost,endTime):
+        self.id          = moteId
+        self.eventCost   = eventCost
+        self.endTime     = endTime
+        self.timeline    = SimEngine.SimEngine().timeline
+        self.bspUart     = BusyUart()
+        self.hwSupply    = BusySupply(self)
+    
+    def getId(self):
+        return self.id
+    
+    def getNumHandoffs(self):
+        return 0
+    
+    def handleEvent(self,functionToCall):
+        functionToCall()
+    
+    def scheduleTick(self,atTime):
+        if atTime<self.endTime:
+            self.timeline.scheduleEvent(atTime,self.id,self.tick,'tick')
+    
+    def tick(self):
+        end = time.time()+self.eventCost
+        while time.time()<end:
+            pass
+        self.scheduleTick(self.timeline.getCurrentTime()+SLOT_DURATION)
+
+class BusyMoteFactory(object):
+    
+    def __init__(self,eventCost,endTime):
+        self.eventCost   = eventCost
+        self.endTime     = endTime
+    
+    def __call__(self,moteId):
+        return BusyMote(moteId,self.eventCost,self.endTime)
+
+def runSingleProcess(numMotes,moteFactory,endTime,results):
+    
+    engine = SimEngine.SimEngine()
+    for moteId in range(1,numMotes+1):
+        mote = moteFactory(moteId)
+        engine.indicateNewMote(mote,createConnections=False)
+        engine.timeline.scheduleEvent(0,moteId,mote.hwSupply.switchOn,mote.hwSupply.INTR_SWITCHON)
+    
+    start     = time.time()
+    numEvents = engine.timeline.runUntil(endTime)
+    results.put((time.time()-start,numEvents))
+
+#============================ main ============================================
+
+def main(numMotes=NUM_MOTES,numShards=NUM_SHARDS,eventCostUs=EVENT_COST_US,durationMs=DURATION_MS):
+    
+    endTime     = durationMs/1000.0
+    moteFactory = BusyMoteFactory(eventCostUs/1000000.0,endTime)
+    
+    # fork all processes first, before this one starts any thread
+    results     = multiprocessing.Queue()
+    single      = multiprocessing.Process(
+        target  = runSingleProcess,
+        args    = (numMotes,moteFactory,endTime,results),
+    )
+    shards      = ShardCoordinator.forkShards(numShards)
+    
+    #=== one process
+    
+    single.start()
+    (duration,numEvents) = results.get()
+    single.join()
+    print '{0:<10} {1} events in {2:.3f}s ({3:.2f} simulated s per s)'.format(
+        '1 process',numEvents,duration,endTime/duration,
+    )
+    
+    #=== shards
+    
+    coordinator = ShardCoordinator.ShardCoordinator(
+        shards        = shards,
+        simFilesPath  = None,
+        headerPath    = None,
+        moteFactory   = moteFactory,
+    )
+    for _ in range(numMotes):
+        coordinator.createMote()
+    
+    start       = time.time()
+    coordinator.start()
+    coordinator.join()
+    duration    = time.time()-start
+    
+    numEvents   = coordinator.engine.timeline.getStats().getNumEvents()
+    numWindows  = coordinator.getNumWindows()
+    print '{0:<10} {1} events in {2:.3f}s ({3:.2f} simulated s per s), {4} windows, {5:.0f}us per window'.format(
+        '{0} shards'.format(numShards),numEvents,duration,endTime/duration,numWindows,1000000*duration/numWindows,
+    )
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
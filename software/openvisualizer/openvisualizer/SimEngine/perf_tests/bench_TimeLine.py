@@ -0,0 +1,85 @@
+'''
+This is a performance test which measures the cost of the operations of the
+TimeLine: scheduling a large number of events, some of which replace or
+cancel an already-pending event, then executing them in order.
+
+Run this test with 'python bench_TimeLine.py [numEvents] [numMotes] [numDescs]'.
+By default, it schedules 1000000 events over 100 motes, each mote using 1000
+different event descriptions.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # SimEngine/
+
+import random
+import time
+
+import SimEngine
+
+#============================ defines =========================================
+
+NUM_EVENTS    = 1000000
+NUM_MOTES     = 100
+NUM_DESCS     = 1000
+
+#============================ helpers =========================================
+
+def _dummyCb():
+    pass
+
+#============================ main ============================================
+
+def main(numEvents=NUM_EVENTS,numMotes=NUM_MOTES,numDescs=NUM_DESCS):
+    
+    timeline = SimEngine.SimEngine().timeline
+    
+    random.seed(0)
+    descs    = ['event_{0}'.format(i) for i in range(numDescs)]
+    schedule = [
+        (
+            random.random(),
+            random.randint(1,numMotes),
+            random.choice(descs),
+        ) for _ in range(numEvents)
+    ]
+    
+    # schedule (a fraction of which replace pending events)
+    start = time.time()
+    for (atTime,moteId,desc) in schedule:
+        timeline.scheduleEvent(atTime,moteId,_dummyCb,desc)
+    durationSchedule = time.time()-start
+    numPending       = len(timeline.getEvents())
+    
+    # cancel half of the pending events
+    start = time.time()
+    numCanceled = 0
+    for moteId in range(1,numMotes+1,2):
+        for desc in descs:
+            numCanceled += timeline.cancelEvent(moteId,desc)
+    durationCancel   = time.time()-start
+    
+    # pop the remaining events
+    start = time.time()
+    numPopped = 0
+    while timeline._popEvent() is not None:
+        numPopped += 1
+    durationPop      = time.time()-start
+    
+    output  = []
+    output += ['scheduled {0} events in {1:.3f}s ({2:.0f} events/s), {3} pending'.format(
+        numEvents,durationSchedule,numEvents/durationSchedule,numPending,
+    )]
+    output += ['canceled  {0} events in {1:.3f}s'.format(
+        numCanceled,durationCancel,
+    )]
+    output += ['popped    {0} events in {1:.3f}s ({2:.0f} events/s)'.format(
+        numPopped,durationPop,numPopped/durationPop,
+    )]
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import json
+
+import pytest
+
+import Medium
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_Medium.log'
+
+import logging
+log = logging.getLogger('test_Medium')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_Medium',
+                   'Medium',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+# power in dBm at which the receiver (mote 1) hears each transmitter
+RX_POWER_dBm = {
+    2: -60.0,
+    3: -60.0,
+    4: -90.0,
+}
+
+#============================ fixtures ========================================
+
+SCENARIOS = [
+    # (fromMote,channel) transmissions, in order     expected crcPasses of the frame from 2
+    json.dumps(([(2,11)],                            True)),
+    json.dumps(([(2,11),(3,11)],                     False)),   # same power, same channel
+    json.dumps(([(3,11),(2,11)],                     False)),   # interferer started first
+    json.dumps(([(2,11),(3,12)],                     True)),    # different channel
+    json.dumps(([(2,11),(4,11)],                     True)),    # much weaker interferer
+    json.dumps(([(2,11),(5,11)],                     True)),    # interferer not heard
+]
+
+@pytest.fixture(params=SCENARIOS)
+def scenario(request):
+    return request.param
+
+@pytest.fixture
+def medium():
+    return Medium.Medium(_getRxPower)
+
+#============================ helpers =========================================
+
+def _getRxPower(fromMote,toMote):
+    if toMote!=1 or fromMote not in RX_POWER_dBm:
+        return 0.0
+    return 10**(RX_POWER_dBm[fromMote]/10)
+
+#============================ tests ===========================================
+
+def test_interference(medium,scenario):
+    
+    (transmissions,expected) = json.loads(scenario)
+    
+    for (fromMote,channel) in transmissions:
+        if fromMote==2:
+            receivers = [1]
+        else:
+            receivers = []
+        medium.indicateTxStart(fromMote,channel,receivers)
+    
+    assert medium.isReceiving(1,11)
+    assert medium.indicateTxEnd(2)==[(1,expected)]
+    assert not medium.isReceiving(1,11)
+    assert medium.getNumCorrupted()==(0 if expected else 1)
+
+def test_interferenceEnded(medium):
+    
+    # an interferer which stopped before the frame started does not matter
+    medium.indicateTxStart(3,11,[])
+    assert medium.indicateTxEnd(3)==[]
+    medium.indicateTxStart(2,11,[1])
+    assert medium.indicateTxEnd(2)==[(1,True)]
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+import MoteCpu
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_MoteCpu.log'
+
+import logging
+log = logging.getLogger('test_MoteCpu')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_MoteCpu',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ fixtures ========================================
+
+@pytest.fixture(params=MoteCpu.CPU_ALL)
+def cpuModel(request):
+    if request.param==MoteCpu.CPU_GREENLET:
+        pytest.importorskip('greenlet')
+    return request.param
+
+#============================ helpers =========================================
+
+class _DummyMote(threading.Thread):
+    '''
+    Stands in for a MoteHandler whose firmware runs its scheduler once, then
+    goes to sleep, each time it is woken up.
+    '''
+    
+    def __init__(self,cpuModel):
+        
+        # local variables
+        self.cpu             = MoteCpu.create(cpuModel,self)
+        self.numRuns         = 0
+        self.runner          = None
+        
+        # initialize the parent
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+    
+    def run(self):
+        while True:
+            self.numRuns    += 1
+            self.runner      = threading.current_thread()
+            self.cpu.sleep()
+
+#============================ tests ===========================================
+
+def test_handoff(cpuModel):
+    
+    mote = _DummyMote(cpuModel)
+    
+    # boot returns once the mote first sleeps
+    mote.cpu.boot()
+    assert mote.numRuns==1
+    assert mote.cpu.getNumHandoffs()==0
+    
+    # each kick runs the mote until it sleeps again
+    for i in range(10):
+        mote.cpu.kick()
+        assert mote.numRuns==i+2
+    assert mote.cpu.getNumHandoffs()==10
+    
+    # a thread CPU runs the mote in its own thread, a greenlet in the caller's
+    if cpuModel==MoteCpu.CPU_THREAD:
+        assert mote.runner is mote
+    else:
+        assert mote.runner is threading.current_thread()
+
+def test_createInvalid():
+    
+    with pytest.raises(NotImplementedError):
+        MoteCpu.create('coroutine',None)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import json
+from math import radians, log10
+
+import pytest
+
+import SimEngine
+import SpatialGrid
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_Propagation.log'
+
+import logging
+log = logging.getLogger('test_Propagation')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_Propagation',
+                   'Propagation',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+LAT = 37.875095
+LON = -122.257473
+
+#============================ fixtures ========================================
+
+EXPECTEDCONNECTIONS = [
+    # simTopology        expected connections between motes 1..4 on a line
+    json.dumps(('linear',          [[1,2],[2,3],[3,4]])),
+    json.dumps(('fully-meshed',    [[1,2],[1,3],[1,4],[2,3],[2,4],[3,4]])),
+]
+
+@pytest.fixture(params=EXPECTEDCONNECTIONS)
+def expectedConnections(request):
+    return request.param
+
+#============================ helpers =========================================
+
+def _addMotes(propagation,locations):
+    for (moteId,(lat,lon)) in enumerate(locations,1):
+        propagation.setLocation(moteId,lat,lon)
+        propagation.createConnections(moteId)
+
+def _getLinks(propagation):
+    return sorted(
+        sorted([c['fromMote'],c['toMote']]) for c in propagation.retrieveConnections()
+    )
+
+#============================ tests ===========================================
+
+def test_topology(expectedConnections):
+    
+    (simTopology,expected) = json.loads(expectedConnections)
+    
+    propagation = SimEngine.Propagation.Propagation(simTopology)
+    _addMotes(propagation,[(LAT,LON+0.0001*i) for i in range(4)])
+    
+    assert _getLinks(propagation)==expected
+
+def test_pisterHack():
+    
+    propagation = SimEngine.Propagation.Propagation('')
+    
+    # motes 1m apart are always connected, motes 100km apart never are
+    _addMotes(propagation,[(LAT,LON),(LAT+0.00001,LON),(LAT+1,LON)])
+    
+    assert _getLinks(propagation)==[[1,2]]
+    assert propagation.connections[1][2]==1.0
+
+def test_move():
+    
+    propagation = SimEngine.Propagation.Propagation('')
+    _addMotes(propagation,[(LAT,LON),(LAT+0.00001,LON)])
+    assert _getLinks(propagation)==[[1,2]]
+    
+    # moving a mote out of range removes its connection
+    propagation.setLocation(2,LAT+1,LON)
+    propagation.recomputeConnections(2)
+    assert _getLinks(propagation)==[]
+
+def test_drawReceivers():
+    
+    propagation = SimEngine.Propagation.Propagation('')
+    propagation.updateConnection(1,2,1.0)
+    propagation.updateConnection(1,3,1.0)
+    propagation.updateConnection(1,4,0.0)
+    
+    for _ in range(100):
+        assert sorted(propagation._drawReceivers(1))==[2,3]
+    assert propagation._drawReceivers(5)==[]
+
+def test_spatialGrid():
+    
+    grid = SpatialGrid.SpatialGrid(1.0,6367.0)
+    
+    # motes 500m, 1.5km and 100km north of mote 1
+    for (moteId,dLat) in [(1,0),(2,0.0045),(3,0.0135),(4,0.9)]:
+        grid.setLocation(moteId,radians(LAT+dLat),radians(LON))
+    
+    assert 2 in grid.getCandidates(1)
+    assert 4 not in grid.getCandidates(1)
+    assert 1 not in grid.getCandidates(1)
+    
+    # moving a mote only updates its own cell
+    grid.setLocation(4,radians(LAT),radians(LON))
+    assert 4 in grid.getCandidates(1)
+    assert sorted(sum([list(m) for m in grid.cells.values()],[]))==[1,2,3,4]
+
+def test_outOfRange():
+    
+    propagation = SimEngine.Propagation.Propagation('')
+    
+    # only the first mote is within radio range of the others
+    _addMotes(propagation,[(LAT,LON)]+[(LAT+0.00001,LON+i) for i in range(10)])
+    
+    assert _getLinks(propagation)==[[1,2]]
+    assert sorted(propagation.grid.getCandidates(1))==[2]
+
+def test_vectorizedMatchesScalar():
+    
+    numpy = pytest.importorskip('numpy')
+    
+    propagation = SimEngine.Propagation.Propagation('')
+    
+    # no random loss, so that both paths compute the same PDRs
+    propagation.PISTER_HACK_LOSS = 0.0
+    
+    # more motes than the location arrays initially hold, from 0 to ~1.2km
+    numMotes = 2*propagation.INITIAL_CAPACITY+1
+    for moteId in range(1,numMotes+1):
+        propagation.setLocation(moteId,LAT+0.0001*(moteId-1),LON)
+    assert len(propagation.lats)>=numMotes
+    
+    toMotes  = range(1,numMotes+1)
+    expected = [
+        propagation._pisterHackLink(
+            radians(LAT),radians(LON),
+            radians(LAT+0.0001*(toMote-1)),radians(LON),
+        ) for toMote in toMotes
+    ]
+    (pdrs,rxPowers) = propagation._computePisterHackLinks(1,toMotes)
+    
+    assert 0.0 in expected and 1.0 in expected and any(0<pdr<1 for (pdr,_) in expected)
+    assert numpy.allclose(pdrs,    [pdr for (pdr,_) in expected])
+    assert numpy.allclose(rxPowers,[Prx for (_,Prx) in expected])
+
+def test_rxPower():
+    
+    propagation = SimEngine.Propagation.Propagation('')
+    propagation.PISTER_HACK_LOSS = 0.0
+    
+    # motes 10m and 100m from mote 1 both have a perfect link to it...
+    _addMotes(propagation,[(LAT,LON),(LAT+0.0001,LON),(LAT+0.001,LON)])
+    assert propagation.connections[1][2]==propagation.connections[1][3]==1.0
+    
+    # ...but the closer one is heard 20dB louder, enough to capture the receiver
+    assert abs(10*log10(propagation._getRxPower(2,1)/propagation._getRxPower(3,1))-20)<0.1
+    
+    # a PDR set by hand is mapped onto the grey area
+    propagation.updateConnection(1,2,0.5)
+    assert abs(10*log10(propagation._getRxPower(1,2))-(propagation.SENSITIVITY_dBm+0.5*propagation.GREY_AREA_dB))<1e-9
+    
+    propagation.deleteConnection(1,3)
+    assert propagation._getRxPower(1,3)==0.0
+    assert 1 not in propagation.rxPowers
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import json
+import threading
+import Queue
+
+import pytest
+
+from openvisualizer.SimEngine   import SimEngine
+from openvisualizer.SimEngine   import ShardCoordinator
+from openvisualizer.BspEmulator import BspRadio
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_Shard.log'
+
+import logging
+log = logging.getLogger('test_Shard')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_Shard',
+                   'Shard',
+                   'ShardCoordinator',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT   = 10 # s
+LOOKAHEAD = BspRadio.BspRadio.DELAY_TX
+PACKET    = [0x41,0x88,0x01]
+CHANNEL   = 11
+
+#============================ helpers =========================================
+
+class _StubUart(object):
+    
+    def __init__(self):
+        self.rxQueue   = Queue.Queue()
+    
+    def read(self):
+        return self.rxQueue.get()
+    
+    def close(self):
+        self.rxQueue.put('')
+
+class _StubSupply(object):
+    
+    INTR_SWITCHON = 'hw_supply.switchOn'
+    
+    def __init__(self,mote):
+        self.mote      = mote
+    
+    def switchOn(self):
+        self.mote.indicateSwitchOn()
+
+class _StubRadio(object):
+    
+    def __init__(self,mote):
+        self.mote      = mote
+    
+    def indicateTxStart(self,fromMote,packet,channel):
+        self.mote.report('rx',fromMote,packet,channel)
+        return True
+    
+    def indicateTxEnd(self,fromMote,crcPasses=True):
+        self.mote.report('rxDone',fromMote,crcPasses)
+
+class _StubMote(object):
+    '''
+    Stands in for a MoteHandler in a shard. On boot, the mote with the
+    lowest id transmits a frame. The mote reports what happens to it, and
+    when, on its UART.
+    '''
+    
+    def __init__(self,moteId):
+        self.id        = moteId
+        self.engine    = SimEngine.SimEngine()
+        self.bspUart   = _StubUart()
+        self.bspRadio  = _StubRadio(self)
+        self.hwSupply  = _StubSupply(self)
+    
+    def getId(self):
+        return self.id
+    
+    def getNumHandoffs(self):
+        return 0
+    
+    def handleEvent(self,functionToCall):
+        functionToCall()
+    
+    def indicateSwitchOn(self):
+        if self.id%2==1:
+            startTime = self.engine.timeline.getCurrentTime()+LOOKAHEAD
+            self.engine.shard.indicateTxScheduled(self.id,startTime,startTime+0.001,PACKET,CHANNEL)
+            self.report('tx',startTime)
+    
+    def report(self,*data):
+        self.bspUart.rxQueue.put(json.dumps([self.engine.timeline.getCurrentTime()]+list(data))+'\n')
+
+def _createStubMote(moteId):
+    return _StubMote(moteId)
+
+def _readReports(shardedMote,numReports):
+    '''
+    Read reports from the UART of a mote, which may arrive in one chunk.
+    '''
+    reports = Queue.Queue()
+    def _read():
+        rxBytes = ''
+        while rxBytes.count('\n')<numReports:
+            rxBytes += ''.join(shardedMote.bspUart.read())
+        reports.put(rxBytes)
+    reader  = threading.Thread(target=_read)
+    reader.daemon = True
+    reader.start()
+    return [json.loads(line) for line in reports.get(timeout=TIMEOUT).splitlines()]
+
+#============================ tests ===========================================
+
+def test_remoteTx():
+    
+    coordinator = ShardCoordinator.ShardCoordinator(
+        shards        = ShardCoordinator.forkShards(2),
+        simFilesPath  = None,
+        headerPath    = None,
+        moteFactory   = _createStubMote,
+    )
+    
+    # one mote per shard, the transmitter in shard 0
+    (txMote,rxMote) = [coordinator.createMote() for _ in range(2)]
+    if txMote.getId()%2==0:
+        (txMote,rxMote) = (rxMote,txMote)
+    assert coordinator.shardOfMote[txMote.getId()]!=coordinator.shardOfMote[rxMote.getId()]
+    coordinator.engine.propagation.updateConnection(txMote.getId(),rxMote.getId(),1.0)
+    
+    coordinator.start()
+    
+    # the frame is announced during the first window, at boot...
+    [(announcedAt,_,startTime)] = _readReports(txMote,1)
+    assert announcedAt==0
+    assert startTime>=LOOKAHEAD
+    
+    # ...and the other shard receives it at its start time, in a later window
+    assert _readReports(rxMote,2)==[
+        [startTime,      'rx',    txMote.getId(),PACKET,CHANNEL],
+        [startTime+0.001,'rxDone',txMote.getId(),True],
+    ]
+    
+    # nothing left to run, the simulation ends
+    coordinator.join(TIMEOUT)
+    assert not coordinator.isAlive()
+    assert coordinator.getNumWindows()>=2
+    assert coordinator.engine.timeline.getStats().getNumEvents()==4
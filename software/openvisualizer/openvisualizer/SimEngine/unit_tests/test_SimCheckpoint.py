@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import random
+import json
+
+import pytest
+
+import SimEngine
+import SimCheckpoint
+import TimeLine
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_SimCheckpoint.log'
+
+import logging
+log = logging.getLogger('test_SimCheckpoint')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_SimCheckpoint',
+                   'SimCheckpoint',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+BOOTED_MOTE   = 1001
+UNBOOTED_MOTE = 1002
+
+#============================ fixtures ========================================
+
+@pytest.fixture
+def engine():
+    return SimEngine.SimEngine()
+
+@pytest.fixture
+def stubMotes(request,engine):
+    '''
+    Two stub motes on a fresh timeline, removed afterwards.
+    '''
+    
+    timeline        = engine.timeline
+    engine.timeline = TimeLine.TimeLine()
+    
+    motes = [
+        _StubMote(BOOTED_MOTE,  (37.875095,-122.257473),True),
+        _StubMote(UNBOOTED_MOTE,(37.875195,-122.257473),False),
+    ]
+    for mote in motes:
+        engine.indicateNewMote(mote)
+    
+    def _removeMotes():
+        for mote in motes:
+            engine.moteHandlers.remove(mote)
+            del engine.moteHandlersById[mote.getId()]
+        engine.propagation.deleteConnection(BOOTED_MOTE,UNBOOTED_MOTE)
+        engine.timeline = timeline
+    request.addfinalizer(_removeMotes)
+    
+    return motes
+
+#============================ helpers =========================================
+
+class _StubSupply(object):
+    
+    INTR_SWITCHON = 'hw_supply.switchOn'
+    
+    def switchOn(self):
+        pass
+
+class _StubCrystal(object):
+    
+    def __init__(self):
+        self.drift    = 0.0
+        self.tsTick   = None
+        self._period  = None
+    
+    def tick(self):
+        pass
+
+class _StubMote(object):
+    
+    def __init__(self,moteId,location,booted):
+        self.id        = moteId
+        self.location  = location
+        self.booted    = booted
+        self.hwSupply  = _StubSupply()
+        self.hwCrystal = _StubCrystal()
+    
+    def getId(self):
+        return self.id
+    
+    def getLocation(self):
+        return self.location
+    
+    def setLocation(self,lat,lon):
+        self.location  = (lat,lon)
+        SimEngine.SimEngine().propagation.setLocation(self.id,lat,lon)
+
+class _ShardedMote(object):
+    
+    def getId(self):
+        return 1
+    
+    def getLocation(self):
+        return (0,0)
+
+def _dummyCb():
+    pass
+
+#============================ tests ===========================================
+
+def test_getRandom(engine):
+    
+    # each stream is seeded from the engine's seed and its name only
+    expected = random.Random()
+    expected.setstate(engine.getRandom('test_a').getstate())
+    
+    engine.getRandom('test_b').random()
+    
+    assert engine.getRandom('test_a') is engine.getRandom('test_a')
+    assert engine.getRandom('test_a').random()==expected.random()
+    assert engine.getRandom('test_a').random()!=engine.getRandom('test_b').random()
+
+def test_saveLoadVerify(engine,tmpdir):
+    
+    filename   = str(tmpdir.join('checkpoint.json'))
+    
+    checkpoint = SimCheckpoint.save(engine,filename)
+    assert checkpoint['seed']==engine.getSeed()
+    
+    assert SimCheckpoint.verify(engine,SimCheckpoint.load(filename))==[]
+    
+    # the state moves on
+    engine.timeline.scheduleEvent(1,None,_dummyCb,'test_saveLoadVerify')
+    engine.getRandom('test_a').random()
+    
+    assert SimCheckpoint.verify(engine,SimCheckpoint.load(filename))==['events','randoms']
+    
+    engine.timeline.cancelEvent(None,'test_saveLoadVerify')
+
+def test_loadInvalid(tmpdir):
+    
+    filename = tmpdir.join('checkpoint.json')
+    filename.write('{"version": 0}')
+    
+    with pytest.raises(ValueError):
+        SimCheckpoint.load(str(filename))
+
+def test_restore(engine,stubMotes):
+    
+    (booted,unbooted) = stubMotes
+    
+    # state of the simulation when the checkpoint is taken
+    engine.timeline.scheduleEvent(1,BOOTED_MOTE,booted.hwCrystal.tick,'test_tick')
+    engine.timeline.scheduleEvent(5,UNBOOTED_MOTE,unbooted.hwSupply.switchOn,_StubSupply.INTR_SWITCHON)
+    engine.timeline.scheduleEvent(5,UNBOOTED_MOTE,unbooted.hwCrystal.tick,'test_tick')
+    engine.timeline.setCurrentTime(0.5)
+    engine.timeline.getStats().incrementEvents(10)
+    booted.hwCrystal.drift   = 12.5
+    booted.hwCrystal.tsTick  = 0.25
+    engine.propagation.updateConnection(BOOTED_MOTE,UNBOOTED_MOTE,0.75)
+    
+    checkpoint = json.loads(json.dumps(SimCheckpoint.capture(engine)))
+    expected   = engine.getRandom('test_a').random()
+    
+    # a fresh engine, whose state differs
+    engine.timeline = TimeLine.TimeLine()
+    booted.hwCrystal.drift   = 0.0
+    engine.propagation.updateConnection(BOOTED_MOTE,UNBOOTED_MOTE,0.25)
+    booted.setLocation(0,0)
+    
+    SimCheckpoint.restore(engine,checkpoint)
+    
+    assert engine.timeline.getCurrentTime()==0.5
+    assert engine.timeline.getStats().getNumEvents()==10
+    assert engine.getRandom('test_a').random()==expected
+    assert booted.hwCrystal.drift==12.5
+    assert booted.getLocation()==(37.875095,-122.257473)
+    assert engine.propagation.getConnections()[1][BOOTED_MOTE][UNBOOTED_MOTE]==0.75
+    
+    # the booted mote is rebooted, the other one keeps its events
+    assert engine.timeline.getEvents()==[
+        [0.5,BOOTED_MOTE,  _StubSupply.INTR_SWITCHON],
+        [5,  UNBOOTED_MOTE,'test_tick'],
+        [5,  UNBOOTED_MOTE,_StubSupply.INTR_SWITCHON],
+    ]
+    assert engine.timeline.getPendingEvents()[2].cb==unbooted.hwSupply.switchOn
+
+def test_restoreMismatch(engine,stubMotes):
+    
+    checkpoint = SimCheckpoint.capture(engine)
+    checkpoint['simTopology'] += '_other'
+    
+    with pytest.raises(ValueError):
+        SimCheckpoint.restore(engine,checkpoint)
+
+def test_restoreStarted(engine,stubMotes):
+    
+    checkpoint = SimCheckpoint.capture(engine)
+    engine.timeline.scheduleEvent(1,None,_dummyCb,'test_restoreStarted')
+    
+    with pytest.raises(ValueError):
+        SimCheckpoint.restore(engine,checkpoint)
+
+def test_captureSharded(engine):
+    
+    engine.moteHandlers.append(_ShardedMote())
+    try:
+        with pytest.raises(ValueError):
+            SimCheckpoint.capture(engine)
+    finally:
+        engine.moteHandlers.pop()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import json
+
+import pytest
+
+import SimClock
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_SimClock.log'
+
+import logging
+log = logging.getLogger('test_SimClock')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_SimClock',
+                   'SimClock',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ fixtures ========================================
+
+EXPECTEDCLOCKS = [
+    # speed              expected description
+    json.dumps(('fast',          'fast')),
+    json.dumps(('realtime',      'realtime')),
+    json.dumps(('1',             'realtime')),
+    json.dumps(('2.5',           '2.5x')),
+    json.dumps((0.5,             '0.5x')),
+]
+
+@pytest.fixture(params=EXPECTEDCLOCKS)
+def expectedClock(request):
+    return request.param
+
+INVALIDSPEEDS = [
+    json.dumps('ratio'),
+    json.dumps('N'),
+    json.dumps('0'),
+    json.dumps('-1'),
+]
+
+@pytest.fixture(params=INVALIDSPEEDS)
+def invalidSpeed(request):
+    return request.param
+
+@pytest.fixture
+def wallClock(monkeypatch):
+    '''
+    A wall clock which only moves forward when slept on.
+    '''
+    returnVal = _WallClock()
+    monkeypatch.setattr(SimClock.time,'time', returnVal.time)
+    monkeypatch.setattr(SimClock.time,'sleep',returnVal.sleep)
+    return returnVal
+
+#============================ helpers =========================================
+
+class _WallClock(object):
+    
+    def __init__(self):
+        self.now        = 1000.0
+        self.numSleeps  = 0
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self,duration):
+        assert duration>0
+        self.now       += duration
+        self.numSleeps += 1
+
+#============================ tests ===========================================
+
+def test_create(expectedClock):
+    
+    (speed,description) = json.loads(expectedClock)
+    
+    assert SimClock.create(speed).getDescription()==description
+
+def test_createInvalid(invalidSpeed):
+    
+    with pytest.raises(ValueError):
+        SimClock.create(json.loads(invalidSpeed))
+
+def test_ratioBatching(wallClock):
+    
+    clock    = SimClock.RatioClock(2.0)
+    quantum  = SimClock.RatioClock.SLEEP_QUANTUM*clock.getRatio()
+    
+    # 2s of simulated time, an event every 1ms
+    numEvents = 2000
+    for i in range(numEvents+1):
+        clock.pace(i*0.001)
+    
+    # at most one sleep per quantum, not one per event
+    assert 0<clock.getNumSleeps()<=2.0/quantum+1
+    assert clock.getNumSleeps()==wallClock.numSleeps
+    
+    # the simulation ran at twice the wall clock
+    assert abs((wallClock.now-1000.0)-1.0)<=SimClock.RatioClock.SLEEP_QUANTUM
+
+def test_ratioRebase(wallClock):
+    
+    clock = SimClock.RatioClock(1.0)
+    clock.pace(0)
+    clock.pace(0.5)
+    
+    # the engine pauses for a minute of wall-clock time
+    wallClock.now += 60
+    clock.rebase(0.5)
+    
+    # after the pause, the clock paces from where it resumed instead of
+    # letting the simulation catch up
+    clock.pace(0.6)
+    assert abs(wallClock.now-(1000.0+0.5+60+0.1))<1e-9
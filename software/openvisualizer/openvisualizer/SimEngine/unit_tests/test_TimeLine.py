@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+import json
+import threading
+
+import pytest
+
+import SimEngine
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_TimeLine.log'
+
+import logging
+log = logging.getLogger('test_TimeLine')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_TimeLine',
+                   'Timeline',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+#============================ fixtures ========================================
+
+EXPECTEDORDER = [
+    # scheduled (atTime,moteId,desc)                  expected (moteId,desc) order
+    json.dumps(([(3,1,'a'),(1,1,'b'),(2,1,'c')],      [[1,'b'],[1,'c'],[1,'a']])),
+    json.dumps(([(1,1,'a'),(1,2,'a'),(1,3,'a')],      [[3,'a'],[2,'a'],[1,'a']])),
+    json.dumps(([(1,1,'a'),(2,1,'b'),(3,1,'a')],      [[1,'b'],[1,'a']])),
+    json.dumps(([(5,1,'a'),(2,1,'a'),(3,2,'a')],      [[1,'a'],[2,'a']])),
+]
+
+@pytest.fixture(params=EXPECTEDORDER)
+def expectedOrder(request):
+    return request.param
+
+@pytest.fixture
+def timeline():
+    return SimEngine.TimeLine.TimeLine()
+
+#============================ helpers =========================================
+
+def _dummyCb():
+    pass
+
+def _drain(timeline):
+    returnVal = []
+    while True:
+        event = timeline._popEvent()
+        if event is None:
+            break
+        returnVal += [[event.moteId,event.desc]]
+    return returnVal
+
+#============================ tests ===========================================
+
+def test_order(timeline,expectedOrder):
+    
+    (scheduled,expected) = json.loads(expectedOrder)
+    
+    for (atTime,moteId,desc) in scheduled:
+        timeline.scheduleEvent(atTime,moteId,_dummyCb,desc)
+    
+    assert [[moteId,desc] for (atTime,moteId,desc) in timeline.getEvents()]==expected
+    assert _drain(timeline)==expected
+
+def test_cancel(timeline):
+    
+    for moteId in range(10):
+        timeline.scheduleEvent(moteId,moteId,_dummyCb,'a')
+        timeline.scheduleEvent(moteId,moteId,_dummyCb,'b')
+    
+    for moteId in range(10):
+        assert timeline.cancelEvent(moteId,'a')==1
+        assert timeline.cancelEvent(moteId,'a')==0
+    
+    assert len(timeline.getEvents())==10
+    assert _drain(timeline)==[[moteId,'b'] for moteId in range(10)]
+    assert timeline._popEvent() is None
+
+def test_replaceMany(timeline):
+    
+    # rescheduling the same event must not grow the heap without bound
+    for i in range(1000):
+        timeline.scheduleEvent(i,1,_dummyCb,'a')
+    
+    assert len(timeline.timeline)<=2
+    assert timeline.getEvents()==[[999,1,'a']]
+
+def test_runUntil(timeline):
+    
+    executed = []
+    for atTime in [3,1,2,5]:
+        timeline.scheduleEvent(
+            atTime,
+            None,
+            lambda atTime=atTime: executed.append(atTime),
+            'e{0}'.format(atTime),
+        )
+    
+    assert timeline.runUntil(3)==2
+    assert executed==[1,2]
+    assert timeline.getNextEventTime()==3
+    
+    timeline.setCurrentTime(3)
+    assert timeline.runUntil(10)==2
+    assert executed==[1,2,3,5]
+    assert timeline.getNextEventTime() is None
+
+def test_concurrentSchedule(timeline):
+    
+    # a moteProbe thread keeps rescheduling the event the timeline pops
+    numEvents = 20000
+    errors    = []
+    def _schedule():
+        try:
+            for i in range(numEvents):
+                timeline.scheduleEvent(i,1,_dummyCb,'a')
+        except Exception as err:
+            errors.append(err)
+    scheduler = threading.Thread(target=_schedule)
+    scheduler.start()
+    while scheduler.isAlive():
+        timeline._popEvent()
+    scheduler.join()
+    
+    assert errors==[]
+    
+    # the index always matches the pending events in the heap
+    pending = [entry for entry in timeline.timeline if entry[2] is not None]
+    assert sorted(timeline.eventIndex.values())==sorted(pending)
@@ -9,13 +9,295 @@ log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
 import threading
+import time
 import Queue
 
 from pydispatch import dispatcher
+from pydispatch import saferef
+
+import eventBusExecutor
+import eventBusProfiler
+
+WILDCARD  = '*'
+
+#============================ routing =========================================
+
+def _signalsEquivalent(s1,s2):
+    returnVal = True
+    if type(s1)==type(s2)==str:
+        if (s1!=s2) and (s1!=WILDCARD) and (s2!=WILDCARD):
+            returnVal = False
+    elif type(s1)==type(s2)==tuple:
+        assert len(s1)==len(s2)==3
+        for i in range(3):
+            if (s1[i]!=s2[i]) and (s1[i]!=WILDCARD) and (s2[i]!=WILDCARD):
+                returnVal = False
+    else:
+        returnVal = False
+    
+    return returnVal
+
+class _Route(object):
+    '''
+    A registration of an eventBusClient, as stored in the routing table.
+    '''
+    
+    def __init__(self,clientSeq,subscriber,regSeq,sender,signal,callbackRef,queue):
+        self.clientSeq            = clientSeq
+        self.subscriber           = subscriber  # name of the client
+        self.regSeq               = regSeq
+        self.sender               = sender
+        self.signal               = signal
+        self.callbackRef          = callbackRef
+        self.queue                = queue  # SubscriberQueue of an asynchronous client
+    
+    def sortKey(self):
+        return (self.clientSeq,self.regSeq)
+
+class _RouteIndex(object):
+    '''
+    The routes, indexed by the signals they match. Never modified once
+    built, so it is read without locking.
+    
+    - string signals are indexed by the signal itself, except the WILDCARD
+      signal, whose routes are kept apart, in wildcards.
+    - (addr,proto,port) signals are indexed by mask, the positions of the
+      signal which are not WILDCARD, then by the values at those positions,
+      e.g. a route for (addr,'udp',WILDCARD) is in
+      byTuple[(True,True,False)][(addr,'udp')].
+    
+    The routes of each entry are sorted by client, then by registration.
+    '''
+    
+    MASKS = [(a,b,c) for a in (True,False) for b in (True,False) for c in (True,False)]
+    
+    def __init__(self,routes):
+        self.routes               = routes
+        self.byString             = {}
+        self.byTuple              = {}
+        self.wildcards            = []
+        for route in sorted(routes,key=_Route.sortKey):
+            signal = route.signal
+            if type(signal)==str:
+                if signal==WILDCARD:
+                    self.wildcards += [route]
+                else:
+                    self.byString.setdefault(signal,[]).append(route)
+            elif type(signal)==tuple:
+                assert len(signal)==3
+                mask = tuple([v!=WILDCARD for v in signal])
+                key  = tuple([v for v in signal if v!=WILDCARD])
+                self.byTuple.setdefault(mask,{}).setdefault(key,[]).append(route)
+        # only try the masks in use
+        self.masks                = [m for m in self.MASKS if m in self.byTuple]
+    
+    def getRoutes(self,signal):
+        '''
+        :returns: The routes whose signal matches, sorted by client, then by
+            registration.
+        '''
+        
+        if type(signal)==str:
+            if signal==WILDCARD:
+                # matches all string signals
+                return self._scan(signal)
+            routes = self.byString.get(signal,[])
+            if self.wildcards:
+                routes = sorted(routes+self.wildcards,key=_Route.sortKey)
+            return routes
+        
+        elif type(signal)==tuple:
+            if WILDCARD in signal:
+                # matches all tuple signals it is equivalent to
+                return self._scan(signal)
+            found = []
+            for mask in self.masks:
+                routes = self.byTuple[mask].get(tuple([v for (v,m) in zip(signal,mask) if m]))
+                if routes:
+                    found += [routes]
+            if   not found:
+                return []
+            elif len(found)==1:
+                return found[0]
+            else:
+                return sorted(sum(found,[]),key=_Route.sortKey)
+        
+        return []
+    
+    def _scan(self,signal):
+        return [
+            r for r in sorted(self.routes,key=_Route.sortKey) if _signalsEquivalent(r.signal,signal)
+        ]
+
+class _RoutingTable(object):
+    '''
+    Delivers the signals sent on the dispatcher to the eventBusClients
+    registered to them.
+    
+    It is the only receiver of the eventBusClients connected to the
+    dispatcher, for all signals. It finds the registrations matching a
+    signal in a _RouteIndex rather than having each client go through its
+    registrations. The index is rebuilt when a client registers or
+    unregisters, and replaced at once, so delivering a signal takes no lock.
+    
+    As when each client was a receiver of the dispatcher, each client gets
+    a signal once, through its first matching registration, the clients in
+    the order they were created. The table only references the clients
+    weakly, their routes are removed when they are garbage collected.
+    '''
+    
+    def __init__(self):
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.index                = _RouteIndex([])
+        self.numClients           = 0
+        self.numRegistrations     = 0
+        self.clientNames          = {}
+        self.profiler             = eventBusProfiler.eventBusProfiler()
+        
+        # connect to dispatcher
+        dispatcher.connect(
+            receiver = self._eventBusNotification,
+        )
+    
+    #======================== public ==========================================
+    
+    def addClient(self,name):
+        '''
+        :param name: The name of the client, under which the durations of
+            its callbacks are profiled.
+        
+        :returns: The sequence number of a new client, which orders it
+            among the others.
+        '''
+        with self.dataLock:
+            self.numClients += 1
+            self.clientNames[self.numClients] = name
+            return self.numClients
+    
+    def addRoute(self,clientSeq,sender,signal,callback,queue=None):
+        '''
+        :param queue: The SubscriberQueue to deliver the signals through, if
+            the client is asynchronous.
+        '''
+        with self.dataLock:
+            self.numRegistrations += 1
+            route = _Route(
+                clientSeq   = clientSeq,
+                subscriber  = self.clientNames[clientSeq],
+                regSeq      = self.numRegistrations,
+                sender      = sender,
+                signal      = signal,
+                callbackRef = saferef.safeRef(callback,onDelete=self._callbackDeleted),
+                queue       = queue,
+            )
+            self._rebuild(self.index.routes+[route])
+    
+    def removeRoutes(self,clientSeq,sender,signal,callback):
+        '''
+        Remove the routes of a client matching the registration, the signal
+        possibly holding wildcards.
+        '''
+        with self.dataLock:
+            self._rebuild([
+                r for r in self.index.routes if not (
+                    r.clientSeq==clientSeq                         and
+                    r.sender==sender                               and
+                    _signalsEquivalent(r.signal,signal)            and
+                    r.callbackRef()==callback
+                )
+            ])
+    
+    #======================== private =========================================
+    
+    def _rebuild(self,routes):
+        # also drop the routes of garbage collected clients
+        self.index = _RouteIndex([r for r in routes if r.callbackRef() is not None])
+    
+    def _callbackDeleted(self,callbackRef):
+        # may be called by the garbage collector while this thread holds the
+        # lock, in which case the route is dropped by the next rebuild, and
+        # skipped until then
+        if self.dataLock.acquire(False):
+            try:
+                self._rebuild(self.index.routes)
+            finally:
+                self.dataLock.release()
+    
+    def _eventBusNotification(self,signal,sender,data,synchronous=False):
+        '''
+        :param synchronous: Whether to call the callbacks of asynchronous
+            clients from this thread too, to get their answer.
+        '''
+        
+        returnVal = None
+        
+        routes    = self.index.getRoutes(signal)
+        if not routes:
+            return None
+        
+        isProfiled = self.profiler.isEnabled
+        
+        lastClientSeq = None
+        for route in routes:
+            
+            # each client only gets the signal through its first matching registration
+            if route.clientSeq==lastClientSeq:
+                continue
+            if route.sender!=sender and route.sender!=WILDCARD:
+                continue
+            callback = route.callbackRef()
+            if callback is None:
+                continue
+            lastClientSeq = route.clientSeq
+            
+            # asynchronous clients get the signal later, from their executor
+            if route.queue and not synchronous:
+                route.queue.put(callback,sender,signal,data)
+                continue
+            
+            # call the callback
+            if isProfiled:
+                startTime = time.time()
+            try:
+                result = callback(
+                    sender = sender,
+                    signal = signal,
+                    data   = data,
+                )
+            except TypeError as err:
+                output = "ERROR could not call {0}, err={1}".format(callback,err)
+                log.critical(output)
+                print output
+            else:
+                # the first answer is returned, as the first receiver's was
+                if returnVal is None:
+                    returnVal = result
+            finally:
+                if isProfiled:
+                    self.profiler.record(signal,route.subscriber,time.time()-startTime)
+        
+        return returnVal
+
+_routingTable = None
+
+def resetRoutingTable():
+    '''
+    Forget the registrations of all eventBusClients, and connect a new
+    routing table to the dispatcher, e.g. in a forked process which cleared
+    the receivers of the dispatcher.
+    '''
+    global _routingTable
+    _routingTable = _RoutingTable()
+
+resetRoutingTable()
+
+#============================ client ==========================================
 
 class eventBusClient(object):
     
-    WILDCARD  = '*'
+    WILDCARD  = WILDCARD
     
     PROTO_ICMPv6 = 'icmpv6'
     PROTO_UDP = 'udp'
@@ -24,7 +306,18 @@ class eventBusClient(object):
         PROTO_UDP
     ]
     
-    def __init__(self,name,registrations):
+    def __init__(self,name,registrations,executor=None,queueSize=eventBusExecutor.QUEUE_SIZE,queuePolicy=eventBusExecutor.QUEUE_DROP):
+        '''
+        :param executor:    The eventBusExecutor to deliver the signals from,
+            through a queue, so the thread dispatching a signal does not wait
+            for this client. By default, signals are delivered synchronously,
+            from the thread dispatching them. Signals dispatched
+            synchronously, to get an answer, are always delivered from the
+            thread dispatching them.
+        :param queueSize:   How many signals can wait in the queue.
+        :param queuePolicy: Whether signals are dropped, or the dispatching
+            thread waits, when the queue is full, see eventBusExecutor.
+        '''
         
         assert type(name)==str
         assert type(registrations)==list
@@ -45,6 +338,12 @@ class eventBusClient(object):
         
         # local variables
         self.goOn            = True
+        self.routingTable    = _routingTable
+        self.clientSeq       = self.routingTable.addClient(name)
+        if executor:
+            self.eventQueue  = executor.createQueue(name,queueSize,queuePolicy)
+        else:
+            self.eventQueue  = None
         
         # register registrations
         for r in registrations:
@@ -53,21 +352,30 @@ class eventBusClient(object):
                 signal       = r['signal'],
                 callback     = r['callback'],
             )
-        
-        # connect to dispatcher
-        dispatcher.connect(
-            receiver = self._eventBusNotification,
-        )
     
     #======================== public ==========================================
     
-    def dispatch(self,signal,data):
+    def dispatch(self,signal,data,synchronous=False):
+        '''
+        :param synchronous: Whether asynchronous clients should also get the
+            signal from this thread, before this call returns, e.g. to answer.
+        '''
         return dispatcher.send(
-            sender = self.name,
-            signal = signal,
-            data   = data,
+            sender      = self.name,
+            signal      = signal,
+            data        = data,
+            synchronous = synchronous,
         )
     
+    def getQueueStats(self):
+        '''
+        :returns: The statistics of the queue of this client, see
+            SubscriberQueue.getStats(), None if it is synchronous.
+        '''
+        if self.eventQueue:
+            return self.eventQueue.getStats()
+        return None
+    
     def register(self,sender,signal,callback):
         
         # detect duplicate registrations
@@ -95,70 +403,28 @@ class eventBusClient(object):
         }
         with self.dataLock:
             self.registrations += [newRegistration]
+            self.routingTable.addRoute(self.clientSeq,sender,signal,callback,self.eventQueue)
     
     def unregister(self,sender,signal,callback):
         
         with self.dataLock:
-            for reg in self.registrations:
+            for reg in self.registrations[:]:
                 if  (
                         reg['sender']==sender                             and
-                        self._signalsEquivalent(reg['signal'], signal)    and
+                        _signalsEquivalent(reg['signal'], signal)         and
                         reg['callback']==callback
                     ):
                     self.registrations.remove(reg)
+            self.routingTable.removeRoutes(self.clientSeq,sender,signal,callback)
     
     #======================== private =========================================
     
-    def _eventBusNotification(self,signal,sender,data):
-        
-        callback = None
-        
-        # find the callback
-        with self.dataLock:
-            for r in self.registrations:
-                if (
-                        self._signalsEquivalent(r['signal'],signal) and
-                        (r['sender']==sender or r['sender']==self.WILDCARD)
-                    ):
-                    callback = r['callback']
-                    break
-        
-        if not callback:
-            return None
-        
-        # call the callback
-        try:
-            return callback(
-                sender = sender,
-                signal = signal,
-                data   = data,
-            )
-        except TypeError as err:
-            output = "ERROR could not call {0}, err={1}".format(callback,err)
-            log.critical(output)
-            print output
-    
-    def _signalsEquivalent(self,s1,s2):
-        returnVal = True
-        if type(s1)==type(s2)==str:
-            if (s1!=s2) and (s1!=self.WILDCARD) and (s2!=self.WILDCARD):
-                returnVal = False
-        elif type(s1)==type(s2)==tuple:
-            assert len(s1)==len(s2)==3
-            for i in range(3):
-                if (s1[i]!=s2[i]) and (s1[i]!=self.WILDCARD) and (s2[i]!=self.WILDCARD):
-                    returnVal = False
-        else:
-            returnVal = False
-        
-        return returnVal
-    
-    
     def _dispatchProtocol(self,signal,data):
         ''' used to sent to the eventBus a signal and look whether someone responds or not'''
         temp = self.dispatch(
               signal       = signal,
               data         = data,
+              synchronous  = True,
         )
         for (function,returnVal) in temp:
             if returnVal is not None:
@@ -175,6 +441,7 @@ class eventBusClient(object):
         temp = self.dispatch(
             signal       = signal, 
             data         = data,
+            synchronous  = True,
         )
         for (function,returnVal) in temp:
             if returnVal is not None:
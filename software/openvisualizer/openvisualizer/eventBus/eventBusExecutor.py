@@ -0,0 +1,244 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('eventBusExecutor')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import collections
+import sys
+import threading
+import time
+import Queue
+
+import openvisualizer.openvisualizer_utils as u
+
+import eventBusProfiler
+
+#============================ defines =========================================
+
+QUEUE_DROP          = 'drop'     # drop the signal when the queue is full
+QUEUE_BLOCK         = 'block'    # have the dispatching thread wait for room
+QUEUE_POLICY_ALL    = [
+    QUEUE_DROP,
+    QUEUE_BLOCK,
+]
+
+QUEUE_SIZE          = 1000       # signals, by default
+
+#============================ classes =========================================
+
+class SubscriberQueue(object):
+    '''
+    The signals waiting to be delivered to an asynchronous eventBusClient.
+    
+    The signals are delivered in the order they were queued, one at a time,
+    by a thread of the executor of the queue.
+    '''
+    
+    BATCH_SIZE      = 32   # signals delivered before letting other queues run
+    
+    def __init__(self,executor,name,maxSize,policy):
+        
+        assert maxSize>0
+        assert policy in QUEUE_POLICY_ALL
+        
+        # store params
+        self.executor             = executor
+        self.name                 = name
+        self.maxSize              = maxSize
+        self.policy               = policy
+        
+        # local variables
+        self.items                = collections.deque()
+        self.dataLock             = threading.Lock()
+        self.notFull              = threading.Condition(self.dataLock)
+        self.isScheduled          = False  # waiting for, or held by, a thread of the executor
+        self.numQueued            = 0
+        self.numDropped           = 0
+        self.numBlocked           = 0
+        self.maxDepth             = 0
+        self.profiler             = eventBusProfiler.eventBusProfiler()
+    
+    #======================== public ==========================================
+    
+    def put(self,callback,sender,signal,data):
+        '''
+        Queue a signal for a callback, dropping it, or waiting for room,
+        according to the policy, if the queue is full.
+        
+        A thread of the executor never waits, the signal is queued beyond the
+        size of the queue instead, since it might be the thread which would
+        make room.
+        '''
+        with self.dataLock:
+            if len(self.items)>=self.maxSize:
+                if self.policy==QUEUE_DROP:
+                    self.numDropped += 1
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug('{0}: queue full, dropping {1}'.format(self.name,signal))
+                    return
+                if not self.executor.isOwnThread():
+                    self.numBlocked += 1
+                    while len(self.items)>=self.maxSize and not self.executor.isClosed:
+                        self.notFull.wait()
+            self.items.append((callback,sender,signal,data))
+            self.numQueued += 1
+            self.maxDepth   = max(self.maxDepth,len(self.items))
+            schedule        = not self.isScheduled
+            self.isScheduled = True
+        if schedule:
+            self.executor._schedule(self)
+    
+    def getStats(self):
+        '''
+        :returns: A dict with the current and maximum number of signals in
+            the queue, and the number of signals queued, dropped, and which
+            had to wait for room.
+        '''
+        with self.dataLock:
+            return {
+                'depth':          len(self.items),
+                'maxDepth':       self.maxDepth,
+                'maxSize':        self.maxSize,
+                'policy':         self.policy,
+                'numQueued':      self.numQueued,
+                'numDropped':     self.numDropped,
+                'numBlocked':     self.numBlocked,
+            }
+    
+    #======================== private =========================================
+    
+    def _deliver(self):
+        '''
+        Deliver the signals at the head of the queue, called by a thread of
+        the executor.
+        
+        :returns: True if signals are left, and the queue should be
+            scheduled again.
+        '''
+        for _ in range(self.BATCH_SIZE):
+            with self.dataLock:
+                if not self.items:
+                    self.isScheduled = False
+                    return False
+                (callback,sender,signal,data) = self.items.popleft()
+                self.notFull.notify()
+            isProfiled = self.profiler.isEnabled
+            if isProfiled:
+                startTime = time.time()
+            try:
+                callback(
+                    sender = sender,
+                    signal = signal,
+                    data   = data,
+                )
+            except Exception as err:
+                output = "ERROR {0} could not deliver {1} to {2}, err={3}".format(self.name,signal,callback,err)
+                log.critical(output)
+                print output
+            finally:
+                if isProfiled:
+                    self.profiler.record(signal,self.name,time.time()-startTime)
+        with self.dataLock:
+            if not self.items:
+                self.isScheduled = False
+                return False
+            return True
+
+class eventBusExecutor(object):
+    '''
+    Delivers the signals of asynchronous eventBusClients, from their
+    SubscriberQueue, in a pool of threads.
+    
+    An executor with a single thread is the dedicated thread of one client,
+    or shared by several. With more threads, the clients sharing the
+    executor are served in parallel, but each client still gets its signals
+    one at a time, in order.
+    '''
+    
+    def __init__(self,name,numThreads=1):
+        
+        assert numThreads>0
+        
+        # store params
+        self.name                 = name
+        self.numThreads           = numThreads
+        
+        # local variables
+        self.readyQueues          = Queue.Queue()   # SubscriberQueues with signals to deliver
+        self.subscriberQueues     = []
+        self.dataLock             = threading.Lock()
+        self.isClosed             = False
+        self.threads              = []
+        for i in range(numThreads):
+            thread = threading.Thread(target=self._run)
+            thread.name   = '{0}_{1}'.format(self.name,i) if numThreads>1 else self.name
+            thread.daemon = True
+            self.threads += [thread]
+        self.threadIds            = set()
+        for thread in self.threads:
+            thread.start()
+            self.threadIds.add(thread.ident)
+    
+    #======================== public ==========================================
+    
+    def createQueue(self,name,maxSize=QUEUE_SIZE,policy=QUEUE_DROP):
+        '''
+        :returns: A new SubscriberQueue, whose signals this executor delivers.
+        '''
+        queue = SubscriberQueue(self,name,maxSize,policy)
+        with self.dataLock:
+            self.subscriberQueues += [queue]
+        return queue
+    
+    def isOwnThread(self):
+        '''
+        :returns: Whether the calling thread is one of the executor's.
+        '''
+        return threading.current_thread().ident in self.threadIds
+    
+    def getStats(self):
+        '''
+        :returns: A dict with the statistics of each of the queues, see
+            SubscriberQueue.getStats(), by name.
+        '''
+        with self.dataLock:
+            queues = self.subscriberQueues[:]
+        return dict([(q.name,q.getStats()) for q in queues])
+    
+    def close(self):
+        '''
+        Stop the threads, once the signals already scheduled are delivered.
+        '''
+        self.isClosed = True
+        with self.dataLock:
+            queues = self.subscriberQueues[:]
+        for queue in queues:
+            with queue.dataLock:
+                queue.notFull.notifyAll()
+        for _ in self.threads:
+            self.readyQueues.put(None)
+    
+    #======================== private =========================================
+    
+    def _schedule(self,queue):
+        self.readyQueues.put(queue)
+    
+    def _run(self):
+        try:
+            while True:
+                queue = self.readyQueues.get()
+                if queue is None:
+                    break
+                if queue._deliver():
+                    # let the other queues run before delivering more
+                    self.readyQueues.put(queue)
+        except Exception as err:
+            errMsg=u.formatCrashMessage(threading.current_thread().name,err)
+            print errMsg
+            log.critical(errMsg)
+            sys.exit(-1)
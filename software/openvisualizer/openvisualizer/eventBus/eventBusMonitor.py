@@ -18,6 +18,8 @@ import openvisualizer.openvisualizer_utils as u
 from pydispatch import dispatcher
 from openvisualizer.openTun    import openTun
 
+import eventBusProfiler
+
 class eventBusMonitor(object):
     
     def __init__(self):
@@ -33,6 +35,7 @@ class eventBusMonitor(object):
         self.wiresharkDebugEnabled     = False
         self.dagRootEui64              = [0x00]*8
         self.simMode                   = False
+        self.profiler                  = eventBusProfiler.eventBusProfiler()
         
         # give this instance a name
         self.name                      = 'eventBusMonitor'
@@ -45,22 +48,43 @@ class eventBusMonitor(object):
     #======================== public ==========================================
     
     def getStats(self):
+        '''
+        :returns: A JSON string of a dictionary with:
+            - 'signals': the number of signals sent, by sender and signal
+            - 'callbacks': the durations of the callbacks, by signal and
+              subscriber, see eventBusProfiler.getStats(), empty unless
+              timing was enabled, see setCallbackTiming()
+            - 'isCallbackTiming': whether the callbacks are being timed
+        '''
         
         # get a copy of stats
         with self.dataLock:
             tempStats = copy.deepcopy(self.stats)
         
         # format as a dictionnary
-        returnVal = [
-            {
-                'sender': k[0],
-                'signal': k[1],
-                'num':    v,
-            } for (k,v) in tempStats.items()
-        ]
+        returnVal = {
+            'signals': [
+                {
+                    'sender': k[0],
+                    'signal': k[1],
+                    'num':    v,
+                } for (k,v) in tempStats.items()
+            ],
+            'callbacks':          self.profiler.getStats(),
+            'isCallbackTiming':   self.profiler.isEnabled,
+        }
         
         # send back JSON string
         return json.dumps(returnVal)
+    
+    def setCallbackTiming(self,isEnabled):
+        '''
+        Turns on/off the timing of the callbacks of the eventBusClients, per
+        signal and subscriber. Turning it on forgets the previous durations.
+        '''
+        if isEnabled and not self.profiler.isEnabled:
+            self.profiler.reset()
+        self.profiler.setEnabled(isEnabled)
         
     def setWiresharkDebug(self,isEnabled):
         '''
@@ -0,0 +1,210 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('eventBusProfiler')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import threading
+import time
+
+#============================ defines =========================================
+
+SUB_BUCKET_BITS     = 4                      # 16 buckets per power of 2, i.e. at most 1/16 error
+SUB_BUCKET_COUNT    = 1<<SUB_BUCKET_BITS
+PERCENTILES         = [50,90,99,99.9]
+
+#============================ classes =========================================
+
+class LatencyHistogram(object):
+    '''
+    A histogram of durations, in the manner of HdrHistogram: durations are
+    counted, in microseconds, in buckets whose width grows with the
+    duration, so the error on a percentile is at most 1/SUB_BUCKET_COUNT
+    of its value, whatever the range of the durations.
+    
+    Durations below 2*SUB_BUCKET_COUNT us have a bucket each. Above, each
+    power of 2 is split into SUB_BUCKET_COUNT buckets.
+    
+    Not thread-safe, see eventBusProfiler.
+    '''
+    
+    def __init__(self):
+        
+        # local variables
+        self.counts               = [0]*(2*SUB_BUCKET_COUNT)
+        self.count                = 0
+        self.total                = 0     # us
+        self.min                  = None  # us
+        self.max                  = None  # us
+    
+    #======================== public ==========================================
+    
+    def record(self,duration):
+        '''
+        :param duration: The duration to count, in seconds.
+        '''
+        value = int(duration*1000000)
+        if value<0:
+            value = 0
+        index = self._bucketIndex(value)
+        if index>=len(self.counts):
+            self.counts += [0]*(index+1-len(self.counts))
+        self.counts[index] += 1
+        self.count         += 1
+        self.total         += value
+        if self.min is None or value<self.min:
+            self.min = value
+        if self.max is None or value>self.max:
+            self.max = value
+    
+    def getPercentile(self,percentile):
+        '''
+        :param percentile: The percentile, between 0 and 100.
+        :returns: The duration, in us, which percentile % of the durations
+            do not exceed, i.e. the highest value of its bucket, or None
+            if no duration was counted.
+        '''
+        if not self.count:
+            return None
+        threshold = max(1,int(round(self.count*percentile/100.0)))
+        seen      = 0
+        for (index,count) in enumerate(self.counts):
+            seen += count
+            if seen>=threshold:
+                return min(self._bucketHighest(index),self.max)
+        return self.max
+    
+    def getStats(self):
+        '''
+        :returns: A dict with the number of durations, their total, mean,
+            min and max, and the PERCENTILES, as 'p50', 'p99.9'..., all in us.
+        '''
+        returnVal = {
+            'count':  self.count,
+            'total':  self.total,
+            'mean':   float(self.total)/self.count if self.count else None,
+            'min':    self.min,
+            'max':    self.max,
+        }
+        for p in PERCENTILES:
+            returnVal['p{0:g}'.format(p)] = self.getPercentile(p)
+        return returnVal
+    
+    #======================== private =========================================
+    
+    def _bucketIndex(self,value):
+        if value<2*SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length()-SUB_BUCKET_BITS-1
+        return SUB_BUCKET_COUNT*(shift+1)+(value>>shift)-SUB_BUCKET_COUNT
+    
+    def _bucketHighest(self,index):
+        if index<2*SUB_BUCKET_COUNT:
+            return index
+        shift = index/SUB_BUCKET_COUNT-1
+        top   = index%SUB_BUCKET_COUNT+SUB_BUCKET_COUNT
+        return ((top+1)<<shift)-1
+
+class eventBusProfiler(object):
+    '''
+    Times the callbacks of the eventBusClients, per signal and subscriber,
+    i.e. the name of the client the callback belongs to.
+    
+    Singleton, shared by the routing table, which times the callbacks it
+    calls from the dispatching thread, and the SubscriberQueues, which time
+    the callbacks of the asynchronous clients. Timing is disabled by
+    default; while disabled, the callers only check isEnabled.
+    '''
+    
+    #======================== singleton pattern ===============================
+    
+    _instance = None
+    _init     = False
+    
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(eventBusProfiler, cls).__new__(cls, *args, **kwargs)
+        return cls._instance
+    
+    #======================== main ============================================
+    
+    def __init__(self):
+        
+        # don't re-initialize an instance (singleton pattern)
+        if self._init:
+            return
+        self._init = True
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.isEnabled            = False
+        self.histograms           = {}    # (signal,subscriber) -> LatencyHistogram
+        self.startTime            = None
+        self.duration             = 0     # s, spent enabled before startTime
+    
+    #======================== public ==========================================
+    
+    def setEnabled(self,isEnabled):
+        '''
+        Start or stop timing the callbacks. The histograms are kept, see
+        reset().
+        '''
+        with self.dataLock:
+            isEnabled = bool(isEnabled)
+            if isEnabled==self.isEnabled:
+                return
+            if isEnabled:
+                self.startTime = time.time()
+            else:
+                self.duration += time.time()-self.startTime
+                self.startTime = None
+            self.isEnabled = isEnabled
+        log.info('%s timing of the eventBus callbacks',
+                'Enabled' if isEnabled else 'Disabled')
+    
+    def reset(self):
+        '''
+        Forget the durations counted so far.
+        '''
+        with self.dataLock:
+            self.histograms = {}
+            self.duration   = 0
+            if self.startTime is not None:
+                self.startTime = time.time()
+    
+    def record(self,signal,subscriber,duration):
+        '''
+        :param duration: The duration of the call, in seconds.
+        '''
+        with self.dataLock:
+            key = (signal,subscriber)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self.histograms[key] = histogram
+            histogram.record(duration)
+    
+    def getStats(self):
+        '''
+        :returns: A list with, for each signal and subscriber, the
+            statistics of the durations of the calls (see
+            LatencyHistogram.getStats()), and the calls per second while
+            timing was enabled, as 'rate', slowest subscribers first.
+        '''
+        with self.dataLock:
+            duration  = self.duration
+            if self.startTime is not None:
+                duration += time.time()-self.startTime
+            returnVal = []
+            for ((signal,subscriber),histogram) in self.histograms.items():
+                stats = histogram.getStats()
+                stats['signal']     = signal
+                stats['subscriber'] = subscriber
+                stats['rate']       = stats['count']/duration if duration else None
+                returnVal += [stats]
+        returnVal.sort(key=lambda s: s['total'],reverse=True)
+        return returnVal
@@ -0,0 +1,93 @@
+'''
+This is a performance test which measures the cost of dispatching a signal
+on the eventBus, as the number of eventBusClients grows. Each client
+registers to its own signal, and to a signal of its own UDP port, as the
+applications on the DAG root do. The test dispatches, from another client,
+the signal of one client, the UDP signal of one client, and a signal nobody
+registered to, first with the timing of the callbacks disabled, then
+enabled.
+
+Run this test with 'python bench_eventBusClient.py [numDispatches]'. By
+default, it dispatches each signal 10000 times, with 1, 10 and 100 clients.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # eventBus/
+
+import time
+
+import eventBusClient
+import eventBusProfiler
+
+#============================ defines =========================================
+
+NUM_DISPATCHES = 10000
+NUM_CLIENTS    = [1,10,100]
+ADDRESS        = tuple([0xbb,0xbb]+[0x00]*6+[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01])
+
+#============================ helpers =========================================
+
+class _Client(eventBusClient.eventBusClient):
+    
+    def __init__(self,index):
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = 'client{0}'.format(index),
+            registrations    = [
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'signal{0}'.format(index),
+                    'callback' : self._notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : (ADDRESS,self.PROTO_UDP,index),
+                    'callback' : self._notif,
+                },
+            ]
+        )
+    
+    def _notif(self,sender,signal,data):
+        return True
+
+#============================ main ============================================
+
+def main(numDispatches=NUM_DISPATCHES):
+    
+    profiler = eventBusProfiler.eventBusProfiler()
+    output   = []
+    for numClients in NUM_CLIENTS:
+        
+        clients = [_Client(i) for i in range(numClients)]
+        sender  = _Client(numClients)
+        
+        for (name,signal) in [
+                ('exact',      'signal{0}'.format(numClients-1)),
+                ('udp',        (ADDRESS,eventBusClient.eventBusClient.PROTO_UDP,numClients-1)),
+                ('unknown',    'unknown'),
+            ]:
+            durations = []
+            for isTimed in [False,True]:
+                profiler.setEnabled(isTimed)
+                start    = time.time()
+                for _ in xrange(numDispatches):
+                    sender.dispatch(signal,None)
+                durations += [time.time()-start]
+            profiler.setEnabled(False)
+            output += ['{0:>3} clients {1:<8} {2:6.2f}us/dispatch, {3:6.2f}us/dispatch timed'.format(
+                numClients,name,
+                1000000*durations[0]/numDispatches,
+                1000000*durations[1]/numDispatches,
+            )]
+        
+        del clients
+        del sender
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
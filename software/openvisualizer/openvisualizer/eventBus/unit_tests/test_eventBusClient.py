@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # eventBus/
+
+import gc
+import logging
+import logging.handlers
+
+import pytest
+
+from pydispatch import dispatcher
+
+import eventBusClient
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_eventBusClient.log'
+
+import logging
+log = logging.getLogger('test_eventBusClient')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_eventBusClient',
+                   'eventBusClient',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+WILDCARD  = eventBusClient.eventBusClient.WILDCARD
+UDP       = eventBusClient.eventBusClient.PROTO_UDP
+ICMPv6    = eventBusClient.eventBusClient.PROTO_ICMPv6
+ADDR1     = (0xbb,0xbb,0x01)
+ADDR2     = (0xbb,0xbb,0x02)
+
+#============================ helpers =========================================
+
+class _Client(eventBusClient.eventBusClient):
+    '''
+    Records the signals it receives, through which registration, and
+    answers with a given value.
+    '''
+    
+    def __init__(self,name,signals=[],sender=WILDCARD,answer=None):
+        self.received = []
+        self.answer   = answer
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = name,
+            registrations    = [
+                {
+                    'sender'   : sender,
+                    'signal'   : s,
+                    'callback' : self._callbackFor(s),
+                } for s in signals
+            ],
+        )
+    
+    def _callbackFor(self,registeredSignal):
+        return lambda sender,signal,data: self._notif(registeredSignal,sender,signal,data)
+    
+    def _notif(self,registeredSignal,sender,signal,data):
+        self.received += [(registeredSignal,sender,signal,data)]
+        return self.answer
+
+#============================ tests ===========================================
+
+def test_exactSignal():
+    
+    client = _Client('client',['exact.a','exact.b'])
+    other  = _Client('other')
+    
+    other.dispatch('exact.a',1)
+    other.dispatch('exact.c',2)
+    other.dispatch('exact.b',3)
+    
+    assert client.received==[
+        ('exact.a','other','exact.a',1),
+        ('exact.b','other','exact.b',3),
+    ]
+
+def test_sender():
+    
+    client = _Client('client',['sender.a'],sender='expected')
+    other  = _Client('other')
+    
+    other.dispatch('sender.a',1)
+    dispatcher.send(sender='expected',signal='sender.a',data=2)
+    
+    assert client.received==[('sender.a','expected','sender.a',2)]
+
+@pytest.mark.parametrize('registered,dispatched,matches', [
+    ((ADDR1,UDP,1000),          (ADDR1,UDP,1000),         True),
+    ((ADDR1,UDP,1000),          (ADDR1,UDP,1001),         False),
+    ((ADDR1,UDP,1000),          (ADDR2,UDP,1000),         False),
+    ((ADDR1,UDP,1000),          (ADDR1,ICMPv6,1000),      False),
+    ((ADDR1,UDP,WILDCARD),      (ADDR1,UDP,1001),         True),
+    ((ADDR1,UDP,WILDCARD),      (ADDR1,ICMPv6,1001),      False),
+    ((WILDCARD,UDP,1000),       (ADDR2,UDP,1000),         True),
+    ((WILDCARD,WILDCARD,1000),  (ADDR2,ICMPv6,1000),      True),
+    ((WILDCARD,WILDCARD,1000),  (ADDR2,ICMPv6,1001),      False),
+    ((ADDR1,UDP,1000),          (ADDR1,UDP,WILDCARD),     True),
+    ((ADDR1,UDP,1000),          (WILDCARD,ICMPv6,1000),   False),
+    ((ADDR1,UDP,1000),          'tuple',                  False),
+])
+def test_tupleSignal(registered,dispatched,matches):
+    
+    client = _Client('client',[registered])
+    other  = _Client('other')
+    
+    other.dispatch(dispatched,None)
+    
+    assert client.received==([(registered,'other',dispatched,None)] if matches else [])
+
+def test_wildcardSignal():
+    
+    client = _Client('client',[WILDCARD])
+    other  = _Client('other')
+    
+    other.dispatch('wildcard.a',1)
+    other.dispatch((ADDR1,UDP,1000),2)
+    
+    assert client.received==[(WILDCARD,'other','wildcard.a',1)]
+
+def test_firstRegistration():
+    '''
+    A client gets a signal once, through the first registration matching it.
+    '''
+    
+    client = _Client('client',[(ADDR1,UDP,WILDCARD),(ADDR1,UDP,1000),WILDCARD,'first.a'])
+    other  = _Client('other')
+    
+    other.dispatch((ADDR1,UDP,1000),1)
+    other.dispatch('first.a',2)
+    
+    assert client.received==[
+        ((ADDR1,UDP,WILDCARD),'other',(ADDR1,UDP,1000),1),
+        (WILDCARD,            'other','first.a',       2),
+    ]
+
+def test_answer():
+    '''
+    The first answer, in the order the clients were created, is returned.
+    '''
+    
+    silent  = _Client('silent', ['answer.a'])
+    first   = _Client('first',  ['answer.a'],answer='first')
+    second  = _Client('second', ['answer.a'],answer='second')
+    other   = _Client('other')
+    
+    assert other._dispatchAndGetResult('answer.a',None)=='first'
+    assert other._dispatchProtocol('answer.a',None)
+    assert not other._dispatchProtocol('answer.b',None)
+    with pytest.raises(SystemError):
+        other._dispatchAndGetResult('answer.b',None)
+    assert len(silent.received)==len(first.received)==len(second.received)==2
+
+def test_register():
+    
+    client   = _Client('client')
+    other    = _Client('other')
+    callback = client._callbackFor('register.a')
+    
+    client.register(WILDCARD,'register.a',callback)
+    with pytest.raises(SystemError):
+        client.register(WILDCARD,'register.a',callback)
+    other.dispatch('register.a',1)
+    
+    client.unregister(WILDCARD,'register.a',callback)
+    other.dispatch('register.a',2)
+    
+    assert client.received==[('register.a','other','register.a',1)]
+
+def test_unregisterWildcard():
+    
+    client   = _Client('client')
+    other    = _Client('other')
+    callback = client._callbackFor('unregister')
+    
+    client.register(WILDCARD,(ADDR1,UDP,1000),callback)
+    client.register(WILDCARD,(ADDR1,UDP,1001),callback)
+    client.unregister(WILDCARD,(ADDR1,UDP,WILDCARD),callback)
+    
+    other.dispatch((ADDR1,UDP,1000),1)
+    other.dispatch((ADDR1,UDP,1001),2)
+    
+    assert client.received==[]
+    assert client.registrations==[]
+
+def test_garbageCollected():
+    
+    received = []
+    class _GcClient(eventBusClient.eventBusClient):
+        def __init__(self):
+            eventBusClient.eventBusClient.__init__(
+                self,
+                name             = 'gc',
+                registrations    = [
+                    {
+                        'sender'   : WILDCARD,
+                        'signal'   : 'gc.a',
+                        'callback' : self._notif,
+                    },
+                ],
+            )
+        def _notif(self,sender,signal,data):
+            received.append(data)
+    
+    client = _GcClient()
+    other  = _Client('other')
+    
+    other.dispatch('gc.a',1)
+    del client
+    gc.collect()
+    other.dispatch('gc.a',2)
+    
+    assert received==[1]
+    assert not [
+        r for r in eventBusClient._routingTable.index.routes if r.signal=='gc.a'
+    ]
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # eventBus/
+
+import logging
+import logging.handlers
+import threading
+import time
+
+import pytest
+
+import eventBusClient
+import eventBusExecutor
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_eventBusExecutor.log'
+
+import logging
+log = logging.getLogger('test_eventBusExecutor')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_eventBusExecutor',
+                   'eventBusClient',
+                   'eventBusExecutor',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT   = 10 # s
+WILDCARD  = eventBusClient.eventBusClient.WILDCARD
+
+#============================ helpers =========================================
+
+class _Client(eventBusClient.eventBusClient):
+    '''
+    Records the signals it receives, and from which thread. Its callback
+    waits for the gate to be open, and answers with its name.
+    '''
+    
+    def __init__(self,name,signal,**kwargs):
+        self.received = []
+        self.entered  = threading.Event()  # the callback was called
+        self.gate     = threading.Event()
+        self.gate.set()
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = name,
+            registrations    = [
+                {
+                    'sender'   : WILDCARD,
+                    'signal'   : signal,
+                    'callback' : self._notif,
+                },
+            ],
+            **kwargs
+        )
+    
+    def _notif(self,sender,signal,data):
+        self.entered.set()
+        assert self.gate.wait(TIMEOUT)
+        self.received += [(threading.current_thread().name,data)]
+        return self.name
+    
+    def waitFor(self,numReceived):
+        deadline = time.time()+TIMEOUT
+        while len(self.received)<numReceived and time.time()<deadline:
+            time.sleep(0.001)
+        return [data for (_,data) in self.received]
+
+@pytest.fixture
+def executor(request):
+    returnVal = eventBusExecutor.eventBusExecutor('testExecutor')
+    request.addfinalizer(returnVal.close)
+    return returnVal
+
+#============================ tests ===========================================
+
+def test_async(executor):
+    
+    client = _Client('client','async.a',executor=executor)
+    other  = _Client('other','none')
+    
+    for i in range(100):
+        other.dispatch('async.a',i)
+    
+    # delivered in order, by the executor
+    assert client.waitFor(100)==range(100)
+    assert set([thread for (thread,_) in client.received])==set(['testExecutor'])
+    
+    stats = client.getQueueStats()
+    assert stats['numQueued']==100
+    assert stats['numDropped']==0
+    assert stats['depth']==0
+    assert executor.getStats()=={'client': stats}
+
+def test_synchronous(executor):
+    '''
+    Signals dispatched to get an answer are delivered by the dispatching
+    thread, to asynchronous clients too.
+    '''
+    
+    client = _Client('client','sync.a',executor=executor)
+    other  = _Client('other','none')
+    
+    assert other._dispatchAndGetResult('sync.a',1)=='client'
+    assert other._dispatchProtocol('sync.a',2)
+    assert client.received==[
+        (threading.current_thread().name,1),
+        (threading.current_thread().name,2),
+    ]
+    assert client.getQueueStats()['numQueued']==0
+
+def test_dropWhenFull(executor):
+    
+    client = _Client('client','drop.a',executor=executor,queueSize=3,queuePolicy=eventBusExecutor.QUEUE_DROP)
+    other  = _Client('other','none')
+    
+    # the first signal is being delivered, the next 3 fill the queue
+    client.gate.clear()
+    other.dispatch('drop.a',0)
+    assert client.entered.wait(TIMEOUT)
+    for i in range(1,10):
+        other.dispatch('drop.a',i)
+    client.gate.set()
+    
+    assert client.waitFor(4)==[0,1,2,3]
+    stats = client.getQueueStats()
+    assert stats['numQueued']==4
+    assert stats['numDropped']==6
+    assert stats['maxDepth']==3
+
+def test_blockWhenFull(executor):
+    
+    client = _Client('client','block.a',executor=executor,queueSize=3,queuePolicy=eventBusExecutor.QUEUE_BLOCK)
+    other  = _Client('other','none')
+    
+    client.gate.clear()
+    dispatched = []
+    def _dispatch():
+        for i in range(10):
+            other.dispatch('block.a',i)
+            dispatched.append(i)
+    dispatcher = threading.Thread(target=_dispatch)
+    dispatcher.daemon = True
+    dispatcher.start()
+    
+    # the dispatching thread waits for room
+    assert client.entered.wait(TIMEOUT)
+    time.sleep(0.1)
+    assert dispatched==[0,1,2,3]
+    client.gate.set()
+    
+    assert client.waitFor(10)==range(10)
+    dispatcher.join(TIMEOUT)
+    stats = client.getQueueStats()
+    assert stats['numDropped']==0
+    assert stats['numBlocked']>=1
+
+def test_sharedExecutor():
+    
+    executor = eventBusExecutor.eventBusExecutor('sharedExecutor',numThreads=2)
+    try:
+        slow   = _Client('slow','shared.a',executor=executor)
+        fast   = _Client('fast','shared.a',executor=executor)
+        other  = _Client('other','none')
+        
+        # a slow client does not hold the others back...
+        slow.gate.clear()
+        for i in range(5):
+            other.dispatch('shared.a',i)
+        assert fast.waitFor(5)==range(5)
+        
+        # ...and gets its signals in order
+        slow.gate.set()
+        assert slow.waitFor(5)==range(5)
+        assert sorted(executor.getStats().keys())==['fast','slow']
+    finally:
+        executor.close()
+
+def test_inline():
+    
+    client = _Client('client','inline.a')
+    other  = _Client('other','none')
+    
+    other.dispatch('inline.a',1)
+    
+    assert client.received==[(threading.current_thread().name,1)]
+    assert client.getQueueStats() is None
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # eventBus/
+
+import logging
+import logging.handlers
+import random
+import time
+
+import pytest
+
+import eventBusClient
+import eventBusExecutor
+import eventBusProfiler
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_eventBusProfiler.log'
+
+import logging
+log = logging.getLogger('test_eventBusProfiler')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_eventBusProfiler',
+                   'eventBusClient',
+                   'eventBusExecutor',
+                   'eventBusProfiler',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT   = 10 # s
+WILDCARD  = eventBusClient.eventBusClient.WILDCARD
+
+#============================ helpers =========================================
+
+class _Client(eventBusClient.eventBusClient):
+    '''
+    Takes some time to handle the signals it receives.
+    '''
+    
+    def __init__(self,name,signal,delay=0,**kwargs):
+        self.delay    = delay
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = name,
+            registrations    = [
+                {
+                    'sender'   : WILDCARD,
+                    'signal'   : signal,
+                    'callback' : self._notif,
+                },
+            ],
+            **kwargs
+        )
+    
+    def _notif(self,sender,signal,data):
+        if self.delay:
+            time.sleep(self.delay)
+
+@pytest.fixture
+def profiler(request):
+    returnVal = eventBusProfiler.eventBusProfiler()
+    returnVal.reset()
+    returnVal.setEnabled(True)
+    def _disable():
+        returnVal.setEnabled(False)
+        returnVal.reset()
+    request.addfinalizer(_disable)
+    return returnVal
+
+def _statsOf(profiler,signal,subscriber):
+    for stats in profiler.getStats():
+        if (stats['signal'],stats['subscriber'])==(signal,subscriber):
+            return stats
+    return None
+
+#============================ tests ===========================================
+
+def test_histogramExact():
+    
+    histogram = eventBusProfiler.LatencyHistogram()
+    for value in range(1,11):
+        histogram.record(value/1000000.0)
+    
+    stats = histogram.getStats()
+    assert stats['count']==10
+    assert stats['total']==55
+    assert stats['min']==1
+    assert stats['max']==10
+    assert stats['p50']==5
+    assert stats['p90']==9
+    assert stats['p99']==10
+
+def test_histogramBuckets():
+    '''
+    The buckets are contiguous, and each holds values within
+    1/SUB_BUCKET_COUNT of each other.
+    '''
+    
+    histogram = eventBusProfiler.LatencyHistogram()
+    lastIndex = -1
+    for value in range(1<<16):
+        index = histogram._bucketIndex(value)
+        assert index in (lastIndex,lastIndex+1)
+        highest = histogram._bucketHighest(index)
+        assert value<=highest<=value*(1+1.0/eventBusProfiler.SUB_BUCKET_COUNT)
+        lastIndex = index
+
+def test_histogramPrecision():
+    
+    random.seed(1)
+    values    = sorted([int(random.expovariate(1/500.0)) for _ in range(10000)])
+    histogram = eventBusProfiler.LatencyHistogram()
+    for value in values:
+        histogram.record(value/1000000.0)
+    
+    for p in eventBusProfiler.PERCENTILES:
+        exact = values[int(round(len(values)*p/100.0))-1]
+        assert exact<=histogram.getPercentile(p)<=exact*(1+1.0/eventBusProfiler.SUB_BUCKET_COUNT)+1
+
+def test_disabled():
+    
+    profiler = eventBusProfiler.eventBusProfiler()
+    assert not profiler.isEnabled
+    client   = _Client('client','disabled.a')
+    other    = _Client('other','none')
+    
+    other.dispatch('disabled.a',None)
+    
+    assert _statsOf(profiler,'disabled.a','client') is None
+
+def test_setEnabled():
+    '''
+    Any true value enables the profiler, enabling it again does not restart
+    the timing.
+    '''
+    
+    profiler  = eventBusProfiler.eventBusProfiler()
+    try:
+        profiler.setEnabled('yes')
+        assert profiler.isEnabled is True
+        startTime = profiler.startTime
+        profiler.setEnabled(1)
+        assert profiler.startTime==startTime
+        profiler.setEnabled([])
+        assert profiler.isEnabled is False
+    finally:
+        profiler.setEnabled(False)
+        profiler.reset()
+
+def test_inline(profiler):
+    
+    fast     = _Client('fast','inline.a')
+    slow     = _Client('slow','inline.a',delay=0.01)
+    other    = _Client('other','none')
+    
+    for _ in range(5):
+        other.dispatch('inline.a',None)
+    
+    fastStats = _statsOf(profiler,'inline.a','fast')
+    slowStats = _statsOf(profiler,'inline.a','slow')
+    assert fastStats['count']==slowStats['count']==5
+    assert slowStats['min']>=10000
+    assert fastStats['max']<slowStats['min']
+    assert slowStats['rate']>0
+    
+    # slowest subscribers first
+    assert profiler.getStats()[0]['subscriber']=='slow'
+
+def test_async(profiler):
+    
+    executor = eventBusExecutor.eventBusExecutor('profiledExecutor')
+    try:
+        client = _Client('client','async.a',delay=0.005,executor=executor)
+        other  = _Client('other','none')
+        
+        for _ in range(3):
+            other.dispatch('async.a',None)
+        
+        # recorded after the callback returns
+        deadline = time.time()+TIMEOUT
+        while time.time()<deadline:
+            stats = _statsOf(profiler,'async.a','client')
+            if stats and stats['count']==3:
+                break
+            time.sleep(0.001)
+        assert stats['count']==3
+        assert stats['min']>=5000
+    finally:
+        executor.close()
@@ -9,6 +9,7 @@ log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
 from ParserException import ParserException
+import openvisualizer.openvisualizer_utils as u
 
 class ParsingKey(object):
     
@@ -42,33 +43,45 @@ class Parser(object):
         
         # local variables
         self.parsingKeys          = []
+        self.parsersByIndex       = []  # (index,{val: parser}), one per index the keys look at
         self.headerParsingKeys    = []
         self.named_tuple          = {}
     
     #======================== public ==========================================
     
     def parseInput(self,input):
+        '''
+        Parse a frame, by calling the subparser of its type.
+        
+        :param input: The frame, a string of bytes or a memoryview of one.
+            The subparser is handed a memoryview of the bytes after the
+            header, which does not copy them.
+        '''
         
         # log
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("received input={0}".format(input))
+            log.debug("received input={0}".format(u.formatStringBuf(input)))
         
         # ensure input not short longer than header
         self._checkLength(input)
         
+        if not isinstance(input,memoryview):
+            input = memoryview(input)
+        
         # parse the header
         # TODO
      
         # call the next header parser
-        for key in self.parsingKeys:
-            if input[key.index]==key.val:
-                return key.parser(input[self.headerLength:])
+        for (index,parsers) in self.parsersByIndex:
+            parser = parsers.get(ord(input[index]))
+            if parser:
+                return parser(input[self.headerLength:])
         
         # if you get here, no key was found
      
         raise ParserException(ParserException.NO_KEY, "type={0} (\"{1}\")".format(
-            input[0],
-            chr(input[0])))
+            ord(input[0]),
+            input[0]))
     
     #======================== private =========================================
     
@@ -77,4 +90,14 @@ class Parser(object):
             raise ParserException(ParserException.TOO_SHORT)
     
     def _addSubParser(self,index=None,val=None,parser=None):
-        self.parsingKeys.append(ParsingKey(index,val,parser))
\ No newline at end of file
+        key = ParsingKey(index,val,parser)
+        self.parsingKeys.append(key)
+        
+        # index the parser by the value of the byte it looks at, keeping
+        # the first one registered for a value
+        for (i,parsers) in self.parsersByIndex:
+            if i==index:
+                parsers.setdefault(val,parser)
+                break
+        else:
+            self.parsersByIndex.append((index,{val: parser}))
\ No newline at end of file
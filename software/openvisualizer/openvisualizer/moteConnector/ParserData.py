@@ -14,6 +14,7 @@ from pydispatch import dispatcher
 
 from ParserException import ParserException
 import Parser
+import openvisualizer.openvisualizer_utils as u
 
 class ParserData(Parser.Parser):
     
@@ -23,6 +24,9 @@ class ParserData(Parser.Parser):
     IPHC_SAM       = 4
     IPHC_DAM       = 0
     
+    ASN_STRUCT     = struct.Struct('<BHH')   # asn_4, asn_2_3, asn_0_1
+    ASN_LE_STRUCT  = struct.Struct('<HHB')   # asn_0_1, asn_2_3, asn_4
+    
      
     def __init__(self):
         
@@ -43,25 +47,23 @@ class ParserData(Parser.Parser):
     def parseInput(self,input):
         # log
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("received data {0}".format(input))
+            log.debug("received data {0}".format(u.formatStringBuf(input)))
         
         # ensure input not short longer than header
         self._checkLength(input)
    
-        headerBytes = input[:2]
         #asn comes in the next 5bytes.  
         
-        asnbytes=input[2:7]
-        (self._asn) = struct.unpack('<BHH',''.join([chr(c) for c in asnbytes]))
+        (self._asn) = self.ASN_STRUCT.unpack_from(input,2)
         
         #source and destination of the message
         dest = input[7:15]
         
         #source is elided!!! so it is not there.. check that.
-        source = input[15:23]
+        source = list(bytearray(input[15:23]))
         
         if log.isEnabledFor(logging.DEBUG):
-            a="".join(hex(c) for c in dest)
+            a="".join(hex(ord(c)) for c in dest)
             log.debug("destination address of the packet is {0} ".format(a))
         
         if log.isEnabledFor(logging.DEBUG):
@@ -71,10 +73,11 @@ class ParserData(Parser.Parser):
         # remove asn src and dest and mote id at the beginning.
         # this is a hack for latency measurements... TODO, move latency to an app listening on the corresponding port.
         # inject end_asn into the packet as well
-        input = input[23:]
+        asnbytes = input[2:7]
+        input    = input[23:]
         
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("packet without source,dest and asn {0}".format(input))
+            log.debug("packet without source,dest and asn {0}".format(u.formatStringBuf(input)))
         
         # when the packet goes to internet it comes with the asn at the beginning as timestamp.
          
@@ -82,14 +85,14 @@ class ParserData(Parser.Parser):
         # then notify a latency component that will plot that information.
         # port 61001==0xee,0x49
         if len(input) >37:
-           if input[36]==238 and input[37]==73:
+           if input[36]=='\xee' and input[37]=='\x49':
             # udp port 61001 for udplatency app.
                aux      = input[len(input)-5:]               # last 5 bytes of the packet are the ASN in the UDP latency packet
                diff     = self._asndiference(aux,asnbytes)   # calculate difference 
                timeinus = diff*self.MSPERSLOT                # compute time in ms
-               SN       = input[len(input)-23:len(input)-21] # SN sent by mote
-               parent   = input[len(input)-21:len(input)-13] # the parent node is the first element (used to know topology)
-               node     = input[len(input)-13:len(input)-5]  # the node address
+               SN       = list(bytearray(input[len(input)-23:len(input)-21])) # SN sent by mote
+               parent   = list(bytearray(input[len(input)-21:len(input)-13])) # the parent node is the first element (used to know topology)
+               node     = list(bytearray(input[len(input)-13:len(input)-5]))  # the node address
                
                if timeinus<0xFFFF:
                # notify latency manager component. only if a valid value
@@ -101,7 +104,7 @@ class ParserData(Parser.Parser):
                else:
                    # this usually happens when the serial port framing is not correct and more than one message is parsed at the same time. this will be solved with HDLC framing.
                    print "Wrong latency computation {0} = {1} mS".format(str(node),timeinus)
-                   print ",".join(hex(c) for c in input)
+                   print ",".join(hex(ord(c)) for c in input)
                    log.warning("Wrong latency computation {0} = {1} mS".format(str(node),timeinus))
                    pass
                # in case we want to send the computed time to internet..
@@ -117,14 +120,14 @@ class ParserData(Parser.Parser):
        
         eventType='data'
         # notify a tuple including source as one hop away nodes elide SRC address as can be inferred from MAC layer header
-        return eventType, (source, input)
+        return eventType, (source, list(bytearray(input)))
 
  #======================== private =========================================
  
     def _asndiference(self,init,end):
       
-       asninit = struct.unpack('<HHB',''.join([chr(c) for c in init]))
-       asnend  = struct.unpack('<HHB',''.join([chr(c) for c in end]))
+       asninit = self.ASN_LE_STRUCT.unpack_from(init)
+       asnend  = self.ASN_LE_STRUCT.unpack_from(end)
        if asnend[2] != asninit[2]: #'byte4'
           return 0xFFFFFFFF
        else:
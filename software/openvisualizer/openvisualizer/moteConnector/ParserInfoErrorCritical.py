@@ -14,11 +14,14 @@ from ParserException import ParserException
 import Parser
 
 import StackDefines
+import openvisualizer.openvisualizer_utils as u
 
 class ParserInfoErrorCritical(Parser.Parser):
     
     HEADER_LENGTH       = 1
     
+    FIELDS_STRUCT       = struct.Struct('>HBBHH')   # moteId, callingComponent, error_code, arg1, arg2
+    
     SEVERITY_INFO       = ord('I')
     SEVERITY_ERROR      = ord('E')
     SEVERITY_CRITICAL   = ord('C')
@@ -26,6 +29,10 @@ class ParserInfoErrorCritical(Parser.Parser):
                            SEVERITY_ERROR,
                            SEVERITY_CRITICAL,]
     
+    LOG_LEVELS          = {SEVERITY_INFO:       logging.INFO,
+                           SEVERITY_ERROR:      logging.ERROR,
+                           SEVERITY_CRITICAL:   logging.CRITICAL,}
+    
     def __init__(self,severity):
         assert severity in self.SEVERITY_ALL
         
@@ -34,6 +41,7 @@ class ParserInfoErrorCritical(Parser.Parser):
         
         # store params
         self.severity   = severity
+        self.logLevel   = self.LOG_LEVELS[severity]
         
         # initialize parent class
         Parser.Parser.__init__(self,self.HEADER_LENGTH)
@@ -44,36 +52,29 @@ class ParserInfoErrorCritical(Parser.Parser):
         
         # log
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("received data {0}".format(input))
+            log.debug("received data {0}".format(u.formatStringBuf(input)))
         
         # parse packet
-        try:
-           (moteId,
-            callingComponent,
-            error_code,
-            arg1,
-            arg2) = struct.unpack('>HBBHH',''.join([chr(c) for c in input]))
-        except struct.error:
-            raise ParserException(ParserException.DESERIALIZE,"could not extract data from {0}".format(input))
+        if len(input)!=self.FIELDS_STRUCT.size:
+            raise ParserException(ParserException.DESERIALIZE,"could not extract data from {0}".format(u.formatStringBuf(input)))
+        (moteId,
+         callingComponent,
+         error_code,
+         arg1,
+         arg2) = self.FIELDS_STRUCT.unpack_from(input)
         
-        # turn into string
-        output = "{MOTEID:x} [{COMPONENT}] {ERROR_DESC}".format(
-            COMPONENT  = self._translateCallingComponent(callingComponent),
-            MOTEID     = moteId,
-            ERROR_DESC = self._translateErrorDescription(error_code,arg1,arg2),
-        )
-        
-        # log
-        if   self.severity==self.SEVERITY_INFO:
-            log.info(output)
-        elif self.severity==self.SEVERITY_ERROR:
-            log.error(output)
-        elif self.severity==self.SEVERITY_CRITICAL:
-            log.critical(output)
-        else:
-            raise SystemError("unexpected severity={0}".format(self.severity))
+        # log, turned into a string only if it is logged
+        if log.isEnabledFor(self.logLevel):
+            log.log(
+                self.logLevel,
+                "{MOTEID:x} [{COMPONENT}] {ERROR_DESC}".format(
+                    COMPONENT  = self._translateCallingComponent(callingComponent),
+                    MOTEID     = moteId,
+                    ERROR_DESC = self._translateErrorDescription(error_code,arg1,arg2),
+                ),
+            )
         
-        return 'error', input
+        return 'error', input.tobytes()
     
     #======================== private =========================================
     
@@ -14,6 +14,7 @@ from pydispatch import dispatcher
 
 from ParserException import ParserException
 import Parser
+import openvisualizer.openvisualizer_utils as u
 
 class ParserPacket(Parser.Parser):
     
@@ -35,15 +36,13 @@ class ParserPacket(Parser.Parser):
     def parseInput(self,input):
         # log
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("received packet {0}".format(input))
+            log.debug("received packet {0}".format(u.formatStringBuf(input)))
         
         # ensure input not short longer than header
         self._checkLength(input)
    
-        headerBytes = input[:2]
-        
         # remove mote id at the beginning.
-        input = input[2:]
+        input = list(bytearray(input[2:]))
         
         if log.isEnabledFor(logging.DEBUG):
             log.debug("packet without header {0}".format(input))
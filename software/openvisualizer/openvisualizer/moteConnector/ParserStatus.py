@@ -21,12 +21,14 @@ class FieldParsingKey(object):
         self.index      = index
         self.val        = val
         self.name       = name
-        self.structure  = structure
+        self.structure  = struct.Struct(structure)
         self.fields     = fields
+        self.tupleClass = collections.namedtuple("Tuple_"+name, fields)
 
 class ParserStatus(Parser.Parser):
     
     HEADER_LENGTH       = 4
+    HEADER_STRUCT       = struct.Struct('<HB')   # moteId, statusElem
     
     def __init__(self):
         
@@ -37,7 +39,7 @@ class ParserStatus(Parser.Parser):
         Parser.Parser.__init__(self,self.HEADER_LENGTH)
         
         # local variables
-        self.fieldsParsingKeys    = []
+        self.fieldsParsingKeys    = {}  # statusElem -> FieldParsingKey
         
         # register fields
         self._addFieldsParser   (
@@ -225,69 +227,60 @@ class ParserStatus(Parser.Parser):
         
         # log
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("received input={0}".format(input))
+            log.debug("received input={0}".format(u.formatStringBuf(input)))
         
         # ensure input not short longer than header
         self._checkLength(input)
         
-        headerBytes = input[:3]
-        
         # extract moteId and statusElem
-        try:
-           (moteId,statusElem) = struct.unpack('<HB',''.join([chr(c) for c in headerBytes]))
-        except struct.error:
-            raise ParserException(ParserException.DESERIALIZE,"could not extract moteId and statusElem from {0}".format(headerBytes))
+        (moteId,statusElem) = self.HEADER_STRUCT.unpack_from(input)
         
         # log
         if log.isEnabledFor(logging.DEBUG):
             log.debug("moteId={0} statusElem={1}".format(moteId,statusElem))
         
-        # jump the header bytes
-        input = input[3:]
+        # the fields follow the header bytes
+        offset = self.HEADER_STRUCT.size
         
         # call the next header parser
-        for key in self.fieldsParsingKeys:
-            if statusElem==key.val:
-            
-                # log
-                if log.isEnabledFor(logging.DEBUG):
-                    log.debug("parsing {0}, ({1} bytes) as {2}".format(input,len(input),key.name))
-                
-                # parse byte array
-                try:
-                    fields = struct.unpack(key.structure,''.join([chr(c) for c in input]))                     
-                except struct.error as err:
-                    raise ParserException(
-                            ParserException.DESERIALIZE,
-                            "could not extract tuple {0} by applying {1} to {2}; error: {3}".format(
-                                key.name,
-                                key.structure,
-                                u.formatBuf(input),
-                                str(err)
-                            )
-                        )
-                
-                # map to name tuple
-                returnTuple = self.named_tuple[key.name](*fields)
-                
-                # log
-                if log.isEnabledFor(logging.DEBUG):
-                    log.debug("parsed into {0}".format(returnTuple))
-                
-                # map to name tuple
-                return 'status', returnTuple
+        key = self.fieldsParsingKeys.get(statusElem)
+        if not key:
+            raise ParserException(ParserException.NO_KEY, "type={0} (\"{1}\")".format(
+                ord(input[offset]),
+                input[offset]))
+        
+        # log
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("parsing {0}, ({1} bytes) as {2}".format(u.formatStringBuf(input[offset:]),len(input)-offset,key.name))
+        
+        # parse byte array
+        if len(input)-offset!=key.structure.size:
+            raise ParserException(
+                    ParserException.DESERIALIZE,
+                    "could not extract tuple {0} by applying {1} to {2}; error: {3}".format(
+                        key.name,
+                        key.structure.format,
+                        u.formatStringBuf(input[offset:]),
+                        'expected {0} bytes'.format(key.structure.size),
+                    )
+                )
+        
+        # map to name tuple
+        returnTuple = key.tupleClass._make(key.structure.unpack_from(input,offset))
+        
+        # log
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("parsed into {0}".format(returnTuple))
         
-        # if you get here, no key was found
-        raise ParserException(ParserException.NO_KEY, "type={0} (\"{1}\")".format(
-            input[0],
-            chr(input[0])))
+        return 'status', returnTuple
     
     #======================== private =========================================
     
     def _addFieldsParser(self,index=None,val=None,name=None,structure=None,fields=None):
     
-        # add to fields parsing keys
-        self.fieldsParsingKeys.append(FieldParsingKey(index,val,name,structure,fields))
+        # add to fields parsing keys, indexed by statusElem
+        key = FieldParsingKey(index,val,name,structure,fields)
+        self.fieldsParsingKeys[val] = key
         
         # define named tuple
-        self.named_tuple[name] = collections.namedtuple("Tuple_"+name, fields)
\ No newline at end of file
+        self.named_tuple[name] = key.tupleClass
\ No newline at end of file
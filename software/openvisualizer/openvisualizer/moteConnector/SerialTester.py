@@ -68,13 +68,13 @@ class SerialTester(eventBusClient.eventBusClient):
     def _receiveDataFromMoteSerial(self,sender,signal,data):
         
         # handle data
-        if chr(data[0])==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_DATA):
+        if data[0]==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_DATA):
             # don't handle if I'm not testing
             with self.dataLock:
                 if not self.busyTesting:
                     return
             with self.dataLock:
-               self.lastReceived = data[1+2+5:] # type (1B), moteId (2B), ASN (5B)
+               self.lastReceived = [ord(c) for c in data[1+2+5:]] # type (1B), moteId (2B), ASN (5B)
                # wake up other thread
                self.waitForReply.set()
     
@@ -66,11 +66,12 @@ class moteConnector(eventBusClient.eventBusClient):
         
     def _sendToParser(self,data):
         
+        # the frame, a string of bytes, is handed to the parsers without copy
         input = data
         
         # log
         if log.isEnabledFor(logging.DEBUG):
-            log.debug("received input={0}".format(input))
+            log.debug("received input={0}".format(u.formatStringBuf(input)))
         
         # parse input
         try:
@@ -0,0 +1,118 @@
+'''
+This is a performance test which measures the cost of OpenParser.parseInput(),
+per type of frame: status frames, per status element, data frames and
+error frames.
+
+Run this test with 'python bench_OpenParser.py [numRounds] [corpusFile]'.
+By default, it parses 10000 times a corpus holding one frame of each type.
+The corpus can instead be read from a capture, recorded by
+'openVisualizerApp.py --capture <corpusFile>', or from a file holding one
+hex-encoded frame, as received from a mote, per line.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # moteConnector/
+
+import random
+import struct
+import time
+
+import OpenParser
+from openvisualizer.moteProbe import moteProbeCapture
+
+#============================ defines =========================================
+
+NUM_ROUNDS    = 10000
+MOTEID        = 0x0001
+
+#============================ helpers =========================================
+
+def _buildCorpus():
+    '''
+    One frame of each type, with random field values.
+    '''
+    
+    random.seed(0)
+    parser    = OpenParser.OpenParser()
+    
+    returnVal = []
+    for key in parser.parserStatus.fieldsParsingKeys.values():
+        returnVal += [
+            'S'+struct.pack('<HB',MOTEID,key.val)+''.join(
+                [chr(random.randint(0x00,0xff)) for _ in range(key.structure.size)]
+            )
+        ]
+    returnVal += [
+        'D'+struct.pack('<H',MOTEID)+''.join(
+            [chr(random.randint(0x00,0xff)) for _ in range(5+8+8+80)]
+        )
+    ]
+    returnVal += ['E'+struct.pack('>HBBHH',MOTEID,1,2,3,4)]
+    return returnVal
+
+def _readCorpus(corpusFile):
+    with open(corpusFile,'rb') as f:
+        isCapture = f.read(len(moteProbeCapture.FILE_MAGIC))==moteProbeCapture.FILE_MAGIC
+    if isCapture:
+        return [frame for (_,_,frame) in moteProbeCapture.readCapture(corpusFile) if frame]
+    with open(corpusFile,'r') as f:
+        return [line.strip().decode('hex') for line in f if line.strip()]
+
+def _frameType(frame):
+    '''
+    :returns: The type of the frame, and its status element if a status
+        frame, -1 otherwise.
+    '''
+    if frame[0]=='S' and len(frame)>3:
+        return (frame[0],ord(frame[3]))
+    return (frame[0],-1)
+
+def _formatFrameType(frameType):
+    if frameType[1]==-1:
+        return frameType[0]
+    return '{0}/{1}'.format(*frameType)
+
+#============================ main ============================================
+
+def main(numRounds=NUM_ROUNDS,corpusFile=None):
+    
+    if corpusFile:
+        corpus = _readCorpus(corpusFile)
+    else:
+        corpus = _buildCorpus()
+    
+    parser = OpenParser.OpenParser()
+    
+    # group the frames by type
+    framesPerType = {}
+    for frame in corpus:
+        framesPerType.setdefault(_frameType(frame),[]).append(frame)
+    
+    output     = []
+    totalTime  = 0
+    totalCount = 0
+    for frameType in sorted(framesPerType.keys()):
+        frames = framesPerType[frameType]
+        start  = time.time()
+        for _ in xrange(numRounds):
+            for frame in frames:
+                parser.parseInput(frame)
+        duration    = time.time()-start
+        count       = numRounds*len(frames)
+        totalTime  += duration
+        totalCount += count
+        output += ['{0:<6} {1:>8} frames {2:>6.2f}us/frame'.format(
+            _formatFrameType(frameType),count,1e6*duration/count,
+        )]
+    output += ['all    {0:>8} frames {1:>6.2f}us/frame ({2:.0f} frames/s)'.format(
+        totalCount,1e6*totalTime/totalCount,totalCount/totalTime,
+    )]
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    args = sys.argv[1:]
+    main(*([int(a) for a in args[:1]]+args[1:2]))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteConnector/
+
+import json
+import struct
+
+import pytest
+
+import OpenParser
+from ParserException import ParserException
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_OpenParser.log'
+
+import logging
+log = logging.getLogger('test_OpenParser')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_OpenParser',
+                        'OpenParser',
+                        'Parser',
+                        'ParserStatus',
+                        'ParserData',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTEID = 0x1234
+
+#============================ fixtures ========================================
+
+STATUSFRAMES = [
+    # statusElem  format       values                      expected name
+    json.dumps((0,  '<B',        [1],                        'IsSync')),
+    json.dumps((2,  '<H',        [0x0a0b],                   'MyDagRank')),
+    json.dumps((4,  '<BHH',      [0x01,0x0203,0x0405],       'Asn')),
+    json.dumps((5,  '<BBhhBII',  [1,2,-3,4,5,6,7],           'MacStats')),
+    json.dumps((10, '<H',        [0xfffe],                   'kaPeriod')),
+]
+
+@pytest.fixture(params=STATUSFRAMES)
+def statusFrame(request):
+    return json.loads(request.param)
+
+#============================ helpers =========================================
+
+def _statusFrame(statusElem,structure,values):
+    return 'S'+struct.pack('<HB',MOTEID,statusElem)+struct.pack(structure,*values)
+
+#============================ tests ===========================================
+
+def test_parseStatus(statusFrame):
+    
+    (statusElem,structure,values,name) = statusFrame
+    
+    parser = OpenParser.OpenParser()
+    
+    (eventSubType,parsed) = parser.parseInput(_statusFrame(statusElem,structure,values))
+    
+    assert eventSubType=='status'
+    assert type(parsed).__name__=='Tuple_'+name
+    assert list(parsed)==values
+
+def test_parseStatusWrongLength():
+    
+    parser = OpenParser.OpenParser()
+    
+    frame  = _statusFrame(4,'<BHH',[0x01,0x0203,0x0405])
+    for wrongFrame in [frame[:-1],frame+'\x00']:
+        with pytest.raises(ParserException) as excinfo:
+            parser.parseInput(wrongFrame)
+        assert excinfo.value.errorCode==ParserException.DESERIALIZE
+
+def test_parseData():
+    
+    parser  = OpenParser.OpenParser()
+    
+    source  = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+    dest    = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+    payload = [0x78,0x33,0x3a,0x01,0x02]
+    frame   = 'D'+struct.pack('<H',MOTEID)+'\x01\x02\x03\x04\x05'
+    frame  += ''.join([chr(b) for b in dest+source+payload])
+    
+    (eventSubType,parsed) = parser.parseInput(frame)
+    
+    assert eventSubType=='data'
+    assert parsed==(source,payload)
+
+def test_parseError():
+    
+    parser = OpenParser.OpenParser()
+    
+    frame  = 'E'+struct.pack('>HBBHH',MOTEID,1,2,3,4)
+    
+    assert parser.parseInput(frame)==('error',frame[1:])
+    with pytest.raises(ParserException):
+        parser.parseInput(frame[:-1])
+
+def test_parseNoKey():
+    
+    parser = OpenParser.OpenParser()
+    
+    with pytest.raises(ParserException) as excinfo:
+        parser.parseInput('Z\x00\x00')
+    assert excinfo.value.errorCode==ParserException.NO_KEY
+    
+    with pytest.raises(ParserException) as excinfo:
+        parser.parseInput(_statusFrame(0xff,'<B',[0]))
+    assert excinfo.value.errorCode==ParserException.NO_KEY
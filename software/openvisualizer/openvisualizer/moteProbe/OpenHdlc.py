@@ -135,4 +135,134 @@ class OpenHdlc(object):
     
     def _crcIteration(self,crc,b):
         return (crc>>8)^self.FCS16TAB[((crc^(ord(b))) & 0xff)]
-    
\ No newline at end of file
+
+class HdlcDecoder(object):
+    '''
+    Extracts the HDLC frames from a stream of bytes, whatever the chunks the
+    bytes are received in.
+    
+    The bytes of a frame are unescaped as they are received, into a buffer
+    which is reused from one frame to the next. The CRC is checked once the
+    closing flag is received.
+    '''
+    
+    FRAME_CAPACITY         = 256    # initial size of the buffer, grown if needed
+    
+    def __init__(self,name=''):
+        
+        # store params
+        self.name                 = name
+        
+        # local variables
+        self.buf                  = bytearray(self.FRAME_CAPACITY)
+        self.bufLen               = 0       # number of unescaped bytes in buf
+        self.busyReceiving        = False
+        self.lastRxByteWasFlag    = True
+        self.escaping             = False   # the last byte received was an escape
+        self.numFrames            = 0
+        self.numInvalid           = 0
+    
+    #============================ public ======================================
+    
+    def feed(self,rxBytes):
+        '''
+        Process bytes received.
+        
+        :param rxBytes: A string of bytes, as received.
+        
+        :returns: A list of the frames completed by these bytes, with their
+            flags, escapes and CRC removed. Invalid frames are logged and
+            dropped.
+        '''
+        
+        returnVal = []
+        pos       = 0
+        end       = len(rxBytes)
+        
+        while pos<end:
+            if not self.busyReceiving:
+                if self.lastRxByteWasFlag and rxBytes[pos]!=OpenHdlc.HDLC_FLAG:
+                    # start of frame
+                    self.busyReceiving       = True
+                    self.bufLen              = 0
+                    self.escaping            = False
+                else:
+                    # skip to the next flag
+                    flagPos = rxBytes.find(OpenHdlc.HDLC_FLAG,pos)
+                    if flagPos==-1:
+                        self.lastRxByteWasFlag = False
+                        break
+                    self.lastRxByteWasFlag   = True
+                    pos                      = flagPos+1
+            else:
+                flagPos = rxBytes.find(OpenHdlc.HDLC_FLAG,pos)
+                if flagPos==-1:
+                    # middle of frame
+                    self._append(rxBytes[pos:])
+                    break
+                
+                # end of frame
+                self._append(rxBytes[pos:flagPos])
+                self.busyReceiving           = False
+                self.lastRxByteWasFlag       = True
+                pos                          = flagPos+1
+                try:
+                    returnVal               += [self._checkFrame()]
+                except HdlcException as err:
+                    self.numInvalid         += 1
+                    log.warning('{0}: invalid serial frame: {1}'.format(self.name,err))
+                else:
+                    self.numFrames          += 1
+        
+        return returnVal
+    
+    def getStats(self):
+        return {
+            'numFrames':          self.numFrames,
+            'numInvalid':         self.numInvalid,
+        }
+    
+    #============================ private =====================================
+    
+    def _append(self,chunk):
+        '''
+        Unescape a chunk of a frame, at the end of the buffer.
+        '''
+        
+        if not chunk:
+            return
+        
+        if self.escaping:
+            # the first byte was escaped at the end of the previous chunk
+            self.buf[self.bufLen:self.bufLen+1] = chr(ord(chunk[0])^0x20)
+            self.bufLen  += 1
+            self.escaping = False
+            chunk         = chunk[1:]
+        
+        if OpenHdlc.HDLC_ESCAPE in chunk:
+            parts = chunk.split(OpenHdlc.HDLC_ESCAPE)
+            if not parts[-1]:
+                # the escaped byte is in the next chunk
+                self.escaping = True
+            chunk = parts[0]+''.join(
+                [chr(ord(p[0])^0x20)+p[1:] for p in parts[1:] if p]
+            )
+        
+        newLen = self.bufLen+len(chunk)
+        self.buf[self.bufLen:newLen] = chunk
+        self.bufLen = newLen
+    
+    def _checkFrame(self):
+        
+        if self.bufLen<2:
+            raise HdlcException('packet too short')
+        
+        frame = self.buf[:self.bufLen]
+        crc   = OpenHdlc.HDLC_CRCINIT
+        table = OpenHdlc.FCS16TAB
+        for b in frame:
+            crc = (crc>>8)^table[(crc^b)&0xff]
+        if crc!=OpenHdlc.HDLC_CRCGOOD:
+            raise HdlcException('wrong CRC')
+        
+        return str(frame[:-2])
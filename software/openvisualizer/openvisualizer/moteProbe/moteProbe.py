@@ -15,6 +15,7 @@ elif os.name=='posix':  # Linux
    import glob
    import platform      # To recognize MAC OS X
 import threading
+import errno
 
 import serial
 import socket
@@ -23,6 +24,7 @@ import sys
 
 from   pydispatch import dispatcher
 import OpenHdlc
+import moteProbeQueue
 import openvisualizer.openvisualizer_utils as u
 from   openvisualizer.moteConnector import OpenParser
 
@@ -89,7 +91,32 @@ class moteProbe(threading.Thread):
         MODE_IOTLAB,
     ]
     
-    def __init__(self,serialport=None,emulatedMote=None,iotlabmote=None):
+    IOTLAB_RECV_SIZE = 4096
+    IOTLAB_PORT      = 20000
+    CONNECT_PENDING  = [              # connect_ex() of a non-blocking socket
+        errno.EINPROGRESS,
+        errno.EWOULDBLOCK,
+        errno.EALREADY,
+        getattr(errno,'WSAEWOULDBLOCK',errno.EWOULDBLOCK),
+    ]
+    MOTE2PC_REQUEST  = chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST)
+    PC2MOTE_DATA     = chr(OpenParser.OpenParser.SERFRAME_PC2MOTE_DATA)
+    
+    FRAMES_PER_REQUEST = 1    # frames written, at most, per request of the mote: openserial
+                              # keeps one input frame, the next overwriting it
+    MOTE_RX_BUFFER     = 200  # bytes, SERIAL_INPUT_BUFFER_SIZE of the firmware
+    
+    def __init__(self,serialport=None,emulatedMote=None,iotlabmote=None,reactor=None,capture=None,framesPerRequest=FRAMES_PER_REQUEST):
+        '''
+        :param reactor: The moteProbeReactor which reads from the port. By
+            default, the moteProbe reads from it in its own thread.
+        :param capture: The moteProbeCapture to record the frames received
+            to, if any.
+        :param framesPerRequest: The number of frames written, at most, when
+            the mote requests data, as long as they fit in its RX buffer.
+            More than one only for firmware which buffers several input
+            frames.
+        '''
         
         # verify params
         if   serialport:
@@ -128,12 +155,11 @@ class moteProbe(threading.Thread):
         )
         
         # local variables
+        self.capture              = capture
         self.hdlc                 = OpenHdlc.OpenHdlc()
-        self.lastRxByte           = self.hdlc.HDLC_FLAG
-        self.busyReceiving        = False
-        self.inputBuf             = ''
-        self.outputBuf            = []
-        self.outputBufLock        = threading.RLock()
+        self.hdlcDecoder          = OpenHdlc.HdlcDecoder('moteProbe@'+self.portname)
+        self.framesPerRequest     = framesPerRequest
+        self.outputQueue          = moteProbeQueue.moteProbeQueue()
         self.dataLock             = threading.Lock()
         # flag to permit exit from read loop
         self.goOn                 = True
@@ -154,9 +180,14 @@ class moteProbe(threading.Thread):
             self._bufferDataToSend,
             signal = 'fromMoteConnector@'+self.portname,
         )
-    
-        # start myself
-        self.start()
+        
+        if reactor:
+            # the reactor polls my port, along with the others
+            assert self.mode!=self.MODE_EMULATED
+            reactor.addProbe(self)
+        else:
+            # start myself
+            self.start()
     
     #======================== thread ==========================================
     
@@ -164,32 +195,19 @@ class moteProbe(threading.Thread):
         try:
             # log
             log.info("start running")
-        
+            
             while self.goOn:     # open serial port
                 
-                # log 
-                log.info("open port {0}".format(self.portname))
-                
-                if   self.mode==self.MODE_SERIAL:
-                    self.serial = serial.Serial(self.serialport,self.baudrate)
-                    self.serial.setDTR(0)
-                    self.serial.setRTS(0)
-                elif self.mode==self.MODE_EMULATED:
-                    self.serial = self.emulatedMote.bspUart
-                elif self.mode==self.MODE_IOTLAB:
-                    self.serial = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
-                    self.serial.connect((self.iotlabmote,20000))
-                else:
-                    raise SystemError()
+                self._openPort()
                 
                 while self.goOn: # read bytes from serial port
                     try:
                         if   self.mode==self.MODE_SERIAL:
-                            rxBytes = self.serial.read(1)
+                            rxBytes = self.serial.read(self.serial.inWaiting() or 1)
                         elif self.mode==self.MODE_EMULATED:
                             rxBytes = self.serial.read()
                         elif self.mode==self.MODE_IOTLAB:
-                            rxBytes = self.serial.recv(1024)
+                            rxBytes = self.serial.recv(self.IOTLAB_RECV_SIZE)
                         else:
                             raise SystemError()
                     except Exception as err:
@@ -198,60 +216,7 @@ class moteProbe(threading.Thread):
                         time.sleep(1)
                         break
                     else:
-                        for rxByte in rxBytes:
-                            if      (
-                                        (not self.busyReceiving)             and 
-                                        self.lastRxByte==self.hdlc.HDLC_FLAG and
-                                        rxByte!=self.hdlc.HDLC_FLAG
-                                    ):
-                                # start of frame
-                                if log.isEnabledFor(logging.DEBUG):
-                                    log.debug("{0}: start of hdlc frame {1} {2}".format(self.name, u.formatStringBuf(self.hdlc.HDLC_FLAG), u.formatStringBuf(rxByte)))
-                                self.busyReceiving       = True
-                                self.inputBuf            = self.hdlc.HDLC_FLAG
-                                self.inputBuf           += rxByte
-                            elif    (
-                                        self.busyReceiving                   and
-                                        rxByte!=self.hdlc.HDLC_FLAG
-                                    ):
-                                # middle of frame
-                                
-                                self.inputBuf           += rxByte
-                            elif    (
-                                        self.busyReceiving                   and
-                                        rxByte==self.hdlc.HDLC_FLAG
-                                    ):
-                                # end of frame
-                                if log.isEnabledFor(logging.DEBUG):
-                                    log.debug("{0}: end of hdlc frame {1} ".format(self.name, u.formatStringBuf(rxByte)))
-                                self.busyReceiving       = False
-                                self.inputBuf           += rxByte
-                                
-                                try:
-                                    tempBuf = self.inputBuf
-                                    self.inputBuf        = self.hdlc.dehdlcify(self.inputBuf)
-                                    if log.isEnabledFor(logging.DEBUG):
-                                        log.debug("{0}: {2} dehdlcized input: {1}".format(self.name, u.formatStringBuf(self.inputBuf), u.formatStringBuf(tempBuf)))
-                                except OpenHdlc.HdlcException as err:
-                                    log.warning('{0}: invalid serial frame: {2} {1}'.format(self.name, err, u.formatStringBuf(tempBuf)))
-                                else:
-                                    if self.inputBuf==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST):
-                                        with self.outputBufLock:
-                                            if self.outputBuf:
-                                                outputToWrite = self.outputBuf.pop(0)
-                                                self.serial.write(outputToWrite)
-                                    else:
-                                        # dispatch
-                                        dispatcher.send(
-                                            sender        = self.name,
-                                            signal        = 'fromMoteProbe@'+self.portname,
-                                            data          = [ord(c) for c in self.inputBuf],
-                                        )
-                            
-                            self.lastRxByte = rxByte
-                        
-                    if self.mode==self.MODE_EMULATED:
-                        self.serial.doneReading()
+                        self._handleRxBytes(rxBytes)
         except Exception as err:
             errMsg=u.formatCrashMessage(self.name,err)
             print errMsg
@@ -268,11 +233,81 @@ class moteProbe(threading.Thread):
         with self.dataLock:
             return self.baudrate
     
+    def getStats(self):
+        '''
+        :returns: The statistics of the frames written to the mote, see
+            moteProbeQueue.getStats().
+        '''
+        return self.outputQueue.getStats()
+    
     def close(self):
         self.goOn = False
     
     #======================== private =========================================
     
+    def _openPort(self,nonBlocking=False):
+        '''
+        Open the serial port, or the connection to the IoT-LAB mote.
+        
+        :param nonBlocking: Whether reads should return immediately, when
+            the port is polled by a moteProbeReactor. The connection to the
+            IoT-LAB mote is then not waited for either.
+        
+        :returns: False if the connection to the IoT-LAB mote is still in
+            progress, the socket becoming writable once it completes, True
+            if the port is open.
+        '''
+        
+        # log 
+        log.info("open port {0}".format(self.portname))
+        
+        if   self.mode==self.MODE_SERIAL:
+            self.serial = serial.Serial(self.serialport,self.baudrate,timeout=0 if nonBlocking else None)
+            self.serial.setDTR(0)
+            self.serial.setRTS(0)
+        elif self.mode==self.MODE_EMULATED:
+            self.serial = self.emulatedMote.bspUart
+        elif self.mode==self.MODE_IOTLAB:
+            self.serial = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+            if nonBlocking:
+                self.serial.setblocking(0)
+                err = self.serial.connect_ex((self.iotlabmote,self.IOTLAB_PORT))
+                if err in self.CONNECT_PENDING:
+                    return False
+                if err:
+                    self.serial.close()
+                    raise socket.error(err,os.strerror(err))
+            else:
+                self.serial.connect((self.iotlabmote,self.IOTLAB_PORT))
+        else:
+            raise SystemError()
+        
+        return True
+    
+    def _handleRxBytes(self,rxBytes):
+        '''
+        Dispatch the frames completed by bytes received from the mote, or
+        answer its requests for data.
+        '''
+        for frame in self.hdlcDecoder.feed(rxBytes):
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("{0}: dehdlcized input: {1}".format(self.name, u.formatStringBuf(frame)))
+            if frame==self.MOTE2PC_REQUEST:
+                outputToWrite = self.outputQueue.drain(self.framesPerRequest,self.MOTE_RX_BUFFER)
+                if outputToWrite:
+                    self.serial.write(''.join(outputToWrite))
+            else:
+                # record
+                if self.capture:
+                    self.capture.write(self.portname,frame)
+                
+                # dispatch
+                dispatcher.send(
+                    sender        = self.name,
+                    signal        = 'fromMoteProbe@'+self.portname,
+                    data          = frame,
+                )
+    
     def _bufferDataToSend(self,data):
         
         # abort for IoT-LAB
@@ -282,6 +317,9 @@ class moteProbe(threading.Thread):
         # frame with HDLC
         hdlcData = self.hdlc.hdlcify(data)
         
-        # add to outputBuf
-        with self.outputBufLock:
-            self.outputBuf += [hdlcData]
+        # add to outputQueue
+        if data[:1]==self.PC2MOTE_DATA:
+            priority = moteProbeQueue.PRIORITY_DATA
+        else:
+            priority = moteProbeQueue.PRIORITY_COMMAND
+        self.outputQueue.put(hdlcData,priority)
@@ -0,0 +1,126 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('moteProbeCapture')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import struct
+import threading
+import time
+
+#============================ defines =========================================
+
+FILE_MAGIC        = 'OWCAPT\x00\x01'            # format version 1
+RECORD_STRUCT     = struct.Struct('<dHH')       # timestamp, portId, length
+PORTNAME_ID       = 0xffff                      # record naming a port
+PORTID_STRUCT     = struct.Struct('<H')
+
+class CaptureException(Exception):
+    pass
+
+#============================ functions =======================================
+
+def readCapture(filename):
+    '''
+    Reads the frames recorded in a capture file.
+    
+    :param filename: The file written by a moteProbeCapture.
+    :returns: A generator of (timestamp,portname,frame) tuples, in the order
+        they were recorded.
+    '''
+    with open(filename,'rb') as f:
+        
+        if f.read(len(FILE_MAGIC))!=FILE_MAGIC:
+            raise CaptureException('{0} is not a capture file'.format(filename))
+        
+        portnames = {}
+        while True:
+            header = f.read(RECORD_STRUCT.size)
+            if not header:
+                break
+            if len(header)<RECORD_STRUCT.size:
+                raise CaptureException('{0} is truncated'.format(filename))
+            (timestamp,portId,length) = RECORD_STRUCT.unpack(header)
+            data = f.read(length)
+            if len(data)<length:
+                raise CaptureException('{0} is truncated'.format(filename))
+            
+            if portId==PORTNAME_ID:
+                portnames[PORTID_STRUCT.unpack_from(data)[0]] = data[PORTID_STRUCT.size:]
+            else:
+                yield (timestamp,portnames[portId],data)
+
+#============================ class ===========================================
+
+class moteProbeCapture(object):
+    '''
+    Records the frames the moteProbes receive from their motes to a compact
+    binary file, which moteProbeReplay can feed back to OpenVisualizer.
+    
+    The file starts with FILE_MAGIC, followed by one record per frame: its
+    timestamp, the id of the port it was received on and its length, packed
+    as RECORD_STRUCT, then the frame itself, as dispatched on
+    'fromMoteProbe@<port>', i.e. without HDLC framing. Port names are only
+    written once, in a record with PORTNAME_ID as port id, before the first
+    frame of the port.
+    
+    One capture is shared by all the moteProbes, so the frames of all ports
+    are recorded in the order they were received.
+    '''
+    
+    def __init__(self,filename):
+        
+        # store params
+        self.filename             = filename
+        
+        # local variables
+        self.file                 = open(filename,'wb')
+        self.portIds              = {}      # portname -> portId
+        self.numFrames            = 0
+        self.dataLock             = threading.Lock()
+        
+        self.file.write(FILE_MAGIC)
+        
+        # log
+        log.info("capturing to {0}".format(self.filename))
+    
+    #======================== public ==========================================
+    
+    def write(self,portname,frame,timestamp=None):
+        '''
+        Record a frame received on a port.
+        
+        :param portname:  The name of the port, as in 'fromMoteProbe@<port>'.
+        :param frame:     The frame, a string of bytes.
+        :param timestamp: When it was received, now by default.
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+        with self.dataLock:
+            if self.file.closed:
+                return
+            portId = self.portIds.get(portname)
+            if portId is None:
+                portId = len(self.portIds)
+                self.portIds[portname] = portId
+                self._writeRecord(0,PORTNAME_ID,PORTID_STRUCT.pack(portId)+portname)
+            self._writeRecord(timestamp,portId,frame)
+            self.numFrames += 1
+    
+    def getNumFrames(self):
+        with self.dataLock:
+            return self.numFrames
+    
+    def close(self):
+        with self.dataLock:
+            self.file.close()
+    
+    #======================== private =========================================
+    
+    def _writeRecord(self,timestamp,portId,data):
+        self.file.write(RECORD_STRUCT.pack(timestamp,portId,len(data)))
+        self.file.write(data)
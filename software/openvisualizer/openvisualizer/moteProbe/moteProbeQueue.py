@@ -0,0 +1,174 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('moteProbeQueue')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import collections
+import threading
+import time
+
+#============================ defines =========================================
+
+PRIORITY_COMMAND    = 'command'       # e.g. toggling the DAG root, 6top commands
+PRIORITY_DATA       = 'data'          # packets to forward into the mesh
+PRIORITY_ALL        = [               # in the order they are drained
+    PRIORITY_COMMAND,
+    PRIORITY_DATA,
+]
+
+DROP_OLDEST         = 'oldest'        # make room for the new frame
+DROP_NEWEST         = 'newest'        # reject the new frame
+
+CAPACITIES          = {               # frames
+    PRIORITY_COMMAND:   16,
+    PRIORITY_DATA:      64,
+}
+DROP_POLICIES       = {
+    PRIORITY_COMMAND:   DROP_NEWEST,  # the commands already issued are kept, in order
+    PRIORITY_DATA:      DROP_OLDEST,  # the freshest packets are the most useful
+}
+MAX_AGES            = {               # s, None for no limit
+    PRIORITY_COMMAND:   None,
+    PRIORITY_DATA:      5,
+}
+
+#============================ class ===========================================
+
+class moteProbeQueue(object):
+    '''
+    The frames a moteProbe is to write to its mote, which the mote requests
+    with SERFRAME_MOTE2PC_REQUEST.
+    
+    The frames are queued by priority class, each in a bounded deque: when a
+    deque is full, either its oldest frame or the new one is dropped,
+    depending on the DROP_POLICIES of the class. At each request, the frames
+    are drained commands first, then data, in order, as many as allowed and
+    as fit in the RX buffer of the mote. Frames which waited longer than the
+    MAX_AGES of their class are dropped rather than written.
+    
+    Thread-safe: frames are put by the thread sending to the moteConnector,
+    and drained by the thread reading from the port.
+    '''
+    
+    def __init__(self,capacities=None,dropPolicies=None,maxAges=None):
+        '''
+        :param capacities:   The maximum number of frames queued, by class,
+            CAPACITIES by default.
+        :param dropPolicies: DROP_OLDEST or DROP_NEWEST, by class,
+            DROP_POLICIES by default.
+        :param maxAges:      The maximum time a frame waits, in seconds, by
+            class, MAX_AGES by default.
+        '''
+        
+        # store params
+        self.capacities           = dict(CAPACITIES)
+        self.capacities.update(capacities or {})
+        self.dropPolicies         = dict(DROP_POLICIES)
+        self.dropPolicies.update(dropPolicies or {})
+        self.maxAges              = dict(MAX_AGES)
+        self.maxAges.update(maxAges or {})
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.queues               = {}    # priority -> deque of (timestamp,frame)
+        self.stats                = {}    # priority -> counters, see getStats()
+        for priority in PRIORITY_ALL:
+            self.queues[priority] = collections.deque()
+            self.stats[priority]  = {
+                'numQueued':      0,
+                'numSent':        0,
+                'numDroppedFull': 0,
+                'numDroppedAged': 0,
+            }
+        self.numRequests          = 0
+        self.numFramesSent        = 0
+    
+    #======================== public ==========================================
+    
+    def put(self,frame,priority,timestamp=None):
+        '''
+        Queue a frame.
+        
+        :param frame:     The frame, HDLC-framed.
+        :param priority:  PRIORITY_COMMAND or PRIORITY_DATA.
+        :param timestamp: When the frame was queued, now by default.
+        :returns: True if the frame was queued, False if it was dropped.
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+        with self.dataLock:
+            queue = self.queues[priority]
+            stats = self.stats[priority]
+            if len(queue)>=self.capacities[priority]:
+                stats['numDroppedFull'] += 1
+                if self.dropPolicies[priority]==DROP_NEWEST:
+                    log.debug('{0} queue full, dropping new frame'.format(priority))
+                    return False
+                log.debug('{0} queue full, dropping oldest frame'.format(priority))
+                queue.popleft()
+            queue.append((timestamp,frame))
+            stats['numQueued'] += 1
+            return True
+    
+    def drain(self,maxFrames,maxBytes,now=None):
+        '''
+        Take the frames to write at a request of the mote.
+        
+        :param maxFrames: The maximum number of frames to take.
+        :param maxBytes:  The size of the RX buffer of the mote. The first
+            frame is always taken, as the mote could not receive it
+            otherwise.
+        :param now:       The time of the request, now by default.
+        :returns: The frames to write, in order, possibly none.
+        '''
+        if now is None:
+            now = time.time()
+        returnVal = []
+        numBytes  = 0
+        with self.dataLock:
+            self.numRequests += 1
+            for priority in PRIORITY_ALL:
+                queue  = self.queues[priority]
+                stats  = self.stats[priority]
+                maxAge = self.maxAges[priority]
+                while queue and len(returnVal)<maxFrames:
+                    (timestamp,frame) = queue[0]
+                    if maxAge is not None and now-timestamp>maxAge:
+                        queue.popleft()
+                        stats['numDroppedAged'] += 1
+                        continue
+                    if returnVal and numBytes+len(frame)>maxBytes:
+                        break
+                    queue.popleft()
+                    stats['numSent'] += 1
+                    numBytes         += len(frame)
+                    returnVal        += [frame]
+                if len(returnVal)>=maxFrames or (queue and returnVal):
+                    # the next frame would not fit, don't let a smaller
+                    # one of a lower class overtake it
+                    break
+            self.numFramesSent += len(returnVal)
+        return returnVal
+    
+    def getStats(self):
+        '''
+        :returns: A dictionary with, by class, the number of frames waiting,
+            as 'length', and counters of the frames queued, sent, dropped
+            because the queue was full or because they were too old, and the
+            number of requests and of frames sent per request.
+        '''
+        with self.dataLock:
+            returnVal = {
+                'numRequests':        self.numRequests,
+                'framesPerRequest':   float(self.numFramesSent)/self.numRequests if self.numRequests else None,
+            }
+            for priority in PRIORITY_ALL:
+                stats = dict(self.stats[priority])
+                stats['length'] = len(self.queues[priority])
+                returnVal[priority] = stats
+            return returnVal
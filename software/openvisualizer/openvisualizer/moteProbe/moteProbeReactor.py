@@ -0,0 +1,292 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('moteProbeReactor')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import errno
+import os
+import select
+import socket
+import sys
+import threading
+import time
+
+import openvisualizer.openvisualizer_utils as u
+
+class _Poller(object):
+    '''
+    Waits for file descriptors to be readable, or writable, with epoll where
+    available, select otherwise.
+    '''
+    
+    def __init__(self):
+        if hasattr(select,'epoll'):
+            self.epoll            = select.epoll()
+        else:
+            self.epoll            = None
+        self.fds                  = set()
+        self.writeFds             = set()   # waited for writable rather than readable
+    
+    def register(self,fd,writable=False):
+        if self.epoll:
+            self.epoll.register(fd,select.EPOLLOUT if writable else select.EPOLLIN)
+        self.fds.add(fd)
+        if writable:
+            self.writeFds.add(fd)
+    
+    def modify(self,fd,writable=False):
+        if self.epoll:
+            self.epoll.modify(fd,select.EPOLLOUT if writable else select.EPOLLIN)
+        if writable:
+            self.writeFds.add(fd)
+        else:
+            self.writeFds.discard(fd)
+    
+    def unregister(self,fd):
+        if self.epoll:
+            self.epoll.unregister(fd)
+        self.fds.discard(fd)
+        self.writeFds.discard(fd)
+    
+    def poll(self,timeout):
+        '''
+        :returns: The list of the registered file descriptors which are
+            readable, or writable, or in error.
+        '''
+        try:
+            if self.epoll:
+                return [fd for (fd,_) in self.epoll.poll(timeout)]
+            elif self.fds:
+                readFds = self.fds-self.writeFds
+                (readable,writable,inError) = select.select(list(readFds),list(self.writeFds),list(self.fds),timeout)
+                return list(set(readable)|set(writable)|set(inError))
+            else:
+                time.sleep(timeout)
+                return []
+        except (IOError,OSError,select.error) as err:
+            if err.args[0]==errno.EINTR:
+                return []
+            raise
+
+class _ProbePort(object):
+    '''
+    The state the reactor keeps for the port of one moteProbe.
+    '''
+    
+    def __init__(self,probe):
+        
+        # store params
+        self.probe                = probe
+        
+        # local variables
+        self.fd                   = None    # None while the port is closed
+        self.connectDeadline      = None    # when to give up connecting, None once connected
+        self.reconnectTime        = 0       # when to try opening the port again
+        self.backoff              = 0       # seconds to wait before the next attempt
+        self.numReconnects        = 0
+
+class moteProbeReactor(threading.Thread):
+    '''
+    Reads from the serial ports and IoT-LAB connections of several moteProbes
+    in a single thread, instead of one thread per moteProbe.
+    
+    Each moteProbe keeps its own HDLC decoder and its output buffer, and
+    dispatches the frames received on 'fromMoteProbe@<port>' as when it runs
+    its own thread. The connections to IoT-LAB motes are not waited for,
+    they complete when their socket becomes writable, within
+    CONNECT_TIMEOUT_S. A port which cannot be opened, or fails, including
+    while its frames are handled, is closed and opened again after a backoff
+    doubling from RECONNECT_MIN_S up to RECONNECT_MAX_S, independently of the
+    other ports. The backoff is reset once data is received.
+    
+    Emulated motes have no file descriptor to wait on, their moteProbes keep
+    their own thread.
+    '''
+    
+    POLL_TIMEOUT_S        = 0.5    # new and closed moteProbes are noticed within that time
+    CONNECT_TIMEOUT_S     = 10
+    RECONNECT_MIN_S       = 1
+    RECONNECT_MAX_S       = 32
+    
+    def __init__(self):
+        
+        # local variables
+        self.poller               = _Poller()
+        self.ports                = {}      # moteProbe -> _ProbePort
+        self.portsByFd            = {}      # fd -> _ProbePort
+        self.dataLock             = threading.Lock()
+        self.goOn                 = True
+        
+        # initialize the parent class
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.name                 = 'moteProbeReactor'
+        self.daemon               = True
+        
+        # start myself
+        self.start()
+    
+    #======================== thread ==========================================
+    
+    def run(self):
+        try:
+            # log
+            log.info("start running")
+            
+            while self.goOn:
+                
+                # open the ports which are due, close those of closed moteProbes
+                now = time.time()
+                with self.dataLock:
+                    ports = self.ports.values()
+                timeout = self.POLL_TIMEOUT_S
+                for port in ports:
+                    if not port.probe.goOn:
+                        self._removePort(port)
+                    elif port.fd is None:
+                        if port.reconnectTime<=now:
+                            self._openPort(port)
+                        if port.fd is None:
+                            timeout = min(timeout,max(0,port.reconnectTime-now))
+                    elif port.connectDeadline is not None:
+                        if port.connectDeadline<=now:
+                            self._failPort(port,'{0}: connection timed out'.format(port.probe.name))
+                        else:
+                            timeout = min(timeout,port.connectDeadline-now)
+                
+                # read from the ports which are readable, finish connecting
+                # those which are writable
+                for fd in self.poller.poll(timeout):
+                    port = self.portsByFd.get(fd)
+                    if not port:
+                        pass
+                    elif port.connectDeadline is not None:
+                        self._connectPort(port)
+                    else:
+                        self._readPort(port)
+            
+            for port in self.ports.values():
+                self._closePort(port)
+        except Exception as err:
+            errMsg=u.formatCrashMessage(self.name,err)
+            print errMsg
+            log.critical(errMsg)
+            sys.exit(-1)
+    
+    #======================== public ==========================================
+    
+    def addProbe(self,probe):
+        '''
+        Have the reactor read from the port of a moteProbe, from now on.
+        '''
+        with self.dataLock:
+            self.ports[probe] = _ProbePort(probe)
+    
+    def getStats(self):
+        '''
+        :returns: A dict with, for the port name of each moteProbe, whether
+            its port is open and how many times it was re-opened.
+        '''
+        with self.dataLock:
+            ports = self.ports.values()
+        return dict(
+            [
+                (
+                    port.probe.getPortName(),
+                    {
+                        'open':           port.fd is not None,
+                        'numReconnects':  port.numReconnects,
+                    },
+                ) for port in ports
+            ]
+        )
+    
+    def close(self):
+        self.goOn = False
+    
+    #======================== private =========================================
+    
+    def _openPort(self,port):
+        try:
+            isOpen  = port.probe._openPort(nonBlocking=True)
+            port.fd = port.probe.serial.fileno()
+        except Exception as err:
+            log.warning('{0}: cannot open port: {1}'.format(port.probe.name,err))
+            self._scheduleReconnect(port)
+        else:
+            self.portsByFd[port.fd] = port
+            if isOpen:
+                self._portOpened(port)
+                self.poller.register(port.fd)
+            else:
+                port.connectDeadline = time.time()+self.CONNECT_TIMEOUT_S
+                self.poller.register(port.fd,writable=True)
+    
+    def _connectPort(self,port):
+        err = port.probe.serial.getsockopt(socket.SOL_SOCKET,socket.SO_ERROR)
+        if err:
+            self._failPort(port,'{0}: cannot connect: {1}'.format(port.probe.name,os.strerror(err)))
+        else:
+            port.connectDeadline = None
+            self._portOpened(port)
+            self.poller.modify(port.fd)
+    
+    def _portOpened(self,port):
+        if port.backoff:
+            port.numReconnects += 1
+    
+    def _readPort(self,port):
+        probe = port.probe
+        try:
+            if probe.mode==probe.MODE_SERIAL:
+                rxBytes = probe.serial.read(probe.serial.inWaiting() or 1)
+            else:
+                rxBytes = probe.serial.recv(probe.IOTLAB_RECV_SIZE)
+            if not rxBytes:
+                # readable without data, the other end is gone
+                raise IOError('{0}: port closed'.format(probe.name))
+        except Exception as err:
+            self._failPort(port,err)
+            return
+        
+        # the port works, a next failure is retried from the shortest backoff
+        port.backoff = 0
+        
+        try:
+            probe._handleRxBytes(rxBytes)
+        except Exception as err:
+            # only this port is affected
+            log.error(u.formatCrashMessage(probe.name,err))
+            self._failPort(port,'{0}: closing the port'.format(probe.name))
+    
+    def _failPort(self,port,err):
+        log.warning(err)
+        self._closePort(port)
+        self._scheduleReconnect(port)
+    
+    def _closePort(self,port):
+        if port.fd is None:
+            return
+        self.poller.unregister(port.fd)
+        del self.portsByFd[port.fd]
+        port.fd              = None
+        port.connectDeadline = None
+        try:
+            port.probe.serial.close()
+        except Exception as err:
+            log.warning(err)
+    
+    def _removePort(self,port):
+        self._closePort(port)
+        with self.dataLock:
+            del self.ports[port.probe]
+    
+    def _scheduleReconnect(self,port):
+        port.backoff       = min(max(2*port.backoff,self.RECONNECT_MIN_S),self.RECONNECT_MAX_S)
+        port.reconnectTime = time.time()+port.backoff
@@ -0,0 +1,138 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('moteProbeReplay')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import sys
+import threading
+import time
+
+from   pydispatch import dispatcher
+import moteProbeCapture
+import openvisualizer.openvisualizer_utils as u
+
+class moteProbeReplay(threading.Thread):
+    '''
+    Plays the frames of a capture file, written by moteProbeCapture, back
+    to OpenVisualizer, in place of the moteProbes.
+    
+    Each frame is dispatched on 'fromMoteProbe@<port>', as the moteProbe of
+    its port did when it was recorded. The frames are played at their
+    original timing, scaled by a speed factor, or as fast as possible. The
+    whole capture is read before playing, so reading the file does not slow
+    the replay down.
+    
+    Call start() once the moteConnectors of all the ports of the capture,
+    see getPortNames(), are listening.
+    '''
+    
+    def __init__(self,filename,speed=None):
+        '''
+        :param filename: The capture file.
+        :param speed:    How many seconds of the capture to play per second,
+            e.g. 1.0 for the original timing; as fast as possible if None.
+        '''
+        
+        # store params
+        self.filename             = filename
+        self.speed                = speed
+        
+        # local variables
+        self.frames               = list(moteProbeCapture.readCapture(filename))
+        self.portnames            = []
+        for (_,portname,_) in self.frames:
+            if portname not in self.portnames:
+                self.portnames   += [portname]
+        self.numFrames            = 0
+        self.startTime            = None
+        self.endTime              = None
+        self.dataLock             = threading.Lock()
+        self.goOn                 = True
+        
+        # initialize the parent class
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.name                 = 'moteProbeReplay'
+        self.daemon               = True
+        
+        # log
+        log.info("replaying {0} frames from {1}".format(len(self.frames),self.filename))
+    
+    #======================== thread ==========================================
+    
+    def run(self):
+        try:
+            # log
+            log.info("start running")
+            
+            signals   = dict([(p,'fromMoteProbe@'+p) for p in self.portnames])
+            startTime = time.time()
+            with self.dataLock:
+                self.startTime = startTime
+            if self.frames:
+                firstTimestamp = self.frames[0][0]
+            
+            for (timestamp,portname,frame) in self.frames:
+                if not self.goOn:
+                    break
+                
+                if self.speed:
+                    delay = startTime+(timestamp-firstTimestamp)/self.speed-time.time()
+                    if delay>0:
+                        time.sleep(delay)
+                
+                dispatcher.send(
+                    sender        = self.name,
+                    signal        = signals[portname],
+                    data          = frame,
+                )
+                
+                with self.dataLock:
+                    self.numFrames += 1
+            
+            with self.dataLock:
+                self.endTime = time.time()
+            
+            # log
+            log.info("replayed {0} frames".format(self.numFrames))
+        except Exception as err:
+            errMsg=u.formatCrashMessage(self.name,err)
+            print errMsg
+            log.critical(errMsg)
+            sys.exit(-1)
+    
+    #======================== public ==========================================
+    
+    def getPortNames(self):
+        '''
+        :returns: The names of the ports of the capture, in the order of
+            their first frame.
+        '''
+        return list(self.portnames)
+    
+    def getStats(self):
+        '''
+        :returns: A dict with the number of frames of the capture, of frames
+            played so far, the time spent playing them, in seconds, and the
+            resulting number of frames per second.
+        '''
+        with self.dataLock:
+            if self.startTime is None:
+                duration = 0
+            else:
+                duration = (self.endTime or time.time())-self.startTime
+            return {
+                'numFramesTotal':    len(self.frames),
+                'numFrames':         self.numFrames,
+                'duration':          duration,
+                'framesPerSec':      self.numFrames/duration if duration else 0,
+            }
+    
+    def close(self):
+        self.goOn = False
@@ -0,0 +1,95 @@
+'''
+This is a performance test which measures the throughput of the HDLC
+decoding of the moteProbe, in frames per second. It decodes a stream of
+random frames, received in chunks of a given size, with the HdlcDecoder, and
+with the byte-per-byte state machine the moteProbe used before, followed by
+dehdlcify().
+
+Run this test with 'python bench_OpenHdlc.py [numFrames] [frameLen] [chunkLen]'.
+By default, it decodes 20000 frames of 100 bytes, received in chunks of 4096
+bytes.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # moteProbe/
+
+import random
+import time
+
+import OpenHdlc
+
+#============================ defines =========================================
+
+NUM_FRAMES    = 20000
+FRAME_LEN     = 100
+CHUNK_LEN     = 4096
+
+#============================ helpers =========================================
+
+def _decodePerByte(hdlc,chunks):
+    '''
+    The byte-per-byte decoding of the moteProbe, before HdlcDecoder.
+    '''
+    returnVal     = []
+    lastRxByte    = hdlc.HDLC_FLAG
+    busyReceiving = False
+    inputBuf      = ''
+    for rxBytes in chunks:
+        for rxByte in rxBytes:
+            if (not busyReceiving) and lastRxByte==hdlc.HDLC_FLAG and rxByte!=hdlc.HDLC_FLAG:
+                busyReceiving  = True
+                inputBuf       = hdlc.HDLC_FLAG
+                inputBuf      += rxByte
+            elif busyReceiving and rxByte!=hdlc.HDLC_FLAG:
+                inputBuf      += rxByte
+            elif busyReceiving and rxByte==hdlc.HDLC_FLAG:
+                busyReceiving  = False
+                inputBuf      += rxByte
+                try:
+                    returnVal += [hdlc.dehdlcify(inputBuf)]
+                except OpenHdlc.HdlcException:
+                    pass
+            lastRxByte = rxByte
+    return returnVal
+
+def _decodeStream(chunks):
+    returnVal = []
+    decoder   = OpenHdlc.HdlcDecoder()
+    for rxBytes in chunks:
+        returnVal += decoder.feed(rxBytes)
+    return returnVal
+
+#============================ main ============================================
+
+def main(numFrames=NUM_FRAMES,frameLen=FRAME_LEN,chunkLen=CHUNK_LEN):
+    
+    hdlc   = OpenHdlc.OpenHdlc()
+    
+    random.seed(0)
+    frames = [
+        ''.join([chr(random.randint(0x00,0xff)) for _ in range(frameLen)])
+        for _ in range(numFrames)
+    ]
+    stream = ''.join([hdlc.hdlcify(f) for f in frames])
+    chunks = [stream[i:i+chunkLen] for i in range(0,len(stream),chunkLen)]
+    
+    output  = []
+    for (name,decode) in [
+            ('per-byte',    lambda: _decodePerByte(hdlc,chunks)),
+            ('HdlcDecoder', lambda: _decodeStream(chunks)),
+        ]:
+        start    = time.time()
+        decoded  = decode()
+        duration = time.time()-start
+        assert decoded==frames
+        output += ['{0:<12} {1} frames in {2:.3f}s ({3:.0f} frames/s)'.format(
+            name,numFrames,duration,numFrames/duration,
+        )]
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,74 @@
+'''
+This is a performance test which measures how many packets a DAG root
+receives from OpenVisualizer under heavy downstream traffic, depending on the
+number of frames written per request of the mote. The mote requests data
+every POLL_PERIOD, while packets of PACKET_SIZE bytes are queued at RATE
+packets per second, with a command every 100 packets. It also measures the
+cost of queuing and draining a frame.
+
+Run this test with 'python bench_moteProbeQueue.py [rate] [duration]'. By
+default, it queues 200 packets per second for 60 seconds.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # moteProbe/
+
+import time
+
+import moteProbeQueue
+
+#============================ defines =========================================
+
+RATE           = 200          # packets per second
+DURATION       = 60           # s
+POLL_PERIOD    = 0.01         # s, between requests of the mote
+PACKET_SIZE    = 60           # bytes, HDLC-framed
+MOTE_RX_BUFFER = 200          # bytes
+
+#============================ helpers =========================================
+
+def _run(rate,duration,framesPerRequest):
+    '''
+    :returns: The statistics of the queue, and the time spent queuing and
+        draining.
+    '''
+    queue    = moteProbeQueue.moteProbeQueue()
+    packet   = 'D'+'x'*(PACKET_SIZE-1)
+    command  = 'G'+'x'*10
+    numPolls = int(duration/POLL_PERIOD)
+    queued   = 0
+    start    = time.time()
+    for poll in xrange(numPolls):
+        now = poll*POLL_PERIOD
+        while queued<rate*now:
+            if queued%100==0:
+                queue.put(command,moteProbeQueue.PRIORITY_COMMAND,timestamp=now)
+            queue.put(packet,moteProbeQueue.PRIORITY_DATA,timestamp=now)
+            queued += 1
+        queue.drain(framesPerRequest,MOTE_RX_BUFFER,now=now)
+    return (queue.getStats(),time.time()-start)
+
+#============================ main ============================================
+
+def main(rate=RATE,duration=DURATION):
+    
+    output = []
+    for framesPerRequest in [1,2,4,8]:
+        (stats,cpuTime) = _run(rate,duration,framesPerRequest)
+        data   = stats[moteProbeQueue.PRIORITY_DATA]
+        output += ['{0} frame(s)/request: {1:6.1f} packets/s sent, {2:5} dropped full, {3:5} dropped aged, {4:5.2f}us/frame'.format(
+            framesPerRequest,
+            data['numSent']/float(duration),
+            data['numDroppedFull'],
+            data['numDroppedAged'],
+            1000000*cpuTime/(data['numQueued']+stats[moteProbeQueue.PRIORITY_COMMAND]['numQueued']),
+        )]
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,101 @@
+'''
+This is a performance test which measures how many frames per second
+OpenVisualizer processes, without hardware. It replays a capture, as fast as
+possible, through the moteConnectors, moteStates, openLbr, RPL and topology
+of an OpenVisualizer, i.e. the pipeline the moteProbes feed.
+
+Run this test with 'python bench_moteProbeReplay.py [captureFile]', with a
+capture recorded by 'openVisualizerApp.py --capture <captureFile>'. Without
+a capture, it replays 20000 status frames of 10 motes, with random fields.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # moteProbe/
+
+import random
+import struct
+import tempfile
+
+import moteProbeCapture
+import moteProbeReplay
+from openvisualizer.eventBus      import eventBusMonitor
+from openvisualizer.moteConnector import moteConnector
+from openvisualizer.moteConnector import OpenParser
+from openvisualizer.moteState     import moteState
+from openvisualizer.openLbr       import openLbr
+from openvisualizer.RPL           import RPL
+from openvisualizer.RPL           import topology
+
+#============================ defines =========================================
+
+NUM_MOTES     = 10
+NUM_FRAMES    = 20000
+PERIOD        = 0.001 # s, between the synthesized frames
+
+#============================ helpers =========================================
+
+def _synthesizeCapture(filename):
+    '''
+    Status frames of each type, from each mote in turn, with random fields.
+    The motes are not DAG roots.
+    '''
+    
+    random.seed(0)
+    parser  = OpenParser.OpenParser()
+    keys    = sorted(parser.parserStatus.fieldsParsingKeys.values(),key=lambda k: k.val)
+    
+    capture = moteProbeCapture.moteProbeCapture(filename)
+    for i in range(NUM_FRAMES):
+        moteId = i%NUM_MOTES
+        key    = keys[(i/NUM_MOTES)%len(keys)]
+        fields = [random.randint(0x00,0xff) for _ in range(key.structure.size)]
+        if key.name=='IdManager':
+            fields[0] = 0 # isDAGroot
+        capture.write(
+            'emulated{0}'.format(moteId),
+            'S'+struct.pack('<HB',moteId,key.val)+''.join([chr(b) for b in fields]),
+            timestamp = i*PERIOD,
+        )
+    capture.close()
+
+#============================ main ============================================
+
+def main(captureFile=None):
+    
+    isSynthesized = not captureFile
+    if isSynthesized:
+        (fd,captureFile) = tempfile.mkstemp(suffix='.cap')
+        os.close(fd)
+        _synthesizeCapture(captureFile)
+    
+    # the pipeline of OpenVisualizer, after the moteProbes
+    replay         = moteProbeReplay.moteProbeReplay(captureFile)
+    if isSynthesized:
+        os.remove(captureFile)
+    monitor        = eventBusMonitor.eventBusMonitor()
+    lbr            = openLbr.OpenLbr()
+    rpl            = RPL.RPL()
+    topo           = topology.topology()
+    moteConnectors = [moteConnector.moteConnector(p) for p in replay.getPortNames()]
+    moteStates     = [moteState.moteState(mc) for mc in moteConnectors]
+    
+    replay.start()
+    replay.join()
+    rpl.close()
+    
+    stats  = replay.getStats()
+    output = []
+    output += ['{0} frames from {1} ports in {2:.3f}s ({3:.0f} frames/s)'.format(
+        stats['numFrames'],
+        len(moteConnectors),
+        stats['duration'],
+        stats['framesPerSec'],
+    )]
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*sys.argv[1:])
@@ -117,3 +117,51 @@ def test_randdomBackAndForth(randomFrame):
     log.debug("dehdlcified:    {0}".format(u.formatStringBuf(frameDehdlcified)))
     
     assert frameDehdlcified==randomFrame
+
+def test_decoderChunks():
+    '''
+    The decoder extracts the same frames as dehdlcify(), whatever the chunks
+    the stream is received in.
+    '''
+    
+    log.debug("\n---------- test_decoderChunks")
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    random.seed(0)
+    
+    frames  = [json.loads(f) for f in RANDOMFRAME[::20]]
+    frames  = [''.join([chr(b) for b in f]) for f in frames]
+    frames += ['\x7e\x7d'*10,'\x7d']
+    stream  = ''.join([hdlc.hdlcify(f) for f in frames])
+    
+    for maxChunkLen in [1,2,3,7,64,len(stream)]:
+        decoder = OpenHdlc.HdlcDecoder()
+        decoded = []
+        pos     = 0
+        while pos<len(stream):
+            chunkLen  = random.randint(1,maxChunkLen)
+            decoded  += decoder.feed(stream[pos:pos+chunkLen])
+            pos      += chunkLen
+        assert decoded==frames
+        assert decoder.getStats()=={'numFrames': len(frames), 'numInvalid': 0}
+
+def test_decoderInvalid():
+    
+    log.debug("\n---------- test_decoderInvalid")
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    decoder = OpenHdlc.HdlcDecoder()
+    
+    corrupted = hdlc.hdlcify('\x53\x01\x02')
+    corrupted = corrupted[:2]+chr(ord(corrupted[2])^0xff)+corrupted[3:]
+    
+    # garbage between frames, empty and invalid frames are dropped
+    stream  = ''
+    stream += hdlc.hdlcify('\x53\x11')
+    stream += '\x01\x02'
+    stream += corrupted
+    stream += '\x7e\x7e\x01\x7e'
+    stream += hdlc.hdlcify('\x53\x22')
+    
+    assert decoder.feed(stream)==['\x53\x11','\x53\x22']
+    assert decoder.getStats()=={'numFrames': 2, 'numInvalid': 3}
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import threading
+import time
+
+import pytest
+
+from pydispatch import dispatcher
+
+import moteProbeCapture
+import moteProbeReplay
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbeCapture.log'
+
+import logging
+log = logging.getLogger('test_moteProbeCapture')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbeCapture',
+                        'moteProbeCapture',
+                        'moteProbeReplay',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 10 # s
+
+RECORDS = [
+    (1000.00,  'COM1',         'S\x01\x00\x00\x01'),
+    (1000.10,  'emulated2',    'D'+''.join([chr(b) for b in range(256)])),
+    (1000.15,  'COM1',         ''),
+    (1000.30,  'emulated2',    'E\x00\x02\x01\x02\x00\x03\x00\x04'),
+]
+
+#============================ helpers =========================================
+
+def _writeCapture(filename,records):
+    capture = moteProbeCapture.moteProbeCapture(filename)
+    for (timestamp,portname,frame) in records:
+        capture.write(portname,frame,timestamp=timestamp)
+    assert capture.getNumFrames()==len(records)
+    capture.close()
+
+class _Listener(object):
+    '''
+    Records the frames dispatched on the 'fromMoteProbe@<port>' signals of
+    some ports, and when.
+    '''
+    
+    def __init__(self,portnames):
+        self.received    = []
+        self.allReceived = threading.Event()
+        self.numExpected = None
+        for portname in portnames:
+            dispatcher.connect(
+                self._fromMoteProbe,
+                signal = 'fromMoteProbe@'+portname,
+            )
+    
+    def _fromMoteProbe(self,signal,data):
+        self.received += [(time.time(),signal,data)]
+        if len(self.received)==self.numExpected:
+            self.allReceived.set()
+    
+    def waitFor(self,numExpected):
+        self.numExpected = numExpected
+        if len(self.received)==numExpected:
+            self.allReceived.set()
+        assert self.allReceived.wait(TIMEOUT)
+
+#============================ tests ===========================================
+
+def test_roundtrip(tmpdir):
+    
+    filename = str(tmpdir.join('roundtrip.cap'))
+    _writeCapture(filename,RECORDS)
+    
+    assert list(moteProbeCapture.readCapture(filename))==RECORDS
+    
+    # each port name is only written once
+    assert os.path.getsize(filename)==(
+        len(moteProbeCapture.FILE_MAGIC)+
+        2*(moteProbeCapture.RECORD_STRUCT.size+2)+len('COM1')+len('emulated2')+
+        sum([moteProbeCapture.RECORD_STRUCT.size+len(frame) for (_,_,frame) in RECORDS])
+    )
+
+def test_invalidFile(tmpdir):
+    
+    filename = str(tmpdir.join('invalid.cap'))
+    with open(filename,'wb') as f:
+        f.write('not a capture')
+    with pytest.raises(moteProbeCapture.CaptureException):
+        list(moteProbeCapture.readCapture(filename))
+
+def test_truncatedFile(tmpdir):
+    
+    filename = str(tmpdir.join('truncated.cap'))
+    _writeCapture(filename,RECORDS)
+    with open(filename,'rb') as f:
+        content = f.read()
+    with open(filename,'wb') as f:
+        f.write(content[:-1])
+    
+    # the complete frames are read, until the truncated one
+    readRecords = []
+    with pytest.raises(moteProbeCapture.CaptureException):
+        for record in moteProbeCapture.readCapture(filename):
+            readRecords += [record]
+    assert readRecords==RECORDS[:-1]
+
+def test_replayFast(tmpdir):
+    
+    filename = str(tmpdir.join('fast.cap'))
+    _writeCapture(filename,RECORDS)
+    
+    replay   = moteProbeReplay.moteProbeReplay(filename)
+    assert replay.getPortNames()==['COM1','emulated2']
+    listener = _Listener(replay.getPortNames())
+    replay.start()
+    listener.waitFor(len(RECORDS))
+    replay.join(TIMEOUT)
+    
+    # the frames are played in order, on the signal of their port
+    assert [(signal,data) for (_,signal,data) in listener.received]==[
+        ('fromMoteProbe@'+portname,frame) for (_,portname,frame) in RECORDS
+    ]
+    
+    stats = replay.getStats()
+    assert stats['numFramesTotal']==len(RECORDS)
+    assert stats['numFrames']==len(RECORDS)
+    assert stats['framesPerSec']>0
+
+@pytest.mark.parametrize('speed', [1.0,2.0])
+def test_replayTiming(tmpdir,speed):
+    
+    filename = str(tmpdir.join('timing.cap'))
+    _writeCapture(filename,RECORDS)
+    
+    replay   = moteProbeReplay.moteProbeReplay(filename,speed=speed)
+    listener = _Listener(replay.getPortNames())
+    replay.start()
+    listener.waitFor(len(RECORDS))
+    
+    # each frame is played at its original offset from the first, scaled
+    firstTime = listener.received[0][0]
+    for ((rxTime,_,_),(timestamp,_,_)) in zip(listener.received,RECORDS):
+        expected = (timestamp-RECORDS[0][0])/speed
+        assert expected-0.010<=rxTime-firstTime<=expected+0.050
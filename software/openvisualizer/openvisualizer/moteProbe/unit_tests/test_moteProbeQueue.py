@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import pytest
+
+import moteProbeQueue
+from moteProbeQueue import PRIORITY_COMMAND, PRIORITY_DATA
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbeQueue.log'
+
+import logging
+log = logging.getLogger('test_moteProbeQueue')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbeQueue',
+                        'moteProbeQueue',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+NOW        = 1000.0
+MAX_BYTES  = 200
+
+#============================ helpers =========================================
+
+def _frame(name,length=10):
+    return name+'x'*(length-len(name))
+
+#============================ tests ===========================================
+
+def test_order():
+    '''
+    Commands are drained before data, each class in order.
+    '''
+    
+    queue = moteProbeQueue.moteProbeQueue()
+    queue.put(_frame('d1'),PRIORITY_DATA,timestamp=NOW)
+    queue.put(_frame('c1'),PRIORITY_COMMAND,timestamp=NOW)
+    queue.put(_frame('d2'),PRIORITY_DATA,timestamp=NOW)
+    queue.put(_frame('c2'),PRIORITY_COMMAND,timestamp=NOW)
+    
+    assert queue.drain(3,MAX_BYTES,now=NOW)==[_frame(n) for n in ['c1','c2','d1']]
+    assert queue.drain(3,MAX_BYTES,now=NOW)==[_frame('d2')]
+    assert queue.drain(3,MAX_BYTES,now=NOW)==[]
+    
+    stats = queue.getStats()
+    assert stats['numRequests']==3
+    assert stats['framesPerRequest']==4/3.0
+    assert stats[PRIORITY_COMMAND]['numSent']==2
+    assert stats[PRIORITY_DATA]['numSent']==2
+    assert stats[PRIORITY_DATA]['length']==0
+
+def test_rxBuffer():
+    '''
+    The frames drained fit in the RX buffer of the mote, but the first one
+    is drained anyway, and a smaller frame does not overtake a larger one.
+    '''
+    
+    queue = moteProbeQueue.moteProbeQueue()
+    queue.put(_frame('c1',150),PRIORITY_COMMAND,timestamp=NOW)
+    queue.put(_frame('c2',100),PRIORITY_COMMAND,timestamp=NOW)
+    queue.put(_frame('d1',10),PRIORITY_DATA,timestamp=NOW)
+    queue.put(_frame('d2',300),PRIORITY_DATA,timestamp=NOW)
+    queue.put(_frame('d3',10),PRIORITY_DATA,timestamp=NOW)
+    
+    assert queue.drain(10,MAX_BYTES,now=NOW)==[_frame('c1',150)]
+    assert queue.drain(10,MAX_BYTES,now=NOW)==[_frame('c2',100),_frame('d1',10)]
+    assert queue.drain(10,MAX_BYTES,now=NOW)==[_frame('d2',300)]
+    assert queue.drain(10,MAX_BYTES,now=NOW)==[_frame('d3',10)]
+
+@pytest.mark.parametrize('policy,expected', [
+    (moteProbeQueue.DROP_OLDEST, ['f2','f3','f4']),
+    (moteProbeQueue.DROP_NEWEST, ['f0','f1','f2']),
+])
+def test_full(policy,expected):
+    
+    queue = moteProbeQueue.moteProbeQueue(
+        capacities   = {PRIORITY_DATA: 3},
+        dropPolicies = {PRIORITY_DATA: policy},
+    )
+    results = [queue.put(_frame('f{0}'.format(i)),PRIORITY_DATA,timestamp=NOW) for i in range(5)]
+    assert results==[True,True,True]+[policy==moteProbeQueue.DROP_OLDEST]*2
+    
+    assert queue.drain(10,MAX_BYTES,now=NOW)==[_frame(n) for n in expected]
+    stats = queue.getStats()[PRIORITY_DATA]
+    assert stats['numDroppedFull']==2
+    assert stats['numQueued']==results.count(True)
+
+def test_aging():
+    
+    queue = moteProbeQueue.moteProbeQueue(maxAges={PRIORITY_DATA: 5})
+    queue.put(_frame('d1'),PRIORITY_DATA,timestamp=NOW)
+    queue.put(_frame('d2'),PRIORITY_DATA,timestamp=NOW+3)
+    queue.put(_frame('c1'),PRIORITY_COMMAND,timestamp=NOW)
+    
+    # commands don't age, by default
+    assert queue.drain(10,MAX_BYTES,now=NOW+6)==[_frame('c1'),_frame('d2')]
+    stats = queue.getStats()
+    assert stats[PRIORITY_DATA]['numDroppedAged']==1
+    assert stats[PRIORITY_COMMAND]['numDroppedAged']==0
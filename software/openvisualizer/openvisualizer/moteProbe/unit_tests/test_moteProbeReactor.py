@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import socket
+import threading
+import time
+
+import pytest
+
+import OpenHdlc
+import moteProbeReactor
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbeReactor.log'
+
+import logging
+log = logging.getLogger('test_moteProbeReactor')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbeReactor',
+                        'moteProbeReactor',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 10 # s
+
+#============================ helpers =========================================
+
+class _StubProbe(object):
+    '''
+    Plays the role of a moteProbe connected to an IoT-LAB mote, over a pair
+    of connected sockets.
+    '''
+    
+    MODE_SERIAL      = 'serial'
+    MODE_IOTLAB      = 'IoT-LAB'
+    IOTLAB_RECV_SIZE = 4096
+    
+    def __init__(self,name):
+        self.name        = name
+        self.mode        = self.MODE_IOTLAB
+        self.goOn        = True
+        self.hdlcDecoder = OpenHdlc.HdlcDecoder(name)
+        self.frames      = []
+        self.framesSem   = threading.Semaphore(0)
+        self.moteEnds    = []
+        self.numOpenFail = 0
+        self.failOnFrame = None
+    
+    def getPortName(self):
+        return self.name
+    
+    def _openPort(self,nonBlocking=False):
+        if self.numOpenFail:
+            self.numOpenFail -= 1
+            raise IOError('cannot connect')
+        (self.serial,moteEnd) = socket.socketpair()
+        self.serial.setblocking(0)
+        self.moteEnds        += [moteEnd]
+        return True
+    
+    def _handleRxBytes(self,rxBytes):
+        for frame in self.hdlcDecoder.feed(rxBytes):
+            if frame==self.failOnFrame:
+                raise ValueError('subscriber failed')
+            self.frames += [frame]
+            self.framesSem.release()
+    
+    def waitForFrames(self,numFrames):
+        for _ in range(numFrames):
+            assert _acquire(self.framesSem)
+        return self.frames
+
+class _ConnectingProbe(_StubProbe):
+    '''
+    A moteProbe whose connection to its IoT-LAB mote completes after its
+    _openPort() returns.
+    '''
+    
+    def __init__(self,name,server):
+        _StubProbe.__init__(self,name)
+        self.server      = server
+    
+    def _openPort(self,nonBlocking=False):
+        self.serial      = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        self.serial.setblocking(0)
+        self.serial.connect_ex(self.server.getsockname())
+        return False
+
+def _acquire(sem):
+    deadline = time.time()+TIMEOUT
+    while time.time()<deadline:
+        if sem.acquire(False):
+            return True
+        time.sleep(0.01)
+    return False
+
+def _waitFor(condition):
+    deadline = time.time()+TIMEOUT
+    while time.time()<deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+#============================ tests ===========================================
+
+def test_multiplex():
+    '''
+    A single reactor dispatches the frames of each port to its own moteProbe,
+    whatever the chunks they are received in.
+    '''
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    reactor = moteProbeReactor.moteProbeReactor()
+    probes  = [_StubProbe('IoT-LAB{0}'.format(i)) for i in range(3)]
+    for probe in probes:
+        reactor.addProbe(probe)
+    assert _waitFor(lambda: all(p.moteEnds for p in probes))
+    
+    for (i,probe) in enumerate(probes):
+        stream = hdlc.hdlcify(chr(i)+'\x7e')+hdlc.hdlcify(chr(i)+'\x7d')
+        for pos in range(0,len(stream),3):
+            probe.moteEnds[0].sendall(stream[pos:pos+3])
+    
+    for (i,probe) in enumerate(probes):
+        assert probe.waitForFrames(2)==[chr(i)+'\x7e',chr(i)+'\x7d']
+    
+    reactor.close()
+
+def test_reconnect():
+    '''
+    A port which fails is opened again after a backoff, without affecting
+    the other ports.
+    '''
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    reactor = moteProbeReactor.moteProbeReactor()
+    failing = _StubProbe('IoT-LAB0')
+    other   = _StubProbe('IoT-LAB1')
+    failing.numOpenFail = 1
+    reactor.addProbe(failing)
+    reactor.addProbe(other)
+    
+    # the first attempt to open the port fails, the other port works meanwhile
+    assert _waitFor(lambda: other.moteEnds)
+    other.moteEnds[0].sendall(hdlc.hdlcify('\x01'))
+    assert other.waitForFrames(1)==['\x01']
+    assert _waitFor(lambda: failing.moteEnds)
+    
+    # the mote's end closes, the port is opened again
+    failing.moteEnds[0].close()
+    assert _waitFor(lambda: len(failing.moteEnds)==2)
+    failing.moteEnds[1].sendall(hdlc.hdlcify('\x02'))
+    assert failing.waitForFrames(1)==['\x02']
+    assert reactor.getStats()['IoT-LAB0']=={'open': True, 'numReconnects': 2}
+    
+    # closed moteProbes are forgotten
+    other.goOn = False
+    assert _waitFor(lambda: 'IoT-LAB1' not in reactor.getStats())
+    
+    reactor.close()
+
+def test_connect():
+    '''
+    The connections in progress are completed once writable, and those which
+    fail are retried, without blocking the other ports.
+    '''
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    server  = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    server.bind(('127.0.0.1',0))
+    server.listen(1)
+    closed  = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    closed.bind(('127.0.0.1',0))   # nobody listening, connecting fails
+    
+    reactor = moteProbeReactor.moteProbeReactor()
+    probe   = _ConnectingProbe('IoT-LAB0',server)
+    failing = _ConnectingProbe('IoT-LAB1',closed)
+    other   = _StubProbe('IoT-LAB2')
+    for p in [probe,failing,other]:
+        reactor.addProbe(p)
+    
+    (moteEnd,_) = server.accept()
+    moteEnd.sendall(hdlc.hdlcify('\x01'))
+    assert probe.waitForFrames(1)==['\x01']
+    
+    assert _waitFor(lambda: other.moteEnds)
+    other.moteEnds[0].sendall(hdlc.hdlcify('\x02'))
+    assert other.waitForFrames(1)==['\x02']
+    
+    assert _waitFor(lambda: reactor.ports[failing].backoff)
+    assert reactor.getStats()['IoT-LAB1']['open']==False
+    
+    reactor.close()
+    moteEnd.close()
+    server.close()
+    closed.close()
+
+def test_backoff():
+    '''
+    The backoff is only reset once data is received, not when a port which
+    closes at once is opened.
+    '''
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    reactor = moteProbeReactor.moteProbeReactor()
+    probe   = _StubProbe('IoT-LAB0')
+    reactor.addProbe(probe)
+    
+    assert _waitFor(lambda: probe.moteEnds)
+    probe.moteEnds[0].close()
+    assert _waitFor(lambda: len(probe.moteEnds)==2)
+    probe.moteEnds[1].close()
+    assert _waitFor(lambda: reactor.ports[probe].backoff==2*reactor.RECONNECT_MIN_S)
+    
+    assert _waitFor(lambda: len(probe.moteEnds)==3)
+    probe.moteEnds[2].sendall(hdlc.hdlcify('\x01'))
+    assert probe.waitForFrames(1)==['\x01']
+    assert reactor.ports[probe].backoff==0
+    
+    reactor.close()
+
+def test_handlerFails():
+    '''
+    An exception handling the frames of a port closes that port only.
+    '''
+    
+    hdlc    = OpenHdlc.OpenHdlc()
+    reactor = moteProbeReactor.moteProbeReactor()
+    failing = _StubProbe('IoT-LAB0')
+    other   = _StubProbe('IoT-LAB1')
+    failing.failOnFrame = '\xff'
+    reactor.addProbe(failing)
+    reactor.addProbe(other)
+    assert _waitFor(lambda: failing.moteEnds and other.moteEnds)
+    
+    failing.moteEnds[0].sendall(hdlc.hdlcify('\xff'))
+    assert _waitFor(lambda: len(failing.moteEnds)==2)
+    
+    other.moteEnds[0].sendall(hdlc.hdlcify('\x01'))
+    assert other.waitForFrames(1)==['\x01']
+    failing.moteEnds[1].sendall(hdlc.hdlcify('\x02'))
+    assert failing.waitForFrames(1)==['\x02']
+    assert reactor.isAlive()
+    
+    reactor.close()
@@ -0,0 +1,467 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Contains the moteHistory store, which keeps the recent values of the
+numeric fields of the motes' status, as time series.
+'''
+import logging
+log = logging.getLogger('moteHistory')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import array
+import glob
+import os
+import struct
+import threading
+import time
+
+#============================ defines =========================================
+
+TIER_RAW            = 'raw'
+TIER_1S             = '1s'
+TIER_1MIN           = '1min'
+TIER_ALL            = [
+    TIER_RAW,
+    TIER_1S,
+    TIER_1MIN,
+]
+TIER_INTERVALS      = {
+    TIER_1S:        1,
+    TIER_1MIN:      60,
+}
+
+RAW_CAPACITY        = 64          # samples, per series
+TIER_CAPACITIES     = {
+    TIER_1S:        300,          # 5 minutes
+    TIER_1MIN:      720,          # 12 hours
+}
+MAX_SERIES          = 20000       # series kept in memory, at most
+
+# the fields recorded, by state element
+HISTORY_FIELDS      = {
+    'OutputBuffer': ['index_write','index_read'],
+    'MacStats':     ['numSyncPkt','numSyncAck','minCorrection','maxCorrection','numDeSync','numTicsOn','numTicsTotal'],
+    'Schedule':     ['numRx','numTx','numTxACK'],
+    'Backoff':      ['backoffExponent','backoff'],
+    'Neighbors':    ['used','parentPreference','DAGrank','rssi','numRx','numTx','numTxACK','numWraps'],
+    'IsSync':       ['isSync'],
+    'MyDagRank':    ['myDAGrank'],
+    'kaPeriod':     ['kaPeriod'],
+}
+
+# on-disk segments
+SEGMENT_MAGIC       = 'OWHIST\x00\x01'            # format version 1
+SEGMENT_PATTERN     = 'history_{0:06d}.seg'
+SEGMENT_GLOB        = 'history_*.seg'
+SEGMENT_SIZE        = 16*1024*1024                # bytes, before starting a new segment
+MAX_SEGMENTS        = 16                          # the oldest are deleted
+RECORD_STRUCT       = struct.Struct('<dHd')       # timestamp, seriesId, value
+SERIESNAME_ID       = 0xffff                      # record naming a series
+SERIESNAME_STRUCT   = struct.Struct('<HH')        # seriesId, length
+
+class HistoryException(Exception):
+    pass
+
+#============================ functions =======================================
+
+def readSegment(filename):
+    '''
+    Reads the samples recorded in a segment.
+    
+    :param filename: A segment written by a moteHistory.
+    :returns: A generator of (timestamp,mote,field,value) tuples, in the
+        order they were recorded.
+    '''
+    with open(filename,'rb') as f:
+        
+        if f.read(len(SEGMENT_MAGIC))!=SEGMENT_MAGIC:
+            raise HistoryException('{0} is not a history segment'.format(filename))
+        
+        seriesNames = {}
+        while True:
+            record = f.read(RECORD_STRUCT.size)
+            if not record:
+                break
+            if len(record)<RECORD_STRUCT.size:
+                raise HistoryException('{0} is truncated'.format(filename))
+            (timestamp,seriesId,value) = RECORD_STRUCT.unpack(record)
+            
+            if seriesId==SERIESNAME_ID:
+                header = f.read(SERIESNAME_STRUCT.size)
+                if len(header)<SERIESNAME_STRUCT.size:
+                    raise HistoryException('{0} is truncated'.format(filename))
+                (newId,length) = SERIESNAME_STRUCT.unpack(header)
+                name = f.read(length)
+                if len(name)<length:
+                    raise HistoryException('{0} is truncated'.format(filename))
+                seriesNames[newId] = tuple(name.split('\x00',1))
+            else:
+                (mote,field) = seriesNames[seriesId]
+                yield (timestamp,mote,field,value)
+
+def readSegments(directory):
+    '''
+    Reads the samples recorded in all the segments of a directory, oldest
+    first.
+    
+    :returns: A generator of (timestamp,mote,field,value) tuples.
+    '''
+    for filename in sorted(glob.glob(os.path.join(directory,SEGMENT_GLOB))):
+        for sample in readSegment(filename):
+            yield sample
+
+#============================ classes =========================================
+
+class RingBuffer(object):
+    '''
+    The last values appended, up to a capacity, in an array allocated once.
+    '''
+    
+    def __init__(self,capacity,typecode='d'):
+        
+        assert capacity>0
+        
+        # store params
+        self.capacity             = capacity
+        
+        # local variables
+        self.values               = array.array(typecode,[0])*capacity
+        self.first                = 0       # index of the oldest value
+        self.count                = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self,index):
+        '''
+        :param index: 0 for the oldest value, -1 for the last one.
+        '''
+        if index<0:
+            index += self.count
+        if not 0<=index<self.count:
+            raise IndexError(index)
+        return self.values[(self.first+index)%self.capacity]
+    
+    def append(self,value):
+        if self.count<self.capacity:
+            self.values[(self.first+self.count)%self.capacity] = value
+            self.count += 1
+        else:
+            self.values[self.first] = value
+            self.first = (self.first+1)%self.capacity
+    
+    def getMemoryUsage(self):
+        return self.values.itemsize*self.capacity
+
+class _Tier(object):
+    '''
+    The means of the values of a series over consecutive intervals. The
+    interval being fixed, only the means are stored, the time of each is
+    deduced from the time of the last one. Intervals without values hold
+    NaN.
+    '''
+    
+    NAN = float('nan')
+    
+    def __init__(self,interval,capacity):
+        
+        # store params
+        self.interval             = interval
+        
+        # local variables
+        self.means                = RingBuffer(capacity,'f')
+        self.lastBucket           = None    # interval of the last mean stored
+        self.bucket               = None    # interval being averaged
+        self.sum                  = 0.0
+        self.num                  = 0
+    
+    def add(self,timestamp,value):
+        bucket = int(timestamp//self.interval)
+        if self.bucket is None:
+            self.bucket = bucket
+        elif bucket>self.bucket:
+            # the interval is over, store its mean, and NaN for those without values
+            self.means.append(self.sum/self.num)
+            numEmpty = min(bucket-self.bucket-1,self.means.capacity)
+            for _ in range(numEmpty):
+                self.means.append(self.NAN)
+            self.lastBucket = bucket-1
+            self.bucket     = bucket
+            self.sum        = 0.0
+            self.num        = 0
+        # a value older than the interval (e.g. the clock was set back) is
+        # averaged in it
+        self.sum += value
+        self.num += 1
+    
+    def getOldestTime(self):
+        if self.means:
+            return (self.lastBucket-len(self.means)+1)*self.interval
+        if self.bucket is not None:
+            return self.bucket*self.interval
+        return None
+    
+    def getRange(self,start,end):
+        '''
+        :returns: The (timestamp,mean) of the intervals starting between
+            start and end, including the one being averaged.
+        '''
+        returnVal = []
+        if self.means:
+            firstBucket = self.lastBucket-len(self.means)+1
+            first = 0
+            if start is not None:
+                first = max(0,int(-(-start//self.interval))-firstBucket)
+            for i in xrange(first,len(self.means)):
+                timestamp = (firstBucket+i)*self.interval
+                if end is not None and timestamp>end:
+                    break
+                mean = self.means[i]
+                if mean==mean: # not NaN
+                    returnVal += [(timestamp,mean)]
+        if self.bucket is not None:
+            timestamp = self.bucket*self.interval
+            if (start is None or timestamp>=start) and (end is None or timestamp<=end):
+                returnVal += [(timestamp,self.sum/self.num)]
+        return returnVal
+    
+    def getMemoryUsage(self):
+        return self.means.getMemoryUsage()
+
+class _Series(object):
+    '''
+    The values of a field of a mote: the last ones, and their means over
+    each tier's intervals.
+    '''
+    
+    def __init__(self,rawCapacity,tierCapacities):
+        self.times                = RingBuffer(rawCapacity)
+        self.values               = RingBuffer(rawCapacity)
+        self.tiers                = dict([
+            (tier,_Tier(TIER_INTERVALS[tier],capacity)) for (tier,capacity) in tierCapacities.items()
+        ])
+    
+    def add(self,timestamp,value):
+        self.times.append(timestamp)
+        self.values.append(value)
+        for tier in self.tiers.values():
+            tier.add(timestamp,value)
+    
+    def getOldestTime(self,tier):
+        if tier==TIER_RAW:
+            return self.times[0] if self.times else None
+        return self.tiers[tier].getOldestTime()
+    
+    def getRange(self,tier,start,end):
+        if tier!=TIER_RAW:
+            return self.tiers[tier].getRange(start,end)
+        returnVal = []
+        for i in xrange(len(self.times)):
+            timestamp = self.times[i]
+            if (start is None or timestamp>=start) and (end is None or timestamp<=end):
+                returnVal += [(timestamp,self.values[i])]
+        return returnVal
+    
+    def getMemoryUsage(self):
+        return (
+            self.times.getMemoryUsage()+
+            self.values.getMemoryUsage()+
+            sum([t.getMemoryUsage() for t in self.tiers.values()])
+        )
+
+class moteHistory(object):
+    '''
+    Keeps the recent values of the numeric fields of the status of the
+    motes, as time series, per mote and field.
+    
+    The memory each series uses is allocated when it is created, and does
+    not grow: it keeps its last rawCapacity values, and their means over
+    each second and each minute, in ring buffers. At most maxSeries series
+    are kept, the values of the others are only written to disk.
+    
+    If given a directory, all the values are also appended to segments on
+    disk, see readSegment(). A segment is started once the previous one
+    reaches segmentSize bytes, and only the last maxSegments are kept.
+    '''
+    
+    def __init__(self,directory=None,rawCapacity=RAW_CAPACITY,tierCapacities=TIER_CAPACITIES,
+            maxSeries=MAX_SERIES,segmentSize=SEGMENT_SIZE,maxSegments=MAX_SEGMENTS):
+        
+        # store params
+        self.directory            = directory
+        self.rawCapacity          = rawCapacity
+        self.tierCapacities       = tierCapacities
+        self.maxSeries            = maxSeries
+        self.segmentSize          = segmentSize
+        self.maxSegments          = maxSegments
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.series               = {}      # (mote,field) -> _Series
+        self.numSamples           = 0
+        self.numDropped           = 0       # samples of series beyond maxSeries
+        self.segment              = None
+        self.segmentIds           = {}      # (mote,field) -> seriesId in the segment
+        self.segmentNum           = 0
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            existing = sorted(glob.glob(os.path.join(self.directory,SEGMENT_GLOB)))
+            if existing:
+                self.segmentNum = int(os.path.basename(existing[-1])[len('history_'):-len('.seg')])+1
+            self._openSegment()
+    
+    #======================== public ==========================================
+    
+    def record(self,mote,field,value,timestamp=None):
+        '''
+        Record a value of a field of a mote.
+        
+        :param timestamp: When it was received, now by default.
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+        with self.dataLock:
+            self._record(mote,field,value,timestamp)
+    
+    def recordNotif(self,mote,elemName,notif,timestamp=None):
+        '''
+        Record the fields of a status notification listed in HISTORY_FIELDS,
+        as '<elemName>.<field>', or '<elemName>.<row>.<field>' for the rows
+        of a table.
+        
+        :param elemName: The name of the state element the notification
+            updates, e.g. 'Neighbors'.
+        '''
+        fields = HISTORY_FIELDS.get(elemName)
+        if not fields:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        row = getattr(notif,'row',None)
+        if row is None:
+            prefix = elemName+'.'
+        else:
+            prefix = '{0}.{1}.'.format(elemName,row)
+        with self.dataLock:
+            for field in fields:
+                self._record(mote,prefix+field,getattr(notif,field),timestamp)
+    
+    def getMotes(self):
+        with self.dataLock:
+            return sorted(set([mote for (mote,_) in self.series.keys()]))
+    
+    def getFields(self,mote):
+        with self.dataLock:
+            return sorted([field for (m,field) in self.series.keys() if m==mote])
+    
+    def getRange(self,mote,field,start=None,end=None,tier=None):
+        '''
+        :param start: The first timestamp, the oldest kept by default.
+        :param end:   The last timestamp, the last kept by default.
+        :param tier:  TIER_RAW for the values, TIER_1S or TIER_1MIN for their
+            means, by default the first of them holding values from start.
+        :raises ValueError: If there is no such series or tier.
+        :returns: A dictionary with the tier of the values, as 'tier', and
+            the (timestamp,value) in the range, as 'values'. For the means,
+            the timestamp is the start of the interval.
+        '''
+        if tier is not None and tier not in TIER_ALL:
+            raise ValueError('Unknown tier {0}'.format(tier))
+        with self.dataLock:
+            series = self.series.get((mote,field))
+            if series is None:
+                raise ValueError('No history of {0} for {1}'.format(field,mote))
+            if tier is None:
+                tier = self._pickTier(series,start)
+            return {
+                'tier':        tier,
+                'values':      series.getRange(tier,start,end),
+            }
+    
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of series, of samples
+            recorded, and dropped because maxSeries was reached, and the
+            memory used by the series, in bytes.
+        '''
+        with self.dataLock:
+            return {
+                'numSeries':      len(self.series),
+                'numSamples':     self.numSamples,
+                'numDropped':     self.numDropped,
+                'memoryUsage':    sum([s.getMemoryUsage() for s in self.series.values()]),
+            }
+    
+    def flush(self):
+        with self.dataLock:
+            if self.segment:
+                self.segment.flush()
+    
+    def close(self):
+        with self.dataLock:
+            if self.segment:
+                self.segment.close()
+                self.segment = None
+    
+    #======================== private =========================================
+    
+    def _record(self,mote,field,value,timestamp):
+        key    = (mote,field)
+        series = self.series.get(key)
+        if series is None:
+            if len(self.series)<self.maxSeries:
+                series = _Series(self.rawCapacity,self.tierCapacities)
+                self.series[key] = series
+            else:
+                self.numDropped += 1
+        if series is not None:
+            series.add(timestamp,value)
+            self.numSamples += 1
+        if self.segment:
+            self._writeSample(key,value,timestamp)
+    
+    def _pickTier(self,series,start):
+        if start is None:
+            return TIER_RAW
+        for tier in TIER_ALL:
+            if tier!=TIER_RAW and tier not in series.tiers:
+                continue
+            oldest = series.getOldestTime(tier)
+            if oldest is not None and oldest<=start:
+                return tier
+        # none goes back that far, the coarsest goes back the furthest
+        return [t for t in TIER_ALL if t==TIER_RAW or t in series.tiers][-1]
+    
+    def _openSegment(self):
+        filename            = os.path.join(self.directory,SEGMENT_PATTERN.format(self.segmentNum))
+        self.segment        = open(filename,'wb')
+        self.segment.write(SEGMENT_MAGIC)
+        self.segmentIds     = {}
+        self.segmentNum    += 1
+        
+        # log
+        log.info("recording history to {0}".format(filename))
+        
+        # delete the oldest segments
+        segments = sorted(glob.glob(os.path.join(self.directory,SEGMENT_GLOB)))
+        for oldest in segments[:-self.maxSegments]:
+            os.remove(oldest)
+    
+    def _writeSample(self,key,value,timestamp):
+        if self.segment.tell()>=self.segmentSize or len(self.segmentIds)>=SERIESNAME_ID:
+            self.segment.close()
+            self._openSegment()
+        seriesId = self.segmentIds.get(key)
+        if seriesId is None:
+            seriesId = len(self.segmentIds)
+            self.segmentIds[key] = seriesId
+            name = '{0}\x00{1}'.format(*key)
+            self.segment.write(RECORD_STRUCT.pack(0,SERIESNAME_ID,0))
+            self.segment.write(SERIESNAME_STRUCT.pack(seriesId,len(name)))
+            self.segment.write(name)
+        self.segment.write(RECORD_STRUCT.pack(timestamp,seriesId,value))
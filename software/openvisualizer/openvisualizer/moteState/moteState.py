@@ -14,12 +14,14 @@ log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
 import copy
+import itertools
 import time
 import threading
 import json
 
 from openvisualizer.moteConnector import ParserStatus
 from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.eventBus      import eventBusExecutor
 from openvisualizer.openType      import openType,         \
                                          typeAsn,          \
                                          typeAddr,         \
@@ -27,6 +29,17 @@ from openvisualizer.openType      import openType,         \
                                          typeComponent,    \
                                          typeRssi
 
+# versions of the StateElems, increasing across all of them, so a single
+# version tells which elements of any mote changed since
+_versions = itertools.count(1)
+
+def getCurrentVersion():
+    '''
+    :returns: A version which all the updates done so far do not exceed,
+        and all the updates to come will.
+    '''
+    return next(_versions)
+
 class OpenEncoder(json.JSONEncoder):
     def default(self, obj):
         if   isinstance(obj, (StateElem,openType.openType)):
@@ -37,6 +50,17 @@ class OpenEncoder(json.JSONEncoder):
 class StateElem(object):
     '''
     Abstract superclass for internal mote state classes.
+    
+    Each update gives the element a new version, see getCurrentVersion().
+    The content of the element is only converted again, to dict or JSON,
+    once its version changed. Sub-classes must call StateElem.update()
+    whenever they change the element, and only change the elements they
+    contain through their update().
+    
+    The moteState updates an element holding its dataLock, which toJson()
+    holds too, so readers only wait for the element they read. The events an
+    update produces are dispatched once the lock is released, see
+    popEvents().
     '''
     
     def __init__(self):
@@ -45,12 +69,28 @@ class StateElem(object):
         
         self.meta[0]['numUpdates']     = 0
         self.meta[0]['lastUpdated']    = None
+        
+        self.dataLock                  = threading.Lock()
+        self.version                   = next(_versions)
+        self.dictCache                 = {}            # aspect -> (version,dict)
+        self.jsonCache                 = {}            # (aspect,isPrettyPrint) -> (version,json)
     
     #======================== public ==========================================
     
     def update(self):
         self.meta[0]['lastUpdated']    = time.time()
         self.meta[0]['numUpdates']    += 1
+        self.version                   = next(_versions)
+    
+    def getVersion(self):
+        return self.version
+    
+    def popEvents(self):
+        '''
+        :returns: The events the updates produced since the last call, as
+            (signal,data) tuples to dispatch on the eventBus.
+        '''
+        return []
     
     def toJson(self, aspect='all', isPrettyPrint=False):
         '''
@@ -69,19 +109,28 @@ class StateElem(object):
                 for the meta and data aspects. Otherwise, the JSON
                 is a list of the selected aspect's content.
         '''
-        content = None
-        if aspect   == 'all':
-            content = self._toDict()
-        elif aspect == 'data':
-            content = self._elemToDict(self.data)
-        elif aspect == 'meta':
-            content = self._elemToDict(self.meta)
-        else:
+        if aspect not in ['all','data','meta']:
             raise ValueError('No aspect named {0}'.format(aspect))
+        
+        with self.dataLock:
+            
+            # reuse the JSON of the current version
+            version = self.version
+            key     = (aspect,bool(isPrettyPrint))
+            cached  = self.jsonCache.get(key)
+            if cached and cached[0]==version:
+                return cached[1]
             
-        return json.dumps(content,
-                          sort_keys = bool(isPrettyPrint),
-                          indent    = 4 if isPrettyPrint else None)
+            if aspect == 'all':
+                content = self._toDict()
+            else:
+                content = self._aspectToDict(aspect)
+            
+            returnVal = json.dumps(content,
+                                   sort_keys = bool(isPrettyPrint),
+                                   indent    = 4 if isPrettyPrint else None)
+            self.jsonCache[key] = (version,returnVal)
+            return returnVal
     
     def __str__(self):
         return self.toJson(isPrettyPrint=True)
@@ -90,8 +139,22 @@ class StateElem(object):
     
     def _toDict(self):
         returnVal = {}
-        returnVal['meta'] = self._elemToDict(self.meta)
-        returnVal['data'] = self._elemToDict(self.data)
+        returnVal['meta'] = self._aspectToDict('meta')
+        returnVal['data'] = self._aspectToDict('data')
+        return returnVal
+    
+    def _aspectToDict(self,aspect):
+        '''
+        :returns: The aspect, converted again only once the version changed.
+            Not to be modified, it is shared by the callers.
+        '''
+        version = self.version
+        cached  = self.dictCache.get(aspect)
+        if cached and cached[0]==version:
+            return cached[1]
+        
+        returnVal = self._elemToDict(self.meta if aspect=='meta' else self.data)
+        self.dictCache[aspect] = (version,returnVal)
         return returnVal
     
     def _elemToDict(self,elem):
@@ -110,11 +173,10 @@ class StateElem(object):
                         else:
                            returnval[-1][k] = v
             elif isinstance(elem[rowNum],StateElem):
-                parsedRow = elem[rowNum]._toDict()
-                assert('data' in parsedRow)
-                assert(len(parsedRow['data'])<2)
-                if len(parsedRow['data'])==1:
-                    returnval.append(parsedRow['data'][0])
+                parsedRow = elem[rowNum]._aspectToDict('data')
+                assert(len(parsedRow)<2)
+                if len(parsedRow)==1:
+                    returnval.append(parsedRow[0])
             else:
                 raise SystemError("can not parse elem of type {0}".format(type(elem[rowNum])))
         return returnval
@@ -158,7 +220,7 @@ class StateMacStats(StateElem):
             self.data[0]['dutyCycle']       = '?'
 
 class StateScheduleRow(StateElem):
-
+    
     def update(self,notif):
         StateElem.update(self)
         if len(self.data)==0:
@@ -267,11 +329,11 @@ class StateIsSync(StateElem):
 
 class StateIdManager(StateElem):
     
-    def __init__(self,eventBusClient,moteConnector):
+    def __init__(self,moteConnector):
         StateElem.__init__(self)
-        self.eventBusClient  = eventBusClient
         self.moteConnector   = moteConnector
         self.isDAGroot       = None
+        self.events          = []
     
     def get16bAddr(self):
         try:
@@ -280,7 +342,7 @@ class StateIdManager(StateElem):
             return None
     
     def update(self,notif):
-    
+        
         # update state
         StateElem.update(self)
         if len(self.data)==0:
@@ -334,19 +396,21 @@ class StateIdManager(StateElem):
         
         # announce information about the DAG root to the eventBus
         if  self.isDAGroot!=self.data[0]['isDAGroot']:
-            
-            # dispatch
-            self.eventBusClient.dispatch(
-                signal        = 'infoDagRoot',
-                data          = {
-                                    'isDAGroot':    self.data[0]['isDAGroot'],
-                                    'eui64':        self.data[0]['my64bID'].addr,
-                                    'serialPort':   self.moteConnector.serialport,
-                                },
-            )
+            self.events += [(
+                'infoDagRoot',
+                {
+                    'isDAGroot':    self.data[0]['isDAGroot'],
+                    'eui64':        self.data[0]['my64bID'].addr[:],
+                    'serialPort':   self.moteConnector.serialport,
+                },
+            )]
         
         # record isDAGroot
         self.isDAGroot = self.data[0]['isDAGroot']
+    
+    def popEvents(self):
+        (returnVal,self.events) = (self.events,[])
+        return returnVal
 
 class StateMyDagRank(StateElem):
     
@@ -365,14 +429,14 @@ class StatekaPeriod(StateElem):
         self.data[0]['kaPeriod']            = notif.kaPeriod
 
 class StateTable(StateElem):
-
+    
     def __init__(self,rowClass,columnOrder=None):
         StateElem.__init__(self)
         self.meta[0]['rowClass']            = rowClass
         if columnOrder:
             self.meta[0]['columnOrder']     = columnOrder
         self.data                           = []
-
+    
     def update(self,notif):
         StateElem.update(self)
         while len(self.data)<notif.row+1:
@@ -411,7 +475,7 @@ class moteState(eventBusClient.eventBusClient):
     
     TRIGGER_DAGROOT     = 'DAGroot'
     SET_COMMAND         = 'imageCommand'
-
+    
     # command for golen image:        command,         id length
     COMMAND_SET_EBPERIOD          =  ['ebPeriod',       0, 1]
     COMMAND_SET_CHANNEL           =  ['channel',        1, 1]
@@ -449,20 +513,28 @@ class moteState(eventBusClient.eventBusClient):
         COMMAND_SET_6PRESPONSE_STATUS,
         COMMAND_SET_SF0BANDWIDTH
     ]
-
+    
     TRIGGER_ALL         = [
         TRIGGER_DAGROOT,
     ]
     
-    def __init__(self,moteConnector):
+    def __init__(self,moteConnector,executor=None,history=None):
+        '''
+        :param executor: The eventBusExecutor to update the state from, if
+            the status notifications are not to be handled by the thread of
+            the moteConnector.
+        :param history:  The moteHistory to record the status notifications
+            to, under the serial port of the mote.
+        '''
         
         # log
         log.info("create instance")
         
         # store params
         self.moteConnector   = moteConnector
+        self.history         = history
+        
         
-      
         # local variables
         self.parserStatus                   = ParserStatus.ParserStatus()
         self.stateLock                      = threading.Lock()
@@ -510,41 +582,42 @@ class moteState(eventBusClient.eventBusClient):
                                                 ))
         self.state[self.ST_ISSYNC]          = StateIsSync()
         self.state[self.ST_IDMANAGER]       = StateIdManager(
-                                                self,
                                                 self.moteConnector
                                               )
         self.state[self.ST_MYDAGRANK]       = StateMyDagRank()
         self.state[self.ST_KAPERIOD]        = StatekaPeriod()
         
-        self.notifHandlers = {
-            self.parserStatus.named_tuple[self.ST_OUPUTBUFFER]:
-                self.state[self.ST_OUPUTBUFFER].update,
-            self.parserStatus.named_tuple[self.ST_ASN]:
-                self.state[self.ST_ASN].update,
-            self.parserStatus.named_tuple[self.ST_MACSTATS]:
-                self.state[self.ST_MACSTATS].update,
-            self.parserStatus.named_tuple[self.ST_SCHEDULEROW]:
-                self.state[self.ST_SCHEDULE].update,
-            self.parserStatus.named_tuple[self.ST_BACKOFF]:
-                self.state[self.ST_BACKOFF].update,
-            self.parserStatus.named_tuple[self.ST_QUEUEROW]:
-                self.state[self.ST_QUEUE].update,
-            self.parserStatus.named_tuple[self.ST_NEIGHBORSROW]:
-                self.state[self.ST_NEIGHBORS].update,
-            self.parserStatus.named_tuple[self.ST_ISSYNC]:
-                self.state[self.ST_ISSYNC].update,
-            self.parserStatus.named_tuple[self.ST_IDMANAGER]:
-                self.state[self.ST_IDMANAGER].update,
-            self.parserStatus.named_tuple[self.ST_MYDAGRANK]:
-                self.state[self.ST_MYDAGRANK].update,
-            self.parserStatus.named_tuple[self.ST_KAPERIOD]:
-                self.state[self.ST_KAPERIOD].update,
+        # the state element each status element updates
+        stateByStatus = {
+            self.ST_OUPUTBUFFER:      self.ST_OUPUTBUFFER,
+            self.ST_ASN:              self.ST_ASN,
+            self.ST_MACSTATS:         self.ST_MACSTATS,
+            self.ST_SCHEDULEROW:      self.ST_SCHEDULE,
+            self.ST_BACKOFF:          self.ST_BACKOFF,
+            self.ST_QUEUEROW:         self.ST_QUEUE,
+            self.ST_NEIGHBORSROW:     self.ST_NEIGHBORS,
+            self.ST_ISSYNC:           self.ST_ISSYNC,
+            self.ST_IDMANAGER:        self.ST_IDMANAGER,
+            self.ST_MYDAGRANK:        self.ST_MYDAGRANK,
+            self.ST_KAPERIOD:         self.ST_KAPERIOD,
         }
         
+        # the state element to update, and its name, by class of
+        # notification, and by fields, for the classes of other ParserStatus
+        # instances
+        self.notifHandlers                  = {}
+        self.notifHandlersByFields          = {}
+        for (statusName,stateName) in stateByStatus.items():
+            tupleClass = self.parserStatus.named_tuple[statusName]
+            self.notifHandlers[tupleClass]                  = (stateName,self.state[stateName])
+            self.notifHandlersByFields[tupleClass._fields]  = (stateName,self.state[stateName])
+        
         # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
             name             = 'moteState@{0}'.format(self.moteConnector.serialport),
+            executor         = executor,
+            queuePolicy      = eventBusExecutor.QUEUE_BLOCK,
             registrations    = [
                 {
                     'sender'      : 'moteConnector@{0}'.format(self.moteConnector.serialport),
@@ -575,6 +648,33 @@ class moteState(eventBusClient.eventBusClient):
         
         return returnVal
     
+    def getStateDelta(self,sinceVersion=0,aspect='data'):
+        '''
+        Dumps to JSON the state elements which changed since a version.
+        
+        :param sinceVersion: The version returned by the previous call, 0
+            for all the elements.
+        :param aspect: The aspect of the elements to dump, see
+            StateElem.toJson().
+        :returns: A dictionary with the version to pass to the next call, as
+            'version', and the JSON of the elements which changed, by
+            name, as 'states'.
+        '''
+        
+        # an update given a version up to this one holds the lock of its
+        # element until it is done
+        version = getCurrentVersion()
+        changed = []
+        for (name,elem) in self.state.items():
+            with elem.dataLock:
+                if elem.getVersion()>sinceVersion:
+                    changed += [(name,elem)]
+        
+        return {
+            'version':     version,
+            'states':      dict([(name,elem.toJson(aspect)) for (name,elem) in changed]),
+        }
+    
     def triggerAction(self,action):
         
         # dispatch
@@ -594,22 +694,29 @@ class moteState(eventBusClient.eventBusClient):
         if log.isEnabledFor(logging.DEBUG):
             log.debug("received {0}".format(data))
         
-        # lock the state data
-        self.stateLock.acquire()
+        # find the state element
+        handler = self.notifHandlers.get(type(data))
+        if handler is None:
+            handler = self.notifHandlersByFields.get(getattr(data,'_fields',None))
+            if handler is None:
+                raise SystemError("No handler for data {0}".format(data))
+            # the class of the notification is known from now on
+            self.notifHandlers[type(data)] = handler
+        (elemName,elem) = handler
         
-        # call handler
-        found = False
-        for k,v in self.notifHandlers.items():
-            if self._isnamedtupleinstance(data,k):
-                found = True
-                v(data)
-                break
+        # update it, holding its lock only
+        with elem.dataLock:
+            elem.update(data)
+            events = elem.popEvents()
         
-        # unlock the state data
-        self.stateLock.release()
+        # dispatch what it produced, the lock released, since the subscribers
+        # may read the state
+        for (signal,eventData) in events:
+            self.dispatch(
+                signal        = signal,
+                data          = eventData,
+            )
         
-        if not found:
-            raise SystemError("No handler for data {0}".format(data))
-    
-    def _isnamedtupleinstance(self,var,tupleInstance):
-        return var._fields==tupleInstance._fields
\ No newline at end of file
+        # record its history
+        if self.history:
+            self.history.recordNotif(self.moteConnector.serialport,elemName,data)
\ No newline at end of file
@@ -0,0 +1,86 @@
+'''
+This is a performance test which measures the cost of recording the history
+of the motes' state, per sample, in memory only and also to segment files,
+and the memory the series use once their buffers are full. The samples are
+the fields of HISTORY_FIELDS, for each mote, at 1 sample per field per
+second of simulated time.
+
+Run this test with 'python bench_moteHistory.py [numSeconds] [numMotes]'. By
+default, it records 600 seconds of 100 motes.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # moteState/
+
+import shutil
+import tempfile
+import time
+
+import moteHistory
+
+#============================ defines =========================================
+
+NUM_SECONDS   = 600
+NUM_MOTES     = 100
+START         = 1000000.0
+
+#============================ helpers =========================================
+
+def _fields():
+    returnVal = []
+    for (elemName,fields) in moteHistory.HISTORY_FIELDS.items():
+        returnVal += ['{0}.{1}'.format(elemName,f) for f in fields]
+    return returnVal
+
+def _record(history,numSeconds,motes,fields):
+    start = time.time()
+    for second in xrange(numSeconds):
+        for mote in motes:
+            for (i,field) in enumerate(fields):
+                history.record(mote,field,second+i,timestamp=START+second)
+    return time.time()-start
+
+#============================ main ============================================
+
+def main(numSeconds=NUM_SECONDS,numMotes=NUM_MOTES):
+    
+    motes      = ['mote{0}'.format(i) for i in range(numMotes)]
+    fields     = _fields()
+    numSamples = numSeconds*numMotes*len(fields)
+    output     = []
+    
+    directory  = tempfile.mkdtemp()
+    try:
+        for (name,history) in [
+                ('memory',   moteHistory.moteHistory()),
+                ('segments', moteHistory.moteHistory(directory=directory)),
+            ]:
+            duration = _record(history,numSeconds,motes,fields)
+            history.close()
+            stats    = history.getStats()
+            output  += ['{0:<10} {1:8.2f}us/sample, {2} series, {3:.1f}MB'.format(
+                name,
+                1000000*duration/numSamples,
+                stats['numSeries'],
+                stats['memoryUsage']/1024.0/1024,
+            )]
+    finally:
+        shutil.rmtree(directory)
+    
+    # reading back the last minute of each series
+    start      = time.time()
+    for mote in motes:
+        for field in fields:
+            history.getRange(mote,field,start=START+numSeconds-60)
+    output    += ['{0:<10} {1:8.2f}us/series'.format(
+        'getRange',1000000*(time.time()-start)/(numMotes*len(fields)),
+    )]
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,121 @@
+'''
+This is a performance test which measures the cost of updating the state of
+a mote from a status notification, as parsed by the moteConnector, and of
+polling the state of motes to JSON, as the web interface does, once per mote
+per poll:
+- 'all changed': every state element changed since the previous poll,
+  so all of them are converted again, as they were before caching;
+- 'asn changed': only the ASN changed, the JSON of the others is reused;
+- 'delta':       only the ASN changed, and only it is polled, through
+  moteState.getStateDelta().
+
+Run this test with 'python bench_moteState.py [numPolls] [numMotes]'. By
+default, it polls 50 motes 100 times.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # moteState/
+
+import time
+
+from pydispatch import dispatcher
+
+import moteState
+from openvisualizer.moteConnector import ParserStatus
+
+#============================ defines =========================================
+
+NUM_POLLS     = 100
+NUM_MOTES     = 50
+NUM_ROWS      = 10     # rows in the schedule and neighbor tables
+
+#============================ helpers =========================================
+
+class _MoteConnector(object):
+    
+    def __init__(self,serialport):
+        self.serialport = serialport
+
+def _notifs(ms):
+    '''
+    :returns: A notification for each state element, and the rows of the
+        tables, with all fields 1.
+    '''
+    returnVal = []
+    for (name,tupleClass) in ms.parserStatus.named_tuple.items():
+        if 'row' in tupleClass._fields:
+            rows = range(NUM_ROWS)
+        else:
+            rows = [None]
+        for row in rows:
+            fields = dict([(f,1) for f in tupleClass._fields])
+            if row is not None:
+                fields['row'] = row
+            returnVal += [(name,tupleClass(**fields))]
+    return returnVal
+
+def _receive(ms,notif):
+    dispatcher.send(
+        sender = 'moteConnector@{0}'.format(ms.moteConnector.serialport),
+        signal = 'fromMote.status',
+        data   = notif,
+    )
+
+def _pollAll(motes):
+    for ms in motes:
+        for name in ms.ST_ALL:
+            ms.getStateElem(name).toJson('data')
+
+#============================ main ============================================
+
+def main(numPolls=NUM_POLLS,numMotes=NUM_MOTES):
+    
+    motes    = [moteState.moteState(_MoteConnector('mote{0}'.format(i))) for i in range(numMotes)]
+    notifs   = dict([(ms,_notifs(ms)) for ms in motes])
+    asns     = dict([(ms,[(n,t) for (n,t) in notifs[ms] if n==ms.ST_ASN]) for ms in motes])
+    versions = dict([(ms,0) for ms in motes])
+    
+    output   = []
+    
+    # updates, from notifications of another ParserStatus, as the moteConnector's
+    parserStatus = ParserStatus.ParserStatus()
+    ms           = motes[0]
+    received     = [parserStatus.named_tuple[name]._make(notif) for (name,notif) in notifs[ms]]
+    start        = time.time()
+    for _ in range(numPolls):
+        for notif in received:
+            ms._receivedStatus_notif(sender=None,signal='fromMote.status',data=notif)
+    duration     = time.time()-start
+    output      += ['{0:<12} {1:8.2f}us/notification'.format(
+        'update',1000000*duration/(numPolls*len(received)),
+    )]
+    
+    for (name,updates) in [
+            ('all changed',  notifs),
+            ('asn changed',  asns),
+            ('delta',        asns),
+        ]:
+        duration = 0
+        for _ in range(numPolls):
+            for ms in motes:
+                for (_,notif) in updates[ms]:
+                    _receive(ms,notif)
+            start = time.time()
+            if name=='delta':
+                for ms in motes:
+                    versions[ms] = ms.getStateDelta(versions[ms])['version']
+            else:
+                _pollAll(motes)
+            duration += time.time()-start
+        output += ['{0:<12} {1:8.2f}ms/poll of {2} motes'.format(
+            name,1000*duration/numPolls,numMotes,
+        )]
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteState/
+
+import logging
+import logging.handlers
+
+import pytest
+
+from pydispatch import dispatcher
+
+import moteHistory
+import moteState
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteHistory.log'
+
+import logging
+log = logging.getLogger('test_moteHistory')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_moteHistory',
+                   'moteHistory',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE       = 'COM1'
+FIELD      = 'MyDagRank.myDAGrank'
+START      = 1000000.0
+
+#============================ helpers =========================================
+
+class _MoteConnector(object):
+    serialport = MOTE
+
+#============================ tests ===========================================
+
+def test_ringBuffer():
+    
+    ring = moteHistory.RingBuffer(3)
+    assert len(ring)==0
+    for value in range(5):
+        ring.append(value)
+    assert len(ring)==3
+    assert [ring[i] for i in range(3)]==[2,3,4]
+    assert ring[-1]==4
+    with pytest.raises(IndexError):
+        ring[3]
+
+def test_raw():
+    
+    history = moteHistory.moteHistory(rawCapacity=10)
+    for i in range(20):
+        history.record(MOTE,FIELD,i,timestamp=START+i*0.1)
+    
+    # only the last values are kept
+    result = history.getRange(MOTE,FIELD)
+    assert result['tier']==moteHistory.TIER_RAW
+    assert result['values']==[(START+i*0.1,i) for i in range(10,20)]
+    
+    result = history.getRange(MOTE,FIELD,start=START+1.45,end=START+1.75)
+    assert [v for (_,v) in result['values']]==[15,16,17]
+    
+    with pytest.raises(ValueError):
+        history.getRange(MOTE,'unknown')
+    with pytest.raises(ValueError):
+        history.getRange(MOTE,FIELD,tier='unknown')
+
+def test_tiers():
+    
+    history = moteHistory.moteHistory(
+        rawCapacity    = 10,
+        tierCapacities = {
+            moteHistory.TIER_1S:    100,
+            moteHistory.TIER_1MIN:  10,
+        },
+    )
+    # 4 values per second for 3 minutes, but none during the second minute
+    for i in range(4*180):
+        if 60<=i/4<120:
+            continue
+        history.record(MOTE,FIELD,i,timestamp=START+i*0.25)
+    
+    # the means of each of the last 100 seconds
+    result = history.getRange(MOTE,FIELD,tier=moteHistory.TIER_1S)
+    values = dict(result['values'])
+    assert START+60 not in values
+    assert START+110 not in values
+    assert values[START+120]==(480+481+482+483)/4.0
+    assert values[START+130]==(520+521+522+523)/4.0
+    assert values[START+179]==(716+717+718+719)/4.0
+    
+    # the means of each minute, the last one still being averaged
+    result = history.getRange(MOTE,FIELD,tier=moteHistory.TIER_1MIN)
+    assert result['values']==[
+        (START-40,  sum(range(0,80))/80.0),     # START is 40s into its minute
+        (START+20,  sum(range(80,240))/160.0),
+        (START+80,  sum(range(480,560))/80.0),
+        (START+140, sum(range(560,720))/160.0),
+    ]
+    
+    # by default, the finest tier going back to start
+    assert history.getRange(MOTE,FIELD,start=START+178)['tier']==moteHistory.TIER_RAW
+    assert history.getRange(MOTE,FIELD,start=START+150)['tier']==moteHistory.TIER_1S
+    assert history.getRange(MOTE,FIELD,start=START)['tier']==moteHistory.TIER_1MIN
+
+def test_boundedMemory():
+    
+    history = moteHistory.moteHistory(maxSeries=5)
+    for i in range(10):
+        history.record(MOTE,'field{0}'.format(i),0,timestamp=START)
+    stats   = history.getStats()
+    for i in range(1000):
+        history.record(MOTE,'field0',i,timestamp=START+i)
+    
+    assert history.getStats()['memoryUsage']==stats['memoryUsage']
+    assert stats['numSeries']==5
+    assert stats['numDropped']==5
+    assert history.getFields(MOTE)==['field{0}'.format(i) for i in range(5)]
+
+def test_segments(tmpdir):
+    
+    directory = str(tmpdir.join('history'))
+    history   = moteHistory.moteHistory(directory=directory,segmentSize=1000,maxSegments=3)
+    samples   = [
+        (START+i,'COM{0}'.format(i%2),'field{0}'.format(i%3),float(i)) for i in range(200)
+    ]
+    for (timestamp,mote,field,value) in samples:
+        history.record(mote,field,value,timestamp=timestamp)
+    history.close()
+    
+    # only the last segments are kept, each can be read on its own
+    segments  = sorted(os.listdir(directory))
+    assert len(segments)==3
+    read      = list(moteHistory.readSegments(directory))
+    assert read==samples[-len(read):]
+    last      = list(moteHistory.readSegment(os.path.join(directory,segments[-1])))
+    assert last and last==samples[-len(last):]
+    
+    # a new history continues after the existing segments
+    history   = moteHistory.moteHistory(directory=directory,segmentSize=1000,maxSegments=3)
+    history.record(MOTE,FIELD,1.0,timestamp=START+1000)
+    history.close()
+    assert sorted(os.listdir(directory))[:2]==segments[1:]
+    assert list(moteHistory.readSegments(directory))[-1]==(START+1000,MOTE,FIELD,1.0)
+
+def test_invalidSegment(tmpdir):
+    
+    filename = str(tmpdir.join('invalid.seg'))
+    with open(filename,'wb') as f:
+        f.write('not a segment')
+    with pytest.raises(moteHistory.HistoryException):
+        list(moteHistory.readSegment(filename))
+
+def test_moteState():
+    
+    history = moteHistory.moteHistory()
+    ms      = moteState.moteState(_MoteConnector(),history=history)
+    for (name,fields) in [
+            ('MyDagRank',     {'myDAGrank': 256}),
+            ('MyDagRank',     {'myDAGrank': 512}),
+            ('IsSync',        {'isSync': 1}),
+            ('NeighborsRow',  dict([(f,2) for f in ms.parserStatus.named_tuple['NeighborsRow']._fields])),
+        ]:
+        dispatcher.send(
+            sender = 'moteConnector@{0}'.format(MOTE),
+            signal = 'fromMote.status',
+            data   = ms.parserStatus.named_tuple[name](**fields),
+        )
+    
+    assert history.getMotes()==[MOTE]
+    assert [v for (_,v) in history.getRange(MOTE,'MyDagRank.myDAGrank')['values']]==[256,512]
+    assert [v for (_,v) in history.getRange(MOTE,'Neighbors.2.rssi')['values']]==[2]
+    assert 'Neighbors.2.row' not in history.getFields(MOTE)
+    assert 'Neighbors.2.addr_bodyH' not in history.getFields(MOTE)
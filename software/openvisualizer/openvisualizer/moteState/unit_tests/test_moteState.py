@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteState/
+
+import json
+import logging
+import logging.handlers
+import threading
+import time
+
+import pytest
+
+from pydispatch import dispatcher
+
+import moteState
+from openvisualizer.moteConnector import ParserStatus
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteState.log'
+
+import logging
+log = logging.getLogger('test_moteState')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_moteState',
+                   'moteState',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT    = 10 # s
+SERIALPORT = 'testPort'
+
+#============================ helpers =========================================
+
+class _MoteConnector(object):
+    '''
+    The attributes of a moteConnector the moteState uses.
+    '''
+    serialport = SERIALPORT
+
+@pytest.fixture
+def ms():
+    return moteState.moteState(_MoteConnector())
+
+def _notif(ms,elemName,**fields):
+    return ms.parserStatus.named_tuple[elemName](**fields)
+
+def _receive(notif):
+    dispatcher.send(
+        sender = 'moteConnector@{0}'.format(SERIALPORT),
+        signal = 'fromMote.status',
+        data   = notif,
+    )
+
+#============================ tests ===========================================
+
+def test_version(ms):
+    
+    elem    = ms.getStateElem(ms.ST_ISSYNC)
+    version = elem.getVersion()
+    assert version>0
+    
+    _receive(_notif(ms,'IsSync',isSync=1))
+    assert elem.getVersion()>version
+    version = elem.getVersion()
+    
+    _receive(_notif(ms,'IsSync',isSync=0))
+    assert elem.getVersion()>version
+    assert elem.getVersion()<moteState.getCurrentVersion()
+
+def test_jsonCache(ms):
+    
+    elem    = ms.getStateElem(ms.ST_ASN)
+    _receive(_notif(ms,'Asn',asn_4=0,asn_2_3=0,asn_0_1=1))
+    
+    first   = elem.toJson('data')
+    assert json.loads(first)==[{'asn': str(elem.data[0]['asn'])}]
+    
+    # the same JSON is returned until the element is updated
+    assert elem.toJson('data') is first
+    assert elem.toJson('all') is elem.toJson('all')
+    assert elem.toJson('data',isPrettyPrint=True)!=first
+    
+    _receive(_notif(ms,'Asn',asn_4=0,asn_2_3=0,asn_0_1=2))
+    second  = elem.toJson('data')
+    assert second!=first
+    assert json.loads(second)==[{'asn': str(elem.data[0]['asn'])}]
+    
+    with pytest.raises(ValueError):
+        elem.toJson('unknown')
+
+def test_nestedElems(ms):
+    '''
+    Updating a row of a table changes the version and JSON of the table.
+    '''
+    
+    elem    = ms.getStateElem(ms.ST_QUEUE)
+    fields  = dict([('creator_{0}'.format(i),0) for i in range(10)])
+    fields.update(dict([('owner_{0}'.format(i),0) for i in range(10)]))
+    _receive(_notif(ms,'QueueRow',**fields))
+    first   = elem.toJson('data')
+    
+    fields['owner_3'] = 1
+    _receive(_notif(ms,'QueueRow',**fields))
+    assert elem.toJson('data')!=first
+
+def test_delta(ms):
+    
+    # all the elements, initially
+    delta   = ms.getStateDelta()
+    assert sorted(delta['states'].keys())==sorted(ms.getStateElemNames())
+    
+    # none, until an update
+    delta   = ms.getStateDelta(delta['version'])
+    assert delta['states']=={}
+    
+    _receive(_notif(ms,'IsSync',isSync=1))
+    _receive(_notif(ms,'MyDagRank',myDAGrank=256))
+    delta   = ms.getStateDelta(delta['version'])
+    assert sorted(delta['states'].keys())==[ms.ST_ISSYNC,ms.ST_MYDAGRANK]
+    assert json.loads(delta['states'][ms.ST_MYDAGRANK])==[{'myDAGrank': 256}]
+    
+    assert ms.getStateDelta(delta['version'])['states']=={}
+
+def test_otherParserStatus(ms):
+    '''
+    Notifications built by the ParserStatus of the moteConnector, whose
+    classes are not those of the moteState, update the state too.
+    '''
+    
+    parserStatus = ParserStatus.ParserStatus()
+    notif        = parserStatus.named_tuple['MyDagRank'](myDAGrank=512)
+    assert type(notif)!=type(_notif(ms,'MyDagRank',myDAGrank=512))
+    
+    _receive(notif)
+    _receive(notif)
+    
+    elem = ms.getStateElem(ms.ST_MYDAGRANK)
+    assert json.loads(elem.toJson('data'))==[{'myDAGrank': 512}]
+    assert elem.meta[0]['numUpdates']==2
+
+def test_unknownNotif(ms):
+    
+    with pytest.raises(SystemError):
+        ms._receivedStatus_notif(
+            sender = 'moteConnector@{0}'.format(SERIALPORT),
+            signal = 'fromMote.status',
+            data   = ('not','a','status'),
+        )
+
+def test_elementLocking(ms):
+    '''
+    Updating an element only waits for the readers of that element.
+    '''
+    
+    elem = ms.getStateElem(ms.ST_ISSYNC)
+    with ms.getStateElem(ms.ST_ASN).dataLock:
+        _receive(_notif(ms,'IsSync',isSync=1))
+        assert json.loads(elem.toJson('data'))==[{'isSync': 1}]
+    
+    # the update waits for the reader holding the lock of its element
+    updater = threading.Thread(target=_receive,args=(_notif(ms,'IsSync',isSync=0),))
+    with elem.dataLock:
+        updater.start()
+        time.sleep(0.1)
+        assert elem.data[0]['isSync']==1
+    updater.join(TIMEOUT)
+    assert elem.data[0]['isSync']==0
+
+def test_infoDagRoot():
+    '''
+    The DAG root information is dispatched once the lock of the element is
+    released, so that its subscribers can read the element.
+    '''
+    
+    # a port of its own, the moteStates of the other tests being alive still
+    connector = _MoteConnector()
+    connector.serialport = 'dagRootPort'
+    ms        = moteState.moteState(connector)
+    elem      = ms.getStateElem(ms.ST_IDMANAGER)
+    received  = []
+    def _infoDagRoot(signal,data):
+        received.append((data,json.loads(elem.toJson('data'))[0]['isDAGroot']))
+    
+    fields    = dict([(f,0) for f in ms.parserStatus.named_tuple['IdManager']._fields])
+    fields.update(isDAGroot=1,my64bID_7=1)
+    updater   = threading.Thread(
+        target = dispatcher.send,
+        kwargs = {
+            'sender': 'moteConnector@dagRootPort',
+            'signal': 'fromMote.status',
+            'data':   _notif(ms,'IdManager',**fields),
+        },
+    )
+    updater.daemon = True
+    
+    dispatcher.connect(_infoDagRoot,signal='infoDagRoot')
+    try:
+        updater.start()
+        updater.join(TIMEOUT)
+        assert not updater.is_alive()
+    finally:
+        dispatcher.disconnect(_infoDagRoot,signal='infoDagRoot')
+    
+    assert received==[({'isDAGroot': 1,'eui64': [0]*7+[1],'serialPort': 'dagRootPort'},1)]
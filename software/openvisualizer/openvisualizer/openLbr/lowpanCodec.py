@@ -0,0 +1,559 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+The 6LoWPAN compression OpenLbr applies to the packets it translates. The
+packets are the lists of bytes the eventBus carries; the headers which do
+not depend on the packet are computed once, at import, and the headers of
+the packets are read in a single pass, with the fields looked up in tables.
+
+* *http://tools.ietf.org/html/rfc6282*
+  Compression Format for IPv6 Datagrams over IEEE 802.15.4-Based Networks.
+* *http://tools.ietf.org/html/rfc8138*
+  6LoWPAN Routing Header (6LoRH).
+'''
+
+import logging
+log = logging.getLogger('lowpanCodec')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import collections
+
+#============================ defines =========================================
+
+IANA_IPv6HOPHEADER       = 0
+IPV6_HEADER              = 0xEE   # NHC identifier, there is no IANA number
+
+# hop-by-hop (RPI) flags
+O_FLAG                   = 0x10
+R_FLAG                   = 0x08
+I_FLAG                   = 0x02
+K_FLAG                   = 0x01
+FLAG_MASK                = 0x1F
+
+IPv6_HEADER_LEN          = 40
+
+IPHC_DISPATCH            = 3
+IPHC_TF_4B               = 0
+IPHC_TF_3B               = 1
+IPHC_TF_1B               = 2
+IPHC_TF_ELIDED           = 3
+IPHC_NH_INLINE           = 0
+IPHC_NH_COMPRESSED       = 1
+IPHC_HLIM_INLINE         = 0
+IPHC_SAM_128B            = 0
+IPHC_SAM_64B             = 1
+IPHC_SAM_16B             = 2
+IPHC_SAM_ELIDED          = 3
+IPHC_DAM_128B            = 0
+IPHC_DAM_64B             = 1
+IPHC_DAM_16B             = 2
+IPHC_DAM_ELIDED          = 3
+
+NHC_DISPATCH             = 0x0E
+NHC_EID_MASK             = 0x0E
+NHC_EID_HOPBYHOP         = 0
+NHC_EID_IPV6             = 7
+NHC_UDP_MASK             = 0xF8
+NHC_UDP_ID               = 0xF0
+UDP_HEADER_LEN           = 8
+
+PAGE_ONE_DISPATCH        = 0xF1
+MASK_6LoRH               = 0xE0
+ELECTIVE_6LoRH           = 0xA0
+CRITICAL_6LoRH           = 0x80
+TYPE_6LoRH_IP_IN_IP      = 0x06
+TYPE_6LoRH_RPI           = 0x05
+TYPE_6LoRH_RH3_0         = 0x00
+TYPE_6LoRH_RH3_1         = 0x01
+TYPE_6LoRH_RH3_2         = 0x02
+TYPE_6LoRH_RH3_3         = 0x03
+TYPE_6LoRH_RH3_4         = 0x04
+MASK_LENGTH_6LoRH_IPINIP = 0x1F
+MAX_6LoRH_SIZE           = 32     # 5-bit size field, i.e. hops per RH3 6LoRH
+
+# the prefix and address the DAG root compresses the source routes against
+MESH_PREFIX              = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+MESH_DAGROOT             = MESH_PREFIX+[0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01]
+
+#===== precomputed headers
+
+# IPHC of the packets to the mesh: TF elided, NH and HLIM inline, both
+# addresses inline (128 bits)
+IPHC_HEADER              = [
+    (IPHC_DISPATCH<<5)+(IPHC_TF_ELIDED<<3)+(IPHC_NH_INLINE<<2)+IPHC_HLIM_INLINE,
+    (IPHC_SAM_128B<<4)+IPHC_DAM_128B,
+]
+
+# RPI 6LoRH (O, I and K flags, rank 0 of the DAG root) and IP-in-IP 6LoRH
+# (source elided), by hop limit
+RPI_IPINIP_HEADERS       = [
+    [CRITICAL_6LoRH|O_FLAG|I_FLAG|K_FLAG,TYPE_6LoRH_RPI,0]+
+    [ELECTIVE_6LoRH|1,TYPE_6LoRH_IP_IN_IP,hlim]
+    for hlim in range(256)
+]
+
+# RH3 6LoRH headers, by type and number of hops
+RH3_HEADERS              = dict([
+    ((rh3Type,numHops),[CRITICAL_6LoRH|(numHops-1),rh3Type])
+    for rh3Type in [TYPE_6LoRH_RH3_0,TYPE_6LoRH_RH3_1,TYPE_6LoRH_RH3_2,TYPE_6LoRH_RH3_3]
+    for numHops in range(1,MAX_6LoRH_SIZE+1)
+])
+
+# IPHC fields, by value of the first byte: (tf,nh,hlim), hlim being the
+# hop limit, None when inline
+IPHC_BYTE0               = [
+    ((b>>3)&0x03,(b>>2)&0x01,{0:None,1:1,2:64,3:255}[b&0x03])
+    for b in range(256)
+]
+# ... and of the second byte: (sam,dam)
+IPHC_BYTE1               = [((b>>4)&0x03,b&0x03) for b in range(256)]
+
+SHORT_ADDR_PADDING       = [0x00]*6
+
+#===== sizes of the headers, compressed and not
+
+# bytes per hop of the RH3 6LoRHs, by type
+RH3_HOP_LEN              = [1,2,4,8,16]
+# bytes of the IPHC fields, by value: traffic class and flow label, and
+# source or destination address (stateless, not multicast)
+IPHC_TF_LEN              = [4,3,1,0]
+IPHC_ADDR_LEN            = [16,8,2,0]
+# bytes of the ports of the UDP NHC, by value of its last 2 bits
+NHC_UDP_PORTS_LEN        = [4,3,3,1]
+# uncompressed, a RPL option in a hop-by-hop header, and a RFC6554 source
+# routing header with its addresses inline
+RPI_HEADER_LEN           = 8
+RH3_HEADER_LEN           = 8
+RH3_ADDR_LEN             = 16
+
+Ipv6Fields = collections.namedtuple(
+    'Ipv6Fields',
+    [
+        'nextHeader',
+        'hopLimit',
+        'flowLabel',
+        'srcAddr',
+        'dstAddr',
+        'hopFlags',          # of the RPI, None without hop-by-hop header
+        'payloadStart',      # offset of the payload in the 6LoWPAN packet
+    ],
+)
+
+#============================ IPv6 -> 6LoWPAN =================================
+
+def parseIpv6(ipv6):
+    '''
+    :param ipv6: The IPv6 packet, as a list of bytes.
+    
+    :raises: ValueError if it is not an IPv6 packet.
+    
+    :returns: An Ipv6Fields of the packet, the payload starting at
+        IPv6_HEADER_LEN.
+    '''
+    if len(ipv6)<IPv6_HEADER_LEN:
+        raise ValueError('Packet too small ({0} bytes) no space for IPv6 header'.format(len(ipv6)))
+    if ipv6[0]>>4!=6:
+        raise ValueError('Not an IPv6 packet, version=={0}'.format(ipv6[0]>>4))
+    # positional, faster than by keyword
+    return Ipv6Fields(
+        ipv6[6],
+        ipv6[7],
+        ((ipv6[1]&0x0F)<<16)+(ipv6[2]<<8)+ipv6[3],
+        ipv6[8:24],
+        ipv6[24:40],
+        None,
+        IPv6_HEADER_LEN,
+    )
+
+def checkCompressible(ipv6):
+    '''
+    :raises: NotImplementedError if the traffic class or flow label of the
+        IPv6 packet are not 0, as they can not be elided.
+    '''
+    trafficClass = ((ipv6[0]&0x0F)<<4)+(ipv6[1]>>4)
+    if trafficClass!=0:
+        raise NotImplementedError('traffic_class={0} unsupported'.format(trafficClass))
+    flowLabel    = ((ipv6[1]&0x0F)<<16)+(ipv6[2]<<8)+ipv6[3]
+    if flowLabel!=0:
+        raise NotImplementedError('flow_label={0} unsupported'.format(flowLabel))
+
+def getCompressReference(srcAddr):
+    '''
+    :returns: The address the first hop of the source route to the mesh is
+        compressed against, for packets from srcAddr.
+    '''
+    if srcAddr[:8]==MESH_PREFIX:
+        return srcAddr
+    return MESH_DAGROOT
+
+def encodeRh3(hops,reference):
+    '''
+    Compress a source route into RH3 6LoRHs: consecutive hops compressed
+    alike share a 6LoRH, each hop carrying the bytes of its address which
+    differ from the previous hop, or from reference for the first one.
+    
+    :param hops:      The EUI64s of the hops, as lists of bytes as RPL
+        returns them, from the next hop of the DAG root to the hop before
+        the destination.
+    :param reference: The address the first hop is compressed against.
+    
+    :raises: ValueError if more than MAX_6LoRH_SIZE consecutive hops are
+        compressed alike.
+    
+    :returns: The RH3 6LoRHs, as a list of bytes.
+    '''
+    returnVal = []
+    previous  = reference[-8:]
+    rh3Type   = None
+    rh3Hops   = []    # the bytes the hops of the current 6LoRH carry
+    numHops   = 0
+    for hop in hops:
+        # the type of 6LoRH, by number of bytes shared with the previous hop
+        if   hop[:7]==previous[:7]:
+            (hopType,carried) = (TYPE_6LoRH_RH3_0,hop[7:])
+        elif hop[:6]==previous[:6]:
+            (hopType,carried) = (TYPE_6LoRH_RH3_1,hop[6:])
+        elif hop[:4]==previous[:4]:
+            (hopType,carried) = (TYPE_6LoRH_RH3_2,hop[4:])
+        else:
+            (hopType,carried) = (TYPE_6LoRH_RH3_3,hop)
+        if hopType!=rh3Type:
+            if numHops:
+                returnVal += _rh3Header(rh3Type,numHops)
+                returnVal += rh3Hops
+                rh3Hops    = []
+                numHops    = 0
+            rh3Type    = hopType
+        rh3Hops   += carried
+        numHops   += 1
+        previous   = hop
+    if numHops:
+        returnVal += _rh3Header(rh3Type,numHops)
+        returnVal += rh3Hops
+    return returnVal
+
+def ipv6ToLowpan(ipv6,rh3):
+    '''
+    Compress an IPv6 packet to the mesh.
+    
+    :param ipv6: The IPv6 packet, as a list of bytes, see
+        checkCompressible().
+    :param rh3:  Its source route, compressed by encodeRh3().
+    
+    :returns: The 6LoWPAN packet, as a list of bytes: page 1 dispatch, RH3
+        6LoRHs, RPI and IP-in-IP 6LoRHs for packets from outside the mesh,
+        then the IPHC header and the payload.
+    '''
+    returnVal  = [PAGE_ONE_DISPATCH]
+    returnVal += rh3
+    if ipv6[8:16]!=MESH_PREFIX:
+        returnVal += RPI_IPINIP_HEADERS[ipv6[7]]
+    returnVal += IPHC_HEADER
+    returnVal += ipv6[6:]
+    return returnVal
+
+#============================ 6LoWPAN -> IPv6 =================================
+
+def lowpanToIpv6(prevHop,lowpan,networkPrefix,dagRootEui64):
+    '''
+    Decompress the headers of a 6LoWPAN packet from the mesh, including the
+    inner IPv6 header of IP-in-IP packets.
+    
+    :param prevHop:       The EUI64 of the previous hop, as a list of bytes.
+    :param lowpan:        The 6LoWPAN packet, as a list of bytes.
+    :param networkPrefix: The prefix of the mesh, 8 bytes.
+    :param dagRootEui64:  The EUI64 of the DAG root.
+    
+    :raises: ValueError when the packet can not be decompressed.
+    :raises: NotImplementedError when it uses compressions not implemented
+        in this module.
+    
+    :returns: An Ipv6Fields.
+    '''
+    try:
+        fields = _decodeHeaders(prevHop,lowpan,0,networkPrefix,dagRootEui64)
+        (nextHeader,hopLimit,flowLabel,srcAddr,dstAddr,hopFlags,payloadStart,hopNextHeader) = fields
+        
+        if nextHeader==IANA_IPv6HOPHEADER:
+            if hopNextHeader is None:
+                raise ValueError('no next header after the hop-by-hop header')
+            nextHeader = hopNextHeader
+        
+        if nextHeader==IPV6_HEADER:
+            # IP-in-IP: the inner header carries the end-to-end fields
+            inner = _decodeHeaders(prevHop,lowpan,payloadStart,networkPrefix,dagRootEui64)
+            (nextHeader,innerHopLimit,flowLabel,srcAddr,dstAddr,_,payloadStart,_) = inner
+            if hopLimit is None:
+                hopLimit = innerHopLimit
+    except TypeError:
+        # the addresses are prefixed by concatenation
+        if networkPrefix is None:
+            raise ValueError('no network prefix')
+        raise
+    
+    # positional, faster than by keyword
+    return Ipv6Fields(nextHeader,hopLimit,flowLabel,srcAddr,dstAddr,hopFlags,payloadStart)
+
+def buildIpv6(fields,payload):
+    '''
+    :returns: The IPv6 packet, as a list of bytes, with the header fields of
+        an Ipv6Fields, traffic class 0.
+    '''
+    flowLabel  = fields.flowLabel
+    returnVal  = [
+        0x60,
+        (flowLabel>>16)&0x0F,
+        (flowLabel>>8)&0xFF,
+        flowLabel&0xFF,
+        len(payload)>>8,
+        len(payload)&0xFF,
+        fields.nextHeader,
+        fields.hopLimit,
+    ]
+    returnVal += fields.srcAddr
+    returnVal += fields.dstAddr
+    returnVal += payload
+    return returnVal
+
+#============================ header sizes ====================================
+
+def getHeaderLengths(lowpan):
+    '''
+    Measure the headers of a 6LoWPAN packet, from its start: the 6LoRHs
+    after the page 1 dispatch, IPHC headers, and the NHC compressed
+    hop-by-hop, IPv6 and UDP headers. What follows is carried as is.
+    
+    The size and offsets of the fragments of a packet count the bytes of its
+    uncompressed form (RFC6282). The RH3 6LoRHs decompress into one RFC6554
+    routing header, with 16-byte addresses, a hop-by-hop header with the
+    RPL option, and an outer IPv6 header (RFC8138).
+    
+    :param lowpan: The 6LoWPAN packet, or its first fragment without the
+        fragment header, as a list of bytes.
+    
+    :raises: ValueError if the headers are cut short.
+    :raises: NotImplementedError when they use compressions not implemented
+        in this module.
+    
+    :returns: The length of the headers, and of their uncompressed form.
+    '''
+    try:
+        return _getHeaderLengths(lowpan)
+    except IndexError:
+        raise ValueError('6LoWPAN headers cut short')
+
+#============================ helpers =========================================
+
+def _getHeaderLengths(pkt):
+    ptr          = 0
+    uncompressed = 0
+    
+    if pkt[ptr]==PAGE_ONE_DISPATCH:
+        rh3          = False
+        ptr     += 1
+        while pkt[ptr]&MASK_6LoRH in (CRITICAL_6LoRH,ELECTIVE_6LoRH):
+            kind    = pkt[ptr]&MASK_6LoRH
+            rhType  = pkt[ptr+1]
+            if   kind==CRITICAL_6LoRH and rhType<=TYPE_6LoRH_RH3_4:
+                numHops       = (pkt[ptr]&~MASK_6LoRH)+1
+                ptr          += 2+numHops*RH3_HOP_LEN[rhType]
+                uncompressed += numHops*RH3_ADDR_LEN
+                uncompressed += 0 if rh3 else RH3_HEADER_LEN  # the 6LoRHs make one routing header
+                rh3           = True
+            elif kind==CRITICAL_6LoRH and rhType==TYPE_6LoRH_RPI:
+                hopFlags      = pkt[ptr]&FLAG_MASK
+                ptr          += 2
+                ptr          += 0 if hopFlags&I_FLAG else 1
+                ptr          += 1 if hopFlags&K_FLAG else 2
+                uncompressed += RPI_HEADER_LEN
+            elif kind==ELECTIVE_6LoRH and rhType==TYPE_6LoRH_IP_IN_IP:
+                ptr          += 2+(pkt[ptr]&MASK_LENGTH_6LoRH_IPINIP)
+                uncompressed += IPv6_HEADER_LEN
+            else:
+                raise NotImplementedError('unsupported 6LoRH {0:#04x}'.format(pkt[ptr]))
+    
+    while True:
+        # IPHC
+        if pkt[ptr]>>5!=IPHC_DISPATCH:
+            raise ValueError('not a 6LoWPAN packet')
+        if pkt[ptr+1]&0xC8:
+            raise NotImplementedError('unsupported IPHC context or multicast {0:#04x}'.format(pkt[ptr+1]))
+        (tf,nh,hopLimit) = IPHC_BYTE0[pkt[ptr]]
+        (sam,dam)        = IPHC_BYTE1[pkt[ptr+1]]
+        ptr             += 2+IPHC_TF_LEN[tf]
+        nextHeader       = pkt[ptr] if nh==IPHC_NH_INLINE else None
+        ptr             += 1 if nh==IPHC_NH_INLINE else 0
+        ptr             += 1 if hopLimit is None else 0
+        ptr             += IPHC_ADDR_LEN[sam]+IPHC_ADDR_LEN[dam]
+        uncompressed    += IPv6_HEADER_LEN
+        if nh==IPHC_NH_INLINE and nextHeader!=IANA_IPv6HOPHEADER:
+            return (ptr,uncompressed)
+        
+        # NHC, a hop-by-hop header being compressed even when announced
+        # inline, as lowpanToIpv6() reads it
+        while True:
+            nhc = pkt[ptr]
+            if nhc&NHC_UDP_MASK==NHC_UDP_ID:
+                ptr          += 1+NHC_UDP_PORTS_LEN[nhc&0x03]
+                ptr          += 0 if nhc&0x04 else 2     # checksum
+                uncompressed += UDP_HEADER_LEN
+                return (ptr,uncompressed)
+            if (nhc>>4)&0x0F!=NHC_DISPATCH:
+                raise ValueError('wrong NHC dispatch {0:#04x}'.format(nhc))
+            eid = (nhc&NHC_EID_MASK)>>1
+            if   eid==NHC_EID_IPV6:
+                ptr          += 1
+                break                                     # an IPHC follows
+            elif eid==NHC_EID_HOPBYHOP:
+                ptr          += 1
+                ptr          += 0 if nhc&0x01 else 1      # next header
+                length        = pkt[ptr]
+                ptr          += 1+length
+                uncompressed += (2+length+7)&~0x07        # padded to 8 bytes
+                if not nhc&0x01:
+                    return (ptr,uncompressed)
+            else:
+                raise NotImplementedError('unsupported NH_EID=={0}'.format(eid))
+
+def _decodeHeaders(prevHop,pkt,ptr,networkPrefix,dagRootEui64):
+    '''
+    Decode either the page 1 dispatch and the RPI and IP-in-IP 6LoRHs, or an
+    IPHC header with its hop-by-hop header, starting at ptr.
+    
+    :returns: The fields of Ipv6Fields, in order, then the next header of
+        the hop-by-hop header, None when missing.
+    '''
+    nextHeader    = None
+    hopLimit      = None
+    flowLabel     = None
+    srcAddr       = None
+    dstAddr       = None
+    hopFlags      = None
+    hopNextHeader = None
+    
+    if pkt[ptr]==PAGE_ONE_DISPATCH:
+        ptr += 1
+        if not (pkt[ptr]&MASK_6LoRH==CRITICAL_6LoRH and pkt[ptr+1]==TYPE_6LoRH_RPI):
+            raise NotImplementedError('unsupported 6LoRH {0:#04x}'.format(pkt[ptr]))
+        
+        # RPI (hop by hop)
+        nextHeader    = IANA_IPv6HOPHEADER
+        hopFlags      = pkt[ptr]&FLAG_MASK
+        ptr          += 2
+        if hopFlags&I_FLAG==0:
+            ptr      += 1   # RPL instance ID
+        if hopFlags&K_FLAG==0:
+            ptr      += 2   # sender rank
+        else:
+            ptr      += 1
+        # the IPHC header follows the hop by hop header
+        hopNextHeader = IPV6_HEADER
+        
+        if pkt[ptr]&MASK_6LoRH==ELECTIVE_6LoRH and pkt[ptr+1]==TYPE_6LoRH_IP_IN_IP:
+            # IP in IP encapsulation
+            length    = pkt[ptr]&MASK_LENGTH_6LoRH_IPINIP
+            hopLimit  = pkt[ptr+2]
+            ptr      += 3
+            if   length==1:
+                srcAddr = MESH_DAGROOT[:]
+            elif length==9:
+                srcAddr = networkPrefix+pkt[ptr:ptr+8]
+                ptr    += 8
+            elif length==17:
+                srcAddr = pkt[ptr:ptr+16]
+                ptr    += 16
+            else:
+                log.error("wrong length of encapsulate {0}".format(length))
+        
+        return (nextHeader,hopLimit,flowLabel,srcAddr,dstAddr,hopFlags,ptr,hopNextHeader)
+    
+    if pkt[ptr]>>5!=IPHC_DISPATCH:
+        raise ValueError('not a 6LoWPAN packet')
+    (tf,nh,hopLimit) = IPHC_BYTE0[pkt[ptr]]
+    (sam,dam)        = IPHC_BYTE1[pkt[ptr+1]]
+    ptr             += 2
+    
+    # tf
+    if   tf==IPHC_TF_3B:
+        flowLabel    = (pkt[ptr]<<16)+(pkt[ptr+1]<<8)+pkt[ptr+2]
+        ptr         += 3
+    elif tf==IPHC_TF_ELIDED:
+        flowLabel    = 0
+    else:
+        raise NotImplementedError('unsupported tf=={0}'.format(tf))
+    
+    # nh
+    if nh==IPHC_NH_INLINE:
+        nextHeader   = pkt[ptr]
+        ptr         += 1
+    
+    # hlim
+    if hopLimit is None:
+        hopLimit     = pkt[ptr]
+        ptr         += 1
+    
+    # sam
+    if   sam==IPHC_SAM_ELIDED:
+        # from the previous hop
+        srcAddr      = networkPrefix+prevHop
+    elif sam==IPHC_SAM_16B:
+        srcAddr      = networkPrefix+SHORT_ADDR_PADDING+pkt[ptr:ptr+2]
+        ptr         += 2
+    elif sam==IPHC_SAM_64B:
+        srcAddr      = networkPrefix+pkt[ptr:ptr+8]
+        ptr         += 8
+    else:
+        srcAddr      = pkt[ptr:ptr+16]
+        ptr         += 16
+    
+    # dam
+    if   dam==IPHC_DAM_ELIDED:
+        # to the DAG root
+        if dagRootEui64 is None:
+            raise ValueError('no DAG root')
+        dstAddr      = networkPrefix+dagRootEui64
+    elif dam==IPHC_DAM_16B:
+        dstAddr      = networkPrefix+SHORT_ADDR_PADDING+pkt[ptr:ptr+2]
+        ptr         += 2
+    elif dam==IPHC_DAM_64B:
+        dstAddr      = networkPrefix+pkt[ptr:ptr+8]
+        ptr         += 8
+    else:
+        dstAddr      = pkt[ptr:ptr+16]
+        ptr         += 16
+    
+    if nh==IPHC_NH_COMPRESSED:
+        if (pkt[ptr]>>4)&0x0F!=NHC_DISPATCH:
+            raise ValueError('wrong NHC dispatch {0:#04x}'.format(pkt[ptr]))
+        eid = (pkt[ptr]&NHC_EID_MASK)>>1
+        if   eid==NHC_EID_HOPBYHOP:
+            nextHeader = IANA_IPv6HOPHEADER
+        elif eid==NHC_EID_IPV6:
+            nextHeader = IPV6_HEADER
+        else:
+            raise NotImplementedError('unsupported NH_EID=={0}'.format(eid))
+    
+    # hop by hop header: NHC, next header, length, then the RPL option
+    if nextHeader==IANA_IPv6HOPHEADER:
+        hopNhc = pkt[ptr]
+        ptr   += 1
+        if hopNhc&0x01==0:
+            hopNextHeader = pkt[ptr]
+            ptr          += 1
+        ptr   += 3          # length, option type, option length
+        hopFlags = pkt[ptr]
+        ptr   += 4          # flags, RPL instance ID, sender rank
+        if hopNhc&0x01==1 and (pkt[ptr]>>1)&0x07==NHC_EID_IPV6:
+            hopNextHeader = IPV6_HEADER
+    
+    return (nextHeader,hopLimit,flowLabel,srcAddr,dstAddr,hopFlags,ptr,hopNextHeader)
+
+def _rh3Header(rh3Type,numHops):
+    try:
+        return RH3_HEADERS[(rh3Type,numHops)]
+    except KeyError:
+        raise ValueError('{0} hops in a RH3 6LoRH, at most {1}'.format(numHops,MAX_6LoRH_SIZE))
@@ -0,0 +1,298 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('lowpanFrag')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import collections
+import threading
+import time
+
+import openvisualizer.openvisualizer_utils as u
+import lowpanCodec
+
+#============================ defines =========================================
+
+# http://tools.ietf.org/html/rfc4944#section-5.3
+FRAG1_DISPATCH           = 0xC0          # 11000xxx
+FRAGN_DISPATCH           = 0xE0          # 11100xxx
+FRAG_DISPATCH_MASK       = 0xF8
+FRAG1_HEADER_LEN         = 4             # dispatch and size, tag
+FRAGN_HEADER_LEN         = 5             # dispatch and size, tag, offset
+MAX_DATAGRAM_SIZE        = 0x07FF        # bytes, the size is 11 bits
+
+MAX_FRAME_SIZE           = 96            # bytes of 6LoWPAN in a 127-byte 802.15.4 frame, once the
+                                         # MAC header with EUI64 addresses, the FCS and the IEs are in
+REASSEMBLY_TIMEOUT       = 60            # s, the maximum of RFC4944
+MAX_REASSEMBLY_DATAGRAMS = 8             # datagrams reassembled at once
+MAX_REASSEMBLY_BYTES     = 4096          # bytes, sum of the sizes of the datagrams reassembled
+
+#============================ helpers =========================================
+
+def isFragment(lowpan):
+    '''
+    :returns: True if a 6LoWPAN packet starts with a FRAG1 or FRAGN header.
+    '''
+    return bool(lowpan) and (lowpan[0] & FRAG_DISPATCH_MASK) in (FRAG1_DISPATCH,FRAGN_DISPATCH)
+
+def parseFragHeader(lowpan):
+    '''
+    :returns: The datagram size, tag and offset, in bytes, of a fragment,
+        and the length of its header.
+    :raises: ValueError if the fragment is too short.
+    '''
+    if lowpan[0] & FRAG_DISPATCH_MASK==FRAG1_DISPATCH:
+        headerLen = FRAG1_HEADER_LEN
+    else:
+        headerLen = FRAGN_HEADER_LEN
+    if len(lowpan)<headerLen:
+        raise ValueError('fragment of {0} bytes too short'.format(len(lowpan)))
+    size          = ((lowpan[0] & 0x07)<<8) | lowpan[1]
+    tag           = (lowpan[2]<<8) | lowpan[3]
+    offset        = lowpan[4]<<3 if headerLen==FRAGN_HEADER_LEN else 0
+    return (size,tag,offset,headerLen)
+
+class _Datagram(object):
+    '''
+    A datagram being reassembled.
+    '''
+    
+    def __init__(self,size,timestamp):
+        self.size      = size
+        self.fragments = {}      # offset -> length, uncompressed
+        self.payloads  = {}      # offset -> bytes carried, the headers compressed
+        self.received  = 0       # bytes, uncompressed
+        self.timestamp = timestamp
+
+#============================ class ===========================================
+
+class lowpanFrag(object):
+    '''
+    Fragments the 6LoWPAN packets to the mesh which don't fit in an 802.15.4
+    frame, and reassembles those from the mesh, with FRAG1/FRAGN headers
+    (RFC4944). The fragment header comes before the page 1 dispatch of the
+    6LoRHs (RFC8025).
+    
+    The datagram size and offsets count the bytes of the uncompressed IPv6
+    datagram (RFC4944, RFC6282), the 6LoRHs included (RFC8138). The
+    compressed headers all go in the first fragment, which ends on a multiple
+    of 8 bytes of their uncompressed form, the other fragments carrying the
+    rest of the packet as is. Reassembling, the headers of the first fragment
+    are measured to map it on the datagram, and are not decompressed.
+    
+    Each fragmented datagram gets the next 16-bit tag. Fragments are
+    reassembled keyed on the neighbour they come from, their datagram size
+    and tag, in a pool bounded in datagrams and in bytes: fragments of new
+    datagrams are dropped when it is full. Datagrams not complete within the
+    timeout are dropped as fragments arrive. A fragment overlapping those
+    received, other than a duplicate, restarts the reassembly of its
+    datagram.
+    
+    Thread-safe: fragments are received by the threads of the moteConnectors.
+    '''
+    
+    def __init__(self,maxFrameSize=MAX_FRAME_SIZE,timeout=REASSEMBLY_TIMEOUT,
+            maxDatagrams=MAX_REASSEMBLY_DATAGRAMS,maxBytes=MAX_REASSEMBLY_BYTES):
+        '''
+        :param maxFrameSize: The maximum number of bytes of 6LoWPAN a frame
+            carries, fragment header included.
+        :param timeout:      The time a datagram has to be reassembled, in
+            seconds.
+        :param maxDatagrams: The maximum number of datagrams reassembled at
+            once.
+        :param maxBytes:     The maximum sum of the sizes of the datagrams
+            reassembled at once, in bytes.
+        '''
+        
+        # store params
+        self.maxFrameSize         = maxFrameSize
+        self.timeout              = timeout
+        self.maxDatagrams         = maxDatagrams
+        self.maxBytes             = maxBytes
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.nextTag              = 0
+        self.datagrams            = collections.OrderedDict() # (neighbour,size,tag) -> _Datagram, oldest first
+        self.numBytes             = 0     # sum of the sizes of the datagrams
+        self.stats                = {}    # neighbour -> counters, see getStats()
+    
+    #======================== public ==========================================
+    
+    def fragment(self,nextHop,lowpan):
+        '''
+        Fragment a 6LoWPAN packet to the mesh, if needed.
+        
+        :param nextHop: The EUI64 of the neighbour the packet is sent to.
+        :param lowpan:  The 6LoWPAN packet.
+        :returns: The frames to send, in order: the packet itself if it fits
+            in one.
+        :raises: ValueError if the packet is too large to be fragmented, or
+            its headers don't fit in the first fragment.
+        :raises: NotImplementedError if its headers can't be measured, see
+            lowpanCodec.getHeaderLengths().
+        '''
+        
+        if len(lowpan)<=self.maxFrameSize:
+            return [lowpan]
+        
+        (headerLen,uncompressedLen) = lowpanCodec.getHeaderLengths(lowpan)
+        size = uncompressedLen+len(lowpan)-headerLen
+        if size>MAX_DATAGRAM_SIZE:
+            raise ValueError('IPv6 datagram of {0} bytes too large to fragment'.format(size))
+        
+        # payload in the first fragment, its uncompressed form a multiple of 8 bytes
+        first = ((self.maxFrameSize-FRAG1_HEADER_LEN-headerLen+uncompressedLen) & ~0x07)-uncompressedLen
+        if first<0:
+            raise ValueError('6LoWPAN headers of {0} bytes too long for the first fragment'.format(headerLen))
+        
+        with self.dataLock:
+            tag          = self.nextTag
+            self.nextTag = (tag+1) & 0xFFFF
+        
+        # all fragments but the last carry a multiple of 8 bytes
+        header     = [FRAG1_DISPATCH|(size>>8),size & 0xFF,tag>>8,tag & 0xFF]
+        returnVal  = [header+lowpan[:headerLen+first]]
+        header[0]  = FRAGN_DISPATCH|(size>>8)
+        step       = (self.maxFrameSize-FRAGN_HEADER_LEN) & ~0x07
+        delta      = headerLen-uncompressedLen    # from the datagram to the packet
+        for offset in xrange(uncompressedLen+first,size,step):
+            returnVal += [header+[offset>>3]+lowpan[offset+delta:offset+delta+step]]
+        
+        with self.dataLock:
+            stats = self._getStats(nextHop)
+            stats['numDatagramsTx'] += 1
+            stats['numFragmentsTx'] += len(returnVal)
+        
+        return returnVal
+    
+    def reassemble(self,prevHop,fragment,now=None):
+        '''
+        Add a fragment from the mesh to its datagram.
+        
+        :param prevHop:  The EUI64 of the neighbour the fragment comes from.
+        :param fragment: The fragment, FRAG1 or FRAGN header included.
+        :param now:      The time the fragment was received, now by default.
+        :returns: The 6LoWPAN packet if this fragment completes it, None
+            otherwise.
+        :raises: ValueError if the fragment is too short.
+        '''
+        
+        (size,tag,offset,headerLen) = parseFragHeader(fragment)
+        payload = fragment[headerLen:]
+        length  = len(payload)                    # bytes of the datagram carried
+        key     = (tuple(prevHop),size,tag)
+        if now is None:
+            now = time.time()
+        
+        if headerLen==FRAG1_HEADER_LEN:
+            try:
+                (compressed,uncompressed) = lowpanCodec.getHeaderLengths(payload)
+                length += uncompressed-compressed
+            except (ValueError,NotImplementedError) as err:
+                log.warning('first fragment from {0} with invalid headers: {1}'.format(u.formatAddr(prevHop),err))
+                length  = 0
+        
+        with self.dataLock:
+            stats = self._getStats(prevHop)
+            stats['numFragmentsRx'] += 1
+            
+            self._expire(now)
+            
+            if length<=0 or offset+length>size:
+                log.warning('invalid fragment from {0}, offset {1} length {2} size {3}'.format(
+                    u.formatAddr(prevHop),offset,length,size))
+                stats['numDroppedInvalid'] += 1
+                return None
+            
+            datagram = self.datagrams.get(key)
+            
+            if datagram is not None:
+                if datagram.fragments.get(offset)==length:
+                    stats['numDuplicates'] += 1
+                    return None
+                for (o,l) in datagram.fragments.iteritems():
+                    if offset<o+l and o<offset+length:
+                        log.warning('overlapping fragment from {0}, restarting datagram {1}'.format(u.formatAddr(prevHop),tag))
+                        stats['numDroppedOverlap'] += 1
+                        self._remove(key)
+                        datagram = None
+                        break
+            
+            if datagram is None:
+                if len(self.datagrams)>=self.maxDatagrams or self.numBytes+size>self.maxBytes:
+                    log.warning('no room to reassemble datagram {0} from {1}'.format(tag,u.formatAddr(prevHop)))
+                    stats['numDroppedNoBuffer'] += 1
+                    return None
+                datagram            = _Datagram(size,now)
+                self.datagrams[key] = datagram
+                self.numBytes      += size
+            
+            datagram.payloads[offset]  = payload
+            datagram.fragments[offset] = length
+            datagram.received         += length
+            
+            if datagram.received<size:
+                return None
+            
+            self._remove(key)
+            stats['numDatagramsRx'] += 1
+            returnVal = []
+            for offset in sorted(datagram.payloads):
+                returnVal += datagram.payloads[offset]
+            return returnVal
+    
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of datagrams being
+            reassembled and the sum of their uncompressed sizes, as
+            'numDatagrams' and 'numBytes', and, by neighbour EUI64 as a
+            tuple in 'motes', counters of the datagrams and fragments sent
+            and received, of the duplicate fragments, of the datagrams
+            dropped because they timed out or got an overlapping fragment,
+            and of the fragments dropped because the pool was full or they
+            were invalid.
+        '''
+        with self.dataLock:
+            return {
+                'numDatagrams':   len(self.datagrams),
+                'numBytes':       self.numBytes,
+                'motes':          dict([(k,dict(v)) for (k,v) in self.stats.items()]),
+            }
+    
+    #======================== private =========================================
+    
+    def _getStats(self,mote):
+        mote  = tuple(mote)
+        stats = self.stats.get(mote)
+        if stats is None:
+            stats = {
+                'numDatagramsTx':     0,
+                'numFragmentsTx':     0,
+                'numFragmentsRx':     0,
+                'numDatagramsRx':     0,
+                'numDuplicates':      0,
+                'numDroppedTimeout':  0,
+                'numDroppedNoBuffer': 0,
+                'numDroppedOverlap':  0,
+                'numDroppedInvalid':  0,
+            }
+            self.stats[mote] = stats
+        return stats
+    
+    def _expire(self,now):
+        while self.datagrams:
+            (key,datagram) = next(self.datagrams.iteritems())
+            if now-datagram.timestamp<=self.timeout:
+                break
+            log.warning('datagram {0} from {1} timed out'.format(key[2],u.formatAddr(key[0])))
+            self.stats[key[0]]['numDroppedTimeout'] += 1
+            self._remove(key)
+    
+    def _remove(self,key):
+        datagram       = self.datagrams.pop(key)
+        self.numBytes -= datagram.size
@@ -0,0 +1,168 @@
+'''
+This is a performance test which measures how many packets per second the
+6LoWPAN codec translates, in each direction: IPv6 packets compressed to the
+mesh, and 6LoWPAN packets from the mesh decompressed to IPv6. The packets
+are those of the golden corpus of the unit tests, translated first by the
+codec alone, then through OpenLbr, its eventBus signals included. IPv6
+packets go through OpenLbr twice: looking up and compressing the source route
+of each packet, then with the compressed source routes cached.
+
+Run this test with 'python bench_lowpanCodec.py [rounds]'. By default, the
+corpus is translated 100 times.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # openLbr/
+
+import json
+import time
+
+import openLbr
+import lowpanCodec
+import openvisualizer.openvisualizer_utils as u
+from openvisualizer.eventBus import eventBusClient
+
+#============================ defines =========================================
+
+ROUNDS         = 100
+PREFIX         = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+DAGROOT        = [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x01]
+GOLDEN_FILE    = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','unit_tests','golden_lowpan.json')
+
+#============================ helpers =========================================
+
+class _Mesh(eventBusClient.eventBusClient):
+    '''
+    Answers the source routes OpenLbr asks for, and listens to the packets
+    it dispatches.
+    '''
+    
+    def __init__(self):
+        self.route = None
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = 'mesh',
+            registrations    = [
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'getSourceRoute',
+                    'callback' : self._getSourceRoute_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'bytesToMesh',
+                    'callback' : self._received_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'v6ToInternet',
+                    'callback' : self._received_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : (self.WILDCARD,self.PROTO_UDP,self.WILDCARD),
+                    'callback' : self._received_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : (self.WILDCARD,self.PROTO_ICMPv6,self.WILDCARD),
+                    'callback' : self._received_notif,
+                },
+            ],
+        )
+    
+    def _getSourceRoute_notif(self,sender,signal,data):
+        return self.route
+    
+    def _received_notif(self,sender,signal,data):
+        return True
+
+def _loadCorpus():
+    '''
+    :returns: The IPv6 packets with their source route, and the 6LoWPAN
+        packets with their previous hop, which OpenLbr translates.
+    '''
+    down = []
+    up   = []
+    for case in json.load(open(GOLDEN_FILE)):
+        if not case['expected']:
+            continue
+        if case['direction']=='down':
+            down += [(
+                u.hex2buf(str(case['ipv6'])),
+                [u.hex2buf(str(hop)) for hop in case['route']],
+            )]
+        else:
+            up   += [(
+                u.hex2buf(str(case['prevHop'])),
+                u.hex2buf(str(case['lowpan'])),
+            )]
+    return (down,up)
+
+def _codecDown(down,rounds):
+    packets = [(ipv6,route[-2:0:-1]) for (ipv6,route) in down]
+    start   = time.time()
+    for _ in xrange(rounds):
+        for (ipv6,hops) in packets:
+            fields = lowpanCodec.parseIpv6(ipv6)
+            lowpanCodec.checkCompressible(ipv6)
+            rh3    = lowpanCodec.encodeRh3(
+                hops,
+                lowpanCodec.getCompressReference(fields.srcAddr),
+            )
+            lowpanCodec.ipv6ToLowpan(ipv6,rh3)
+    return rounds*len(packets)/(time.time()-start)
+
+def _codecUp(up,rounds):
+    start   = time.time()
+    for _ in xrange(rounds):
+        for (prevHop,lowpan) in up:
+            fields = lowpanCodec.lowpanToIpv6(prevHop,lowpan,PREFIX,DAGROOT)
+            lowpanCodec.buildIpv6(fields,lowpan[fields.payloadStart:])
+    return rounds*len(up)/(time.time()-start)
+
+def _lbrDown(mesh,lbr,down,rounds,cached):
+    start   = time.time()
+    for _ in xrange(rounds):
+        for (ipv6,route) in down:
+            if not cached:
+                lbr.routeCache.clear()
+                lbr.routeCacheUsers.clear()
+            mesh.route = route
+            mesh.dispatch('v6ToMesh',ipv6)
+    return rounds*len(down)/(time.time()-start)
+
+def _lbrUp(mesh,up,rounds):
+    start   = time.time()
+    for _ in xrange(rounds):
+        for (prevHop,lowpan) in up:
+            mesh.dispatch('fromMote.data',(prevHop,lowpan))
+    return rounds*len(up)/(time.time()-start)
+
+#============================ main ============================================
+
+def main(rounds=ROUNDS):
+    
+    (down,up) = _loadCorpus()
+    
+    lbr  = openLbr.OpenLbr()
+    mesh = _Mesh()
+    mesh.dispatch('networkPrefix',PREFIX)
+    mesh.dispatch('infoDagRoot',{'isDAGroot': 1, 'eui64': DAGROOT})
+    
+    output  = []
+    output += ['{0} IPv6 packets, {1} 6LoWPAN packets, {2} rounds'.format(len(down),len(up),rounds)]
+    output += ['codec   IPv6 -> 6LoWPAN: {0:8.0f} packets/s'.format(_codecDown(down,rounds))]
+    output += ['codec   6LoWPAN -> IPv6: {0:8.0f} packets/s'.format(_codecUp(up,rounds))]
+    output += ['OpenLbr IPv6 -> 6LoWPAN: {0:8.0f} packets/s'.format(_lbrDown(mesh,lbr,down,rounds,False))]
+    output += ['  source routes cached : {0:8.0f} packets/s'.format(_lbrDown(mesh,lbr,down,rounds,True))]
+    output += ['OpenLbr 6LoWPAN -> IPv6: {0:8.0f} packets/s'.format(_lbrUp(mesh,up,rounds))]
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,78 @@
+'''
+This is a performance test which measures how many 6LoWPAN packets per second
+are fragmented into 802.15.4 frames, and reassembled from them, depending on
+their size. The packets come from outside the mesh, with a source route of 2
+hops, their size counting the bytes of the uncompressed IPv6 datagram.
+
+Run this test with 'python bench_lowpanFrag.py [rounds]'. By default, each
+packet is fragmented and reassembled 1000 times.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                   # root/
+    sys.path.insert(0, os.path.join(here, '..'))                               # openLbr/
+
+import time
+
+import lowpanCodec
+import lowpanFrag
+
+#============================ defines =========================================
+
+ROUNDS         = 1000
+SIZES          = [200,500,1280]   # bytes
+MOTE           = [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x02]
+HOPS           = [
+    [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x04],
+    [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x05],
+]
+SRC_ADDR       = [0x20,0x01,0x0d,0xb8]+[0x00]*11+[0x01]
+HEADERS_LEN    = 40+(8+2*16)+8+40 # uncompressed, IPv6, routing, hop-by-hop, outer IPv6
+
+#============================ helpers =========================================
+
+def _packet(size):
+    payloadLen = size-HEADERS_LEN
+    ipv6       = [0x60,0x00,0x00,0x00,payloadLen>>8,payloadLen & 0xFF,17,64]
+    ipv6      += SRC_ADDR
+    ipv6      += lowpanCodec.MESH_PREFIX+MOTE
+    ipv6      += [i & 0xFF for i in range(payloadLen)]
+    return lowpanCodec.ipv6ToLowpan(ipv6,lowpanCodec.encodeRh3(HOPS,lowpanCodec.MESH_DAGROOT))
+
+def _fragment(frag,packet,rounds):
+    start   = time.time()
+    for _ in xrange(rounds):
+        frag.fragment(MOTE,packet)
+    return rounds/(time.time()-start)
+
+def _reassemble(frag,packet,rounds):
+    fragments = frag.fragment(MOTE,packet)
+    start     = time.time()
+    for _ in xrange(rounds):
+        for fragment in fragments:
+            frag.reassemble(MOTE,fragment,now=0)
+    return rounds/(time.time()-start)
+
+#============================ main ============================================
+
+def main(rounds=ROUNDS):
+    
+    frag    = lowpanFrag.lowpanFrag()
+    
+    output  = []
+    for size in SIZES:
+        packet  = _packet(size)
+        output += ['{0:4} bytes, {1:2} fragments: {2:8.0f} fragmented/s, {3:8.0f} reassembled/s'.format(
+            size,
+            len(frag.fragment(MOTE,packet)),
+            _fragment(frag,packet,rounds),
+            _reassemble(frag,packet,rounds),
+        )]
+    
+    print '\n'.join(output)
+
+if __name__=="__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+
+import logging
+import logging.handlers
+import json
+
+import pytest
+
+import openLbr
+import lowpanCodec
+import lowpanFrag
+import openvisualizer.openvisualizer_utils as u
+from openvisualizer.eventBus import eventBusClient
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_lowpanCodec.log'
+
+import logging
+log = logging.getLogger('test_lowpanCodec')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_lowpanCodec',
+                   'lowpanCodec',
+                   'openLbr',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+WILDCARD       = eventBusClient.eventBusClient.WILDCARD
+PREFIX         = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+DAGROOT        = [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x01]
+
+# packets translated by the list-based implementation of OpenLbr this codec
+# replaced, as hex strings: 'down' cases are IPv6 packets and the source
+# route RPL returns, 'up' cases the 6LoWPAN packets from the mesh and the
+# previous hop. 'expected' lists what OpenLbr dispatched.
+GOLDEN_FILE    = os.path.join(os.path.dirname(os.path.abspath(__file__)),'golden_lowpan.json')
+GOLDEN         = json.load(open(GOLDEN_FILE))
+
+#============================ helpers =========================================
+
+def _buf(hexString):
+    return u.hex2buf(str(hexString))
+
+def _hex(buf):
+    return ''.join(['%02x' % b for b in buf])
+
+class _Mesh(eventBusClient.eventBusClient):
+    '''
+    Plays the roles of RPL, answering with a given source route, and of the
+    other components, recording what OpenLbr dispatches. Only the UDP ports
+    and ICMPv6 types which are even have a listener.
+    '''
+    
+    def __init__(self):
+        self.route          = None
+        self.numRouteLookup = 0
+        self.received       = []
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = 'mesh',
+            registrations    = [
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'getSourceRoute',
+                    'callback' : self._getSourceRoute_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'bytesToMesh',
+                    'callback' : self._record_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'v6ToInternet',
+                    'callback' : self._record_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : (WILDCARD,self.PROTO_UDP,WILDCARD),
+                    'callback' : self._record_notif,
+                },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : (WILDCARD,self.PROTO_ICMPv6,WILDCARD),
+                    'callback' : self._record_notif,
+                },
+            ],
+        )
+    
+    def _getSourceRoute_notif(self,sender,signal,data):
+        self.numRouteLookup += 1
+        return [list(hop) for hop in self.route]
+    
+    def _record_notif(self,sender,signal,data):
+        if signal=='bytesToMesh':
+            (nextHop,lowpan) = data
+            self.received += [[signal,[_hex(nextHop),_hex(lowpan)]]]
+        elif signal=='v6ToInternet':
+            self.received += [[signal,_hex(data)]]
+        else:
+            (dstAddr,proto,port) = signal
+            (srcAddr,payload)    = data
+            self.received += [[[_hex(dstAddr),proto,port],[_hex(srcAddr),_hex(payload)]]]
+            if port%2==0:
+                return True
+
+@pytest.fixture(scope='module')
+def mesh():
+    mesh     = _Mesh()
+    # the golden packets were not fragmented
+    mesh.lbr = openLbr.OpenLbr(maxFrameSize=lowpanFrag.MAX_DATAGRAM_SIZE)
+    mesh.dispatch('networkPrefix',PREFIX)
+    mesh.dispatch('infoDagRoot',{'isDAGroot': 1, 'eui64': DAGROOT})
+    return mesh
+
+def _clearRouteCache(lbr):
+    lbr.routeCache.clear()
+    lbr.routeCacheUsers.clear()
+
+#============================ tests ===========================================
+
+@pytest.mark.parametrize('case', GOLDEN, ids=['{0}-{1}'.format(i,c['note']) for (i,c) in enumerate(GOLDEN)])
+def test_golden(mesh,case):
+    '''
+    The packets are translated as by the list-based implementation.
+    '''
+    
+    mesh.received = []
+    if case['direction']=='down':
+        # the routes of the cases are unrelated
+        _clearRouteCache(mesh.lbr)
+        mesh.route = [_buf(hop) for hop in case['route']]
+        mesh.dispatch('v6ToMesh',_buf(case['ipv6']))
+    else:
+        mesh.dispatch('fromMote.data',(_buf(case['prevHop']),_buf(case['lowpan'])))
+    
+    assert mesh.received==case['expected']
+
+def test_routeCache(mesh):
+    '''
+    The source routes are looked up once, until a DAO changes them.
+    '''
+    
+    motes    = [[0x14,0x15,0x92,0xcc,0x00,0x00,0x00,i] for i in range(2,7)]
+    ipv6     = [0x60,0x00,0x00,0x00,0x00,0x04,0x11,0x40]+ \
+               [0xbb,0xbb]+[0x00]*13+[0x01]+ \
+               PREFIX+motes[0]+ \
+               [0x01,0x02,0x03,0x04]
+    
+    _clearRouteCache(mesh.lbr)
+    mesh.received       = []
+    mesh.numRouteLookup = 0
+    
+    # motes[0] <- motes[1] <- motes[2] <- DAG root
+    mesh.route = [motes[0],motes[1],motes[2],DAGROOT]
+    mesh.dispatch('v6ToMesh',ipv6)
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==1
+    assert mesh.received[0]==mesh.received[1]
+    assert mesh.received[0][1][0]==_hex(motes[2])
+    
+    # a DAO which does not change the route
+    mesh.dispatch('updateParents',(tuple(motes[1]),[motes[2]]))
+    mesh.dispatch('updateParents',(tuple(motes[4]),[motes[3]]))
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==1
+    
+    # a DAO which does: motes[0] <- motes[1] <- motes[3] <- DAG root
+    mesh.dispatch('updateParents',(tuple(motes[1]),[motes[3],motes[2]]))
+    mesh.route = [motes[0],motes[1],motes[3],DAGROOT]
+    mesh.dispatch('v6ToMesh',ipv6)
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==2
+    assert mesh.received[-1][1][0]==_hex(motes[3])
+    assert mesh.received[-1]==mesh.received[-2]
+    
+    # so does the DAG root becoming the parent of the next hop
+    mesh.dispatch('updateParents',(tuple(motes[3]),[]))
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==3
+
+def test_routeCacheOutOfOrder(mesh):
+    '''
+    A route not reaching the DAG root yet, its last hop's DAO missing, is not
+    cached; a route whose last hop gets a parent, or whose DAG root changes,
+    is dropped.
+    '''
+    
+    motes    = [[0x14,0x15,0x92,0xcc,0x00,0x00,0x00,i] for i in range(2,6)]
+    (dst,x,p,r) = motes
+    ipv6     = [0x60,0x00,0x00,0x00,0x00,0x04,0x11,0x40]+ \
+               [0xbb,0xbb]+[0x00]*13+[0x01]+ \
+               PREFIX+dst+ \
+               [0x01,0x02,0x03,0x04]
+    
+    _clearRouteCache(mesh.lbr)
+    mesh.received       = []
+    mesh.numRouteLookup = 0
+    
+    # the DAOs of X and D, not yet that of P: D -> X -> P
+    mesh.dispatch('updateParents',(tuple(x),[p]))
+    mesh.dispatch('updateParents',(tuple(dst),[x]))
+    mesh.route = [dst,x,p]
+    mesh.dispatch('v6ToMesh',ipv6)
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==2
+    
+    # the DAO of P: D -> X -> P -> DAG root
+    mesh.dispatch('updateParents',(tuple(p),[DAGROOT]))
+    mesh.route = [dst,x,p,DAGROOT]
+    mesh.dispatch('v6ToMesh',ipv6)
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==3
+    assert mesh.received[-1][1][0]==_hex(p)
+    
+    # the last hop of a cached route getting a parent
+    mesh.lbr._updateParents_notif(None,'updateParents',(tuple(DAGROOT),[r]))
+    mesh.dispatch('v6ToMesh',ipv6)
+    assert mesh.numRouteLookup==4
+    
+    # the DAG root changing
+    try:
+        mesh.dispatch('infoDagRoot',{'isDAGroot': 1, 'eui64': r})
+        assert mesh.lbr.routeCache=={}
+        mesh.dispatch('v6ToMesh',ipv6)
+        assert mesh.numRouteLookup==5
+        assert mesh.lbr.routeCache=={}
+    finally:
+        mesh.dispatch('infoDagRoot',{'isDAGroot': 1, 'eui64': DAGROOT})
+
+@pytest.mark.parametrize('direction', ['down','up'])
+def test_fragmentation(mesh,direction):
+    '''
+    The packets which don't fit in a frame are fragmented to the mesh, and
+    reassembled from it, whatever the order of the fragments. The frames are
+    small enough to fragment most packets, large enough for their headers,
+    which all go in the first fragment.
+    '''
+    
+    cases = [c for c in GOLDEN if c['direction']==direction and c['expected']]
+    frag  = lowpanFrag.lowpanFrag()
+    
+    for case in cases:
+        mesh.received = []
+        if direction=='down':
+            lowpan    = _buf(case['expected'][0][1][1])
+        else:
+            lowpan    = _buf(case['lowpan'])
+        frameSize = max(64,lowpanCodec.getHeaderLengths(lowpan)[0]+lowpanFrag.FRAG1_HEADER_LEN)
+        if direction=='down':
+            _clearRouteCache(mesh.lbr)
+            mesh.route = [_buf(hop) for hop in case['route']]
+            mesh.lbr.frag.maxFrameSize = frameSize
+            try:
+                mesh.dispatch('v6ToMesh',_buf(case['ipv6']))
+            finally:
+                mesh.lbr.frag.maxFrameSize = lowpanFrag.MAX_DATAGRAM_SIZE
+            received = []
+            for (signal,(nextHop,lowpan)) in mesh.received:
+                assert signal=='bytesToMesh'
+                lowpan = _buf(lowpan)
+                assert len(lowpan)<=frameSize
+                if lowpanFrag.isFragment(lowpan):
+                    lowpan = frag.reassemble(_buf(nextHop),lowpan)
+                if lowpan:
+                    received += [[signal,[nextHop,_hex(lowpan)]]]
+        else:
+            frag.maxFrameSize = frameSize
+            for fragment in reversed(frag.fragment(_buf(case['prevHop']),lowpan)):
+                mesh.dispatch('fromMote.data',(_buf(case['prevHop']),fragment))
+            received = mesh.received
+        assert received==case['expected']
+    
+    assert frag.getStats()['numDatagrams']==0
+    assert mesh.lbr.getFragmentationStats()['numDatagrams']==0
+
+def test_rh3():
+    
+    reference = lowpanCodec.MESH_DAGROOT
+    hops      = [
+        [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02],   # 1 byte
+        [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x03],   # 1 byte
+        [0x14,0x15,0x92,0x00,0x00,0x00,0x01,0x04],   # 2 bytes
+        [0x02,0x02,0x02,0x02,0x02,0x02,0x02,0x02],   # 8 bytes
+    ]
+    # the first hop shares nothing with bbbb::1
+    assert lowpanCodec.encodeRh3(hops,reference)==(
+        [0x80,0x03]+hops[0]+
+        [0x80,0x00,0x03]+
+        [0x80,0x01,0x01,0x04]+
+        [0x80,0x03]+hops[3]
+    )
+    assert lowpanCodec.encodeRh3([],reference)==[]
+
+def test_rh3TooLong():
+    
+    reference = lowpanCodec.MESH_DAGROOT
+    hops      = [[0,0,0,0,0,0,0,1]]*(lowpanCodec.MAX_6LoRH_SIZE+1)
+    with pytest.raises(ValueError):
+        lowpanCodec.encodeRh3(hops,reference)
+    
+    # a route as long, if not compressed alike, is fine
+    hops[1]   = [1,1,1,1,1,1,1,1]
+    assert lowpanCodec.encodeRh3(hops,reference)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+
+import pytest
+
+import lowpanCodec
+import lowpanFrag
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_lowpanFrag.log'
+
+import logging
+log = logging.getLogger('test_lowpanFrag')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_lowpanFrag',
+                        'lowpanFrag',
+                        'lowpanCodec',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+NOW        = 1000.0
+MOTE       = [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x02]
+OTHER_MOTE = [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x03]
+HOPS       = [
+    [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x04],
+    [0x14,0x15,0x92,0xcc,0x00,0x00,0x00,0x05],
+]
+SRC_ADDR   = [0x20,0x01,0x0d,0xb8]+[0x00]*11+[0x01]
+# uncompressed: IPv6 header, routing header with 2 addresses, hop-by-hop
+# header with the RPL option, outer IPv6 header
+HEADERS_LEN = 40+(8+2*16)+8+40
+
+#============================ helpers =========================================
+
+def _packet(payloadLen,seed=0):
+    '''
+    :returns: A packet from outside the mesh to MOTE, compressed, with a
+        payload of payloadLen bytes, and the size of its uncompressed IPv6
+        datagram.
+    '''
+    payload = [(seed+i) & 0xFF for i in range(payloadLen)]
+    ipv6    = [0x60,0x00,0x00,0x00,payloadLen>>8,payloadLen & 0xFF,17,64]
+    ipv6   += SRC_ADDR
+    ipv6   += lowpanCodec.MESH_PREFIX+MOTE
+    ipv6   += payload
+    lowpan  = lowpanCodec.ipv6ToLowpan(ipv6,lowpanCodec.encodeRh3(HOPS,lowpanCodec.MESH_DAGROOT))
+    return (lowpan,HEADERS_LEN+payloadLen)
+
+def _stats(frag,mote=MOTE):
+    return frag.getStats()['motes'][tuple(mote)]
+
+#============================ tests ===========================================
+
+@pytest.mark.parametrize('payloadLen', [0,40,41,72,1152,lowpanFrag.MAX_DATAGRAM_SIZE-HEADERS_LEN])
+def test_roundtrip(payloadLen):
+    '''
+    The fragments fit in a frame, carry multiples of 8 bytes of the
+    uncompressed datagram but the last, at the offsets of the uncompressed
+    datagram, and reassemble into the packet.
+    '''
+    
+    frag           = lowpanFrag.lowpanFrag()
+    (packet,size)  = _packet(payloadLen)
+    fragments      = frag.fragment(MOTE,packet)
+    
+    if len(packet)<=lowpanFrag.MAX_FRAME_SIZE:
+        assert fragments==[packet]
+        return
+    
+    assert fragments[0][0] & lowpanFrag.FRAG_DISPATCH_MASK==lowpanFrag.FRAG1_DISPATCH
+    for fragment in fragments[1:]:
+        assert fragment[0] & lowpanFrag.FRAG_DISPATCH_MASK==lowpanFrag.FRAGN_DISPATCH
+    
+    (compressed,uncompressed) = lowpanCodec.getHeaderLengths(fragments[0][lowpanFrag.FRAG1_HEADER_LEN:])
+    offset = uncompressed-compressed
+    for fragment in fragments:
+        (fragSize,_,fragOffset,headerLen) = lowpanFrag.parseFragHeader(fragment)
+        assert len(fragment)<=lowpanFrag.MAX_FRAME_SIZE
+        assert fragSize==size
+        assert fragOffset==(offset if fragOffset else 0)
+        offset += len(fragment)-headerLen
+        if fragment is not fragments[-1]:
+            assert offset%8==0
+    assert offset==size
+    
+    for fragment in fragments[:-1]:
+        assert frag.reassemble(MOTE,fragment,now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[-1],now=NOW)==packet
+    
+    assert frag.getStats()['numDatagrams']==0
+    assert frag.getStats()['numBytes']==0
+    stats = _stats(frag)
+    assert stats['numDatagramsTx']==1
+    assert stats['numFragmentsTx']==len(fragments)
+    assert stats['numFragmentsRx']==len(fragments)
+    assert stats['numDatagramsRx']==1
+
+def test_tooLarge():
+    
+    frag = lowpanFrag.lowpanFrag()
+    with pytest.raises(ValueError):
+        frag.fragment(MOTE,_packet(lowpanFrag.MAX_DATAGRAM_SIZE-HEADERS_LEN+1)[0])
+
+def test_headersTooLong():
+    '''
+    The compressed headers all go in the first fragment.
+    '''
+    
+    frag = lowpanFrag.lowpanFrag(maxFrameSize=40)
+    with pytest.raises(ValueError):
+        frag.fragment(MOTE,_packet(200)[0])
+
+def test_tags():
+    '''
+    Each datagram gets its tag, and interleaved datagrams, from the same or
+    different neighbours, are reassembled apart.
+    '''
+    
+    frag      = lowpanFrag.lowpanFrag()
+    frag.nextTag = 0xFFFF
+    packets   = [_packet(72,seed)[0] for seed in range(3)]
+    fragments = [frag.fragment(MOTE,packet) for packet in packets]
+    
+    assert [lowpanFrag.parseFragHeader(f[0])[1] for f in fragments]==[0xFFFF,0,1]
+    
+    # the same tag from another neighbour is another datagram
+    received  = []
+    for (i,_) in enumerate(fragments[0]):
+        for (mote,f) in [(MOTE,fragments[0]),(MOTE,fragments[1]),(OTHER_MOTE,fragments[2]),(OTHER_MOTE,fragments[1])]:
+            received += [frag.reassemble(mote,f[i],now=NOW)]
+    assert [r for r in received if r]==[packets[0],packets[1],packets[2],packets[1]]
+
+def test_outOfOrder():
+    
+    frag      = lowpanFrag.lowpanFrag()
+    packet    = _packet(172)[0]
+    fragments = frag.fragment(MOTE,packet)
+    
+    for fragment in fragments[:0:-1]:
+        assert frag.reassemble(MOTE,fragment,now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[0],now=NOW)==packet
+
+def test_duplicate():
+    
+    frag      = lowpanFrag.lowpanFrag()
+    packet    = _packet(72)[0]
+    fragments = frag.fragment(MOTE,packet)
+    
+    assert frag.reassemble(MOTE,fragments[0],now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[0],now=NOW) is None
+    for fragment in fragments[1:-1]:
+        assert frag.reassemble(MOTE,fragment,now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[-1],now=NOW)==packet
+    assert _stats(frag)['numDuplicates']==1
+
+def test_overlap():
+    '''
+    A fragment overlapping, but not duplicating, those received restarts the
+    datagram.
+    '''
+    
+    frag      = lowpanFrag.lowpanFrag()
+    packet    = _packet(172)[0]
+    fragments = frag.fragment(MOTE,packet)
+    
+    # the second fragment again, one byte shorter and 8 bytes earlier
+    overlap   = fragments[1][:4]+[fragments[1][4]-1]+fragments[1][5:-1]
+    
+    for fragment in fragments[:-1]:
+        assert frag.reassemble(MOTE,fragment,now=NOW) is None
+    assert frag.reassemble(MOTE,overlap,now=NOW) is None
+    assert _stats(frag)['numDroppedOverlap']==1
+    
+    # the fragments received before it were dropped
+    assert frag.reassemble(MOTE,fragments[-1],now=NOW) is None
+    for fragment in fragments[:-1]:
+        frag.reassemble(MOTE,fragment,now=NOW)
+    assert frag.getStats()['numDatagrams']==1
+
+def test_invalid():
+    
+    frag      = lowpanFrag.lowpanFrag()
+    
+    # beyond the size of the datagram
+    fragment  = [lowpanFrag.FRAGN_DISPATCH,100,0,0,12]+[0]*8
+    assert frag.reassemble(MOTE,fragment,now=NOW) is None
+    assert _stats(frag)['numDroppedInvalid']==1
+    
+    # first fragment without 6LoWPAN headers
+    fragment  = [lowpanFrag.FRAG1_DISPATCH,100,0,0]+[0xf1]*8
+    assert frag.reassemble(MOTE,fragment,now=NOW) is None
+    assert _stats(frag)['numDroppedInvalid']==2
+    
+    with pytest.raises(ValueError):
+        frag.reassemble(MOTE,[lowpanFrag.FRAGN_DISPATCH,100,0,0],now=NOW)
+
+def test_timeout():
+    
+    frag      = lowpanFrag.lowpanFrag(timeout=10)
+    packet    = _packet(172)[0]
+    fragments = frag.fragment(MOTE,packet)
+    
+    assert frag.reassemble(MOTE,fragments[0],now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[1],now=NOW+5) is None
+    assert frag.getStats()['numDatagrams']==1
+    
+    # the datagram timed out, the last fragment starts another
+    assert frag.reassemble(MOTE,fragments[2],now=NOW+11) is None
+    assert _stats(frag)['numDroppedTimeout']==1
+    assert frag.getStats()['numDatagrams']==1
+    assert frag.getStats()['numBytes']==300
+
+@pytest.mark.parametrize('bounds', [{'maxDatagrams': 2},{'maxBytes': 500}])
+def test_poolFull(bounds):
+    '''
+    The fragments of new datagrams are dropped while the pool is full.
+    '''
+    
+    frag      = lowpanFrag.lowpanFrag(**bounds)
+    packets   = [_packet(72,seed)[0] for seed in range(3)]
+    fragments = [frag.fragment(MOTE,packet) for packet in packets]
+    
+    assert frag.reassemble(MOTE,fragments[0][0],now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[1][0],now=NOW) is None
+    assert frag.reassemble(MOTE,fragments[2][0],now=NOW) is None
+    assert _stats(frag)['numDroppedNoBuffer']==1
+    assert frag.getStats()['numDatagrams']==2
+    
+    # the datagrams under way complete
+    for fragment in fragments[0][1:]:
+        received = frag.reassemble(MOTE,fragment,now=NOW)
+    assert received==packets[0]
+    
+    # which makes room
+    for fragment in fragments[2]:
+        received = frag.reassemble(MOTE,fragment,now=NOW)
+    assert received==packets[2]
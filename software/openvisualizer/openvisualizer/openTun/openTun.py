@@ -14,6 +14,7 @@ import time
 
 import openvisualizer.openvisualizer_utils as u
 from   openvisualizer.eventBus import eventBusClient
+from   openvisualizer.eventBus import eventBusExecutor
 
 # IPv6 address for TUN interface
 IPV6PREFIX = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
@@ -56,10 +57,16 @@ class OpenTun(eventBusClient.eventBusClient):
         
         # store params
         
+        # writing to the TUN interface happens in its own thread, the packets
+        # are dropped if they arrive faster than they can be written
+        self.txExecutor           = eventBusExecutor.eventBusExecutor('OpenTun_tx')
+        
         # register to receive outgoing network packets
         eventBusClient.eventBusClient.__init__(
             self,
             name                  = 'OpenTun',
+            executor              = self.txExecutor,
+            queuePolicy           = eventBusExecutor.QUEUE_DROP,
             registrations         = [
                 {
                     'sender'      : self.WILDCARD,
@@ -93,6 +100,8 @@ class OpenTun(eventBusClient.eventBusClient):
     
     def close(self):
         
+        self.txExecutor.close()
+        
         if self.tunReadThread:
             
             self.tunReadThread.close()
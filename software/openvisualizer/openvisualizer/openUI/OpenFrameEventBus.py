@@ -50,7 +50,7 @@ class OpenFrameEventBus(OpenFrame.OpenFrame):
     def _updateStats(self):
         
         # load stats
-        newStats = json.loads(self.eventBusMonitor.getStats())
+        newStats = json.loads(self.eventBusMonitor.getStats())['signals']
         
         for i in range(len(newStats)):
             if type(newStats[i]['signal'])==list and len(newStats[i]['signal'])==3:
@@ -69,7 +69,7 @@ class remoteConnectorServer():
             dispatcher.send(
                 sender  =  event['sender'].encode("utf8"),
                 signal  =  event['signal'].encode("utf8"),
-                data    =  event['data']
+                data    =  event['data'].decode('hex')
             )
             count+=1
 
@@ -99,6 +99,12 @@ setup(
                         '/'.join([simdata, '*.h']) 
                         ]},
     install_requires = deplist,
+    # Optional, to run emulated motes as greenlets and to vectorize the
+    # propagation model.
+    extras_require   = {
+                       'greenlet': ['greenlet'],
+                       'numpy':    ['numpy'],
+                       },
     # Must extract zip to edit conf files.
     zip_safe         = False,
     version          = VERSION,